@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the actionlog application.
+
+Run them with ``./manage.py txbenchmark``.
+"""
+
+from __future__ import with_statement
+import datetime
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core import management
+from django.db import connection, transaction, DatabaseError
+from django.template import loader, Context
+from django.utils.encoding import force_unicode
+from notification.models import NoticeType
+from south.db import db
+from transifex.txcommon.benchmarks import register
+from transifex.txcommon.db.bulk import bulk_insert
+from transifex.actionlog.models import LogEntry, action_logging, \
+        buffered_action_logging, timeline_page
+from transifex.languages.models import Language
+from transifex.projects.models import Project
+
+
+def _legacy_action_logging(user, object_list, action_type, context):
+    """Log the actions the way action_logging used to: the notice type is
+    fetched, the template loaded and each entry saved on every call, and
+    the actions on projects are checked against the slugs of all private
+    projects.
+    """
+    message = loader.get_template(
+        'notification/%s/notice.html' % action_type
+    ).render(Context(context))
+    action_type_obj = NoticeType.objects.get(label=action_type)
+    time = datetime.datetime.now()
+    for object in object_list:
+        LogEntry(
+            user_id=user.pk,
+            content_type=ContentType.objects.get_for_model(object),
+            object_id=object.pk, object_name=force_unicode(object)[:200],
+            action_type=action_type_obj, action_time=time, message=message
+        ).save()
+        if isinstance(object, Project) and not object.private:
+            for slug in Project.objects.filter(
+                    private=True).values_list('slug', flat=True):
+                if ('/projects/p/%s/' % slug) in message:
+                    break
+
+
+def _action_logging(user, object_list, action_type, context):
+    action_logging(user, object_list, action_type, context=context)
+
+
+def _log_many(log, user, projects, calls, per_call):
+    for n in xrange(calls):
+        objects = projects[:per_call]
+        log(user, objects, 'project_changed', {'project': objects[0]})
+
+
+def _log_buffered(user, projects, calls, per_call):
+    with buffered_action_logging():
+        _log_many(_action_logging, user, projects, calls, per_call)
+
+
+@register('actionlog', "Log thousands of actions on projects")
+def log_actions(run, calls=2000, private_projects=200):
+    management.call_command('txcreatenoticetypes', verbosity=0)
+    if not Language.objects.exists():
+        management.call_command('txlanguages', verbosity=0)
+    language = Language.objects.by_code_or_alias('en')
+    user, created = User.objects.get_or_create(username='benchmarks')
+    projects = []
+    for n in xrange(private_projects + 10):
+        project, created = Project.objects.get_or_create(
+            slug='actionlog-%s' % n, defaults={
+                'name': 'Actionlog %s' % n, 'source_language': language,
+                'private': n >= 10,
+            }
+        )
+        projects.append(project)
+
+    old_debug_cursor = connection.use_debug_cursor
+    connection.use_debug_cursor = True
+    try:
+        for per_call_objects in (1, 10):
+            call_count = calls / per_call_objects
+            for name, func, args in (
+                    ("legacy", _log_many, (_legacy_action_logging, )),
+                    ("one insert per call", _log_many, (_action_logging, )),
+                    ("one insert per block", _log_buffered, ())):
+                task = "%s (%s x %s objects)" % (
+                    name, call_count, per_call_objects
+                )
+                start = len(connection.queries)
+                args = args + (user, projects, call_count, per_call_objects)
+                run.time(task, func, *args)
+                run.note(task, "%s queries" % (
+                    len(connection.queries) - start
+                ))
+    finally:
+        connection.use_debug_cursor = old_debug_cursor
+
+
+# The indexes added by the 0002_add_timeline_indexes migration
+_TIMELINE_INDEXES = (
+    ['content_type_id', 'object_id', 'action_time'],
+    ['user_id', 'action_time'],
+)
+
+
+def _create_log(entries, project, other_projects, users, action_type_id):
+    """Log the given number of entries: a quarter of them on the project,
+    the rest on the other projects. Each action is logged twice, with the
+    same action time, like the actions logged for many objects at once.
+    """
+    ctype_id = ContentType.objects.get_for_model(project).id
+    start = datetime.datetime.now() - datetime.timedelta(seconds=entries)
+    batch = []
+    for n in xrange(entries):
+        if (n / 2) % 4:
+            obj = other_projects[(n / 2) % len(other_projects)]
+        else:
+            obj = project
+        batch.append(LogEntry(
+            user_id=users[n % len(users)].id, content_type_id=ctype_id,
+            object_id=obj.id, object_name=obj.name,
+            action_type_id=action_type_id,
+            action_time=start + datetime.timedelta(seconds=n / 2),
+            message=u'Changed %s' % obj.name
+        ))
+        if len(batch) == 10000:
+            bulk_insert(LogEntry, batch)
+            batch = []
+    bulk_insert(LogEntry, batch)
+    transaction.commit_unless_managed()
+
+
+def _create_timeline_indexes():
+    for columns in _TIMELINE_INDEXES:
+        try:
+            db.create_index(LogEntry._meta.db_table, columns)
+        except DatabaseError:
+            # The test database was created with the migrations.
+            transaction.rollback_unless_managed()
+    transaction.commit_unless_managed()
+
+
+def _offset_page(query, number, size):
+    return list(query[(number - 1) * size:number * size])
+
+
+def _keyset_page(query, cursor, size):
+    return timeline_page(query, cursor, size).entries
+
+
+@register('actionlog-timeline', "Page through the timeline of a project "
+          "with 1M log entries")
+def timeline(run, entries=1000000, size=30, last_page=100):
+    management.call_command('txcreatenoticetypes', verbosity=0)
+    if not Language.objects.exists():
+        management.call_command('txlanguages', verbosity=0)
+    language = Language.objects.by_code_or_alias('en')
+    users = [User.objects.get_or_create(username='timeline-%s' % n)[0]
+             for n in xrange(20)]
+    projects = []
+    for n in xrange(50):
+        project, created = Project.objects.get_or_create(
+            slug='timeline-%s' % n, defaults={
+                'name': 'Timeline %s' % n, 'source_language': language,
+            }
+        )
+        projects.append(project)
+    project = projects[0]
+    run.time("log %s entries" % entries, _create_log, entries, project,
+             projects[1:], users,
+             NoticeType.objects.get(label='project_changed').id)
+
+    legacy = LogEntry.objects.by_object(project).select_related(
+        'action_type', 'user'
+    )
+    query = LogEntry.objects.for_object(project).select_related(
+        'action_type', 'user'
+    )
+    # The cursor of the page before the last one, found beforehand
+    cursor = None
+    for n in xrange(last_page - 1):
+        cursor = timeline_page(query, cursor, size).next_cursor
+
+    for indexes in ("without indexes", "with indexes"):
+        if indexes == "with indexes":
+            run.time("create the indexes", _create_timeline_indexes)
+        for number in (1, last_page):
+            task = "offset page %s (%s)" % (number, indexes)
+            run.time(task, _offset_page, legacy, number, size)
+            task = "keyset page %s (%s)" % (number, indexes)
+            run.time(task, _keyset_page, query,
+                     number > 1 and cursor or None, size)
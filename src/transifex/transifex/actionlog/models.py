@@ -1,5 +1,10 @@
+from __future__ import with_statement
 import datetime
+import itertools
+import threading
 from django.db import models
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
 from django.contrib.contenttypes import generic
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
@@ -9,6 +14,7 @@ from django.utils.encoding import smart_unicode, force_unicode
 from django.template import loader, Context, TemplateDoesNotExist
 from django.utils.translation import get_language, activate
 from notification.models import NoticeType
+from transifex.txcommon.db.bulk import bulk_insert
 from transifex.txcommon.log import logger
 try:
     from datastores import TxRedisMapper, ConnectionError
@@ -18,23 +24,54 @@ except ImportError, e:
     USE_REDIS = False
 
 
+_local = threading.local()
+
+# The compiled notice templates and the NoticeType ids, by label
+_templates = {}
+_notice_type_ids = {}
+
+
+def _get_notice_template(label):
+    """Return the compiled notice template of the label or None."""
+    if label not in _templates:
+        template = 'notification/%s/notice.html' % label
+        try:
+            _templates[label] = loader.get_template(template)
+        except TemplateDoesNotExist:
+            logger.error("Template '%s' doesn't exist." % template)
+            _templates[label] = None
+    return _templates[label]
+
+
+def _get_notice_type_id(label):
+    """Return the id of the NoticeType with the label."""
+    if label not in _notice_type_ids:
+        _notice_type_ids[label] = NoticeType.objects.get(label=label).id
+    return _notice_type_ids[label]
+
+
+def _clear_notice_type_ids(sender, **kwargs):
+    _notice_type_ids.clear()
+
+post_save.connect(_clear_notice_type_ids, sender=NoticeType)
+post_delete.connect(_clear_notice_type_ids, sender=NoticeType)
+
+
 def _get_formatted_message(label, context):
     """
     Return a message that is a rendered template with the given context using
     the default language of the system.
     """
+    template = _get_notice_template(label)
+    if template is None:
+        return None
+
     current_language = get_language()
 
     # Setting the environment to the default language
     activate(settings.LANGUAGE_CODE)
 
-    c = Context(context)
-    template = 'notification/%s/notice.html' % label
-    try:
-        msg = loader.get_template(template).render(c)
-    except TemplateDoesNotExist:
-        logger.error("Template '%s' doesn't exist." % template)
-        msg = None
+    msg = template.render(Context(context))
 
     # Reset environment to original language
     activate(current_language)
@@ -98,17 +135,118 @@ def _distinct_action_time(query):
     return LogEntry.objects.select_related('user').filter(pk__in=pks)
 
 
+_CURSOR_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def format_cursor(entry):
+    """Return the cursor of a timeline page, which starts after the entry."""
+    return '%s_%s' % (
+        entry.action_time.strftime(_CURSOR_TIME_FORMAT), entry.id
+    )
+
+
+def parse_cursor(value):
+    """Return the action time and the id of a cursor, or None if the
+    cursor is not valid.
+    """
+    try:
+        action_time, id = value.split('_')
+        return (datetime.datetime.strptime(action_time, _CURSOR_TIME_FORMAT),
+                int(id))
+    except (AttributeError, ValueError):
+        return None
+
+
+def iter_distinct_entries(query, cursor=None, chunk_size=100):
+    """
+    Yield the entries of the query newest first, keeping only the entry
+    with the highest 'id' of the entries with equal 'action_time', like
+    ``_distinct_action_time``.
+
+    The entries are fetched in chunks ordered by ('action_time', 'id').
+    Each chunk starts after the last entry of the previous one, instead of
+    skipping the entries before it with an OFFSET, and the duplicates are
+    dropped as the rows stream. Only the entries that are consumed are
+    read, which the indexes on (content_type, object_id, action_time) and
+    (user, action_time) serve.
+
+    Args:
+        query: A LogEntry queryset.
+        cursor: The (action_time, id) of the last entry returned before.
+            The entries up to it and the rest of the entries with its
+            action time are skipped.
+        chunk_size: The number of entries fetched with each query.
+    """
+    query = query.order_by('-action_time', '-id')
+    last_time = cursor and cursor[0]
+    while True:
+        chunk = query
+        if cursor is not None:
+            action_time, id = cursor
+            chunk = chunk.filter(
+                Q(action_time__lt=action_time) |
+                Q(action_time=action_time, id__lt=id)
+            )
+        chunk = list(chunk[:chunk_size])
+        for entry in chunk:
+            if entry.action_time != last_time:
+                last_time = entry.action_time
+                yield entry
+        if len(chunk) < chunk_size:
+            return
+        cursor = (chunk[-1].action_time, chunk[-1].id)
+
+
+class TimelinePage(object):
+    """A page of distinct LogEntries, newest first."""
+
+    def __init__(self, entries, next_cursor=None):
+        self.entries = entries
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def timeline_page(query, cursor=None, size=30):
+    """Return the TimelinePage of the query, which starts after the cursor.
+
+    Args:
+        query: A LogEntry queryset.
+        cursor: The cursor returned by ``format_cursor`` for the last entry
+            of the previous page, or None for the first page.
+        size: The number of entries in the page.
+    """
+    if cursor is not None:
+        cursor = parse_cursor(cursor)
+    entries = list(itertools.islice(
+        iter_distinct_entries(query, cursor, chunk_size=size + 1), size + 1
+    ))
+    if len(entries) > size:
+        return TimelinePage(entries[:size], format_cursor(entries[size - 1]))
+    return TimelinePage(entries)
+
+
 class LogEntryManager(models.Manager):
+    def for_object(self, obj):
+        """Return all the LogEntries of a related object, including the
+        ones with the same action time."""
+        ctype = ContentType.objects.get_for_model(obj)
+        return self.filter(content_type__pk=ctype.pk, object_id=obj.pk)
+
+    def for_user(self, user):
+        """Return all the LogEntries of a user, including the ones with the
+        same action time."""
+        return self.filter(user__pk__exact=user.pk)
+
     def by_object(self, obj):
         """Return LogEntries for a related object."""
-        ctype = ContentType.objects.get_for_model(obj)
-        q = self.filter(content_type__pk=ctype.pk, object_id=obj.pk)
-        return _distinct_action_time(q)
+        return _distinct_action_time(self.for_object(obj))
 
     def by_user(self, user):
         """Return LogEntries for a specific user."""
-        q = self.filter(user__pk__exact=user.pk)
-        return _distinct_action_time(q)
+        return _distinct_action_time(self.for_user(user))
 
     def by_object_last_week(self, obj):
         """Return LogEntries of the related object for the last week."""
@@ -117,16 +255,22 @@ class LogEntryManager(models.Manager):
         return self.filter(content_type__pk=ctype.pk, object_id=obj.pk,
             action_time__gt=last_week_date)
 
-    def by_user_and_public_projects(self, user):
+    def for_user_and_public_projects(self, user):
         """
-        Return LogEntries for a specific user and his actions on public projects.
+        Return all the LogEntries of a user for his actions on public
+        projects, including the ones with the same action time.
         """
         # Avoiding circular import troubles. get_model didn't make it.
         from transifex.projects.models import Project
         ctype = ContentType.objects.get(model='project')
-        q = self.filter(user__pk__exact=user.pk, content_type=ctype,
+        return self.filter(user__pk__exact=user.pk, content_type=ctype,
                 object_id__in=Project.objects.filter(private=False))
-        return _distinct_action_time(q)
+
+    def by_user_and_public_projects(self, user):
+        """
+        Return LogEntries for a specific user and his actions on public projects.
+        """
+        return _distinct_action_time(self.for_user_and_public_projects(user))
 
     def for_projects_by_user(self, user):
         """Return project LogEntries for a related user."""
@@ -248,53 +392,112 @@ def action_logging(user, object_list, action_type, message=None, context=None):
     if message is None:
         message = _get_formatted_message(action_type, context)
 
-    action_type_obj = NoticeType.objects.get(label=action_type)
+    action_type_id = _get_notice_type_id(action_type)
 
     time = datetime.datetime.now()
 
     try:
+        object_list = iter(object_list)
+    except TypeError:
+        raise TypeError("The 'object_list' parameter must be iterable")
+
+    with buffered_action_logging() as buffer:
         for object in object_list:
-            l = LogEntry(
+            buffer.entries.append(LogEntry(
                     user_id = user.pk,
-                    content_type = ContentType.objects.get_for_model(object),
+                    content_type_id = ContentType.objects.get_for_model(
+                        object).id,
                     object_id = object.pk,
                     object_name = force_unicode(object)[:200],
-                    action_type = action_type_obj,
+                    action_type_id = action_type_id,
                     action_time = time,
-                    message = message)
-            l.save()
+                    message = message))
             if USE_REDIS:
-                _log_to_queues(object, user.pk, time, message)
-    except TypeError:
-        raise TypeError("The 'object_list' parameter must be iterable")
+                _log_to_queues(buffer, object, user.pk, time, message, context)
+
+
+class ActionLogBuffer(object):
+    """The LogEntries and the redis events waiting to be written."""
+
+    def __init__(self):
+        self.entries = []
+        self.project_actions = []
+
+    def flush(self):
+        """Insert the LogEntries with one query and push the events."""
+        entries, self.entries = self.entries, []
+        project_actions, self.project_actions = self.project_actions, []
+        bulk_insert(LogEntry, entries)
+        for args in project_actions:
+            try:
+                _log_to_recent_project_actions(*args)
+            except ConnectionError, e:
+                logger.critical("Cannot connect to redis: %s" % e,
+                                exc_info=True)
+                return
 
 
-def _log_to_queues(o, user_id, action_time, message):
-    """Log actions to redis' queues."""
+class buffered_action_logging(object):
+    """
+    Context manager that writes the LogEntries logged in it together, at
+    its end::
+
+        with buffered_action_logging():
+            for resource in resources:
+                action_logging(user, [resource], 'project_resource_added')
+
+    Nested blocks are merged into the outermost one. The entries are thrown
+    away, if an exception is raised. Use it inside the transaction of the
+    logged actions, so that their entries are rolled back with them.
+    """
+
+    def __enter__(self):
+        self.outer = getattr(_local, 'buffer', None)
+        if self.outer is None:
+            _local.buffer = ActionLogBuffer()
+        return _local.buffer
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is None:
+            buffer = _local.buffer
+            _local.buffer = None
+            if exc_type is None:
+                buffer.flush()
+        return False
+
+
+def _related_projects(context):
+    """Return the projects of the objects in the context of an action."""
     from transifex.projects.models import Project
+    projects = []
+    for value in context.itervalues():
+        if isinstance(value, Project):
+            projects.append(value)
+        elif isinstance(getattr(value, 'project', None), Project):
+            projects.append(value.project)
+    return projects
 
-    try:
-        if isinstance(o, Project):
-            _log_to_recent_project_actions(o, user_id, action_time, message)
-    except ConnectionError, e:
-        logger.critical("Cannot connect to redis: %s" % e, exc_info=True)
-        return
+
+def _log_to_queues(buffer, o, user_id, action_time, message, context):
+    """Log actions to redis' queues, when the buffer is flushed."""
+    from transifex.projects.models import Project
+
+    if isinstance(o, Project):
+        buffer.project_actions.append((
+            o, user_id, action_time, message, _related_projects(context)
+        ))
 
 
-def _log_to_recent_project_actions(p, user_id, action_time, message):
+def _log_to_recent_project_actions(p, user_id, action_time, message,
+                                   related_projects=()):
     """Log actions that refer to projects to a queue of most recent actions.
 
-    We use redis' list for that. We skip actions that refer to private projects.
+    We use redis' list for that. We skip actions that refer to private
+    projects, either the project itself or any project in the context of
+    the action.
     """
-    from transifex.projects.models import Project
-    if p.private:
+    if p.private or any(project.private for project in related_projects):
         return
-    private_slugs = Project.objects.filter(
-        private=True
-    ).values_list('slug', flat=True)
-    for slug in private_slugs:
-        if ('/projects/p/%s/' % slug) in message:
-            return
 
     key = 'event_feed'
     data = {
@@ -1,5 +1,5 @@
 from django import template
-from actionlog.models import LogEntry
+from actionlog.models import LogEntry, timeline_page
 
 register = template.Library()
 
@@ -16,14 +16,16 @@ class LogNode(template.Node):
         if self.user is not None:
             user = template.Variable(self.user).resolve(context)
             if self.log_type and self.log_type == 'get_public_log':
-                query = LogEntry.objects.by_user_and_public_projects(user)
+                query = LogEntry.objects.for_user_and_public_projects(user)
             else:
-                query = LogEntry.objects.by_user(user)
+                query = LogEntry.objects.for_user(user)
         elif self.object is not None:
             obj = template.Variable(self.object).resolve(context)
-            query = LogEntry.objects.by_object(obj)
+            query = LogEntry.objects.for_object(obj)
 
-        context[self.varname] = query[:self.limit]
+        context[self.varname] = timeline_page(
+            query.select_related('user'), size=int(self.limit)
+        ).entries
         return ''
 
 class DoGetLog:
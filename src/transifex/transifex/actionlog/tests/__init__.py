@@ -1 +1,3 @@
 from api import *
+from buffer import *
+from timeline import *
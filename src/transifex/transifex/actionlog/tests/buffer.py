@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from __future__ import with_statement
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from transifex.actionlog.models import LogEntry, action_logging, \
+        buffered_action_logging, _related_projects, \
+        _log_to_recent_project_actions
+from transifex.txcommon.tests.base import BaseTestCase, Users, \
+        TransactionNoticeTypes
+
+
+class BufferedActionLoggingTests(BaseTestCase):
+    """Test that the LogEntries are inserted together."""
+
+    def _count_queries(self, func, *args):
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            func(*args)
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        return connection.queries[start:]
+
+    def _log(self, objects):
+        action_logging(
+            self.user['maintainer'], objects, 'project_changed',
+            context={'project': self.project}
+        )
+
+    def test_one_insert_per_call(self):
+        LogEntry.objects.all().delete()
+        objects = [self.project, self.project_private, self.resource]
+        self._log(objects)
+        queries = self._count_queries(self._log, objects)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]['sql'].startswith('INSERT'))
+        self.assertEqual(LogEntry.objects.count(), 6)
+        entry = LogEntry.objects.filter(object_id=self.resource.id)[0]
+        self.assertEqual(entry.object, self.resource)
+        self.assertEqual(entry.action_type.label, 'project_changed')
+        self.assertEqual(entry.user, self.user['maintainer'])
+        self.assertTrue(entry.message)
+
+    def test_buffer(self):
+        LogEntry.objects.all().delete()
+        with buffered_action_logging():
+            self._log([self.project])
+            with buffered_action_logging():
+                self._log([self.project_private])
+            self.assertEqual(LogEntry.objects.count(), 0)
+        self.assertEqual(LogEntry.objects.count(), 2)
+
+    def test_buffer_error(self):
+        LogEntry.objects.all().delete()
+        try:
+            with buffered_action_logging():
+                self._log([self.project])
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(LogEntry.objects.count(), 0)
+        self._log([self.project])
+        self.assertEqual(LogEntry.objects.count(), 1)
+
+    def test_private_projects(self):
+        self.assertEqual(set(_related_projects({
+            'project': self.project_private, 'resource': self.resource,
+            'other': 'value',
+        })), set([self.project_private, self.project]))
+        # Nothing is pushed for private projects, even without redis.
+        _log_to_recent_project_actions(
+            self.project, None, None, '', [self.project_private]
+        )
+        _log_to_recent_project_actions(self.project_private, None, None, '')
+
+
+class ActionLoggingTransactionTests(Users, TransactionNoticeTypes,
+                                    TransactionTestCase):
+    """Test that the LogEntries are part of the transaction of their
+    actions.
+    """
+
+    def _log(self):
+        user = self.user['maintainer']
+        action_logging(user, [user], 'project_changed', message="Changed")
+
+    def test_rollback(self):
+        LogEntry.objects.all().delete()
+
+        @transaction.commit_on_success
+        def failed_action():
+            self._log()
+            raise ValueError
+        self.assertRaises(ValueError, failed_action)
+        self.assertEqual(LogEntry.objects.count(), 0)
+
+        @transaction.commit_manually
+        def rolled_back_action():
+            with buffered_action_logging():
+                self._log()
+            transaction.rollback()
+        rolled_back_action()
+        self.assertEqual(LogEntry.objects.count(), 0)
+
+        @transaction.commit_manually
+        def committed_action():
+            with buffered_action_logging():
+                self._log()
+            transaction.commit()
+        committed_action()
+        self.assertEqual(LogEntry.objects.count(), 1)
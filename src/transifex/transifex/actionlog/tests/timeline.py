@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import datetime
+from django.contrib.contenttypes.models import ContentType
+from notification.models import NoticeType
+from transifex.actionlog.models import LogEntry, iter_distinct_entries, \
+        timeline_page, format_cursor, parse_cursor
+from transifex.txcommon.tests.base import BaseTestCase
+
+
+class TimelineTests(BaseTestCase):
+    """Test the keyset pagination of the distinct LogEntries."""
+
+    def setUp(self):
+        super(TimelineTests, self).setUp()
+        LogEntry.objects.all().delete()
+        ctype = ContentType.objects.get_for_model(self.project)
+        action_type = NoticeType.objects.get(label='project_changed')
+        start = datetime.datetime(2011, 1, 1)
+        for n in xrange(40):
+            # Every third action time is shared by two entries.
+            for m in xrange(n % 3 and 1 or 2):
+                LogEntry.objects.create(
+                    user=self.user['maintainer'], content_type=ctype,
+                    object_id=self.project.id, object_name=self.project.name,
+                    action_type=action_type,
+                    action_time=start + datetime.timedelta(minutes=n)
+                )
+        LogEntry.objects.create(
+            user=self.user['registered'], content_type=ctype,
+            object_id=self.project_private.id, action_type=action_type,
+            action_time=start
+        )
+
+    def test_distinct_entries(self):
+        query = LogEntry.objects.for_object(self.project)
+        legacy = list(LogEntry.objects.by_object(self.project).order_by(
+            '-action_time'
+        ))
+        for chunk_size in (1, 2, 7, 100):
+            entries = list(iter_distinct_entries(query, chunk_size=chunk_size))
+            self.assertEqual(entries, legacy)
+        self.assertEqual(len(legacy), 40)
+        self.assertEqual(
+            list(iter_distinct_entries(LogEntry.objects.for_user(
+                self.user['registered']
+            ))),
+            list(LogEntry.objects.by_user(self.user['registered']))
+        )
+
+    def test_pages(self):
+        query = LogEntry.objects.for_object(self.project)
+        expected = list(iter_distinct_entries(query))
+        entries, cursor = [], None
+        for n in xrange(4):
+            page = timeline_page(query, cursor, size=12)
+            entries.extend(page.entries)
+            cursor = page.next_cursor
+            self.assertEqual(page.has_next, n < 3)
+        self.assertEqual(entries, expected)
+
+        # Invalid cursors return the first page
+        self.assertEqual(
+            timeline_page(query, 'invalid', size=12).entries, expected[:12]
+        )
+
+    def test_cursor(self):
+        entry = LogEntry.objects.for_object(self.project)[0]
+        self.assertEqual(
+            parse_cursor(format_cursor(entry)),
+            (entry.action_time, entry.id)
+        )
+        self.assertEqual(parse_cursor(None), None)
+        self.assertEqual(parse_cursor('2011-01-01_1'), None)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-File containing the necessary mechanics for the txlanguages management command.
+File containing the necessary mechanics for the txfetch management command.
 """
 from optparse import make_option, OptionParser
 import os.path
@@ -8,6 +8,7 @@ import sys
 from django.core.management.base import (BaseCommand, LabelCommand, CommandError)
 from django.db.models import get_model
 from django.conf import settings
+from autofetch.runner import FetchRunner, FAILED
 
 URLInfo = get_model("autofetch", "URLInfo")
 Resource = get_model("resources", "Resource")
@@ -25,12 +26,21 @@ class Command(LabelCommand):
         make_option('--skip', action='store_true',
             dest='skip', default=False,
             help='Import data from a file or from the default '),
+        make_option('--force', action='store_true',
+            dest='force', default=False,
+            help='Import the source files, even if they have not changed.'),
+        make_option('--workers', type='int',
+            dest='workers', default=None,
+            help='The number of source files to download at the same time.'),
     )
 
     can_import_settings = True
 
     def handle(self, *args, **options):
         skip = options.get('skip')
+        workers = options.get('workers')
+        if workers is not None and workers < 1:
+            raise CommandError("The number of workers must be positive.")
         resource_urlhandlers = []
         if not args:
             resource_urlhandlers = URLInfo.objects.filter(auto_update=True)
@@ -46,6 +56,9 @@ class Command(LabelCommand):
 
             resource_urlhandlers = URLInfo.objects.filter(resource__in=resources)
 
+        resource_urlhandlers = resource_urlhandlers.select_related(
+            'resource', 'resource__project'
+        )
         num = resource_urlhandlers.count()
 
         if num == 0:
@@ -54,19 +67,22 @@ class Command(LabelCommand):
 
         sys.stdout.write("A total of %s resources are listed for updating.\n" % num)
 
-        for seq, handler in enumerate(resource_urlhandlers):
-            sys.stdout.write((u"Updating resource %s.%s (%s of %s)\n" %
-                ( handler.resource.project.slug, handler.resource.slug, seq+1,num)).encode('UTF-8'))
-            try:
-                handler.update_source_file()
-            except Exception, e:
+        def report_result(result):
+            handler = result.urlinfo
+            if result.status == FAILED:
                 sys.stderr.write((u"Error updating source file for resource %s.%s\n" %
                     ( handler.resource.project.slug, handler.resource.slug)).encode('UTF-8'))
-                sys.stderr.write("Exception was: %s\n" % e)
-                if skip:
-                    continue
-                sys.stderr.write("Aborting...\n")
-                sys.exit(1)
+                sys.stderr.write("Exception was: %s\n" % result.error)
             else:
-               sys.stdout.write((u"Updated source file for resource %s.%s\n" %
-                    (handler.resource.project.slug, handler.resource.slug)).encode('UTF-8'))
+                sys.stdout.write((u"%s\n" % unicode(result)).encode('UTF-8'))
+
+        runner = FetchRunner(
+            resource_urlhandlers, workers=workers,
+            force=options.get('force'), stop_on_error=not skip,
+            callback=report_result
+        )
+        report = runner.run()
+        sys.stdout.write((u"%s\n" % unicode(report)).encode('UTF-8'))
+        if report.failed and not skip:
+            sys.stderr.write("Aborting...\n")
+            sys.exit(1)
@@ -1,5 +1,7 @@
 import gc
+from django.conf import settings
 from django.db import models
+from django.utils.hashcompat import md5_constructor
 from django.utils.translation import ugettext_lazy as _
 
 from transifex.resources.models import Resource
@@ -24,6 +26,16 @@ class URLInfo(models.Model):
         " file should be automatically updated by pulling and merging from"\
         " the given URL."))
 
+    # The validators of the last imported file
+    etag = models.CharField(_('ETag'), max_length=255, blank=True,
+        editable=False, help_text=_("The ETag of the last imported file."))
+    last_modified = models.CharField(_('Last modified'), max_length=64,
+        blank=True, editable=False, help_text=_("The Last-Modified header"\
+        " of the last imported file."))
+    content_hash = models.CharField(_('Content hash'), max_length=32,
+        blank=True, editable=False, help_text=_("The MD5 hash of the last"\
+        " imported file."))
+
     # Foreign keys
     resource = models.OneToOneField(Resource, verbose_name=_('Resource'),
         blank=False, null=False, related_name='url_info', unique=True,
@@ -36,33 +48,87 @@ class URLInfo(models.Model):
     def __unicode__(self):
         return "%s.%s" % (self.resource.project.slug, self.resource.slug)
 
-    def update_source_file(self, fake=False):
+    def __init__(self, *args, **kwargs):
+        super(URLInfo, self).__init__(*args, **kwargs)
+        self._validated_url = self.source_file_url
+
+    def save(self, *args, **kwargs):
+        # The validators of the old URL do not apply to the new one.
+        if self.source_file_url != self._validated_url:
+            self.etag = self.last_modified = self.content_hash = ''
+            self._validated_url = self.source_file_url
+        super(URLInfo, self).save(*args, **kwargs)
+
+    def fetch(self, conditional=True):
         """
-        Fetch source file from remote url and import it, updating existing
-        entries.
+        Fetch the source file from the remote url.
+
+        If ``conditional`` is set, the validators of the last import are
+        sent along, so that the server may answer that the file has not
+        been modified.
+
+        This does not touch the database, so that it can run in a thread.
+
+        Returns:
+            A RemoteFile or None, if the file has not been modified.
         """
+        request = urllib2.Request(self.source_file_url)
+        if conditional:
+            if self.etag:
+                request.add_header('If-None-Match', self.etag)
+            if self.last_modified:
+                request.add_header('If-Modified-Since', self.last_modified)
         try:
-            source_file = urllib2.urlopen(self.source_file_url)
+            source_file = urllib2.urlopen(
+                request, timeout=settings.AUTOFETCH_TIMEOUT
+            )
+        except urllib2.HTTPError, e:
+            if conditional and e.code == 304:
+                return None
+            logger.error("Could not pull source file for resource %s (%s)" %
+                (self.resource.full_name, self.source_file_url))
+            raise
         except:
             logger.error("Could not pull source file for resource %s (%s)" %
                 (self.resource.full_name, self.source_file_url))
             raise
 
-        filename = ''
-        if source_file.info().has_key('Content-Disposition'):
+        try:
+            info = source_file.info()
+            filename = ''
+            if info.has_key('Content-Disposition'):
                 # If the response has Content-Disposition, we try to take
                 # filename from it
-                content = source_file.info()['Content-Disposition']
+                content = info['Content-Disposition']
                 if 'filename' in content:
                     filename = content.split('filename')[1]
                     filename = filename.replace('"', '').replace("'", ""
                         ).replace("=", "").replace('/', '-').strip()
 
-        if filename == '':
-            parts = urlparse.urlsplit(self.source_file_url)
-            #FIXME: This still might end empty
-            filename = parts.path.split('/')[-1]
+            if filename == '':
+                parts = urlparse.urlsplit(self.source_file_url)
+                #FIXME: This still might end empty
+                filename = parts.path.split('/')[-1]
+
+            return RemoteFile(
+                source_file.read(), filename, info.get('ETag', ''),
+                info.get('Last-Modified', '')
+            )
+        finally:
+            source_file.close()
+
+    def is_unchanged(self, remote_file):
+        """Whether the remote file is the same as the last one imported."""
+        return bool(self.content_hash) and \
+                remote_file.content_hash == self.content_hash
+
+    def import_source_file(self, remote_file, fake=False):
+        """
+        Import a fetched source file, updating existing entries.
 
+        Unless ``fake`` is set, the validators of the file are stored, so
+        that the next fetch is conditional.
+        """
         try:
             if not self.resource.i18n_method:
                 msg = "No i18n method defined for resource %s"
@@ -70,11 +136,10 @@ class URLInfo(models.Model):
                 return
             parser = registry.appropriate_handler(
                 self.resource, language=self.resource.source_language,
-                filename=filename
+                filename=remote_file.filename
             )
             language = self.resource.source_language
-            content = source_file.read()
-            parser.bind_content(content)
+            parser.bind_content(remote_file.content)
             parser.set_language(language)
             parser.bind_resource(self.resource)
             parser.is_content_valid()
@@ -88,7 +153,44 @@ class URLInfo(models.Model):
                     self.source_file_url, str(e)))
             raise
         finally:
-            source_file.close()
             gc.collect()
 
+        if not fake and self.pk is not None:
+            self.etag = remote_file.etag[:255]
+            self.last_modified = remote_file.last_modified[:64]
+            self.content_hash = remote_file.content_hash
+            self._validated_url = self.source_file_url
+            URLInfo.objects.filter(pk=self.pk).update(
+                etag=self.etag, last_modified=self.last_modified,
+                content_hash=self.content_hash
+            )
         return strings_added, strings_updated
+
+    def update_source_file(self, fake=False, force=False):
+        """
+        Fetch source file from remote url and import it, updating existing
+        entries.
+
+        Unless ``force`` is set, a file that has not changed since the last
+        import is skipped.
+        """
+        conditional = not (fake or force)
+        remote_file = self.fetch(conditional=conditional)
+        if remote_file is None or (conditional and
+                                   self.is_unchanged(remote_file)):
+            logger.debug("Source file of resource %s.%s has not changed." % (
+                self.resource.project.slug, self.resource.slug
+            ))
+            return 0, 0
+        return self.import_source_file(remote_file, fake=fake)
+
+
+class RemoteFile(object):
+    """A source file fetched from a remote url."""
+
+    def __init__(self, content, filename, etag='', last_modified=''):
+        self.content = content
+        self.filename = filename
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = md5_constructor(content).hexdigest()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Fetch and import the source files of many resources.
+
+The source files are downloaded by a bounded pool of threads, which do not
+touch the database. The downloaded files are imported one at a time by the
+calling thread, so the imports of a project never run concurrently. Files
+that have not changed since the last import are skipped before they are
+parsed: either the server answers that they have not been modified, or
+their content hash is the same.
+"""
+
+import Queue
+import threading
+import time
+from django.conf import settings
+from transifex.txcommon.log import logger
+
+FETCHED = 'fetched'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class FetchResult(object):
+    """The result of the update of a single resource."""
+
+    def __init__(self, urlinfo, status, fetch_time, import_time=0.0,
+                 error=None, strings_added=0, strings_updated=0):
+        self.urlinfo = urlinfo
+        self.status = status
+        self.fetch_time = fetch_time
+        self.import_time = import_time
+        self.error = error
+        self.strings_added = strings_added
+        self.strings_updated = strings_updated
+
+    def __unicode__(self):
+        msg = u"%s %s (fetch %.2fs, import %.2fs)" % (
+            self.status.capitalize(), unicode(self.urlinfo),
+            self.fetch_time, self.import_time
+        )
+        if self.error is not None:
+            msg += u": %s" % self.error
+        return msg
+
+
+class FetchReport(object):
+    """The results of a run."""
+
+    def __init__(self):
+        self.results = []
+        self.total_time = 0.0
+
+    def _with_status(self, status):
+        return [r for r in self.results if r.status == status]
+
+    @property
+    def fetched(self):
+        return self._with_status(FETCHED)
+
+    @property
+    def skipped(self):
+        return self._with_status(SKIPPED)
+
+    @property
+    def failed(self):
+        return self._with_status(FAILED)
+
+    def __unicode__(self):
+        return (
+            u"%s fetched, %s skipped, %s failed in %.2fs "
+            u"(fetch %.2fs, import %.2fs)" % (
+                len(self.fetched), len(self.skipped), len(self.failed),
+                self.total_time, sum(r.fetch_time for r in self.results),
+                sum(r.import_time for r in self.results),
+            )
+        )
+
+
+class FetchRunner(object):
+    """
+    Update the source files of the given URLInfo objects.
+
+    Args:
+        urlinfos: The URLInfo objects, with their resources and projects
+            loaded, since the threads do not query the database.
+        workers: The number of downloads at the same time. Defaults to
+            AUTOFETCH_WORKERS.
+        force: Import the files, even if they have not changed.
+        stop_on_error: Do not import any more files after a failure.
+        callback: Called with each FetchResult, as soon as it is ready.
+    """
+
+    def __init__(self, urlinfos, workers=None, force=False,
+                 stop_on_error=False, callback=None):
+        self.urlinfos = list(urlinfos)
+        self.workers = workers or settings.AUTOFETCH_WORKERS
+        self.force = force
+        self.stop_on_error = stop_on_error
+        self.callback = callback
+
+    def _fetch(self, tasks, results, stop):
+        while not stop.is_set():
+            try:
+                urlinfo = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            start = time.time()
+            try:
+                remote_file = urlinfo.fetch(conditional=not self.force)
+                error = None
+            except Exception, e:
+                remote_file, error = None, e
+            results.put((urlinfo, remote_file, error, time.time() - start))
+
+    def _import(self, urlinfo, remote_file, error, fetch_time):
+        if error is not None:
+            return FetchResult(urlinfo, FAILED, fetch_time, error=error)
+        if remote_file is None or (not self.force and
+                                   urlinfo.is_unchanged(remote_file)):
+            return FetchResult(urlinfo, SKIPPED, fetch_time)
+        start = time.time()
+        try:
+            strings = urlinfo.import_source_file(remote_file)
+        except Exception, e:
+            return FetchResult(
+                urlinfo, FAILED, fetch_time, time.time() - start, error=e
+            )
+        result = FetchResult(urlinfo, FETCHED, fetch_time, time.time() - start)
+        if strings is not None:
+            result.strings_added, result.strings_updated = strings
+        return result
+
+    def run(self):
+        """Update the source files and return a FetchReport."""
+        report = FetchReport()
+        start = time.time()
+        tasks = Queue.Queue()
+        for urlinfo in self.urlinfos:
+            tasks.put(urlinfo)
+        # Bound the number of downloaded files kept in memory
+        results = Queue.Queue(maxsize=self.workers)
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._fetch, args=(tasks, results, stop))
+            for i in xrange(min(self.workers, len(self.urlinfos)))
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for i in xrange(len(self.urlinfos)):
+                result = self._import(*results.get())
+                report.results.append(result)
+                if result.status == FAILED:
+                    logger.error(unicode(result))
+                if self.callback is not None:
+                    self.callback(result)
+                if result.status == FAILED and self.stop_on_error:
+                    break
+        finally:
+            stop.set()
+            # Let the threads blocked on a full queue finish
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    results.get(timeout=0.1)
+                except Queue.Empty:
+                    pass
+        report.total_time = time.time() - start
+        return report
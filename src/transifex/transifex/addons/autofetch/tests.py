@@ -1,11 +1,15 @@
 import os
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from django.core.urlresolvers import reverse
 from django.conf import settings
+from django.utils.hashcompat import md5_constructor
 from django.test.client import Client
 from transifex.projects.models import Project
 from transifex.resources.models import Resource
 from transifex.txcommon.tests.base import BaseTestCase
 from transifex.addons.autofetch.models import URLInfo
+from transifex.addons.autofetch.runner import FetchRunner
 
 class TestFetchUrl(BaseTestCase):
 
@@ -57,3 +61,124 @@ class TestFetchUrl(BaseTestCase):
             '"status": 500, "message": "Error updating source file."',
             status_code=200
         )
+
+
+class _SourceFileHandler(BaseHTTPRequestHandler):
+    """Serve the source file set on the server, honoring its ETag."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.getheader('If-None-Match'))
+        if self.path.startswith('/missing'):
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = self.server.etag
+        if etag is not None and self.headers.getheader('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(self.server.content)))
+        self.end_headers()
+        self.wfile.write(self.server.content)
+
+
+class TestFetchRunner(BaseTestCase):
+
+    def setUp(self):
+        super(TestFetchRunner, self).setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), _SourceFileHandler)
+        self.server.requests = []
+        self.server.etag = '"v1"'
+        self.server.content = open(os.path.join(
+            settings.TX_ROOT, 'resources/tests/lib/pofile/tests.pot'
+        )).read()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.base_url = 'http://127.0.0.1:%s/' % self.server.server_port
+        self.url_info = URLInfo.objects.create(
+            source_file_url=self.base_url + 'tests.pot',
+            auto_update=True, resource=self.resource
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(TestFetchRunner, self).tearDown()
+
+    def _run(self, **kwargs):
+        return FetchRunner(
+            URLInfo.objects.select_related('resource', 'resource__project'),
+            **kwargs
+        ).run()
+
+    def test_conditional(self):
+        report = self._run()
+        self.assertEqual(len(report.fetched), 1)
+        url_info = URLInfo.objects.get(id=self.url_info.id)
+        self.assertEqual(url_info.etag, '"v1"')
+        self.assertEqual(
+            url_info.content_hash,
+            md5_constructor(self.server.content).hexdigest()
+        )
+        self.assertTrue(self.resource.source_entities.count() > 0)
+
+        report = self._run()
+        self.assertEqual(len(report.skipped), 1)
+        self.assertEqual(self.server.requests, [None, '"v1"'])
+
+        report = self._run(force=True)
+        self.assertEqual(len(report.fetched), 1)
+        self.assertEqual(self.server.requests[-1], None)
+
+    def test_content_hash(self):
+        """Unchanged files are skipped, even without an ETag."""
+        self.server.etag = None
+        self.assertEqual(len(self._run().fetched), 1)
+        self.assertEqual(len(self._run().skipped), 1)
+        self.server.content = self.server.content.replace(
+            'msgid ""', '#. changed\nmsgid ""', 1
+        )
+        self.assertEqual(len(self._run().fetched), 1)
+
+    def test_url_change(self):
+        self._run()
+        self.url_info.source_file_url = self.base_url + 'other.pot'
+        self.url_info.save()
+        url_info = URLInfo.objects.get(id=self.url_info.id)
+        self.assertEqual(url_info.etag, '')
+        self.assertEqual(url_info.content_hash, '')
+
+    def test_many(self):
+        for i in range(5):
+            resource = Resource.objects.create(
+                slug='fetched%s' % i, name='Fetched %s' % i,
+                project=self.project, source_language=self.language_en,
+                i18n_type='PO'
+            )
+            URLInfo.objects.create(
+                source_file_url=self.base_url + 'tests.pot',
+                auto_update=True, resource=resource
+            )
+        URLInfo.objects.create(
+            source_file_url=self.base_url + 'missing.pot',
+            auto_update=True, resource=self.resource_private
+        )
+        results = []
+        report = self._run(workers=3, callback=results.append)
+        self.assertEqual(len(report.fetched), 6)
+        self.assertEqual(len(report.failed), 1)
+        self.assertEqual(len(results), 7)
+        self.assertTrue(report.total_time > 0)
+        self.assertTrue(unicode(report).startswith(
+            u"6 fetched, 0 skipped, 1 failed"
+        ))
+        report = self._run(workers=3)
+        self.assertEqual(len(report.skipped), 6)
+        self.assertEqual(len(report.failed), 1)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+A gateway to the machine translation services.
+
+Translations are kept in a cache in the database (see ``MTCache``), so that
+a text is sent to a service only once for each pair of languages. The texts
+that are not in the cache are sent in batches, with one request for up to
+AUTOTRANSLATE_BATCH_SIZE texts, over an HTTP session shared by the process,
+which reuses the connections to the services::
+
+    gateway = MTGateway(Gtranslate.objects.get(project=project))
+    gateway.translate_many([u'File', u'Edit'], 'en', 'el')
+"""
+
+from __future__ import with_statement
+import datetime
+import threading
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import simplejson
+from django.utils.hashcompat import md5_constructor
+from transifex.txcommon.db.bulk import bulk_insert, chunks
+from transifex.txcommon.log import logger
+from gtranslate.models import MachineTranslation
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class MTError(Exception):
+    """An error of a machine translation service."""
+
+
+def get_session():
+    """Return the HTTP session shared by the requests to the services."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests.session()
+    return _session
+
+
+def _text_hash(text):
+    return md5_constructor(text.encode('UTF-8')).hexdigest()
+
+
+class MTCache(object):
+    """
+    The translations of a service between two languages.
+
+    Translations expire after AUTOTRANSLATE_CACHE_TTL seconds. When there
+    are more than AUTOTRANSLATE_CACHE_MAX_ENTRIES translations, the oldest
+    ones are evicted.
+    """
+
+    def __init__(self, service_type, source, target):
+        self.service_type = service_type
+        self.source = source
+        self.target = target
+
+    def _translations(self):
+        return MachineTranslation.objects.filter(
+            service_type=self.service_type, source=self.source,
+            target=self.target
+        )
+
+    def get_many(self, texts):
+        """Return a dictionary of the cached translations of the texts."""
+        hashes = dict((_text_hash(text), text) for text in texts)
+        if not hashes:
+            return {}
+        oldest = datetime.datetime.now() - datetime.timedelta(
+            seconds=settings.AUTOTRANSLATE_CACHE_TTL
+        )
+        found = {}
+        for hashes_chunk in chunks(hashes.keys(), 500):
+            rows = self._translations().filter(
+                text_hash__in=hashes_chunk, created__gte=oldest
+            ).values_list('text_hash', 'text', 'translation')
+            for text_hash, text, translation in rows:
+                # Guard against hash collisions
+                if hashes[text_hash] == text:
+                    found[text] = translation
+        return found
+
+    def set_many(self, translations):
+        """Cache the translations, given as a list of (text, translation)
+        pairs.
+
+        The rows are inserted in the order of the pairs, so that the first
+        texts are the first to be evicted.
+        """
+        if not translations:
+            return
+        hashes = [_text_hash(text) for text, translation in translations]
+        # Replace expired translations
+        self._translations().filter(text_hash__in=hashes).delete()
+        objs = [
+            MachineTranslation(
+                service_type=self.service_type, source=self.source,
+                target=self.target, text_hash=text_hash, text=text,
+                translation=translation
+            )
+            for text_hash, (text, translation) in zip(hashes, translations)
+        ]
+        try:
+            bulk_insert(MachineTranslation, objs)
+        except IntegrityError:
+            # Another request cached some of the texts in the meantime.
+            transaction.rollback_unless_managed()
+            for obj in objs:
+                self._translations().get_or_create(
+                    text_hash=obj.text_hash, defaults={
+                        'text': obj.text, 'translation': obj.translation
+                    }
+                )
+        self.evict()
+
+    @classmethod
+    def evict(cls):
+        """Delete the expired and the oldest translations over the limit."""
+        MachineTranslation.objects.filter(
+            created__lt=datetime.datetime.now() - datetime.timedelta(
+                seconds=settings.AUTOTRANSLATE_CACHE_TTL
+            )
+        ).delete()
+        max_entries = settings.AUTOTRANSLATE_CACHE_MAX_ENTRIES
+        oldest_kept = MachineTranslation.objects.order_by(
+            '-id'
+        ).values_list('id', flat=True)[max_entries - 1:max_entries]
+        if oldest_kept:
+            MachineTranslation.objects.filter(id__lt=oldest_kept[0]).delete()
+
+
+class MTGateway(object):
+    """Translate texts with the service configured for a project."""
+
+    def __init__(self, service):
+        self.service = service
+
+    def translate(self, text, source, target):
+        """Return the translation of the text."""
+        return self.translate_many([text], source, target)[0]
+
+    def translate_many(self, texts, source, target):
+        """Return the translations of the texts, in the same order.
+
+        Raises:
+            MTError: The service returned an error.
+        """
+        cache = MTCache(self.service.service_type, source, target)
+        found = cache.get_many(texts)
+        missing = []
+        for text in texts:
+            if text not in found and text not in missing:
+                missing.append(text)
+        for batch in chunks(missing, settings.AUTOTRANSLATE_BATCH_SIZE):
+            translations = zip(batch, self._request(batch, source, target))
+            cache.set_many(translations)
+            found.update(translations)
+        return [found[text] for text in texts]
+
+    def _request(self, texts, source, target):
+        """Send the texts to the service and return their translations."""
+        service_type = self.service.service_type
+        try:
+            if service_type == 'GT':
+                return self._google(texts, source, target)
+            elif service_type == 'BT':
+                return self._bing(texts, source, target)
+        except (requests.RequestException, ValueError, KeyError,
+                TypeError, IndexError), e:
+            logger.error("Error translating with %s: %s" % (service_type, e))
+            raise MTError("Error contacting the translation service.")
+        raise MTError("Unknown translation service %s." % service_type)
+
+    def _load(self, response):
+        content = response.content
+        if content.startswith('\xef\xbb\xbf'):
+            content = content[3:]
+        return simplejson.loads(content.decode('UTF-8'))
+
+    def _google(self, texts, source, target):
+        # Use POST to send many texts; the service treats it as a GET.
+        data = [('key', self.service.api_key), ('source', source),
+                ('target', target)]
+        data.extend(('q', text.encode('UTF-8')) for text in texts)
+        response = get_session().post(
+            self.service.get_translate_url(), data=data,
+            headers={'X-HTTP-Method-Override': 'GET'},
+            timeout=settings.AUTOTRANSLATE_TIMEOUT
+        )
+        result = self._load(response)
+        if 'error' in result:
+            raise MTError(result['error'].get('message', 'Unknown error'))
+        translations = [
+            t['translatedText'] for t in result['data']['translations']
+        ]
+        if len(translations) != len(texts):
+            raise MTError("The service returned the wrong number of texts.")
+        return translations
+
+    def _bing(self, texts, source, target):
+        response = get_session().get(
+            self.service.get_translate_url(), params={
+                'appId': self.service.api_key,
+                'texts': simplejson.dumps(texts),
+                'from': source,
+                'to': target,
+                'options': '{"State": ""}',
+            }, timeout=settings.AUTOTRANSLATE_TIMEOUT
+        )
+        result = self._load(response)
+        if not isinstance(result, list):
+            # Errors are returned as a string
+            raise MTError(unicode(result))
+        translations = [t['TranslatedText'] for t in result]
+        if len(translations) != len(texts):
+            raise MTError("The service returned the wrong number of texts.")
+        return translations
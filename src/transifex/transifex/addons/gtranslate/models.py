@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
+import datetime
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from transifex.projects.models import Project
-import requests
 
 class Gtranslate(models.Model):
     """
@@ -65,27 +65,42 @@ class Gtranslate(models.Model):
             params = {
                 'appId': self.api_key,
             }
-        r = requests.get(self.get_language_url(), params=params)
+        from gtranslate.gateway import get_session
+        r = get_session().get(self.get_language_url(), params=params)
         return r.content
 
     def translate(self, term, source, target):
-        """Build and send the actual request to the corresponding
-        translation API and return the response content.
+        """Return the translation of the term by the corresponding
+        translation API.
+
+        See ``gateway.MTGateway``, which caches the translations.
         """
-        if self.service_type == 'GT':
-            params = {
-                'key': self.api_key,
-                'q': term,
-                'source': source,
-                'target': target,
-            }
-        elif self.service_type == 'BT':
-            params = {
-                'appId': self.api_key,
-                'texts': '["' + term + '"]',
-                'from': source,
-                'to': target,
-                'options': '{"State": ""}'
-            }
-        r = requests.get(self.get_translate_url(), params=params)
-        return r.content
+        from gtranslate.gateway import MTGateway
+        return MTGateway(self).translate(term, source, target)
+
+
+class MachineTranslation(models.Model):
+    """
+    A cached translation of a text by a machine translation service.
+
+    The texts are looked up by their md5 hash. See ``gateway.MTCache``.
+    """
+
+    service_type = models.CharField(max_length=2, verbose_name=_("Service"))
+    source = models.CharField(max_length=20, verbose_name=_("Source language"))
+    target = models.CharField(max_length=20, verbose_name=_("Target language"))
+    text_hash = models.CharField(max_length=32, verbose_name=_("Text hash"))
+    text = models.TextField(verbose_name=_("Text"))
+    translation = models.TextField(verbose_name=_("Translation"))
+    created = models.DateTimeField(
+        default=datetime.datetime.now, db_index=True,
+        verbose_name=_("Created")
+    )
+
+    class Meta:
+        unique_together = ('service_type', 'source', 'target', 'text_hash')
+        verbose_name = _('Machine translation')
+        verbose_name_plural = _('Machine translations')
+
+    def __unicode__(self):
+        return u'%s (%s -> %s)' % (self.text, self.source, self.target)
@@ -1,10 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import cgi
+import datetime
+import threading
+import urlparse
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from django.conf import settings
+from django.core.urlresolvers import reverse
+from django.utils import simplejson
 from transifex.txcommon.tests.base import BaseTestCase, Languages
 from transifex.projects.models import Project
 from handlers import *
-from models import Gtranslate
+from models import Gtranslate, MachineTranslation
+from gateway import MTGateway, MTError, MTCache
 from transifex.addons.gtranslate import is_gtranslate_allowed
 
 class TestGtranslate(BaseTestCase):
@@ -20,3 +28,179 @@ class TestGtranslate(BaseTestCase):
         Gtranslate.objects.create(project=p)
         p.delete()
         self.assertEquals(Gtranslate.objects.all().count(), 0)
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """A fake service, which translates a text to its upper case."""
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, result):
+        self.server.requests.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(simplejson.dumps(result))
+
+    def do_POST(self):
+        length = int(self.headers.getheader('Content-Length'))
+        params = cgi.parse_qs(self.rfile.read(length))
+        if params.get('target') == ['xx']:
+            self._respond({'error': {'message': 'Bad language'}})
+            return
+        self._respond({'data': {'translations': [
+            {'translatedText': q.decode('UTF-8').upper()}
+            for q in params['q']
+        ]}})
+
+    def do_GET(self):
+        params = urlparse.parse_qs(urlparse.urlparse(self.path).query)
+        if params.get('to') == ['xx']:
+            self._respond('ArgumentException: Bad language')
+            return
+        texts = simplejson.loads(params['texts'][0])
+        self._respond([{'TranslatedText': t.upper()} for t in texts])
+
+
+class TestMTGateway(BaseTestCase):
+
+    def setUp(self):
+        super(TestMTGateway, self).setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), _ServiceHandler)
+        self.server.requests = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = 'http://127.0.0.1:%s/' % self.server.server_port
+        self._old_urls = Gtranslate.service_translate_urls
+        Gtranslate.service_translate_urls = {'GT': url, 'BT': url}
+        self.service = Gtranslate.objects.create(
+            project=self.project, service_type='GT', api_key='key'
+        )
+
+    def tearDown(self):
+        Gtranslate.service_translate_urls = self._old_urls
+        self.server.shutdown()
+        self.server.server_close()
+        super(TestMTGateway, self).tearDown()
+
+    def test_cache(self):
+        """A text is sent to the service once."""
+        for service_type in ('GT', 'BT'):
+            self.service.service_type = service_type
+            gateway = MTGateway(self.service)
+            self.server.requests = []
+            self.assertEqual(gateway.translate(u'file', 'en', 'el'), u'FILE')
+            self.assertEqual(gateway.translate(u'file', 'en', 'el'), u'FILE')
+            self.assertEqual(len(self.server.requests), 1)
+            self.assertEqual(gateway.translate(u'file', 'en', 'de'), u'FILE')
+            self.assertEqual(len(self.server.requests), 2)
+
+    def test_batches(self):
+        """Texts not in the cache are sent in batches."""
+        gateway = MTGateway(self.service)
+        gateway.translate(u'edit', 'en', 'el')
+        old_batch_size = settings.AUTOTRANSLATE_BATCH_SIZE
+        settings.AUTOTRANSLATE_BATCH_SIZE = 2
+        try:
+            self.server.requests = []
+            texts = [u'file', u'edit', u'view', u'file', u'ωμέγα']
+            self.assertEqual(
+                gateway.translate_many(texts, 'en', 'el'),
+                [t.upper() for t in texts]
+            )
+        finally:
+            settings.AUTOTRANSLATE_BATCH_SIZE = old_batch_size
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_expiration(self):
+        gateway = MTGateway(self.service)
+        gateway.translate(u'file', 'en', 'el')
+        MachineTranslation.objects.update(
+            created=datetime.datetime.now() - datetime.timedelta(
+                seconds=settings.AUTOTRANSLATE_CACHE_TTL + 1
+            )
+        )
+        gateway.translate(u'file', 'en', 'el')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(MachineTranslation.objects.count(), 1)
+
+    def test_eviction(self):
+        """The translations are evicted in the order they were cached."""
+        old_max_entries = settings.AUTOTRANSLATE_CACHE_MAX_ENTRIES
+        settings.AUTOTRANSLATE_CACHE_MAX_ENTRIES = 3
+        try:
+            MTGateway(self.service).translate_many(
+                [u'a', u'b', u'c', u'd', u'e'], 'en', 'el'
+            )
+        finally:
+            settings.AUTOTRANSLATE_CACHE_MAX_ENTRIES = old_max_entries
+        self.assertEqual(MachineTranslation.objects.count(), 3)
+        self.assertEqual(
+            MTCache('GT', 'en', 'el').get_many([u'c', u'd', u'e']),
+            {u'c': u'C', u'd': u'D', u'e': u'E'}
+        )
+        self.assertEqual(MTCache('GT', 'en', 'el').get_many([u'a', u'b']), {})
+
+    def test_errors(self):
+        for service_type in ('GT', 'BT'):
+            self.service.service_type = service_type
+            self.assertRaises(
+                MTError, MTGateway(self.service).translate, u'file', 'en', 'xx'
+            )
+        self.assertEqual(MachineTranslation.objects.count(), 0)
+        Gtranslate.service_translate_urls = {'GT': 'http://127.0.0.1:1/'}
+        self.service.service_type = 'GT'
+        self.assertRaises(
+            MTError, MTGateway(self.service).translate, u'file', 'en', 'el'
+        )
+
+    def test_views(self):
+        url = reverse('autotranslate_proxy', args=[self.project.slug])
+        resp = self.client['maintainer'].get(
+            url, {'source': 'en', 'target': 'el', 'q': 'file'}
+        )
+        self.assertEqual(simplejson.loads(resp.content), {
+            'data': {'translations': [{'translatedText': 'FILE'}]}
+        })
+        resp = self.client['maintainer'].get(
+            url, {'source': 'en', 'target': 'xx', 'q': 'file'}
+        )
+        self.assertEqual(
+            simplejson.loads(resp.content)['error']['message'], 'Bad language'
+        )
+
+        url = reverse('autotranslate_batch', args=[self.project.slug])
+        data = {'source': 'en', 'target': 'el', 'q': ['file', 'edit']}
+        resp = self.client['anonymous'].post(
+            url, simplejson.dumps(data), content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 302)
+        # Only those who can submit translations may use the service.
+        resp = self.client['registered'].post(
+            url, simplejson.dumps(data), content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 403)
+        private_url = reverse(
+            'autotranslate_batch', args=[self.project_private.slug]
+        )
+        resp = self.client['registered'].post(
+            private_url, simplejson.dumps(data),
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 403)
+        self.server.requests = []
+        resp = self.client['maintainer'].post(
+            url, simplejson.dumps(data), content_type='application/json'
+        )
+        self.assertEqual(
+            simplejson.loads(resp.content), {'translations': ['FILE', 'EDIT']}
+        )
+        # 'file' is cached, so only 'edit' is sent to the service.
+        self.assertEqual(len(self.server.requests), 1)
+        resp = self.client['maintainer'].post(
+            url, simplejson.dumps({'source': 'en', 'q': 'file'}),
+            content_type='application/json'
+        )
+        self.assertEqual(resp.status_code, 400)
@@ -1,9 +1,11 @@
 from django.conf.urls.defaults import *
-from gtranslate.views import translate, languages
+from gtranslate.views import translate, translate_batch, languages
 
 urlpatterns = patterns('',
     url('^ajax/projects/p/(?P<project_slug>[-\w]+)/autotranslate/$',
         translate, name='autotranslate_proxy'),
+    url('^ajax/projects/p/(?P<project_slug>[-\w]+)/autotranslate/batch/$',
+        translate_batch, name='autotranslate_batch'),
     url('^ajax/projects/p/(?P<project_slug>[-\w]+)/autotranslate/languages/$',
         languages, name='supported_langs'),
 )
\ No newline at end of file
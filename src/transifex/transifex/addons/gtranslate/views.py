@@ -1,16 +1,31 @@
 # -*- coding: utf-8 -*-
 from django.conf import settings
+from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import simplejson
+from authority.views import permission_denied
 from transifex.projects.models import Project
+from transifex.projects.permissions import *
+from transifex.projects.permissions.project import ProjectPermission
+from transifex.teams.models import Team
+from transifex.txcommon.decorators import one_perm_required_or_403
 from gtranslate.models import Gtranslate
+from gtranslate.gateway import MTGateway, MTError
 
 def _get_canonical_name(target_lang):
     if '_' in target_lang or '-' in target_lang:
         return target_lang[:2]
     return target_lang
 
+def _service_response(service_type, translation):
+    """Return the translation in the format of the response of the
+    service, which the auto-translate javascript code expects.
+    """
+    if service_type == 'BT':
+        return [{'TranslatedText': translation}]
+    return {'data': {'translations': [{'translatedText': translation}]}}
+
 def translate(request, project_slug):
     """Wrapper view over the supported translation APIs. Captures the GET
     parameters and forwards the request to the suitable service."""
@@ -25,11 +40,69 @@ def translate(request, project_slug):
 
     try:
         service = Gtranslate.objects.get(project__slug=project_slug)
-        resp = service.translate(term, source_lang, target_lang)
-        return HttpResponse(resp)
+        translation = MTGateway(service).translate(
+            term, source_lang, target_lang
+        )
+        return HttpResponse(simplejson.dumps(
+            _service_response(service.service_type, translation)
+        ))
+    except MTError, e:
+        return HttpResponse(simplejson.dumps(
+            {"error": {"message": unicode(e)}}
+        ))
     except Gtranslate.DoesNotExist:
         return HttpResponse(simplejson.dumps({"error": "Auto-translate not available."}))
 
+# Restrict access only to those who can submit translations to the target
+# language, like the main lotte view does.
+@login_required
+@one_perm_required_or_403(pr_project_private_perm,
+    (Project, 'slug__exact', 'project_slug'))
+def translate_batch(request, project_slug):
+    """Translate many texts, like the untranslated strings of a page, with
+    as few requests to the service as possible.
+
+    The request is a POST one with a JSON object with the source and target
+    languages and a list of texts in ``q``. The response has the list of
+    translations in ``translations``.
+    """
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+    try:
+        data = simplejson.loads(request.raw_post_data)
+        source_lang, target_lang = data['source'], data['target']
+        texts = data['q']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponse(status=400)
+    if not all([source_lang, target_lang]) or not isinstance(texts, list) \
+            or len(texts) > settings.AUTOTRANSLATE_MAX_TEXTS \
+            or not all(isinstance(t, basestring) for t in texts):
+        return HttpResponse(status=400)
+
+    project = get_object_or_404(Project, slug=project_slug)
+    team = Team.objects.get_or_none(project, target_lang)
+    check = ProjectPermission(request.user)
+    if not check.submit_translations(team or project) and not\
+        check.maintain(project):
+        return permission_denied(request)
+
+    target_lang = _get_canonical_name(target_lang)
+
+    try:
+        service = Gtranslate.objects.get(project=project)
+        translations = MTGateway(service).translate_many(
+            texts, source_lang, target_lang
+        )
+        return HttpResponse(simplejson.dumps({"translations": translations}),
+                            mimetype='application/json')
+    except MTError, e:
+        return HttpResponse(simplejson.dumps(
+            {"error": {"message": unicode(e)}}
+        ), mimetype='application/json')
+    except Gtranslate.DoesNotExist:
+        return HttpResponse(simplejson.dumps({"error": "Auto-translate not available."}),
+                            mimetype='application/json')
+
 def languages(request, project_slug):
     """Thin wrapper over the translation APIs to check if the requested language
     is supported. If no services are enabled for the project, it has the ability
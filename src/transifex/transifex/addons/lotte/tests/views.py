@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.db.models.loading import get_model
 from django.utils import simplejson as json
 from transifex.txcommon.tests.base import BaseTestCase
@@ -8,6 +9,7 @@ from utils import *
 
 Translation = get_model('resources', 'Translation')
 SourceEntity = get_model('resources', 'SourceEntity')
+RLStats = get_model('resources', 'RLStats')
 
 
 class LotteViewsTests(BaseTestCase):
@@ -356,6 +358,147 @@ class LotteViewsTests(BaseTestCase):
         """Test lotte filters one by one."""
         pass
 
+    def _count_stringset_queries(self, length):
+        """Return the number of queries and the number of rows of a
+        stringset request showing ``length`` rows.
+        """
+        self.DataTable_params["iDisplayLength"] = length
+        self.DataTable_params["more_languages"] = "%s,%s," % (
+            self.language.id, self.language_en.id
+        )
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            resp = self.client['maintainer'].post(
+                self.translate_content_arabic_url, self.DataTable_params)
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        self.assertEqual(resp.status_code, 200)
+        rows = len(json.loads(resp.content)['aaData'])
+        return len(connection.queries) - start, rows
+
+    def test_dt_query_count(self):
+        """Test that the number of queries does not grow with the page."""
+        for i in range(20):
+            se = SourceEntity.objects.create(string='Extra%s' % i,
+                context='', resource=self.resource)
+            se.translations.create(string='Extra%s' % i,
+                language=self.language_en, rule=5, resource=self.resource)
+            se.translations.create(string='ExtraAr%s' % i,
+                language=self.language_ar, rule=5, resource=self.resource)
+        # Warm up any caches, like the ones of the permissions.
+        self._count_stringset_queries(1)
+        queries, rows = self._count_stringset_queries(1)
+        self.assertEqual(rows, 1)
+        more_queries, more_rows = self._count_stringset_queries(100)
+        self.assertTrue(more_rows > 20)
+        self.assertEqual(queries, more_queries)
+
+    def _push(self, rows):
+        """Push the rows and return the number of queries and the
+        response.
+        """
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            resp = self.client['maintainer'].post(self.push_translation,
+                json.dumps({"strings": rows}), content_type='application/json')
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        self.assertEqual(resp.status_code, 200)
+        return len(connection.queries) - start, json.loads(resp.content)
+
+    def test_push_many_translations(self):
+        """Test the status of each row pushed in a request."""
+        rows = [
+            {"id": self.source_string1.id,
+             "translations": {"other": "ArabicString2_1"}},
+            {"id": self.source_string3.id,
+             "translations": {"other": "String4"}},
+            {"id": self.source_string4.id,
+             "translations": {"other": "String with arguments: %s %f"}},
+            {"id": -1, "translations": {"other": "Missing"}},
+            {"id": self.source_string_plural1.id,
+             "translations": {"one": "ArabicTrans1_1"}},
+        ]
+        queries, result = self._push(rows)
+        self.assertEqual(result[str(self.source_string1.id)]['status'], 200)
+        self.assertEqual(result[str(self.source_string3.id)]['status'], 200)
+        for source_id in (self.source_string4.id, -1,
+                          self.source_string_plural1.id):
+            self.assertEqual(result[str(source_id)]['status'], 400)
+        self.assertEqual(Translation.objects.get(
+            source_entity=self.source_entity1, language=self.language_ar
+        ).string, "ArabicString2_1")
+        self.assertEqual(Translation.objects.filter(
+            source_entity=self.source_entity3,
+            language=self.language_ar).count(), 1)
+        self.assertEqual(Translation.objects.filter(
+            source_entity=self.source_entity4,
+            language=self.language_ar).count(), 0)
+        self.assertEqual(Translation.objects.get(
+            source_entity=self.source_entity_plural,
+            language=self.language_ar, rule=1).string, "ArabicTrans1")
+        stats = RLStats.objects.get(
+            resource=self.resource, language=self.language_ar
+        )
+        translated = stats.translated
+        stats.update()
+        self.assertEqual(stats.translated, translated)
+
+    def test_push_translation_save_error(self):
+        """Test that a row which cannot be saved does not fail the rest."""
+        from transifex.addons.lotte import views
+
+        def failing_bulk_insert(model, objs, *args, **kwargs):
+            if [obj for obj in objs if obj.string.startswith("Unsavable")]:
+                raise ValueError("Unsavable")
+            return old_bulk_insert(model, objs, *args, **kwargs)
+
+        old_bulk_insert = views.bulk_insert
+        views.bulk_insert = failing_bulk_insert
+        try:
+            queries, result = self._push([
+                {"id": self.source_string3.id,
+                 "translations": {"other": "String4"}},
+                {"id": self.source_string4.id,
+                 "translations": {"other": "Unsavable: %s %d"}},
+            ])
+        finally:
+            views.bulk_insert = old_bulk_insert
+        self.assertEqual(result[str(self.source_string3.id)]['status'], 200)
+        self.assertEqual(result[str(self.source_string4.id)]['status'], 400)
+        self.assertEqual(Translation.objects.filter(
+            source_entity=self.source_entity3,
+            language=self.language_ar).count(), 1)
+        self.assertEqual(Translation.objects.filter(
+            source_entity=self.source_entity4,
+            language=self.language_ar).count(), 0)
+
+    def test_push_translation_query_count(self):
+        """Test that the number of queries does not grow with the rows."""
+        source_strings = []
+        for i in range(10):
+            se = SourceEntity.objects.create(string='Push%s' % i,
+                context='', resource=self.resource)
+            source_strings.append(se.translations.create(string='Push%s' % i,
+                language=self.language_en, rule=5, resource=self.resource))
+        rows = [
+            {"id": s.id, "translations": {"other": "%s_ar" % s.string}}
+            for s in source_strings
+        ]
+        # Warm up any caches, like the ones of the permissions.
+        self._push(rows[:1])
+        queries, result = self._push(rows[1:2])
+        more_queries, more_result = self._push(rows[2:])
+        self.assertEqual(len(more_result), 8)
+        self.assertEqual(queries, more_queries)
+        self.assertEqual(Translation.objects.filter(
+            source_entity__in=[s.source_entity_id for s in source_strings],
+            language=self.language_ar).count(), 10)
+
     def test_delete_translation(self):
         """Test translation delete"""
         to_delete = []
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from __future__ import with_statement
 import re
 from polib import escape, unescape
 from django.conf import settings
@@ -22,16 +23,20 @@ from authority.views import permission_denied
 from actionlog.models import action_logging
 from transifex.txcommon.log import logger
 from transifex.languages.models import Language
+from transifex.languages.registry import registry as language_registry
 from transifex.projects.models import Project
 from transifex.projects.permissions import *
 from transifex.projects.permissions.project import ProjectPermission
 from transifex.resources.models import Translation, Resource, SourceEntity, \
         get_source_language
 from transifex.resources.handlers import invalidate_stats_cache
-from transifex.resources.formats.validators import create_error_validators, \
-        create_warning_validators, ValidationError
+from transifex.resources.stats import record as record_stats, batch_stats
+from transifex.resources.translations import delete_translations
+from transifex.resources.formats.validators import get_pipeline
 from transifex.teams.models import Team
 from transifex.txcommon.decorators import one_perm_required_or_403
+from transifex.txcommon.db.bulk import chunks, bulk_insert, bulk_update, \
+        bulk_delete
 import httplib
 
 # Temporary
@@ -326,8 +331,8 @@ def _get_stringset(post_data, resources, language, review=False, *args, **kwargs
         resource__in=resources,
         language=language)
 
+    more_languages = []
     if not isinstance(source_strings, list):
-        more_languages = []
         if post_data and post_data.has_key('more_languages'):
             # rsplit is used to remove the trailing ','
             more_languages = post_data.get('more_languages').rstrip(',').split(',')
@@ -365,9 +370,17 @@ def _get_stringset(post_data, resources, language, review=False, *args, **kwargs
     except ValueError, e:
         return HttpResponseBadRequest()
 
-    # NOTE: It's important to keep the translation string matching inside this
-    # iteration to prevent extra un-needed queries. In this iteration only the
-    # strings displayed are calculated, saving a lot of resources.
+    # NOTE: Only the strings displayed are calculated, saving a lot of
+    # resources. The data of all rows are fetched with a fixed number of
+    # queries, regardless of the number of rows.
+    if isinstance(source_strings, list):
+        page = []
+    else:
+        page = list(source_strings.select_related('source_entity')[
+            dstart:dstart+dlength
+        ])
+    rows = _get_rows_data(page, source_language, language, more_languages)
+
     response_dict = {
         'sEcho': post_data.get('sEcho','1'),
         'iTotalRecords': total,
@@ -380,13 +393,13 @@ def _get_stringset(post_data, resources, language, review=False, *args, **kwargs
                 s.source_entity.string,
                 # 3. Get all the necessary source strings, including plurals and
                 # similar langs, all in a dictionary (see also below)
-                _get_source_strings(s, source_language, language.code, more_languages),
+                _get_source_strings(s, source_language, rows),
                 # 4. Get all the Translation strings mapped with plural rules
                 # in a single dictionary (see docstring of function)
-                _get_strings(translated_strings, language, s.source_entity),
+                _get_strings(rows, language, s.source_entity),
                 # 5. A number which indicates the number of Suggestion objects
                 # attached to this row of the table.
-                Suggestion.objects.filter(source_entity=s.source_entity, language__code=language.code).count(),
+                rows['suggestions'].get(s.source_entity_id, 0),
                 # 6. save buttons and hidden context (ready to inject snippet)
                 # It includes the following content, wrapped in span tags:
                 # * SourceEntity object's "context" value
@@ -396,19 +409,16 @@ def _get_stringset(post_data, resources, language, review=False, *args, **kwargs
                  '<span class="undo edit-panel inactive" id="undo_' + str(counter) + '" style="border:0" title="' + _("Undo to initial text") + '"></span>'
                  '<span class="context" id="context_' + str(counter) + '" style="display:none;">' + escape(str(s.source_entity.context_string.encode('UTF-8'))) + '</span>'
                  '<span class="source_id" id="sourceid_' + str(counter) + '"style="display:none;">' + str(s.source_entity.id) + '</span>'),
-            ] for counter,s in enumerate(source_strings[dstart:dstart+dlength])
+            ] for counter,s in enumerate(page)
         ],
     }
 
     if review:
-        for counter, s in enumerate(source_strings[dstart:dstart+dlength]):
-            try:
-                translation = Translation.objects.get(
-                    source_entity__id=s.source_entity.id,
-                    language__code=language.code, rule=5
-                )
-                review_snippet = '<span><input class="review-check" id="review_source_' + str(s.source_entity.id) + '" type="checkbox" name="review" ' + ('checked="checked"' if translation.reviewed else '') + ' value="Review"/></span>',
-            except Translation.DoesNotExist:
+        for counter, s in enumerate(page):
+            reviewed = rows['reviewed'].get(s.source_entity_id)
+            if reviewed is not None:
+                review_snippet = '<span><input class="review-check" id="review_source_' + str(s.source_entity.id) + '" type="checkbox" name="review" ' + ('checked="checked"' if reviewed else '') + ' value="Review"/></span>',
+            else:
                 review_snippet = '<span><input class="review-check" id="review_source_' + str(s.source_entity.id) + '" type="checkbox" name="review" disabled="disabled" value="Review"/></span>',
 
             response_dict['aaData'][counter].append(review_snippet)
@@ -447,21 +457,25 @@ def proofread(request, project_slug, lang_code, resource_slug=None, *args, **kwa
 
     request_data = simplejson.loads(request.raw_post_data)
 
+    # Queryset updates bypass the signals, so record the changes of the
+    # stats here.
     if 'true' in request_data:
         source_entity_ids = request_data['true']
         translations = Translation.objects.filter(
-            source_entity__id__in=source_entity_ids,
+            source_entity__id__in=source_entity_ids, resource=resource,
             language__code=lang_code, rule=5
         )
-        translations.update(reviewed=True)
+        changed = translations.filter(reviewed=False).update(reviewed=True)
+        record_stats(resource.id, language.id, reviewed=changed)
 
     if 'false' in request_data:
         source_entity_ids = request_data['false']
         translations = Translation.objects.filter(
-            source_entity__id__in=source_entity_ids,
+            source_entity__id__in=source_entity_ids, resource=resource,
             language__code=lang_code, rule=5
         )
-        translations.update(reviewed=False)
+        changed = translations.filter(reviewed=True).update(reviewed=False)
+        record_stats(resource.id, language.id, reviewed=-changed)
 
     invalidate_stats_cache(resource, language, user=request.user)
 
@@ -611,10 +625,77 @@ def _get_user_filtered_source_strings(resources, users, language, *args, **kwarg
     return Translation.objects.user_translated_strings(resources, language, users)
 
 
-def _get_source_strings(source_string, source_language, lang_code, more_languages):
+def _get_rows_data(source_strings, source_language, language, more_languages):
+    """
+    Fetch the data of the displayed rows of the stringset with a fixed
+    number of queries.
+
+    Returns a dictionary with the keys:
+    'source_plurals' : {<source entity id>: [(<rule>, <string>), ...]}
+    'translations' : {<source entity id>: [(<rule>, <string>), ...]}
+    'reviewed' : {<source entity id>: <reviewed flag of rule 5>}
+    'similar_langs' : [(<language name>, {<source entity id>:
+        [(<rule>, <string>), ...]}), ...]
+    'suggestions' : {<source entity id>: <number of suggestions>}
+    """
+    rows = {
+        'source_plurals': {}, 'translations': {}, 'reviewed': {},
+        'similar_langs': [], 'suggestions': {},
+    }
+    se_ids = [s.source_entity_id for s in source_strings]
+    if not se_ids:
+        return rows
+
+    # Remaining plural forms of the source strings
+    plurals = Translation.objects.filter(
+        source_entity__in=se_ids, language=source_language
+    ).exclude(rule=5).order_by('rule').values_list(
+        'source_entity', 'rule', 'string'
+    )
+    for se_id, rule, string in plurals:
+        rows['source_plurals'].setdefault(se_id, []).append((rule, string))
+
+    # Translations of all plural forms in the target language
+    translations = Translation.objects.filter(
+        source_entity__in=se_ids, language=language
+    ).order_by('rule').values_list('source_entity', 'rule', 'string',
+        'reviewed')
+    for se_id, rule, string, reviewed in translations:
+        rows['translations'].setdefault(se_id, []).append((rule, string))
+        if rule == 5:
+            rows['reviewed'][se_id] = reviewed
+
+    # Translations in the similar languages
+    if more_languages:
+        languages = language_registry.in_bulk(more_languages)
+        similar_langs = dict((l.id, (l.name, {})) for l in languages)
+        translations = Translation.objects.filter(
+            source_entity__in=se_ids, language__in=similar_langs.keys()
+        ).order_by('rule').values_list(
+            'source_entity', 'language', 'rule', 'string'
+        )
+        for se_id, lang_id, rule, string in translations:
+            similar_langs[lang_id][1].setdefault(se_id, []).append(
+                (rule, string)
+            )
+        rows['similar_langs'] = [
+            similar_langs[l.id] for l in languages
+        ]
+
+    suggestions = Suggestion.objects.filter(
+        source_entity__in=se_ids, language=language
+    ).order_by().values('source_entity').annotate(count=Count('id'))
+    for row in suggestions:
+        rows['suggestions'][row['source_entity']] = row['count']
+    return rows
+
+
+def _get_source_strings(source_string, source_language, rows):
     """
     Get all the necessary source strings, including plurals and similar langs.
 
+    The rows argument holds the data fetched by _get_rows_data.
+
     Returns a dictionary with the keys:
     'source_strings' : {"one":<string>, "two":<string>, ... , "other":<string>}
     'similar_lang_strings' :
@@ -629,29 +710,26 @@ def _get_source_strings(source_string, source_language, lang_code, more_language
 
     if source_entity.pluralized:
         # These are the remaining plural forms of the source string.
-        plural_strings = Translation.objects.filter(
-            source_entity = source_entity,
-            language = source_language).exclude(rule=5).order_by('rule')
-        for pl_string in plural_strings:
-            plural_name = source_language.get_rule_name_from_num(pl_string.rule)
-            source_strings[plural_name] = pl_string.string
-
-    # for each similar language fetch all the translation strings
-    for lang_id in more_languages:
-        l = Language.objects.get(pk=lang_id)
-        similar_lang_strings[l.name] = {}
-        for t in Translation.objects.filter(source_entity=source_entity, language=l).order_by('rule'):
-            plural_name = source_language.get_rule_name_from_num(t.rule)
-            similar_lang_strings[l.name][plural_name] = t.string
+        for rule, string in rows['source_plurals'].get(source_entity.id, []):
+            plural_name = source_language.get_rule_name_from_num(rule)
+            source_strings[plural_name] = string
+
+    # for each similar language add all the translation strings
+    for name, translations in rows['similar_langs']:
+        similar_lang_strings[name] = {}
+        for rule, string in translations.get(source_entity.id, []):
+            plural_name = source_language.get_rule_name_from_num(rule)
+            similar_lang_strings[name][plural_name] = string
     return { 'source_strings' : source_strings,
              'similar_lang_strings' : similar_lang_strings }
 
 
-def _get_strings(query, target_language, source_entity):
+def _get_strings(rows, target_language, source_entity):
     """
     Helper function for returning all the Translation strings or an empty dict.
 
-    Used in the list concatenation above to preserve code sanity.
+    Used in the list concatenation above to preserve code sanity. The rows
+    argument holds the data fetched by _get_rows_data.
     Returns a dictionary in the following form:
     {"zero":<string>, "one":<string>, ... , "other":<string>},
     where the 'zero', 'one', ... are the plural names of the corresponding
@@ -659,20 +737,19 @@ def _get_strings(query, target_language, source_entity):
     """
     # It includes the plural translations, too!
     translation_strings = {}
+    translations = rows['translations'].get(source_entity.id, [])
     if source_entity.pluralized:
-        translations = query.filter(source_entity=source_entity).order_by('rule')
         # Fill with empty strings to have the Untranslated entries!
         for rule in target_language.get_pluralrules():
             translation_strings[rule] = ""
-        for translation in translations:
-            plural_name = target_language.get_rule_name_from_num(translation.rule)
-            translation_strings[plural_name] = translation.string
+        for rule, string in translations:
+            plural_name = target_language.get_rule_name_from_num(rule)
+            translation_strings[plural_name] = string
     else:
-        try:
-            translation_strings["other"] = query.get(source_entity=source_entity,
-                                                     rule=5).string
-        except Translation.DoesNotExist:
-            translation_strings["other"] = ""
+        translation_strings["other"] = ""
+        for rule, string in translations:
+            if rule == 5:
+                translation_strings["other"] = string
     return translation_strings
 
 
@@ -725,14 +802,18 @@ def push_translation(request, project_slug, lang_code, *args, **kwargs):
     # translations-> translation strings (includes all plurals)
     # context-> source_entity context
     # occurrence-> occurrence (not yet well supported)
+    source_strings = Translation.objects.select_related(
+        'source_entity', 'resource__source_language', 'resource__project'
+    ).in_bulk([int(row['id']) for row in strings])
+    push = _TranslationPush(
+        source_strings.values(), target_language, request.user
+    )
+
     # Iterate through all the row data that have been sent.
     for row in strings:
         source_id = int(row['id'])
-        try:
-            source_string = Translation.objects.select_related(depth=1).get(
-                id=source_id
-            )
-        except Translation.DoesNotExist:
+        source_string = source_strings.get(source_id)
+        if source_string is None:
             # TODO: Log or inform here
             push_response_dict[source_id] = { 'status':400,
                  'message':_("Source string cannot be identified in the DB")}
@@ -770,10 +851,7 @@ def push_translation(request, project_slug, lang_code, *args, **kwargs):
                 # Skip the save as we hit on an error.
                 continue
         try:
-            msgs = _save_translation(
-                source_string, row['translations'],
-                target_language, request.user
-            )
+            msgs = push.add(source_string, row['translations'])
             if not msgs:
                 push_response_dict[source_id] = {'status': 200}
             else:
@@ -792,119 +870,282 @@ def push_translation(request, project_slug, lang_code, *args, **kwargs):
                 'status': 400, 'message': e.message
             }
 
+    try:
+        push.save()
+    except Exception, e:
+        logger.error(
+            "Error occurred while trying to save translations: %s" % e,
+            exc_info=True
+        )
+        # Save the rows one by one, to find the ones that fail.
+        for source_id in push.source_ids:
+            # catch-all. if we don't save we _MUST_ inform the user
+            try:
+                push.save([source_id])
+            except Exception, e:
+                msg = _(
+                    "Error occurred while trying to save translation: %s" %
+                    unicode(e)
+                )
+                logger.error(msg, exc_info=True)
+                push_response_dict[source_id] = {
+                    'status': 400, 'message': msg
+                }
+
     json_dict = simplejson.dumps(push_response_dict)
     return HttpResponse(json_dict, mimetype='application/json')
 
 
-@transaction.commit_on_success
-def _save_translation(source_string, translations, target_language, user):
-    """Save a translation string to the database.
+class _TranslationPush(object):
+    """The translations pushed from Lotte in a single request.
 
-    This functions handle a signle source entity translation
-    (could be pluralized).
-
-    Currently, the function only returns warning strings.
-    There is no message for success.
+    The existing translations of the source strings are fetched at once.
+    Each row is validated by ``add`` with the validator pipeline of its
+    resource and its changes are kept, unless there are errors. ``save``
+    writes the changes of all rows with a few bulk queries and updates the
+    stats of each resource once. It can also save the changes of some rows
+    only, so that a row that cannot be saved does not fail the rest.
 
     Args:
-        source_string: A Translation object of the string in the source
-            language.
-        translations: A (rule, string) tuple.
-        target_language: The language the string is translated to.
+        source_strings: The Translation objects of the pushed strings in
+            the source language, with their resources loaded.
+        target_language: The language the strings are translated to.
         user: The translator.
-    Returns:
-        A list if strings to display to the user.
-    Raises:
-        An LotteBadRequestError exception in case of errors.
     """
-    source_id = source_string.pk
-    resource = source_string.resource
-    source_language = resource.source_language
-    warnings = []
-
-    for rule, target_string in translations.items():
-        rule = target_language.get_rule_num_from_name(rule)
-        if rule != 5:
-            # fetch correct source string for plural rule
-            try:
-                source_string = Translation.objects.get(
-                    source_entity=source_string.source_entity,
-                    language=source_language, rule=rule
-                )
-            except Translation.DoesNotExist:
-                # target language has extra plural forms
-                pass
 
-        # check for errors
-        try:
-            for ErrorValidator in create_error_validators(resource.i18n_method):
-                v = ErrorValidator(source_language, target_language, rule)
-                v(source_string.string, target_string)
-        except ValidationError, e:
-            raise LotteBadRequestError(e.message)
-        # check for warnings
-        for WarningValidator in create_warning_validators(resource.i18n_method):
-            v = WarningValidator(source_language, target_language, rule)
-            try:
-                v(source_string.string, target_string)
-            except ValidationError, e:
-                warnings.append(e.message)
-        try:
-            # TODO: Implement get based on context and/or on context too!
-            translation_string = Translation.objects.get(
-                source_entity=source_string.source_entity,
-                language=target_language, rule=rule
+    def __init__(self, source_strings, target_language, user):
+        self.target_language = target_language
+        self.user = user
+        # The ids of the source strings of the rows with changes
+        self.source_ids = set()
+        self._resources = {}
+        self._source_plurals = {}
+        self._source_wordcounts = {}
+        self._existing = {}
+        self._original = {}
+        self._translations = {}
+        self._changed = set()
+        # The keys of the changed translations of each row
+        self._row_keys = {}
+
+        se_ids = set()
+        for source_string in source_strings:
+            self._resources.setdefault(
+                source_string.resource_id, source_string.resource
+            )
+            se_ids.add(source_string.source_entity_id)
+        source_language_ids = dict(
+            (r.id, r.source_language_id) for r in self._resources.itervalues()
+        )
+        for chunk in chunks(list(se_ids), 500):
+            qs = Translation.objects.filter(
+                source_entity__in=chunk,
+                language__in=set(source_language_ids.itervalues())
+            )
+            for t in qs:
+                if t.language_id != source_language_ids[t.resource_id]:
+                    continue
+                if t.rule == 5:
+                    self._source_wordcounts[t.source_entity_id] = t.wordcount
+                else:
+                    self._source_plurals[(t.source_entity_id, t.rule)] = t
+            qs = Translation.objects.filter(
+                source_entity__in=chunk, language=target_language
+            )
+            for t in qs:
+                key = (t.source_entity_id, t.rule)
+                self._existing[key] = self._translations[key] = t
+                self._original[key] = (t.string, t.reviewed, t.wordcount)
+
+    def add(self, source_string, translations):
+        """Validate the translations of a source string (could be
+        pluralized) and keep the changes.
+
+        Currently, the function only returns warning strings.
+        There is no message for success.
+
+        Args:
+            source_string: A Translation object of the string in the source
+                language.
+            translations: A dictionary of the translation string for each
+                plural rule name.
+        Returns:
+            A list if strings to display to the user.
+        Raises:
+            An LotteBadRequestError exception in case of errors, in which
+            case none of the translations are kept.
+        """
+        resource = self._resources[source_string.resource_id]
+        source_entity = source_string.source_entity
+        warnings = []
+        changes = []
+        for rule, target_string in translations.items():
+            rule = self.target_language.get_rule_num_from_name(rule)
+            if rule is None:
+                raise LotteBadRequestError(_("Invalid plural rule."))
+            # fetch correct source string for plural rule, unless the
+            # target language has extra plural forms
+            source = source_string
+            if rule != 5:
+                source = self._source_plurals.get(
+                    (source_entity.id, rule), source_string
+                )
+            errors, rule_warnings = get_pipeline(resource.i18n_method).check(
+                source.string, target_string, resource.source_language,
+                self.target_language, rule
             )
+            if errors:
+                raise LotteBadRequestError(errors[0])
+            warnings.extend(rule_warnings)
 
+            key = (source_entity.id, rule)
             # FIXME: Maybe we don't want to permit anyone to delete!!!
-            # If an empty string has been issued then we delete the translation.
-            if target_string == "":
-                translation_string.delete()
-            else:
-                translation_string.string = target_string
-                translation_string.user = user
-                translation_string.save()
-
-            _add_copyright(source_string, target_language, user)
-            invalidate_stats_cache(resource, target_language, user=user)
-        except Translation.DoesNotExist:
-            # Only create new if the translation string sent, is not empty!
-            if target_string != "":
-                Translation.objects.create(
-                    source_entity=source_string.source_entity, user=user,
-                    language=target_language, rule=rule, string=target_string,
-                    resource=resource
+            # If an empty string has been issued then we delete the
+            # translation. In cases of pluralized translations, sometimes
+            # only one translation will exist and the rest plural forms will
+            # be empty. If the user wants to delete all of them, we need to
+            # let by the ones that don't already have a translation.
+            if target_string == "" and self._translations.get(key) is None \
+               and not source_entity.pluralized:
+                raise LotteBadRequestError(
+                    _("The translation string is empty")
                 )
-                _add_copyright(source_string, target_language, user)
-                invalidate_stats_cache(resource, target_language, user=user)
-            else:
-                # In cases of pluralized translations, sometimes only one
-                # translation will exist and the rest plural forms will be
-                # empty. If the user wants to delete all of them, we need
-                # to let by the ones that don't already have a translation.
-                if not source_string.source_entity.pluralized:
-                    raise LotteBadRequestError(
-                        _("The translation string is empty")
+            changes.append((key, target_string))
+
+        for key, target_string in changes:
+            self._set(resource, key, target_string)
+        if changes:
+            self.source_ids.add(source_string.id)
+            self._row_keys.setdefault(source_string.id, set()).update(
+                key for key, target_string in changes
+            )
+        return warnings
+
+    def _set(self, resource, key, target_string):
+        """Keep the new string of a translation. An empty string deletes
+        the translation.
+        """
+        translation = self._translations.get(key)
+        if target_string == "":
+            if translation is not None:
+                self._translations[key] = None
+                self._changed.add(key)
+            return
+        if translation is None:
+            translation = self._existing.get(key)
+            if translation is None:
+                translation = Translation(
+                    source_entity_id=key[0], rule=key[1],
+                    language=self.target_language, resource=resource
+                )
+            self._translations[key] = translation
+        translation.string = target_string
+        translation.user = self.user
+        self._changed.add(key)
+
+    @transaction.commit_on_success
+    def save(self, source_ids=None):
+        """Write the kept changes and update the stats of the resources.
+
+        Args:
+            source_ids: The ids of the source strings of the rows to save.
+                Defaults to all rows.
+        """
+        if source_ids is None:
+            changed = self._changed
+        else:
+            changed = set()
+            for source_id in source_ids:
+                changed.update(self._row_keys.get(source_id, ()))
+        if not changed:
+            return
+        language = self.target_language
+        chunk_size = settings.BULK_IMPORT_CHUNK_SIZE
+        deleted, updated, created = [], [], []
+        resource_ids = set()
+        with batch_stats() as deltas:
+            for se_id, wordcount in self._source_wordcounts.iteritems():
+                deltas.set_source_wordcount(se_id, wordcount)
+            source_wordcounts = {}
+            for key in changed:
+                translation = self._translations.get(key)
+                original = self._original.get(key)
+                if translation is None:
+                    if original is not None:
+                        deleted.append(self._existing[key].id)
+                        resource_ids.add(self._existing[key].resource_id)
+                    continue
+                resource = self._resources[translation.resource_id]
+                resource_ids.add(resource.id)
+                is_source = language.id == resource.source_language_id
+                if original is not None:
+                    old_string, old_reviewed, old_wordcount = original
+                    # Same as the pre_save handler of translations.
+                    if translation.string != old_string:
+                        translation.reviewed = False
+                    updated.append(translation)
+                else:
+                    old_reviewed, old_wordcount = False, 0
+                    created.append(translation)
+                translation._update_string_hash()
+                translation._update_wordcount()
+                if translation.rule != 5:
+                    continue
+                # Same as stats.translation_saved.
+                if is_source:
+                    wordcount = translation.wordcount - old_wordcount
+                    if wordcount:
+                        source_wordcounts.setdefault(resource.id, {})[
+                            translation.source_entity_id
+                        ] = wordcount
+                    deltas.set_source_wordcount(
+                        translation.source_entity_id, translation.wordcount
                     )
-        # catch-all. if we don't save we _MUST_ inform the user
-        except Exception, e:
-            msg = _(
-                "Error occurred while trying to save translation: %s" % unicode(e)
+                elif original is None:
+                    wordcount = deltas.source_wordcount(
+                        translation.source_entity_id,
+                        resource.source_language_id
+                    )
+                else:
+                    wordcount = 0
+                reviewed = int(bool(translation.reviewed)) - \
+                        int(bool(old_reviewed))
+                if original is None:
+                    deltas.add(
+                        resource.id, language.id, translated=1,
+                        untranslated=-1, reviewed=reviewed,
+                        translated_wordcount=wordcount
+                    )
+                else:
+                    deltas.add(
+                        resource.id, language.id, reviewed=reviewed,
+                        translated_wordcount=wordcount
+                    )
+            for resource_id, changes in source_wordcounts.iteritems():
+                deltas.add_source_wordcounts(resource_id, language.id, changes)
+            # The stats of the deleted translations are recorded by the
+            # signal handlers.
+            bulk_delete(Translation, deleted, chunk_size)
+            bulk_update(
+                Translation, updated,
+                ['string', 'string_hash', 'wordcount', 'user', 'reviewed'],
+                chunk_size
             )
-            logger.error(msg, exc_info=True)
-            raise LotteBadRequestError(msg)
-    return warnings
+            bulk_insert(Translation, created, chunk_size)
+
+        for resource_id in resource_ids:
+            resource = self._resources[resource_id]
+            _add_copyright(resource, language, self.user)
+            invalidate_stats_cache(resource, language, user=self.user)
 
 
-def _add_copyright(source_string, target_language, user):
+def _add_copyright(resource, target_language, user):
     from transifex.addons.copyright.handlers import lotte_copyrights
     lotte_save_translation.connect(lotte_copyrights)
     lotte_save_translation.send(
-        None, resource=source_string.resource,
-        language=target_language, user=user
+        None, resource=resource, language=target_language, user=user
     )
 
-
 # Restrict access only for private projects since this is used to fetch stuff
 # Allow even anonymous access on public projects
 def tab_details_snippet(request, entity_id, lang_code):
@@ -973,14 +1214,13 @@ def delete_translation(request, project_slug=None, resource_slug=None,
     # Ensure that there are no empty '' ids
     for se_id in to_delete:
         if se_id:
-            ids.append(se_id)
-
+            try:
+                ids.append(int(se_id))
+            except (TypeError, ValueError):
+                return HttpResponseBadRequest()
 
     try:
-        translations = Translation.objects.filter(source_entity__pk__in=ids,
-                                   language=language)
-
-        translations.delete()
+        delete_translations(resource, language, ids, user=request.user)
 #        request.user.message_set.create(
 #            message=_("Translations deleted successfully!"))
     except:
@@ -988,8 +1228,6 @@ def delete_translation(request, project_slug=None, resource_slug=None,
 #            message=_("Failed to delete translations due to some error!"))
         raise Http404
 
-    invalidate_stats_cache(resource, language, user=request.user)
-
     return HttpResponse(status=200)
 
 def spellcheck(request, project_slug, lang_code, resource_slug=None):
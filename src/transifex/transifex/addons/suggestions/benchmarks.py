@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the suggestions addon.
+
+Run them with ``./manage.py txbenchmark``.
+"""
+
+import random
+from django.conf import settings
+from transifex.txcommon.benchmarks import register
+from transifex.resources.formats.utils.string_utils import percent_diff, \
+        SimilarStringIndex
+
+
+def _changed_strings(size, seed=1):
+    """Return the old and new source strings of a refactored resource.
+
+    Half of the new strings are slightly changed old ones.
+    """
+    rand = random.Random(seed)
+    letters = u'abcdefghijklmnopqrstuvwxyz'
+    words = [
+        u''.join(rand.choice(letters) for i in xrange(rand.randint(2, 9)))
+        for n in xrange(2000)
+    ]
+    def sentence():
+        return u' '.join(
+            rand.choice(words) for i in xrange(rand.randint(2, 12))
+        )
+    old = [sentence() for n in xrange(size)]
+    new = [rand.random() < 0.5 and s + u'.' or sentence() for s in old]
+    return old, new
+
+
+def _match_indexed(old, new, max_percent):
+    index = SimilarStringIndex(enumerate(new), max_percent)
+    return [index.find_first(s) for s in old]
+
+
+def _match_full_scan(old, new, max_percent):
+    matches = []
+    for s in old:
+        for i, n in enumerate(new):
+            if percent_diff(s, n) < max_percent:
+                matches.append(i)
+                break
+        else:
+            matches.append(None)
+    return matches
+
+
+@register('suggestions', "Match the strings of refactored resources")
+def match_strings(run, sizes=(1000, 10000), scanned_rows=20):
+    max_percent = settings.MAX_STRING_DISTANCE
+    for size in sizes:
+        old, new = _changed_strings(size)
+        matches = run.time(
+            "index (%sx%s)" % (size, size),
+            _match_indexed, old, new, max_percent
+        )
+        # The full scan is too slow for whole resources, so time only a
+        # few rows of it.
+        scanned = run.time(
+            "full scan (%s rows of %sx%s)" % (scanned_rows, size, size),
+            _match_full_scan, old[:scanned_rows], new, max_percent
+        )
+        assert scanned == matches[:scanned_rows]
@@ -5,7 +5,8 @@ from django.conf import settings
 from suggestions.models import Suggestion
 from transifex.txcommon.log import logger
 from transifex.resources.models import Translation, SourceEntity
-from transifex.resources.formats.utils.string_utils import percent_diff
+from transifex.txcommon.db.bulk import chunks
+from transifex.resources.formats.utils.string_utils import SimilarStringIndex
 
 
 class SuggestionFormat(object):
@@ -96,22 +97,42 @@ class ContentSuggestionFormat(SuggestionFormat):
     of the content.
     """
 
+    def _source_strings(self, source_entities):
+        """Return a dictionary of the ids of the source entities to their
+        source strings, fetched with one query per chunk.
+        """
+        strings = {}
+        ids = [se.id for se in source_entities]
+        for chunk in chunks(ids, 500):
+            strings.update(Translation.objects.filter(
+                source_entity__in=chunk,
+                language=self.resource.source_language, rule=5
+            ).values_list('source_entity', 'string'))
+        return strings
+
     def create_suggestions(self, original, new):
-        iterations = len(original)*len(new)
-        # If it's not over the limit, then do it
-        if iterations < settings.MAX_STRING_ITERATIONS:
-            for se in original:
-                for ne in new:
-                    try:
-                        old_trans = Translation.objects.get(source_entity=se,
-                            language=se.resource.source_language, rule=5)
-                        new_trans = Translation.objects.get(source_entity=ne,
-                            language=se.resource.source_language, rule=5)
-                    except Translation.DoesNotExist:
-                        # Source language translation should always exist
-                        # but just in case...
-                        continue
-                    # find Levenshtein distance
-                    if percent_diff(old_trans.string, new_trans.string) < settings.MAX_STRING_DISTANCE:
-                        self._convert_to_suggestions(se, ne, self.user)
-                        break
+        """Convert the translations of each original source entity to
+        suggestions for the first new source entity with a similar string.
+
+        Strings are similar, if their percent difference is lower than
+        MAX_STRING_DISTANCE.
+        """
+        if not original or not new:
+            return
+        strings = self._source_strings(list(original) + list(new))
+        # Index the new entities by their position, so that the first
+        # similar one is matched.
+        new = list(new)
+        index = SimilarStringIndex(
+            ((i, strings[ne.id]) for i, ne in enumerate(new)
+             if ne.id in strings),
+            settings.MAX_STRING_DISTANCE
+        )
+        for se in original:
+            # Source language translation should always exist but just in
+            # case...
+            if se.id not in strings:
+                continue
+            i = index.find_first(strings[se.id])
+            if i is not None:
+                self._convert_to_suggestions(se, new[i], self.user)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from django.conf import settings
 from django.views.generic import list_detail
 from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
@@ -6,10 +7,38 @@ from django.contrib.auth.decorators import login_required
 from transifex.txcommon.decorators import one_perm_required_or_403
 from transifex.projects.models import Project
 from transifex.projects.permissions import pr_project_private_perm
-from actionlog.models import LogEntry
+from actionlog.models import LogEntry, timeline_page
 from filters import LogEntryFilter
 
 
+def _timeline_context(request, log_entries):
+    """
+    Return the context of a timeline page with the filtered entries.
+
+    The entries are paginated with the cursor in the 'before' GET parameter
+    (see ``actionlog.models.timeline_page``), so the page is found without
+    counting or skipping the newer entries.
+    """
+    f = LogEntryFilter(request.GET, queryset=log_entries)
+    page = timeline_page(
+        f.qs.select_related('action_type', 'user'),
+        request.GET.get('before'), settings.TIMELINE_PAGE_SIZE
+    )
+    params = request.GET.copy()
+    first_page_url = None
+    if 'before' in params:
+        del params['before']
+        first_page_url = '?' + params.urlencode()
+    next_page_url = None
+    if page.has_next:
+        params['before'] = page.next_cursor
+        next_page_url = '?' + params.urlencode()
+    return {'f': f,
+            'actionlog': page.entries,
+            'first_page_url': first_page_url,
+            'next_page_url': next_page_url}
+
+
 @login_required
 def user_timeline(request, *args, **kwargs):
     """
@@ -18,12 +47,9 @@ def user_timeline(request, *args, **kwargs):
     The view limits the results and uses filters to allow the user to even
     further refine the set.
     """
-    log_entries = LogEntry.objects.by_user(request.user)
-    f = LogEntryFilter(request.GET, queryset=log_entries)
-
+    log_entries = LogEntry.objects.for_user(request.user)
     return render_to_response("timeline/timeline_user.html",
-        {'f': f,
-         'actionlog': f.qs},
+        _timeline_context(request, log_entries),
         context_instance = RequestContext(request))
 
 
@@ -38,11 +64,7 @@ def project_timeline(request, project_slug, *args, **kwargs):
     further refine the set.
     """
     project = get_object_or_404(Project, slug=project_slug)
-    log_entries = LogEntry.objects.by_object(project)
-    f = LogEntryFilter(request.GET, queryset=log_entries)
-    # The template needs both these variables. The first is used in filtering,
-    # the second is used for pagination and sorting.
+    log_entries = LogEntry.objects.for_object(project)
     kwargs.setdefault('extra_context', {}).update(
-        {'f': f,
-         'actionlog': f.qs.select_related('action_type', 'user')})
+        _timeline_context(request, log_entries))
     return list_detail.object_detail(request, slug=project_slug, *args, **kwargs)
@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
 
 from django.contrib import admin
-from webhooks.models import WebHook
+from webhooks.models import WebHook, WebHookEvent
 
 
 class WebHookAdmin(admin.ModelAdmin):
-    pass
+    list_display = ('project', 'url', 'deliveries', 'failures',
+                    'average_latency', 'last_delivery', )
+    readonly_fields = ('deliveries', 'failures', 'total_latency',
+                       'last_delivery', 'last_error', )
+
+
+class WebHookEventAdmin(admin.ModelAdmin):
+    list_display = ('hook', 'project', 'resource', 'language', 'percent',
+                    'attempts', 'next_attempt', )
+    raw_id_fields = ('hook', )
 
 admin.site.register(WebHook, WebHookAdmin)
+admin.site.register(WebHookEvent, WebHookEventAdmin)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+The queue of the web hook events.
+
+Changes of the translations are not sent to the web hooks while the
+translations are being saved. They are stored as ``WebHookEvent`` objects
+instead and delivered by the ``txdeliverhooks`` command:
+
+- An event waits for WEBHOOKS_COALESCE_WINDOW seconds. More changes of the
+  same resource and language in the meantime update the pending event, so
+  that only the latest percentage is sent.
+- Failed deliveries are retried with exponential backoff, up to
+  WEBHOOKS_MAX_ATTEMPTS times.
+- The requests share an HTTP session, which keeps a pool of connections to
+  each host. The events are delivered grouped by host.
+- The number of deliveries and failures and the latency of the deliveries
+  are recorded on each ``WebHook``.
+"""
+
+from __future__ import with_statement
+import datetime
+import threading
+import time
+import urlparse
+import requests
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from transifex.txcommon.log import logger
+from webhooks.models import WebHook, WebHookEvent
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the HTTP session shared by the requests to the web hooks."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = requests.session()
+    return _session
+
+
+def enqueue_event(hook_id, event_info, now=None):
+    """Add an event for the hook to the queue, or update the pending event
+    of the same resource and language.
+
+    Args:
+        hook_id: The id of the web hook.
+        event_info: A dictionary with the slugs of the project and the
+            resource, the code of the language and the percentage.
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    pending = WebHookEvent.objects.filter(
+        hook=hook_id, resource=event_info['resource'],
+        language=event_info['language']
+    )
+    values = {
+        'project': event_info['project'],
+        'percent': event_info['percent'],
+        'version': F('version') + 1,
+    }
+    if pending.update(**values):
+        return
+    sid = transaction.savepoint()
+    try:
+        WebHookEvent.objects.create(
+            hook_id=hook_id, resource=event_info['resource'],
+            language=event_info['language'], project=event_info['project'],
+            percent=event_info['percent'], created=now,
+            next_attempt=now + datetime.timedelta(
+                seconds=settings.WEBHOOKS_COALESCE_WINDOW
+            )
+        )
+        transaction.savepoint_commit(sid)
+    except IntegrityError:
+        # Another process added the event in the meantime.
+        transaction.savepoint_rollback(sid)
+        pending.update(**values)
+
+
+def _retry_delay(attempts):
+    """Return the delay before the next attempt, in seconds."""
+    return min(
+        settings.WEBHOOKS_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.WEBHOOKS_RETRY_MAX_DELAY
+    )
+
+
+class DeliveryReport(object):
+    """The results of a run of deliveries."""
+
+    def __init__(self):
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.latencies = []
+
+    @property
+    def average_latency(self):
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def max_latency(self):
+        if not self.latencies:
+            return None
+        return max(self.latencies)
+
+    def __unicode__(self):
+        msg = u"%s delivered, %s failed, %s dropped" % (
+            self.delivered, self.failed, self.dropped
+        )
+        if self.latencies:
+            msg += u", latency %.3fs average, %.3fs max" % (
+                self.average_latency, self.max_latency
+            )
+        return msg
+
+
+def _post(event, session):
+    """POST the event to its hook.
+
+    Returns:
+        The error message, or None on success.
+    """
+    try:
+        res = session.post(
+            event.hook.url, data=event.data, allow_redirects=False,
+            timeout=settings.WEBHOOKS_TIMEOUT
+        )
+    except requests.RequestException, e:
+        return unicode(e) or e.__class__.__name__
+    if not res.ok:
+        return u"HTTP code is %s" % res.status_code
+    return None
+
+
+def _claim(event, now):
+    """Postpone the event, so that no other worker delivers it, in case
+    many run at the same time. The event is delivered again after the
+    delay of a retry, if the worker dies.
+
+    Returns:
+        Whether the event was claimed.
+    """
+    claimed = WebHookEvent.objects.filter(
+        id=event.id, next_attempt=event.next_attempt
+    ).update(next_attempt=now + datetime.timedelta(
+        seconds=settings.WEBHOOKS_RETRY_DELAY
+    ))
+    transaction.commit_unless_managed()
+    return bool(claimed)
+
+
+def _record_success(event, latency, now, report):
+    report.delivered += 1
+    report.latencies.append(latency)
+    WebHook.objects.filter(id=event.hook_id).update(
+        deliveries=F('deliveries') + 1,
+        total_latency=F('total_latency') + latency, last_delivery=now
+    )
+    # If the event was updated during the delivery, send it again.
+    updated = WebHookEvent.objects.filter(id=event.id).exclude(
+        version=event.version
+    ).update(attempts=0, next_attempt=now)
+    if not updated:
+        WebHookEvent.objects.filter(
+            id=event.id, version=event.version
+        ).delete()
+
+
+def _record_failure(event, error, now, report):
+    logger.error("Error visiting webhook %s: %s" % (event.hook, error))
+    report.failed += 1
+    WebHook.objects.filter(id=event.hook_id).update(
+        failures=F('failures') + 1, last_error=error
+    )
+    attempts = event.attempts + 1
+    if attempts >= settings.WEBHOOKS_MAX_ATTEMPTS:
+        logger.error("Dropping event %s after %s attempts." % (
+            event, attempts
+        ))
+        report.dropped += 1
+        WebHookEvent.objects.filter(id=event.id).delete()
+    else:
+        WebHookEvent.objects.filter(id=event.id).update(
+            attempts=attempts, next_attempt=now + datetime.timedelta(
+                seconds=_retry_delay(attempts)
+            )
+        )
+
+
+def deliver_events(limit=None, session=None):
+    """Deliver the events that are due.
+
+    Args:
+        limit: The maximum number of events to deliver. Defaults to
+            WEBHOOKS_BATCH_SIZE.
+        session: The HTTP session to use. Defaults to the shared one.
+    Returns:
+        A DeliveryReport.
+    """
+    if limit is None:
+        limit = settings.WEBHOOKS_BATCH_SIZE
+    if session is None:
+        session = get_session()
+    report = DeliveryReport()
+    events = list(WebHookEvent.objects.select_related('hook').filter(
+        next_attempt__lte=datetime.datetime.now()
+    ).order_by('next_attempt')[:limit])
+    # Deliver the events of each host one after the other, so that the
+    # pooled connection to the host is reused.
+    events.sort(key=lambda e: urlparse.urlparse(e.hook.url).netloc)
+    for event in events:
+        if not _claim(event, datetime.datetime.now()):
+            continue
+        start = time.time()
+        error = _post(event, session)
+        latency = time.time() - start
+        now = datetime.datetime.now()
+        if error is None:
+            _record_success(event, latency, now, report)
+        else:
+            _record_failure(event, error, now, report)
+        transaction.commit_unless_managed()
+    return report
@@ -4,7 +4,6 @@
 Handlers for the addon.
 """
 
-import requests
 from django.db.models import get_model
 from django import forms
 from django.utils.translation import ugettext_lazy as _
@@ -13,36 +12,31 @@ from transifex.txcommon.validators import validate_http_url
 from transifex.resources.signals import post_update_rlstats
 from transifex.projects.signals import project_form_init, post_proj_save_m2m
 from webhooks.models import WebHook
+from webhooks.delivery import enqueue_event
 
 
 def visit_url(sender, **kwargs):
-    """Visit the URL for the project.
+    """Queue an event for the web hooks of the project.
 
     Send the slug of the project, the slug of the resource and the language
     of the translation as identifiers. Send the translation percentage
-    as information.
+    as information. The events are delivered by the txdeliverhooks
+    command (see ``webhooks.delivery``).
 
     Args:
         sender: The rlstats object itself.
     Returns:
-        True of False for success (or not).
+        True of False, if the project has web hooks (or not).
     """
-    # TODO make it a celery task
-    # TODO increase the timeout in celery
-
     stats = sender
     resource = stats.resource
     project = resource.project
     language = stats.language
 
-    if 'post_function' in kwargs:
-        post_function = kwargs['post_function']
-    else:
-        post_function = requests.post
-
-    try:
-        hooks = WebHook.objects.filter(project=project)
-    except WebHook.DoesNotExist:
+    hooks = WebHook.objects.filter(project=project).values_list(
+        'id', flat=True
+    )
+    if not hooks:
         logger.debug("Project %s has no web hooks" % project.slug)
         return False
 
@@ -53,19 +47,12 @@ def visit_url(sender, **kwargs):
         'percent': stats.translated_perc,
     }
     logger.debug(
-        "POST data for %s: %s" % (stats.resource.project.slug, event_info)
+        "Queued event for %s: %s" % (stats.resource.project.slug, event_info)
     )
 
-    for hook in hooks:
-        res = post_function(hook.url,
-          data=event_info, allow_redirects=False, timeout=2.0)
-
-        if res.ok:
-            logger.debug("POST for project %s successful." % project)
-        else:
-            msg = "Error visiting webhook %s: HTTP code is %s" % (
-              hook, res.status_code)
-            logger.error(msg)
+    for hook_id in hooks:
+        enqueue_event(hook_id, event_info)
+    return True
 
 def add_web_hook_field(sender, **kwargs):
     """Add the field for a web hook to the project edit form."""
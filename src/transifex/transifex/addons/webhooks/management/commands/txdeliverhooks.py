@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+The txdeliverhooks management command, which delivers the queued events of
+the web hooks.
+"""
+import sys
+import time
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from webhooks.delivery import deliver_events
+
+
+class Command(BaseCommand):
+    """
+    Management Command Class about delivering web hook events
+    """
+    help = "Deliver the events of the web hooks that are due. Run it from\n"\
+        "cron or keep it running with --loop."
+    option_list = BaseCommand.option_list + (
+        make_option('--loop', action='store_true',
+            dest='loop', default=False,
+            help='Keep delivering events, as they are queued.'),
+        make_option('--limit', type='int',
+            dest='limit', default=None,
+            help='The maximum number of events to deliver in a run.'),
+    )
+
+    requires_model_validation = True
+    can_import_settings = True
+
+    def handle(self, *args, **options):
+        limit = options.get('limit')
+        if limit is not None and limit < 1:
+            raise CommandError("The limit must be a positive number.")
+        verbosity = int(options.get('verbosity', 1))
+        while True:
+            report = deliver_events(limit=limit)
+            active = report.delivered or report.failed
+            if verbosity > 0 and (active or not options.get('loop')):
+                sys.stdout.write((u"%s\n" % unicode(report)).encode('UTF-8'))
+            if not options.get('loop'):
+                break
+            if not active:
+                time.sleep(settings.WEBHOOKS_POLL_INTERVAL)
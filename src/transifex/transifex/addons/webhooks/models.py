@@ -4,6 +4,7 @@
 Models for the web hook addon.
 """
 
+import datetime
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from transifex.txcommon.validators import validate_http_url
@@ -32,6 +33,97 @@ class WebHook(models.Model):
         help_text=_("The kind of web hook (apps or project)")
     )
 
+    deliveries = models.PositiveIntegerField(
+        verbose_name=_('Deliveries'), default=0, editable=False,
+        help_text=_('The number of events delivered successfully.')
+    )
+    failures = models.PositiveIntegerField(
+        verbose_name=_('Failures'), default=0, editable=False,
+        help_text=_('The number of failed delivery attempts.')
+    )
+    total_latency = models.FloatField(
+        verbose_name=_('Total latency'), default=0, editable=False,
+        help_text=_('The total time of the successful deliveries, in seconds.')
+    )
+    last_delivery = models.DateTimeField(
+        verbose_name=_('Last delivery'), null=True, editable=False,
+        help_text=_('The time of the last successful delivery.')
+    )
+    last_error = models.TextField(
+        verbose_name=_('Last error'), blank=True, editable=False,
+        help_text=_('The error of the last failed delivery attempt.')
+    )
+
     def __unicode__(self):
         return '<Webhoook for %s: %s>' % (self.project.slug, self.url)
 
+    @property
+    def average_latency(self):
+        """The average time of the successful deliveries, in seconds."""
+        if not self.deliveries:
+            return None
+        return self.total_latency / self.deliveries
+
+
+class WebHookEvent(models.Model):
+    """An event waiting to be delivered to a web hook.
+
+    There is at most one event for each hook, resource and language. A new
+    change of the translation updates the pending event instead.
+    """
+
+    hook = models.ForeignKey(
+        WebHook, related_name='events', verbose_name=_('Web hook'),
+        help_text=_('The web hook to deliver the event to.')
+    )
+    project = models.CharField(
+        verbose_name=_('Project'), max_length=30,
+        help_text=_('The slug of the project.')
+    )
+    resource = models.CharField(
+        verbose_name=_('Resource'), max_length=50,
+        help_text=_('The slug of the resource.')
+    )
+    language = models.CharField(
+        verbose_name=_('Language'), max_length=50,
+        help_text=_('The code of the language.')
+    )
+    percent = models.PositiveIntegerField(
+        verbose_name=_('Percent'), default=0,
+        help_text=_('The translation percentage.')
+    )
+    version = models.PositiveIntegerField(
+        verbose_name=_('Version'), default=1,
+        help_text=_('Incremented whenever the event is updated.')
+    )
+    attempts = models.PositiveIntegerField(
+        verbose_name=_('Attempts'), default=0,
+        help_text=_('The number of failed delivery attempts.')
+    )
+    created = models.DateTimeField(
+        verbose_name=_('Created'), default=datetime.datetime.now,
+        help_text=_('The time of the first change of the event.')
+    )
+    next_attempt = models.DateTimeField(
+        verbose_name=_('Next attempt'), db_index=True,
+        help_text=_('The time the event should be delivered at.')
+    )
+
+    class Meta:
+        unique_together = ('hook', 'resource', 'language', )
+
+    def __unicode__(self):
+        return '<Event for %s: %s.%s %s>' % (
+            self.hook_id, self.project, self.resource, self.language
+        )
+
+    @property
+    def data(self):
+        """The data to POST to the web hook."""
+        return {
+            'project': self.project,
+            'resource': self.resource,
+            'language': self.language,
+            'percent': self.percent,
+        }
+
@@ -5,10 +5,16 @@ Tests for the webhook addon.
 """
 
 from __future__ import with_statement
+import cgi
+import datetime
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from transifex.txcommon.tests.base import BaseTestCase
-from webhooks.models import WebHook
+from webhooks.models import WebHook, WebHookEvent
 from webhooks.handlers import visit_url, add_web_hook_field, save_web_hook
+from webhooks.delivery import deliver_events
 from transifex.resources.models import RLStats
 from transifex.projects.forms import ProjectForm
 
@@ -38,23 +44,134 @@ class TestWebHooks(BaseTestCase):
         )
         self.assertRaises(ValidationError, hook.full_clean)
 
-    def test_error_response(self):
+    def test_coalesce(self):
+        """Test that changes of the same translation update one event."""
         stats = RLStats.objects.get(
             resource=self.resource, language=self.language_en
         )
-        web_hook = WebHook.objects.create(
+        WebHook.objects.create(
             project=self.resource.project, url='https://127.0.0.1'
         )
-        self.assertFalse(visit_url(stats, post_function=_mock_error_request))
+        self.assertTrue(visit_url(stats))
+        stats.translated_perc = 42
+        self.assertTrue(visit_url(stats))
+        event = WebHookEvent.objects.get()
+        self.assertEqual(event.percent, 42)
+        self.assertEqual(event.version, 2)
+        self.assertTrue(event.next_attempt > datetime.datetime.now())
+        self.assertEqual(deliver_events().delivered, 0)
+
+
+class _HookHandler(BaseHTTPRequestHandler):
+    """A web hook, which returns the status code set on the server."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.getheader('Content-Length'))
+        self.server.requests.append(
+            (self.client_address, cgi.parse_qs(self.rfile.read(length)))
+        )
+        self.send_response(self.server.status_code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class TestWebHookDelivery(BaseTestCase):
+    """Test the delivery of the queued events."""
+
+    def setUp(self):
+        super(TestWebHookDelivery, self).setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), _HookHandler)
+        self.server.requests = []
+        self.server.status_code = 200
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.hook = WebHook.objects.create(
+            project=self.project,
+            url='http://127.0.0.1:%s/hook/' % self.server.server_port
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(TestWebHookDelivery, self).tearDown()
+
+    def _queue_events(self):
+        for stats in RLStats.objects.filter(resource=self.resource):
+            visit_url(stats)
+        WebHookEvent.objects.update(next_attempt=datetime.datetime.now())
 
     def test_successful_response(self):
-        stats = RLStats.objects.get(
-            resource=self.resource, language=self.language_en
+        self._queue_events()
+        events = WebHookEvent.objects.count()
+        self.assertTrue(events > 1)
+        report = deliver_events()
+        self.assertEqual(report.delivered, events)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual(len(report.latencies), events)
+        self.assertEqual(WebHookEvent.objects.count(), 0)
+        self.assertEqual(len(self.server.requests), events)
+        # The connection to the host is reused
+        self.assertEqual(
+            len(set(address for address, data in self.server.requests)), 1
         )
-        web_hook = WebHook.objects.create(
-            project=self.resource.project, url='https://127.0.0.1'
+        data = self.server.requests[0][1]
+        self.assertEqual(data['project'], [self.project.slug])
+        self.assertEqual(data['resource'], [self.resource.slug])
+        hook = WebHook.objects.get(id=self.hook.id)
+        self.assertEqual(hook.deliveries, events)
+        self.assertEqual(hook.failures, 0)
+        self.assertTrue(hook.average_latency > 0)
+        self.assertTrue(hook.last_delivery is not None)
+
+    def test_error_response(self):
+        self.server.status_code = 500
+        self._queue_events()
+        events = WebHookEvent.objects.count()
+        report = deliver_events()
+        self.assertEqual(report.delivered, 0)
+        self.assertEqual(report.failed, events)
+        self.assertEqual(WebHookEvent.objects.count(), events)
+        for event in WebHookEvent.objects.all():
+            self.assertEqual(event.attempts, 1)
+            self.assertTrue(event.next_attempt > datetime.datetime.now())
+        hook = WebHook.objects.get(id=self.hook.id)
+        self.assertEqual(hook.failures, events)
+        self.assertIn('500', hook.last_error)
+        # Nothing is due until the retry
+        self.assertEqual(deliver_events().failed, 0)
+
+        # The events are dropped after the last attempt
+        WebHookEvent.objects.update(
+            attempts=settings.WEBHOOKS_MAX_ATTEMPTS - 1,
+            next_attempt=datetime.datetime.now()
         )
-        self.assertTrue(visit_url(stats, post_function=_mock_successful_request))
+        report = deliver_events()
+        self.assertEqual(report.dropped, events)
+        self.assertEqual(WebHookEvent.objects.count(), 0)
+
+    def test_retry(self):
+        self.server.status_code = 500
+        self._queue_events()
+        deliver_events()
+        self.server.status_code = 200
+        WebHookEvent.objects.update(next_attempt=datetime.datetime.now())
+        events = WebHookEvent.objects.count()
+        self.assertEqual(deliver_events().delivered, events)
+        self.assertEqual(WebHookEvent.objects.count(), 0)
+
+    def test_connection_error(self):
+        self.hook.url = 'http://127.0.0.1:1/hook/'
+        self.hook.save()
+        self._queue_events()
+        report = deliver_events()
+        self.assertEqual(report.delivered, 0)
+        self.assertEqual(report.failed, WebHookEvent.objects.count())
 
 
 class TestWebHookHandlers(BaseTestCase):
@@ -64,24 +181,3 @@ class TestWebHookHandlers(BaseTestCase):
         kwargs = {'form': ProjectForm()}
         add_web_hook_field(None, **kwargs)
         self.assertIn('webhook', kwargs['form'].fields)
-
-
-def _mock_successful_request(*args, **kwargs):
-    """Mock a request and return a success status code."""
-    return MockResponse(200)
-
-
-def _mock_error_request(*args, **kwargs):
-    """Mock a request and return an error status code."""
-    return MockResponse(400)
-
-
-class MockResponse(object):
-    """Mock a response object.
-
-    Mimic the response object of the requests library.
-    """
-
-    def __init__(self, code):
-        self.status_code = code
-        self.ok = self.status_code == 200
@@ -11,7 +11,7 @@ from transifex.api.authentication import CustomHttpBasicAuthentication
 from transifex.languages.api import LanguageHandler
 from transifex.projects.api import ProjectHandler, ProjectResourceHandler
 from transifex.resources.api import ResourceHandler, FileHandler, StatsHandler, \
-        TranslationHandler, FormatsHandler
+        TranslationHandler, FormatsHandler, QAHandler, CloneHandler
 from transifex.storage.api import StorageHandler
 from transifex.releases.api import ReleaseHandler
 from transifex.actionlog.api import ActionlogHandler
@@ -28,6 +28,8 @@ stats_handler = Resource(StatsHandler, authentication=auth)
 translation_handler = Resource(TranslationHandler, authentication=auth)
 actionlog_handler = Resource(ActionlogHandler, authentication=auth)
 formats_handler = Resource(FormatsHandler, authentication=auth)
+qa_handler = Resource(QAHandler, authentication=auth)
+clone_handler = Resource(CloneHandler, authentication=auth)
 
 urlpatterns = patterns('',
     url(
@@ -130,6 +132,16 @@ urlpatterns = patterns('',
         never_cache(translation_handler),
         {'api_version': 2},
         name='apiv2_translation',
+    ), url(
+        r'^2/project/(?P<project_slug>[-\w]+)/resource/(?P<resource_slug>[-\w]+)/translation/(?P<lang_code>[\-_@\w\.]+)/qa/$',
+        never_cache(qa_handler),
+        {'api_version': 2},
+        name='apiv2_translation_qa',
+    ), url(
+        r'^2/project/(?P<project_slug>[-\w]+)/resource/(?P<resource_slug>[-\w]+)/translation/(?P<source_lang_code>[\-_@\w\.]+)/clone/(?P<target_lang_code>[\-_@\w\.]+)/$',
+        never_cache(clone_handler),
+        {'api_version': 2},
+        name='apiv2_translation_clone',
     ), url(
         r'^2/project/(?P<project_slug>[-\w]+)/resource/(?P<resource_slug>[-\w]+)/stats/$',
         never_cache(stats_handler),
@@ -2,11 +2,12 @@ from datetime import datetime
 from django.contrib import admin
 from django.db import models
 from django.db.models import permalink, get_model
-from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
 from django.http import Http404
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
+from transifex.languages.registry import registry, invalidate_registry
 
 class LanguageManager(models.Manager):
     def by_code_or_alias(self, code):
@@ -16,14 +17,11 @@ class LanguageManager(models.Manager):
         """
         if not code:
             raise Language.DoesNotExist("No language matched the query.")
-        lang = cache.get('languages:code_or_alias:%s' % code, None)
-        if lang is None:
-            lang = Language.objects.get(
-                models.Q(code=code) |
-                models.Q(code_aliases__contains=' %s ' % code)
-            )
-            cache.set('languages:code_or_alias:%s' % code, lang)
-        return lang
+        return registry.by_code_or_alias(code).language()
+
+    def by_id(self, id):
+        """Return the language with the given id, without a query."""
+        return registry.by_id(id).language()
 
     def by_code_or_alias_or_none(self, code):
         """
@@ -171,3 +169,7 @@ class Language(models.Model):
             rules.append(4)
         rules.append(5)
         return rules
+
+
+post_save.connect(invalidate_registry, sender=Language)
+post_delete.connect(invalidate_registry, sender=Language)
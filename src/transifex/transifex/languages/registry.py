@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+A process-local registry of the languages.
+
+The languages are loaded from the database once, with a single query, and
+kept as immutable ``LanguageInfo`` snapshots. This saves the queries that
+looking up a language by its code, alias or id would need, since these
+happen over and over while handling files and requests.
+
+The registry is reloaded the next time it is used, after a language is
+saved or deleted. Saves in other processes are noticed through a version
+kept in the shared cache, which is checked every
+LANGUAGE_REGISTRY_CHECK_INTERVAL seconds. A code or id that is not in the
+registry is looked up in the database, so that a language added by another
+process is found right away::
+
+    from transifex.languages.registry import registry
+    registry.by_code_or_alias('pt_BR').rule_numbers
+"""
+
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import get_model, Q
+
+VERSION_KEY = 'languages:registry_version'
+
+
+class LanguageInfo(object):
+    """An immutable snapshot of a language."""
+
+    __slots__ = (
+        'id', 'code', 'aliases', 'name', 'nplurals', 'pluralequation',
+        'rule_numbers', '_values',
+    )
+
+    def __init__(self, language):
+        set_ = super(LanguageInfo, self).__setattr__
+        set_('id', language.id)
+        set_('code', language.code)
+        set_('aliases', tuple((language.code_aliases or '').split()))
+        set_('name', language.name)
+        set_('nplurals', language.nplurals)
+        set_('pluralequation', language.pluralequation)
+        set_('rule_numbers', tuple(language.get_pluralrules_numbers()))
+        set_('_values', tuple(
+            getattr(language, f.attname) for f in language._meta.fields
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LanguageInfo objects are immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("LanguageInfo objects are immutable.")
+
+    def __repr__(self):
+        return '<LanguageInfo: %s>' % self.code
+
+    def language(self):
+        """Return a new Language object for the language.
+
+        No query is needed; the object is built from the snapshot.
+        """
+        return get_model('languages', 'Language')(*self._values)
+
+
+class LanguageRegistry(object):
+    """Lookups of the languages by id, code and alias."""
+
+    def __init__(self):
+        self._snapshot = None
+        self._version = None
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load all languages with one query."""
+        Language = get_model('languages', 'Language')
+        by_id, by_code, by_alias = {}, {}, {}
+        for language in Language.objects.all():
+            info = LanguageInfo(language)
+            by_id[info.id] = info
+            by_code[info.code] = info
+            for alias in info.aliases:
+                by_alias.setdefault(alias, info)
+        return by_id, by_code, by_alias
+
+    def _is_current(self):
+        """Check, at most once per LANGUAGE_REGISTRY_CHECK_INTERVAL
+        seconds, whether a language has changed in another process.
+        """
+        now = time.time()
+        if now - self._checked < settings.LANGUAGE_REGISTRY_CHECK_INTERVAL:
+            return True
+        self._checked = now
+        return cache.get(VERSION_KEY) == self._version
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None or not self._is_current():
+            self._lock.acquire()
+            try:
+                if self._snapshot is None or self._snapshot is snapshot:
+                    self._version = cache.get(VERSION_KEY)
+                    self._checked = time.time()
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+            finally:
+                self._lock.release()
+        return snapshot
+
+    def invalidate(self):
+        """Reload the languages, the next time they are needed."""
+        self._snapshot = None
+
+    def _fetch(self, query):
+        """Look up a language missing from the registry in the database.
+
+        The registry is reloaded, if the language is found, since it was
+        added or changed by another process.
+        """
+        Language = get_model('languages', 'Language')
+        try:
+            language = Language.objects.get(query)
+        except Language.MultipleObjectsReturned:
+            raise Language.DoesNotExist("No language matched the query.")
+        self.invalidate()
+        return LanguageInfo(language)
+
+    def by_id(self, id):
+        """Return the LanguageInfo of the language with the given id.
+
+        Raises Language.DoesNotExist, if there is no such language.
+        """
+        try:
+            id = int(id)
+        except (ValueError, TypeError):
+            raise get_model('languages', 'Language').DoesNotExist(
+                "No language matched the query."
+            )
+        info = self._get_snapshot()[0].get(id)
+        if info is None:
+            info = self._fetch(Q(id=id))
+        return info
+
+    def by_code_or_alias(self, code):
+        """Return the LanguageInfo of the language that matches the code
+        either with its code or one of its aliases.
+
+        Raises Language.DoesNotExist, if there is no such language.
+        """
+        by_id, by_code, by_alias = self._get_snapshot()
+        info = by_code.get(code) or by_alias.get(code)
+        if info is None:
+            info = self._fetch(
+                Q(code=code) | Q(code_aliases__contains=' %s ' % code)
+            )
+        return info
+
+    def in_bulk(self, ids):
+        """Return the LanguageInfo objects of the languages with the given
+        ids, ordered by name. Unknown ids are skipped.
+        """
+        by_id = self._get_snapshot()[0]
+        infos = []
+        for id in ids:
+            try:
+                infos.append(by_id[int(id)])
+            except (KeyError, ValueError, TypeError):
+                pass
+        return sorted(infos, key=lambda info: info.name)
+
+
+registry = LanguageRegistry()
+
+
+def invalidate_registry(sender, **kwargs):
+    """Reload the registry after a language is saved or deleted, in this
+    and the other processes."""
+    registry.invalidate()
+    cache.set(VERSION_KEY, uuid.uuid4().hex)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from transifex.languages.models import Language
+from transifex.languages.registry import registry, VERSION_KEY
+
+
+class LanguageRegistryTests(TestCase):
+    """Test the process-local registry of the languages."""
+
+    def setUp(self):
+        self.language = Language.objects.create(
+            code='xx_YY', name='Test language', code_aliases='xx xx-yy',
+            nplurals=2, pluralequation='(n != 1)', rule_one='n is 1',
+            rule_other='everything'
+        )
+
+    def _count_queries(self, func, *args):
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            result = func(*args)
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        return result, len(connection.queries) - start
+
+    def test_lookups(self):
+        info = registry.by_code_or_alias('xx_YY')
+        self.assertEqual(info.id, self.language.id)
+        self.assertEqual(info.rule_numbers, (1, 5))
+        self.assertEqual(registry.by_code_or_alias('xx-yy'), info)
+        self.assertEqual(registry.by_id(self.language.id), info)
+        self.assertEqual(registry.by_id(str(self.language.id)), info)
+        self.assertEqual(registry.in_bulk([self.language.id, 'x']), [info])
+        for code in ('zz', 'xx_', ''):
+            self.assertRaises(
+                Language.DoesNotExist, registry.by_code_or_alias, code
+            )
+        self.assertRaises(Language.DoesNotExist, registry.by_id, 'zz')
+
+    def test_no_queries(self):
+        registry.by_id(self.language.id)
+        language, queries = self._count_queries(
+            Language.objects.by_code_or_alias, 'xx'
+        )
+        self.assertEqual(queries, 0)
+        self.assertEqual(language, self.language)
+        self.assertEqual(language.name, self.language.name)
+        self.assertEqual(
+            language.get_pluralrules(), self.language.get_pluralrules()
+        )
+        language, queries = self._count_queries(
+            Language.objects.by_id, self.language.id
+        )
+        self.assertEqual(queries, 0)
+        self.assertEqual(language.code, 'xx_YY')
+
+    def test_refresh_on_save(self):
+        info = registry.by_code_or_alias('xx_YY')
+        self.language.rule_few = 'n in 2..4'
+        self.language.code_aliases = 'xx-zz'
+        self.language.save()
+        new_info = registry.by_code_or_alias('xx-zz')
+        self.assertEqual(new_info.rule_numbers, (1, 3, 5))
+        self.assertRaises(
+            Language.DoesNotExist, registry.by_code_or_alias, 'xx-yy'
+        )
+        # Old snapshots are not changed.
+        self.assertEqual(info.rule_numbers, (1, 5))
+        self.language.delete()
+        self.assertRaises(
+            Language.DoesNotExist, registry.by_code_or_alias, 'xx_YY'
+        )
+
+    def test_immutable(self):
+        info = registry.by_code_or_alias('xx_YY')
+        self.assertRaises(AttributeError, setattr, info, 'code', 'zz')
+        self.assertRaises(AttributeError, setattr, info, 'other', 1)
+        self.assertRaises(AttributeError, delattr, info, 'code')
+        # Changing a language object does not change the registry.
+        language = info.language()
+        language.name = 'Changed'
+        self.assertEqual(registry.by_id(info.id).language().name,
+                         'Test language')
+
+    def test_changed_by_other_process(self):
+        registry.by_code_or_alias('xx_YY')
+        # Updates without signals, as if made by another process.
+        Language.objects.filter(id=self.language.id).update(
+            code_aliases=' xx-zz '
+        )
+        info = registry.by_code_or_alias('xx-zz')
+        self.assertEqual(info.id, self.language.id)
+        self.assertRaises(
+            Language.DoesNotExist, registry.by_code_or_alias, 'xx-yy'
+        )
+        Language.objects.filter(id=self.language.id).update(name='Changed')
+        self.assertEqual(registry.by_id(self.language.id).name,
+                         'Test language')
+        old_interval = settings.LANGUAGE_REGISTRY_CHECK_INTERVAL
+        settings.LANGUAGE_REGISTRY_CHECK_INTERVAL = 0
+        try:
+            cache.set(VERSION_KEY, 'changed')
+            self.assertEqual(registry.by_id(self.language.id).name,
+                             'Changed')
+        finally:
+            settings.LANGUAGE_REGISTRY_CHECK_INTERVAL = old_interval
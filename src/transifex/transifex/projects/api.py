@@ -450,7 +450,9 @@ class ProjectResourceHandler(BaseHandler):
                     resource.name = resource_slug or storagefile.name
                     resource.save()
                     # update i18n_type
-                    i18n_type = registry.guess_method(storagefile.get_storage_path())
+                    i18n_type = registry.guess_method(
+                        storagefile.get_storage_path(), storagefile.mime_type
+                    )
                     if not i18n_type:
                         transaction.rollback()
                         return BAD_REQUEST("File type not supported.")
@@ -469,14 +471,8 @@ class ProjectResourceHandler(BaseHandler):
                     resource.slug))
 
                 strings_added, strings_updated = 0, 0
-                fhandler = storagefile.find_parser()
-                fhandler.bind_file(filename=storagefile.get_storage_path())
-                fhandler.bind_resource(resource)
-                fhandler.set_language(storagefile.language)
-
                 try:
-                    fhandler.is_content_valid()
-                    fhandler.parse_file(True)
+                    fhandler = storagefile.get_parser(resource, is_source=True)
                     strings_added, strings_updated = fhandler.save2db(True,
                         user=request.user)
                 except Exception, e:
@@ -545,15 +541,8 @@ class ProjectResourceHandler(BaseHandler):
                     resource.slug))
 
                 strings_added, strings_updated = 0, 0
-                fhandler = storagefile.find_parser()
-                language = storagefile.language
-                fhandler.bind_file(filename=storagefile.get_storage_path())
-                fhandler.set_language(language)
-                fhandler.bind_resource(resource)
-                fhandler.is_content_valid()
-
                 try:
-                    fhandler.parse_file()
+                    fhandler = storagefile.get_parser(resource)
                     strings_added, strings_updated = fhandler.save2db(
                         user=request.user)
                 except Exception, e:
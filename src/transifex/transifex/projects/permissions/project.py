@@ -1,11 +1,12 @@
 # -*- coding: utf-8 -*-
-from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils.translation import ugettext_lazy as _
 
 import authority
 from authority.permissions import BasePermission
 from transifex.projects.models import Project
+from transifex.projects.permissions.roles import get_user_roles, \
+        COORDINATOR, REVIEWER, MEMBER
 from transifex.teams.models import Team
 from transifex.txcommon.log import logger
 
@@ -33,13 +34,23 @@ def _check_outsource_project(obj):
     return (project, team, outsourced_project)
 
 class ProjectPermission(BasePermission):
+    """
+    The permissions of a user on the projects.
+
+    The checks look up the roles of the user (see ``roles.get_user_roles``),
+    which are loaded once per request.
+    """
 
     label = 'project_perm'
     checks = ('maintain', 'coordinate_team', 'proofread', 'submit_translations')
 
+    @property
+    def roles(self):
+        return get_user_roles(self.user)
+
     def maintain(self, project=None):
         if project:
-            if project.maintainers.filter(id=self.user.id):
+            if self.roles.maintains(project):
                 return True
         return False
     maintain.short_description=_('Is allowed to maintain this project')
@@ -50,9 +61,8 @@ class ProjectPermission(BasePermission):
             if self.maintain(project):
                 return True
             if language:
-                team = Team.objects.get_or_none(project, language.code)
                 #Coordinator
-                if team and self.user in team.coordinators.all():
+                if COORDINATOR in self.roles.language_roles(project, language):
                     return True
         return False
     coordinate_team.short_description = _("Is allowed to coordinate a "
@@ -65,10 +75,9 @@ class ProjectPermission(BasePermission):
                 return True
 
             if language:
-                team = Team.objects.get_or_none(project, language.code)
-                if team:
-                    if self.user in team.reviewers.all() or self.user in team.coordinators.all():
-                        return True
+                roles = self.roles.language_roles(project, language)
+                if REVIEWER in roles or COORDINATOR in roles:
+                    return True
         return False
     proofread.short_description = _("Is allowed to review translations for "
         "a team project")
@@ -104,20 +113,16 @@ class ProjectPermission(BasePermission):
                 if self.maintain(project) and not outsourced_project:
                     return True
                 #Writers
-                perm = '%s.submit_translations' % self.label
-                if self.has_perm(perm, project):
+                if self.roles.writes(project):
                     return True
                 if team:
                     # Coordinators or members
-                    if self.user in team.coordinators.all() or \
-                        self.user in team.members.all() or \
-                        self.user in team.reviewers.all():
+                    roles = self.roles.team_roles(team)
+                    if COORDINATOR in roles or MEMBER in roles or \
+                        REVIEWER in roles:
                         return True
                 if any_team and not team:
-                    user_teams = project.team_set.filter(
-                        Q(coordinators=self.user)|
-                        Q(members=self.user)).distinct()
-                    if user_teams:
+                    if self.roles.in_any_team(project):
                         return True
         return False
     submit_translations.short_description = _("Is allowed to submit "
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+The roles of a user in the projects and their teams.
+
+Permission checks used to query the maintainers and the members of the
+teams for every check. The roles of a user are now loaded the first time
+they are needed, with two queries, and kept on the user object. Since a
+new user object is created for every request, the roles are kept for the
+duration of the request::
+
+    roles = get_user_roles(request.user)
+    roles.maintains(project)
+
+Any change of the maintainers, the teams, their members or the permissions
+makes the roles of all users be loaded again, the next time they are used.
+"""
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from authority.models import Permission
+from transifex.projects.models import Project
+from transifex.teams.models import Team
+
+MAINTAINER = 'maintainer'
+COORDINATOR = 'coordinator'
+REVIEWER = 'reviewer'
+MEMBER = 'member'
+
+SUBMIT_TRANSLATIONS_PERM = 'project_perm.submit_translations'
+
+_generation = [0]
+
+
+def _roles_sql():
+    """Return the query of the maintainer and team roles of a user.
+
+    Each row has the role, the project id, the team id and the language id.
+    """
+    qn = connection.ops.quote_name
+    maintainers = Project._meta.get_field('maintainers')
+    parts = ["SELECT '%s', %s, NULL, NULL FROM %s WHERE %s = %%s" % (
+        MAINTAINER, qn(maintainers.m2m_column_name()),
+        qn(maintainers.m2m_db_table()), qn(maintainers.m2m_reverse_name())
+    )]
+    team_pk = Team._meta.pk.column
+    team_project = Team._meta.get_field('project').column
+    team_language = Team._meta.get_field('language').column
+    for role, name in ((COORDINATOR, 'coordinators'),
+                       (REVIEWER, 'reviewers'), (MEMBER, 'members')):
+        field = Team._meta.get_field(name)
+        parts.append(
+            "SELECT '%s', t.%s, t.%s, t.%s FROM %s t INNER JOIN %s m "
+            "ON m.%s = t.%s WHERE m.%s = %%s" % (
+                role, qn(team_project), qn(team_pk), qn(team_language),
+                qn(Team._meta.db_table), qn(field.m2m_db_table()),
+                qn(field.m2m_column_name()), qn(team_pk),
+                qn(field.m2m_reverse_name()),
+            )
+        )
+    return ' UNION ALL '.join(parts), len(parts)
+
+
+class UserRoles(object):
+    """The roles of a user in all projects and teams."""
+
+    def __init__(self, user=None):
+        self.generation = _generation[0]
+        self.user = user
+        self._maintains = set()
+        self._writes = set()
+        # Team id to roles
+        self._team_roles = {}
+        # (project id, language id) to team id
+        self._teams = {}
+        # Projects with a team the user coordinates or is a member of
+        self._team_projects = set()
+        if user is not None and user.is_authenticated():
+            self._load()
+
+    def _load(self):
+        sql, parts = _roles_sql()
+        cursor = connection.cursor()
+        cursor.execute(sql, [self.user.id] * parts)
+        for role, project_id, team_id, language_id in cursor.fetchall():
+            if role == MAINTAINER:
+                self._maintains.add(project_id)
+                continue
+            self._team_roles.setdefault(team_id, set()).add(role)
+            self._teams[(project_id, language_id)] = team_id
+            if role != REVIEWER:
+                self._team_projects.add(project_id)
+
+        if self.user.is_active:
+            self._writes = set(int(id) for id in Permission.objects.filter(
+                Q(user=self.user) | Q(group__in=self.user.groups.all()),
+                codename=SUBMIT_TRANSLATIONS_PERM, approved=True,
+                content_type=ContentType.objects.get_for_model(Project),
+            ).values_list('object_id', flat=True))
+
+    def maintains(self, project):
+        """Whether the user is a maintainer of the project."""
+        return project.id in self._maintains
+
+    def writes(self, project):
+        """Whether the user has been given the submit permission to the
+        project, or is a superuser.
+        """
+        if self.user is None:
+            return False
+        if self.user.is_superuser:
+            return True
+        return self.user.is_active and project.id in self._writes
+
+    def team_roles(self, team):
+        """Return the roles of the user in the team."""
+        return self._team_roles.get(team.id, ())
+
+    def language_roles(self, project, language):
+        """Return the roles of the user in the team of the language.
+
+        As in ``Team.objects.get_or_none``, the team is looked up in the
+        project the teams are outsourced to, if any.
+        """
+        project_id = project.outsource_id or project.id
+        team_id = self._teams.get((project_id, language.id))
+        return self._team_roles.get(team_id, ())
+
+    def in_any_team(self, project):
+        """Whether the user coordinates or is a member of a team of the
+        project.
+        """
+        return project.id in self._team_projects
+
+
+def get_user_roles(user):
+    """Return the roles of the user, loading them on first use."""
+    if user is None:
+        return UserRoles()
+    roles = getattr(user, '_project_roles', None)
+    if roles is None or roles.generation != _generation[0]:
+        roles = UserRoles(user)
+        user._project_roles = roles
+    return roles
+
+
+def invalidate_roles(sender, **kwargs):
+    """Load the roles of all users again, the next time they are used."""
+    _generation[0] += 1
+
+
+for _field in ('coordinators', 'members', 'reviewers'):
+    m2m_changed.connect(
+        invalidate_roles, sender=getattr(Team, _field).through
+    )
+m2m_changed.connect(invalidate_roles, sender=Project.maintainers.through)
+m2m_changed.connect(invalidate_roles, sender=User.groups.through)
+for _model in (Team, Permission):
+    post_save.connect(invalidate_roles, sender=_model)
+    post_delete.connect(invalidate_roles, sender=_model)
@@ -4,3 +4,4 @@ from views import *
 from view_permission_access import *
 from private_projects import *
 from api import *
+from roles import *
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.db import connection
+from transifex.projects.permissions.project import ProjectPermission
+from transifex.txcommon.tests.base import BaseTestCase
+
+
+class UserRolesTests(BaseTestCase):
+    """Test that the permission checks use the roles loaded once."""
+
+    def _count_queries(self, func, *args):
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            result = func(*args)
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        return result, connection.queries[start:]
+
+    def _checks(self, user):
+        check = ProjectPermission(user)
+        return [
+            check.maintain(self.project),
+            check.coordinate_team(self.project, self.language),
+            check.proofread(self.project, self.language),
+            check.submit_translations(self.project),
+            check.submit_translations(self.team),
+            check.submit_translations(self.project, any_team=True),
+            check.private(self.project_private),
+        ]
+
+    def test_checks(self):
+        expected = {
+            'registered': [False] * 7,
+            'maintainer': [True] * 7,
+            'writer': [False, False, False, True, True, True, False],
+            'team_coordinator': [False, True, True, False, True, True, True],
+            'team_member': [False, False, False, False, True, True, True],
+        }
+        for nick, results in expected.iteritems():
+            self.assertEqual(self._checks(self.user[nick]), results, nick)
+
+    def test_queries(self):
+        for nick in ('registered', 'maintainer', 'team_member'):
+            user = User.objects.get(username=nick)
+            results, queries = self._count_queries(self._checks, user)
+            self.assertTrue(len(queries) <= 2, nick)
+            results, queries = self._count_queries(self._checks, user)
+            self.assertEqual(len(queries), 0)
+
+    def test_invalidation(self):
+        user = self.user['registered']
+        self.assertFalse(ProjectPermission(user).submit_translations(self.team))
+        self.team.reviewers.add(user)
+        self.assertTrue(ProjectPermission(user).submit_translations(self.team))
+        self.assertTrue(ProjectPermission(user).proofread(
+            self.project, self.language
+        ))
+        self.team.reviewers.remove(user)
+        self.assertFalse(ProjectPermission(user).submit_translations(self.team))
+        self.project.maintainers.add(user)
+        self.assertTrue(ProjectPermission(user).maintain(self.project))
+
+    def test_pages(self):
+        """The membership of the user is queried once per page."""
+        for url in (self.urls['project'], self.urls['team']):
+            for nick in ('maintainer', 'team_coordinator', 'team_member'):
+                resp, queries = self._count_queries(
+                    self.client[nick].get, url
+                )
+                self.assertEqual(resp.status_code, 200)
+                roles_queries = [
+                    q for q in queries if 'UNION ALL' in q['sql']
+                ]
+                self.assertTrue(len(roles_queries) <= 1, (url, nick))
+                permission_queries = [
+                    q for q in queries if 'authority_permission' in q['sql']
+                    and 'submit_translations' in q['sql']
+                ]
+                self.assertTrue(len(permission_queries) <= 1, (url, nick))
@@ -5,12 +5,14 @@ import urllib
 from itertools import ifilter
 from django.db import transaction, IntegrityError, DatabaseError
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
 from django.core.urlresolvers import reverse
 from django.template.defaultfilters import slugify
 from django.contrib.auth.models import User
 from django.utils import simplejson
 from django.utils.encoding import smart_unicode
+from django.utils.hashcompat import md5_constructor
+from django.utils.http import quote_etag
 from django.utils.translation import ugettext_lazy as _
 
 from piston.handler import BaseHandler, AnonymousBaseHandler
@@ -34,10 +36,16 @@ from transifex.resources.backends import ResourceBackend, FormatsBackend, \
         filename_of_uploaded_file
 from transifex.resources.formats.registry import registry
 from transifex.resources.formats.core import ParseError
+from transifex.resources.formats.parse_cache import is_parsed, \
+        parse_file_cached
 from transifex.resources.formats.pseudo import get_pseudo_class
+from transifex.resources.formats.validators import validate_translations
 from transifex.teams.models import Team
 
-from transifex.resources.handlers import invalidate_stats_cache
+from transifex.resources.translations import clone_translations, \
+        delete_translations
+from transifex.resources.compiled import compiled_file_response, \
+        get_compiled_file, request_etags
 
 from transifex.api.utils import BAD_REQUEST
 
@@ -498,15 +506,14 @@ class FileHandler(BaseHandler):
             return BAD_REQUEST("%s" % e )
 
         try:
-            fb = FormatsBackend(resource, language)
-            template = fb.compile_translation(None)
+            response = compiled_file_response(
+                request, resource, language,
+                mimetype=registry.mimetypes_for(resource.i18n_method)[0]
+            )
         except Exception, e:
             logger.error(unicode(e), exc_info=True)
             return BAD_REQUEST("Error compiling the translation file: %s" %e )
 
-        response = HttpResponse(
-            template, mimetype=registry.mimetypes_for(resource.i18n_method)[0]
-        )
         response['Content-Disposition'] = (
             'attachment; filename*="UTF-8\'\'%s_%s%s"' % (
                 urllib.quote(resource.name.encode('UTF-8')), language.code,
@@ -768,11 +775,7 @@ class Translation(object):
         Delete all Translation objects that belong to the specified resource
         and are in the specified language.
         """
-        TranslationModel.objects.filter(
-            resource=self.resource,
-            language=self.language
-        ).delete()
-        invalidate_stats_cache(
+        delete_translations(
             self.resource, self.language, user=self.request.user
         )
 
@@ -784,20 +787,24 @@ class Translation(object):
         """
         raise NotImplementedError
 
-    def _parse_translation(self, parser):
+    def _is_source(self):
+        return self.resource.source_language == self.language
+
+    def _parse_translation(self, parser, content_hash=None):
         """
         Parses a source/translation file.
 
         We assume the content has been checked for validity
-        by now.
+        by now. The result of parsing a content with the same
+        ``content_hash`` is reused, if it is cached.
         """
         strings_added, strings_updated = 0, 0
         parser.bind_resource(self.resource)
         parser.set_language(self.language)
 
-        is_source = self.resource.source_language == self.language
+        is_source = self._is_source()
         try:
-            parser.parse_file(is_source)
+            parse_file_cached(parser, content_hash, is_source)
             strings_added, strings_updated = parser.save2db(
                 is_source, user=self.request.user
             )
@@ -817,6 +824,9 @@ class Translation(object):
                 args=[self.resource.project.slug, self.resource.slug]
             )
         }
+        if parser.qa_report is not None:
+            retval['qa_errors'] = len(parser.qa_report.errors)
+            retval['qa_warnings'] = len(parser.qa_report.warnings)
         logger.debug("Extraction successful, returning: %s" % retval)
 
         # If any string added/updated
@@ -837,13 +847,20 @@ class FileTranslation(Translation):
     Handle requests for translation as files.
     """
 
+    etag = None
+
     @classmethod
     def to_http_for_get(cls, translation, result):
-        response = HttpResponse(
-            result, mimetype=registry.mimetypes_for(
-                translation.resource.i18n_method
-            )[0]
-        )
+        if result is None:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                result, mimetype=registry.mimetypes_for(
+                    translation.resource.i18n_method
+                )[0]
+            )
+        if translation.etag is not None:
+            response['ETag'] = quote_etag(translation.etag)
         response['Content-Disposition'] = (
             'attachment; filename*="UTF-8\'\'%s_%s%s"' % (
                 urllib.quote(translation.resource.name.encode('UTF-8')),
@@ -859,15 +876,21 @@ class FileTranslation(Translation):
         """
         Return the requested translation as a file.
 
+        The ETag of the file is kept in ``self.etag``.
+
         Returns:
-            The compiled template.
+            The compiled template or None, if the client already has the
+            current file.
 
         Raises:
             BadRequestError: There was a problem with the request.
         """
         try:
-            fb = FormatsBackend(self.resource, self.language)
-            return fb.compile_translation(pseudo_type)
+            self.etag, content = get_compiled_file(
+                self.resource, self.language, pseudo_type,
+                request_etags(self.request)
+            )
+            return content
         except Exception, e:
             logger.error(unicode(e), exc_info=True)
             raise BadRequestError("Error compiling the translation file: %s" %e )
@@ -896,32 +919,36 @@ class FileTranslation(Translation):
                 suffix=name[name.rfind('.'):],
                 delete=False
             )
+            md5 = md5_constructor()
             for chunk in submitted_file.chunks():
+                md5.update(chunk)
                 file_.write(chunk)
             file_.close()
+            content_hash = md5.hexdigest()
 
             parser = registry.appropriate_handler(
                 self.resource,
                 language=self.language,
                 filename=name
             )
-            parser.bind_file(file_.name)
             if parser is None:
                 raise BadRequestError("Unknown file type")
             if size == 0:
                 raise BadRequestError("Empty file")
-
-            try:
-                parser.is_content_valid()
-                logger.debug("Uploaded file %s" % file_.name)
-            except (FileCheckError, ParseError), e:
-                raise BadRequestError("Error uploading file: %s" % e)
-            except Exception, e:
-                logger.error(unicode(e), exc_info=True)
-                raise BadRequestError("A strange error happened.")
-
             parser.bind_file(file_.name)
-            res = self._parse_translation(parser)
+
+            # A content found in the cache has been checked already
+            if not is_parsed(parser, content_hash, self._is_source()):
+                try:
+                    parser.is_content_valid()
+                    logger.debug("Uploaded file %s" % file_.name)
+                except (FileCheckError, ParseError), e:
+                    raise BadRequestError("Error uploading file: %s" % e)
+                except Exception, e:
+                    logger.error(unicode(e), exc_info=True)
+                    raise BadRequestError("A strange error happened.")
+
+            res = self._parse_translation(parser, content_hash)
         finally:
             os.unlink(file_.name)
         return res
@@ -1000,12 +1027,132 @@ class StringTranslation(Translation):
                 logger.error(unicode(e), exc_info=True)
                 raise BadRequestError("A strange error has happened.")
 
-            parser.bind_file(file_.name)
             res = self._parse_translation(parser)
         finally:
             os.unlink(file_.name)
         return res
 
+class CloneHandler(BaseHandler):
+    """
+    Copy the translations of a resource from one language to another.
+
+    The translations that already exist in the target language are kept.
+    """
+    allowed_methods = ('POST', )
+
+    @throttle(settings.API_MAX_REQUESTS, settings.API_THROTTLE_INTERVAL)
+    @method_decorator(one_perm_required_or_403(
+            pr_project_private_perm,
+            (Project, 'slug__exact', 'project_slug')
+    ))
+    def create(self, request, project_slug, resource_slug, source_lang_code,
+               target_lang_code, api_version=2):
+        try:
+            resource = Resource.objects.get(
+                slug=resource_slug, project__slug=project_slug
+            )
+        except Resource.DoesNotExist:
+            return rc.NOT_FOUND
+        try:
+            source_language = Language.objects.by_code_or_alias(
+                source_lang_code
+            )
+            target_language = Language.objects.by_code_or_alias(
+                target_lang_code
+            )
+        except Language.DoesNotExist:
+            return rc.NOT_FOUND
+
+        team = Team.objects.get_or_none(resource.project, target_lang_code)
+        check = ProjectPermission(request.user)
+        if (not check.submit_translations(team or resource.project) or\
+            not resource.accept_translations) and not\
+                check.maintain(resource.project):
+            return rc.FORBIDDEN
+        if target_language == resource.source_language:
+            return BAD_REQUEST(
+                "You cannot clone translations to the source language."
+            )
+
+        added = clone_translations(
+            resource, source_language, target_language, user=request.user
+        )
+        return {'strings_added': added}
+
+
+class QAHandler(BaseHandler):
+    """
+    Report the errors and warnings of the validators for the translations
+    of a resource.
+    """
+    allowed_methods = ('GET', )
+
+    @throttle(settings.API_MAX_REQUESTS, settings.API_THROTTLE_INTERVAL)
+    @method_decorator(one_perm_required_or_403(
+            pr_project_private_perm,
+            (Project, 'slug__exact', 'project_slug')
+    ))
+    def read(self, request, project_slug, resource_slug, lang_code,
+             api_version=2):
+        try:
+            resource = Resource.objects.get(
+                slug=resource_slug, project__slug=project_slug
+            )
+        except Resource.DoesNotExist:
+            return rc.NOT_FOUND
+        try:
+            language = Language.objects.by_code_or_alias(lang_code)
+        except Language.DoesNotExist:
+            return rc.NOT_FOUND
+
+        entities = dict(
+            (se_id, (string, context)) for se_id, string, context in
+            SourceEntity.objects.filter(resource=resource).values_list(
+                'id', 'string', 'context'
+            ).iterator()
+        )
+        report = validate_translations(
+            resource.i18n_method, resource.source_language, language,
+            self._strings(resource, language)
+        )
+
+        def issues(results):
+            return [{
+                'source_entity': entities[se_id][0],
+                'context': entities[se_id][1],
+                'rule': rule,
+                'message': message,
+            } for se_id, rule, message in results]
+
+        return {
+            'checked': report.checked,
+            'errors': issues(report.errors),
+            'warnings': issues(report.warnings),
+        }
+
+    def _strings(self, resource, language):
+        """Yield the source entity id, the rule, the source string and the
+        translation of each translation of the resource in the language.
+        """
+        sources = {}
+        qs = TranslationModel.objects.filter(
+            resource=resource, language=resource.source_language
+        ).values_list('source_entity', 'rule', 'string').iterator()
+        for se_id, rule, string in qs:
+            sources[(se_id, rule)] = string
+        if language == resource.source_language:
+            return
+        qs = TranslationModel.objects.filter(
+            resource=resource, language=language
+        ).values_list('source_entity', 'rule', 'string').iterator()
+        for se_id, rule, string in qs:
+            # The language may have more plural forms than the source
+            # language.
+            source = sources.get((se_id, rule), sources.get((se_id, 5)))
+            if source is not None:
+                yield se_id, rule, source, string
+
+
 class FormatsHandler(BaseHandler):
     """
     Formats Handler for READ operation.
@@ -6,7 +6,7 @@ Various backend commands for resource models.
 These are used by views and the API.
 """
 
-from itertools import ifilter
+from itertools import ifilter, chain
 from django.utils.translation import ugettext as _
 from django.db import IntegrityError, DatabaseError
 from transifex.txcommon.log import logger
@@ -201,6 +201,28 @@ class FormatsBackend(object):
         handler.compile()
         return handler.compiled_template or ''
 
+    def compile_translation_iter(self, pseudo_type=None):
+        """Compile the translation for a resource in a specified language
+        as an iterator of chunks of the file.
+
+        Suitable for an HttpResponse, so that big files are not kept in
+        memory. The first chunk is compiled right away, so that most errors
+        are raised here instead of while the response is being sent.
+        """
+        handler = registry.appropriate_handler(
+            resource=self.resource, language=self.language
+        )
+        handler.bind_resource(self.resource)
+        handler.set_language(self.language)
+        if pseudo_type:
+            handler.bind_pseudo_type(pseudo_type)
+        chunks = handler.compile_iter()
+        try:
+            first = chunks.next()
+        except StopIteration:
+            return iter([''])
+        return chain([first], chunks)
+
 
 def content_from_uploaded_file(files, encoding='UTF-8'):
     """Get the content of an uploaded file.
@@ -0,0 +1,575 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the resources application.
+
+Run them with ``./manage.py txbenchmark``.
+"""
+
+import re
+import sys
+import xml.dom.minidom
+from django.conf import settings
+from django.core import management
+from django.core.cache import get_cache
+from django.utils.hashcompat import md5_constructor
+from django.utils.http import urlquote
+from transifex.txcommon import import_to_python
+from transifex.txcommon.benchmarks import register
+from transifex.languages.models import Language
+from transifex.projects.models import Project
+from transifex.releases.models import Release
+from transifex.resources.models import Resource, SourceEntity, \
+        Translation, Template, RLStats
+from transifex.resources import handlers, utils
+from transifex.resources.formats.core import Handler
+from transifex.resources.formats.utils.hash_tag import hash_tag
+from transifex.resources.formats.joomla import JoomlaINIHandler
+from transifex.resources.formats.pofile import POHandler
+from transifex.resources.formats.qt import LinguistHandler, \
+        _getElementByTagName, _getText
+from transifex.resources.formats.xliff import XliffHandler
+from transifex.resources.formats.validators import ValidationError, \
+        validate_translations
+
+
+def _po_template(size):
+    """Create a PO template with ``size`` strings.
+
+    Returns a tuple of the template and the dictionary of translations
+    for the placeholders in it.
+    """
+    entries = []
+    translations = {}
+    for n in xrange(size):
+        source = u"Source string number %s with \"quotes\"" % n
+        placeholder = "%s_tr" % hash_tag(source, "")
+        entries.append(u'#: src/file.c:%s\nmsgid "%s"\nmsgstr "%s"\n' % (
+            n, source.replace('"', '\\"'), placeholder
+        ))
+        translations[placeholder] = u"Translation number %s\n" % n
+    return u'\n'.join(entries), translations
+
+
+def _compile_per_string(handler, translations, content):
+    """Apply the translations with one search-and-replace per string."""
+    for placeholder, trans in translations.iteritems():
+        content = handler._replace_translation(placeholder, trans, content)
+    return content
+
+
+@register('compile', "Apply translations to PO templates of various sizes")
+def compile_template(run, sizes=(1000, 5000, 20000), legacy_limit=5000):
+    handler = POHandler()
+    for size in sizes:
+        content, translations = _po_template(size)
+        new = run.time(
+            "single pass (%s strings)" % size,
+            handler._apply_translations, translations, content
+        )
+        if size > legacy_limit:
+            continue
+        old = run.time(
+            "per string (%s strings)" % size,
+            _compile_per_string, handler, translations, content
+        )
+        assert old == new
+
+
+def _create_resource(slug, i18n_type='INI'):
+    """Create a resource in a benchmark project."""
+    if not Language.objects.exists():
+        management.call_command('txlanguages', verbosity=0)
+    language = Language.objects.by_code_or_alias('en')
+    project, created = Project.objects.get_or_create(
+        slug='benchmarks', defaults={
+            'name': 'Benchmarks', 'source_language': language,
+        }
+    )
+    return Resource.objects.create(
+        slug=slug, name=slug, project=project, i18n_type=i18n_type,
+        source_language=language
+    )
+
+
+def _ini_content(size, value=u"value"):
+    """Create the content of an INI file with ``size`` strings."""
+    return u';1.6\n' + u''.join(
+        u'KEY%s="%s %s of the file"\n' % (n, value, n) for n in xrange(size)
+    )
+
+
+def _parse(resource, content, is_source=True, language=None):
+    """Return a handler with the content parsed."""
+    handler = JoomlaINIHandler()
+    handler.bind_content(content)
+    handler.bind_resource(resource)
+    handler.set_language(language or resource.source_language)
+    handler.parse_file(is_source=is_source)
+    return handler
+
+
+@register('save2db', "Import a synthetic resource with and without bulk queries")
+def save_resource(run, size=50000):
+    old_bulk_import = settings.BULK_IMPORT
+    try:
+        for bulk in (False, True):
+            settings.BULK_IMPORT = bulk
+            mode = bulk and "bulk" or "per string"
+            resource = _create_resource('save2db-%s' % mode.replace(' ', '-'))
+            language = Language.objects.by_code_or_alias('el')
+            handler = _parse(resource, _ini_content(size))
+            run.time("%s: new source" % mode, handler.save2db, True)
+            handler = _parse(resource, _ini_content(size, u"new value"))
+            run.time("%s: updated source" % mode, handler.save2db, True)
+            handler = _parse(
+                resource, _ini_content(size, u"translation"), False, language
+            )
+            run.time("%s: new translation" % mode, handler.save2db, False)
+    finally:
+        settings.BULK_IMPORT = old_bulk_import
+
+
+class _DOMLinguistHandler(LinguistHandler):
+    """The Qt handler with the plurals added through a DOM, one query per
+    numerus message.
+    """
+
+    def _post_compile(self, language=None):
+        if language is None:
+            language = self.language
+        doc = xml.dom.minidom.parseString(self.compiled_template)
+        doc.documentElement.attributes["language"] = language.code
+        for message in doc.getElementsByTagName("message"):
+            translation = _getElementByTagName(message, "translation")
+            if message.getAttribute('numerus') != 'yes':
+                if not translation.childNodes:
+                    translation.attributes['type'] = 'unfinished'
+                continue
+            source = _getElementByTagName(message, "source")
+            translation.childNodes = []
+            plurals = Translation.objects.filter(
+                resource=self.resource, language=language,
+                source_entity__string=_getText(source.childNodes),
+                source_entity__context=self._context_of_message(message)
+            ).order_by('rule')
+            plural_keys = {}
+            for p, n in enumerate(language.get_pluralrules_numbers()):
+                plural_keys[p] = ""
+            for p, n in enumerate(plurals):
+                plural_keys[p] = n.string
+            for key in plural_keys.iterkeys():
+                e = doc.createElement("numerusform")
+                e.appendChild(doc.createTextNode(plural_keys[key]))
+                translation.appendChild(e)
+                if not plural_keys[key]:
+                    translation.attributes['type'] = 'unfinished'
+        self.compiled_template = doc.toxml()
+
+
+def _ts_content(size, language):
+    """Create the content of a TS file with ``size`` numerus messages."""
+    messages = []
+    forms = u''.join(
+        u'<numerusform>%s form %s of %%n files</numerusform>' % (
+            language, rule
+        ) for rule in xrange(2)
+    )
+    for n in xrange(size):
+        messages.append(
+            u'<message numerus="yes"><source>%%n files number %s</source>'
+            u'<translation>%s</translation></message>' % (n, forms)
+        )
+    return (
+        u'<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE TS>\n'
+        u'<TS version="2.0" language="%s"><context><name>Benchmark</name>'
+        u'%s</context></TS>\n' % (language, u'\n'.join(messages))
+    )
+
+
+def _numerusforms(content):
+    return re.findall(r'<numerusform>(.*?)</numerusform>', content)
+
+
+@register('qt', "Compile a Qt file with thousands of numerus messages")
+def compile_qt(run, size=5000):
+    resource = _create_resource('qt-plurals', 'QT')
+    language = Language.objects.by_code_or_alias('el')
+    for code, is_source in (('en', True), ('el', False)):
+        handler = LinguistHandler()
+        handler.bind_content(_ts_content(size, code))
+        handler.bind_resource(resource)
+        handler.set_language(is_source and resource.source_language or language)
+        handler.parse_file(is_source=is_source)
+        handler.save2db(is_source=is_source)
+    results = []
+    for name, klass in (("stream", LinguistHandler),
+                        ("dom", _DOMLinguistHandler)):
+        handler = klass()
+        handler.bind_resource(resource)
+        handler.set_language(language)
+        run.time("%s (%s numerus messages)" % (name, size), handler.compile)
+        results.append(_numerusforms(handler.compiled_template))
+    assert results[0] == results[1]
+
+
+class _DOMXliffHandler(XliffHandler):
+    """The XLIFF handler with a query per string for its plural flag, a
+    search-and-replace over the whole template per string and the plurals
+    and the targets handled in a DOM.
+    """
+
+    def _examine_content(self, content):
+        """Modify template content to handle plural data in target language"""
+        if isinstance(content, unicode):
+            content = content.encode('utf-8')
+        doc = xml.dom.minidom.parseString(content)
+        root = doc.documentElement
+        rules = self.language.get_pluralrules_numbers()
+        plurals = SourceEntity.objects.filter(resource = self.resource, pluralized=True)
+        if self.language != self.resource.source_language and plurals:
+            for entity in plurals:
+                match = False
+                for group_node in root.getElementsByTagName("group"):
+                    if group_node.attributes['restype'].value == "x-gettext-plurals":
+                        trans_unit_nodes = group_node.getElementsByTagName("trans-unit")
+                        if self.getElementByTagName(trans_unit_nodes[0], "source").firstChild.data == entity.string_hash:
+                            match = True
+                            break
+                if not match:
+                    continue
+            for count,rule in enumerate(rules):
+                if rule == 0:
+                    clone = trans_unit_nodes[1].cloneNode(deep=True)
+                    target = self.getElementByTagName(clone, "target")
+                    target.firstChild.data = target.firstChild.data[:-1] + '0'
+                    clone.setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
+                    indent_node = trans_unit_nodes[0].previousSibling.cloneNode(deep=True)
+                    group_node.insertBefore(indent_node, trans_unit_nodes[0].previousSibling)
+                    group_node.insertBefore(clone, trans_unit_nodes[0].previousSibling)
+                if rule == 1:
+                    trans_unit_nodes[0].setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
+                if rule in range(2, 5):
+                    clone = trans_unit_nodes[1].cloneNode(deep=True)
+                    target = self.getElementByTagName(clone, "target")
+                    target.firstChild.data = target.firstChild.data[:-1] + '%d'%rule
+                    clone.setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
+                    indent_node = trans_unit_nodes[1].previousSibling.cloneNode(deep=True)
+                    group_node.insertBefore(indent_node, trans_unit_nodes[1].previousSibling)
+                    group_node.insertBefore(clone, trans_unit_nodes[1].previousSibling)
+                if rule == 5:
+                    trans_unit_nodes[1].setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
+        content = doc.toxml()
+        return content
+
+    def _get_translation_strings(self, source_entities, language):
+        """Modified to include a new field for translation rule"""
+        res = {}
+        translations = Translation.objects.filter(
+            source_entity__in=source_entities, language=language
+        ).values_list('source_entity_id', 'string', 'rule') .iterator()
+        for t in translations:
+            if res.has_key(t[0]):
+                if type(res[t[0]]) == type([]):
+                    res[t[0]].append(t[1:])
+                else:
+                    res[t[0]] = [res[t[0]]]
+                    res[t[0]].append(t[1:])
+            else:
+                res[t[0]] = t[1:]
+        return res
+
+    def _post_compile(self, *args, **kwargs):
+        doc = xml.dom.minidom.parseString(self.compiled_template)
+        root = doc.documentElement
+        for node in root.getElementsByTagName("target"):
+            value = ""
+            for child in node.childNodes:
+                value += child.toxml()
+            if not value.strip() or self.language == self.resource.source_language:
+                parent = node.parentNode
+                parent.removeChild(node.previousSibling)
+                parent.removeChild(node)
+        self.compiled_template = doc.toxml()
+
+    def _compile(self, content, language):
+        stringset = self._get_source_strings(self.resource)
+        translations = self._get_translation_strings(
+            (s[0] for s in stringset), language
+        )
+
+        for string in stringset:
+            trans = translations.get(string[0], u"")
+            if SourceEntity.objects.get(id__exact=string[0]).pluralized:
+                if type(trans) == type([]):
+                    plural_trans = trans
+                else:
+                    plural_trans = []
+                    for i in self.language.get_pluralrules_numbers():
+                        plural_trans.append((u"", i))
+                for i in plural_trans:
+                    rule = str(i[1])
+                    trans = i[0]
+                    if SourceEntity.objects.get(id__exact=string[0]).pluralized:
+                        content = self._replace_translation(
+                            "%s_pl_%s"%(string[1].encode('utf-8'), rule),
+                            trans or "",
+                            content)
+            else:
+                if trans:
+                    trans = trans[0]
+                content = self._replace_translation(
+                    "%s_tr" % string[1].encode('utf-8'),
+                    trans or "",
+                    content
+                )
+
+        return content
+
+    def compile(self, language=None):
+        return Handler.compile(self, language)
+
+
+def _xliff_content(size, language=None):
+    """Create the content of an XLIFF file with ``size`` trans-units, one
+    in ten of them in plural groups.
+
+    Without a language, the file is a source file. Else, it has a
+    translation for each string and plural rule of the language.
+    """
+    rules = language and language.get_pluralrules_numbers() or [1, 5]
+    units = []
+    for n in xrange(size):
+        if n % 10:
+            target = language and (
+                u'\n        <target>%s string %s</target>' % (
+                    language.code, n
+                )
+            ) or u''
+            units.append(
+                u'      <trans-unit id="unit:%s">\n'
+                u'        <source>String number %s</source>%s\n'
+                u'      </trans-unit>' % (n, n, target)
+            )
+            continue
+        plurals = []
+        for count, rule in enumerate(rules):
+            target = language and (
+                u'\n          <target>%s form %s of %s</target>' % (
+                    language.code, rule, n
+                )
+            ) or u''
+            plurals.append(
+                u'        <trans-unit id="unit:%s[%s]">\n'
+                u'          <source>%s %s</source>%s\n'
+                u'        </trans-unit>' % (
+                    n, count, rule == 1 and u"One file" or u"Many files",
+                    n, target
+                )
+            )
+        units.append(
+            u'      <group id="unit:%s" restype="x-gettext-plurals">\n'
+            u'%s\n      </group>' % (n, u'\n'.join(plurals))
+        )
+    return (
+        u'<?xml version="1.0" ?><xliff version="1.2" '
+        u'xmlns="urn:oasis:names:tc:xliff:document:1.2">\n'
+        u'  <file datatype="po" original="benchmark.pot" '
+        u'source-language="en">\n    <body>\n%s\n    </body>\n'
+        u'  </file>\n</xliff>\n' % u'\n'.join(units)
+    )
+
+
+@register('xliff', "Compile XLIFF files with tens of thousands of trans-units")
+def compile_xliff(run, sizes=(2000, 20000, 50000), legacy_limit=2000):
+    for size in sizes:
+        resource = _create_resource('xliff-%s' % size, 'XLIFF')
+        language = Language.objects.by_code_or_alias('ar')
+        for target, is_source in ((None, True), (language, False)):
+            handler = XliffHandler()
+            handler.bind_content(_xliff_content(size, target))
+            handler.bind_resource(resource)
+            handler.set_language(target or resource.source_language)
+            handler.parse_file(is_source=is_source)
+            handler.save2db(is_source=is_source)
+        for name, klass in (("single pass", XliffHandler),
+                            ("dom", _DOMXliffHandler)):
+            if klass is _DOMXliffHandler and size > legacy_limit:
+                continue
+            handler = klass()
+            handler.bind_resource(resource)
+            handler.set_language(language)
+            run.time(
+                "%s (%s trans-units)" % (name, size), handler.compile
+            )
+
+
+def _template_content(megabytes):
+    """Create the content of a PO template of about ``megabytes`` MB."""
+    entry = 'msgid "%s"\nmsgstr ""\n\n'
+    size = megabytes * 1024 * 1024 / len(entry % hash_tag('', ''))
+    return ''.join(
+        entry % hash_tag('string %s' % n, '') for n in xrange(size)
+    )
+
+
+def _load_template(resource, read):
+    template = Template.objects.get(resource=resource)
+    if read:
+        template.content
+    return template
+
+
+@register('templates', "Load compressed templates of 1 to 50 MB")
+def load_templates(run, sizes=(1, 10, 50)):
+    old_format = settings.COMPRESSED_TEXT_FIELD_FORMAT
+    try:
+        for megabytes in sizes:
+            resource = _create_resource('templates-%s' % megabytes, 'PO')
+            content = _template_content(megabytes)
+            for format in ('pickle', 'zlib'):
+                settings.COMPRESSED_TEXT_FIELD_FORMAT = format
+                Template.objects.filter(resource=resource).delete()
+                Template.objects.create(resource=resource, content=content)
+                for read in (False, True):
+                    task = "%s, %s (%s MB)" % (
+                        read and "load and read" or "load", format, megabytes
+                    )
+                    template = run.time(task, _load_template, resource, read)
+                    kept = sum(
+                        sys.getsizeof(v) for v in template.__dict__.values()
+                    )
+                    run.note(task, "%.1f MB in memory" % (
+                        kept / (1024.0 * 1024)
+                    ))
+                assert template.content == content
+    finally:
+        settings.COMPRESSED_TEXT_FIELD_FORMAT = old_format
+
+
+class _CountingCache(object):
+    """Count the operations on a cache."""
+
+    def __init__(self, cache):
+        self._cache = cache
+        self.operations = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._cache, name)
+        if not callable(attr):
+            return attr
+        def counted(*args, **kwargs):
+            self.operations += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+def _legacy_invalidate_template_cache(fragment_name, *variables):
+    """Delete the fragment of every UI language."""
+    for lang, code in settings.LANGUAGES:
+        cur_vars = list(variables)
+        cur_vars.append(unicode(lang))
+        args = md5_constructor(u':'.join([urlquote(var) for var in cur_vars]))
+        cache_key = 'template.cache.%s.%s' % (fragment_name, args.hexdigest())
+        utils.cache.delete(cache_key)
+
+
+@register('fragments', "Invalidate the template caches after a source upload")
+def invalidate_fragments(run, languages=100, releases=10):
+    resource = _create_resource('fragments', 'PO')
+    for language in Language.objects.exclude(
+            id=resource.source_language.id)[:languages]:
+        RLStats.objects.create(resource=resource, language=language)
+    for n in xrange(releases):
+        release = Release.objects.create(
+            slug='fragments-%s' % n, name='Fragments %s' % n,
+            project=resource.project
+        )
+        release.resources.add(resource)
+
+    old_cache = utils.cache
+    old_invalidate = handlers.invalidate_template_cache
+    try:
+        for name, invalidate in (
+                ("delete per UI language", _legacy_invalidate_template_cache),
+                ("generations", utils.invalidate_template_cache)):
+            counting = utils.cache = _CountingCache(get_cache(
+                'django.core.cache.backends.locmem.LocMemCache',
+                LOCATION='fragments-benchmark'
+            ))
+            handlers.invalidate_template_cache = invalidate
+            task = "%s (%s languages, %s releases)" % (
+                name, languages, releases
+            )
+            run.time(
+                task, handlers.invalidate_object_templates,
+                resource, resource.source_language
+            )
+            run.note(task, "%s cache operations" % counting.operations)
+    finally:
+        utils.cache = old_cache
+        handlers.invalidate_template_cache = old_invalidate
+
+
+def _validation_strings(size):
+    """Create ``size`` pairs of source strings and translations with printf
+    specifiers, urls, emails and numbers in them.
+    """
+    strings = []
+    for n in xrange(size):
+        source = (u"Send %%s (%s of %%d) to info@example.com, see "
+                  u"http://example.com/%s\\n" % (n, n))
+        translation = (u"Στείλτε %%s (%s από %%d) στο info@example.com, "
+                       u"δείτε http://example.com/%s\\n" % (n, n))
+        strings.append((n, 5, source, translation))
+    return strings
+
+
+def _legacy_validate(i18n_type, source_language, target_language, strings):
+    """Validate the strings the way Lotte used to: the validators are
+    imported and created for every string and each of them runs its own
+    regular expressions.
+    """
+    for item, rule, source, translation in strings:
+        for path in (settings.I18N_ERROR_VALIDATORS.get(i18n_type) or
+                     settings.I18N_ERROR_VALIDATORS['DEFAULT']):
+            v = import_to_python(path)(source_language, target_language, rule)
+            try:
+                v(source, translation)
+            except ValidationError:
+                break
+        for path in (settings.I18N_WARNING_VALIDATORS.get(i18n_type) or
+                     settings.I18N_WARNING_VALIDATORS['DEFAULT']):
+            v = import_to_python(path)(source_language, target_language, rule)
+            try:
+                v(source, translation)
+            except ValidationError:
+                pass
+
+
+@register('validators', "Validate tens of thousands of translations")
+def validate_strings(run, size=20000):
+    if not Language.objects.exists():
+        management.call_command('txlanguages', verbosity=0)
+    source_language = Language.objects.by_code_or_alias('en')
+    target_language = Language.objects.by_code_or_alias('el')
+    strings = _validation_strings(size)
+    for name, validate in (("per string", _legacy_validate),
+                           ("pipeline", validate_translations)):
+        task = "%s (%s strings)" % (name, size)
+        run.time(
+            task, validate, 'PO', source_language, target_language, strings
+        )
+        run.note(task, "%.0f strings/s" % (size / run.timers[-1].duration))
+
+    # The validation of an imported file, with the source strings fetched
+    # from the database.
+    resource = _create_resource('validators')
+    _parse(resource, _ini_content(size)).save2db(True)
+    handler = _parse(
+        resource, _ini_content(size, u"translation"), False, target_language
+    )
+    task = "imported file (%s strings)" % size
+    report = run.time(task, handler.check_translations)
+    run.note(task, "%.0f strings/s, %s" % (
+        report.checked / run.timers[-1].duration, unicode(report)
+    ))
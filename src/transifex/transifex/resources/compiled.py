@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of the compiled translation files.
+
+A compiled file is cached under a key made of the resource, the language,
+the pseudo type and the i18n type of the resource, along with version
+tokens: one for the resource, which changes when the source strings (the
+template) or the stats change, and one per language, which changes with its
+translations. A file depends on the tokens of its language and of the source
+language. The headers of some formats are built from the project, its teams
+and the language as well, so there are also tokens for the project, the
+project whose teams it uses and the language itself, which change when
+these are saved. Changing a token invalidates all files cached with it,
+without having to find and delete them.
+
+The cached entry points to the content of the file, which is stored under
+its md5 hash, the ETag of the file. A download that sends the ETag of the
+current file back in If-None-Match gets a 304 Not Modified response,
+without the file being compiled or even read from the cache.
+"""
+
+import uuid
+from itertools import chain
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.hashcompat import md5_constructor
+from django.utils.http import parse_etags, quote_etag
+from django.http import HttpResponse, HttpResponseNotModified
+from transifex.txcommon.log import logger
+
+HITS_KEY = 'compiled_files:hits'
+MISSES_KEY = 'compiled_files:misses'
+
+
+def _version(key):
+    """Return the version token stored in ``key``, creating it if needed."""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex)
+        version = cache.get(key) or uuid.uuid4().hex
+    return version
+
+
+def _resource_version_key(resource_id):
+    return 'compiled_files:version:%s' % resource_id
+
+
+def _language_version_key(resource_id, language_id):
+    return 'compiled_files:version:%s:%s' % (resource_id, language_id)
+
+
+def _project_version_key(project_id):
+    return 'compiled_files:version:project:%s' % project_id
+
+
+def _language_data_version_key(language_id):
+    return 'compiled_files:version:language:%s' % language_id
+
+
+def invalidate_project_files(project_id):
+    """Invalidate the cached compiled files of the resources of a project
+    and of the projects that outsource to it.
+    """
+    cache.set(_project_version_key(project_id), uuid.uuid4().hex)
+
+
+def invalidate_language_files(language_id):
+    """Invalidate the cached compiled files of a language, for all
+    resources.
+    """
+    cache.set(_language_data_version_key(language_id), uuid.uuid4().hex)
+
+
+def invalidate_compiled_files(resource_id, language_id=None):
+    """Invalidate the cached compiled files of a resource.
+
+    Args:
+        resource_id: The id of the resource.
+        language_id: The id of the language, whose translations changed.
+            If None, the files of all languages are invalidated.
+    """
+    if language_id is None:
+        key = _resource_version_key(resource_id)
+    else:
+        key = _language_version_key(resource_id, language_id)
+    cache.set(key, uuid.uuid4().hex)
+
+
+def _file_key(resource, language, pseudo_type):
+    language_id = language and language.id or None
+    project = resource.project
+    parts = [
+        resource.id, language_id or 'pot',
+        _version(_resource_version_key(resource.id)),
+        _version(_language_version_key(resource.id, language_id)),
+        # Changes of the source strings affect every file
+        _version(_language_version_key(
+            resource.id, resource.source_language_id
+        )),
+        _version(_project_version_key(project.id)),
+        # The teams come from the project the translations are outsourced to
+        _version(_project_version_key(project.outsource_id or project.id)),
+        _version(_language_data_version_key(language_id)),
+        pseudo_type and pseudo_type.__class__.__name__ or '',
+        resource.i18n_type,
+    ]
+    return 'compiled_files:file:%s' % md5_constructor(
+        u':'.join(unicode(p) for p in parts).encode('UTF-8')
+    ).hexdigest()
+
+
+def _content_key(etag):
+    return 'compiled_files:content:%s' % etag
+
+
+def _count(key):
+    """Increase one of the hit/miss counters."""
+    if cache.add(key, 1):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def compiled_cache_stats():
+    """Return the number of cache hits and misses of compiled files."""
+    return {
+        'hits': cache.get(HITS_KEY) or 0,
+        'misses': cache.get(MISSES_KEY) or 0,
+    }
+
+
+def get_compiled_file(resource, language, pseudo_type=None, etags=()):
+    """Return the compiled translation file of a resource, from the cache,
+    if possible.
+
+    Args:
+        resource: The resource.
+        language: The language of the translation or None for a template.
+        pseudo_type: The pseudo type of the file, if any.
+        etags: The ETags of the file the client already has.
+    Returns:
+        A tuple of the ETag of the file and an iterator over its content.
+        The content is None, if the ETag is one of ``etags``. The ETag is
+        None for files that are too big to be cached.
+    """
+    # Import here to avoid circular imports
+    from transifex.resources.backends import FormatsBackend
+    backend = FormatsBackend(resource, language)
+    timeout = settings.COMPILED_FILE_CACHE_TIMEOUT
+    if not timeout:
+        return None, backend.compile_translation_iter(pseudo_type)
+
+    key = _file_key(resource, language, pseudo_type)
+    etag = cache.get(key)
+    if etag is not None:
+        if etag in etags:
+            _count(HITS_KEY)
+            return etag, None
+        content = cache.get(_content_key(etag))
+        if content is not None:
+            _count(HITS_KEY)
+            return etag, iter([content])
+
+    _count(MISSES_KEY)
+    chunks = backend.compile_translation_iter(pseudo_type)
+    content, size = [], 0
+    for chunk in chunks:
+        content.append(chunk)
+        size += len(chunk)
+        if size > settings.COMPILED_FILE_CACHE_MAX_SIZE:
+            logger.debug("Compiled file of %s for %s is too big to be "
+                "cached." % (resource, language))
+            return None, chain(content, chunks)
+    content = ''.join(content)
+    etag = md5_constructor(content).hexdigest()
+    cache.set(_content_key(etag), content, timeout)
+    cache.set(key, etag, timeout)
+    if etag in etags:
+        return etag, None
+    return etag, iter([content])
+
+
+def request_etags(request):
+    """Return the ETags a request sent in If-None-Match."""
+    return parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+
+def compiled_file_response(request, resource, language, mimetype,
+                           pseudo_type=None):
+    """Return a response with the compiled translation file.
+
+    The response is a 304 Not Modified one, if the request has the ETag of
+    the current file. Exceptions raised while compiling are propagated.
+    """
+    etag, content = get_compiled_file(
+        resource, language, pseudo_type, request_etags(request)
+    )
+    if content is None:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, mimetype=mimetype)
+    if etag is not None:
+        response['ETag'] = quote_etag(etag)
+    return response
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+from __future__ import with_statement
 import codecs, copy, os, re
 import gc
 from django.utils import simplejson as json
@@ -9,13 +10,16 @@ from django.db import transaction
 from django.db.models import get_model
 from django.utils.translation import ugettext as _
 from transifex.txcommon.log import logger
+from transifex.txcommon.db.bulk import bulk_insert, bulk_update, bulk_delete
 from transifex.languages.models import Language
 from suggestions.models import Suggestion
 from suggestions.formats import ContentSuggestionFormat
 from transifex.actionlog.models import action_logging
 from transifex.resources.handlers import invalidate_stats_cache
+from transifex.resources.stats import batch_stats, current_deltas
 from transifex.resources.formats import FormatError
 from transifex.resources.formats.pseudo import PseudoTypeMixin
+from transifex.resources.formats.validators import validate_translations
 from transifex.resources.formats.utils.decorators import *
 from transifex.resources.signals import post_save_translation
 from transifex.resources.formats.resource_collections import StringSet, \
@@ -37,6 +41,10 @@ STRICT flag is used to switch between two parsing modes:
 """
 STRICT=False
 
+# Matches the placeholders of the strings in a template: the hash of the
+# source entity followed by either `_tr` or `_pl_<n>` for plural forms.
+PLACEHOLDER_RE = re.compile(r'[0-9a-f]{32}_(?:tr|pl_\d+)')
+
 
 Resource = get_model('resources', 'Resource')
 Translation = get_model('resources', 'Translation')
@@ -97,6 +105,13 @@ class Handler(object):
 
     linesep = '\n'
 
+    # The attributes set by parse_file, which are cached for files that are
+    # parsed again (see parse_cache).
+    parsed_attributes = ('stringset', 'suggestions', 'template')
+    # Whether _parse reads the database, so that the result of parsing
+    # depends on more than the content and must not be cached.
+    parse_uses_database = False
+
     @classmethod
     def accepts(cls, i18n_type):
         """Accept only files that have the correct type specified."""
@@ -118,6 +133,10 @@ class Handler(object):
         self.template = None # Var to store raw template
         self.compiled_template = None # Var to store output of compile() method
 
+        # The QAReport of the imported translations (see I18N_VALIDATE_IMPORTS)
+        self.qa_report = None
+        self._invalid_se_ids = set()
+
         if resource:
             self.resource = resource
             self.language = resource.source_language
@@ -369,7 +388,45 @@ class Handler(object):
         Returns:
             The content after the translation has been applied.
         """
-        return self._replace_translation("%s_tr" % source_hash, trans, content)
+        return self._apply_translations({"%s_tr" % source_hash: trans}, content)
+
+    def _get_replacement(self, placeholder, trans):
+        """Return the text that replaces `placeholder` in the template.
+
+        The text is calculated by running `_replace_translation` on the
+        placeholder alone, so that any format-specific override of it
+        (escaping, pseudo-decoration, encoding etc.) still applies.
+        """
+        return self._replace_translation(placeholder, trans, placeholder)
+
+    def _apply_translations(self, translations, content):
+        """Apply a set of translations to text in a single pass.
+
+        The text is scanned once for placeholders (``<hash>_tr`` and
+        ``<hash>_pl_<n>``) and each one found in `translations` is replaced.
+        The rest are left untouched.
+
+        Args:
+            translations: A dictionary with the placeholders as keys and
+                the translation strings as values.
+            content: The text for the search-&-replace.
+
+        Returns:
+            The content after the translations have been applied.
+        """
+        replacements = {}
+
+        def replace(match):
+            placeholder = match.group(0)
+            if placeholder not in translations:
+                return placeholder
+            if placeholder not in replacements:
+                replacements[placeholder] = self._get_replacement(
+                    placeholder, translations[placeholder]
+                )
+            return replacements[placeholder]
+
+        return PLACEHOLDER_RE.sub(replace, content)
 
     def _examine_content(self, content):
         """
@@ -417,6 +474,36 @@ class Handler(object):
             raise
         self._post_compile(language)
 
+    @need_resource
+    def compile_iter(self, language=None):
+        """
+        Compile the template and return an iterator over chunks of the
+        content of the translation file.
+
+        Handlers that can apply their post-processing while the file is
+        generated override this to keep memory usage bounded for large
+        resources. By default, the whole file is compiled at once.
+
+        Args:
+          language: The language of the file
+        """
+        self.compile(language)
+        return iter([self.compiled_template or ''])
+
+    def _get_placeholders(self, language):
+        """Return a dictionary of the placeholders of the template to the
+        translations of the strings in the language.
+        """
+        stringset = self._get_source_strings(self.resource)
+        translations = self._get_translation_strings(
+            (s[0] for s in stringset), language
+        )
+        placeholders = {}
+        for string in stringset:
+            trans = translations.get(string[0], u"")
+            placeholders["%s_tr" % string[1]] = trans
+        return placeholders
+
     def _compile(self, content, language):
         """Internal compile function.
 
@@ -430,14 +517,8 @@ class Handler(object):
         Returns:
             The compiled template.
         """
-        stringset = self._get_source_strings(self.resource)
-        translations = self._get_translation_strings(
-            (s[0] for s in stringset), language
-        )
-        for string in stringset:
-            trans = translations.get(string[0], u"")
-            content = self._apply_translation(string[1], trans, content)
-        return content
+        placeholders = self._get_placeholders(language)
+        return self._apply_translations(placeholders, content)
 
     #######################
     #  save methods
@@ -562,7 +643,69 @@ class Handler(object):
             True, if the specified translation must be skipped, ie not
             saved to database.
         """
-        return not trans.translation or trans.pluralized != se.pluralized
+        return not trans.translation or trans.pluralized != se.pluralized \
+                or se.id in self._invalid_se_ids
+
+    def check_translations(self, source_entities=None):
+        """Validate the translations of the stringset against the source
+        strings of the resource.
+
+        Args:
+            source_entities: A SourceEntityCollection of the resource. It is
+                fetched from the database, if it is not given.
+        Returns:
+            A QAReport, with the source entities as the items.
+        """
+        if source_entities is None:
+            qs = SourceEntity.objects.filter(resource=self.resource).iterator()
+            source_entities = self._init_source_entity_collection(qs)
+        source_language = self.resource.source_language
+        sources = {}
+        qs = Translation.objects.filter(
+            resource=self.resource, language=source_language
+        ).values_list('source_entity', 'rule', 'string').iterator()
+        for se_id, rule, string in qs:
+            sources[(se_id, rule)] = string
+
+        def strings():
+            for j in self.stringset.strings:
+                se = source_entities.get(j)
+                if se is None or self._should_skip_translation(se, j):
+                    continue
+                # The language may have more plural forms than the source
+                # language.
+                source = sources.get((se.id, j.rule), sources.get((se.id, 5)))
+                if source is not None:
+                    yield se, j.rule, source, j.translation
+
+        return validate_translations(
+            self.resource.i18n_method, source_language, self.language,
+            strings()
+        )
+
+    def _validate_imported_translations(self, source_entities):
+        """Validate the translations to import, if I18N_VALIDATE_IMPORTS is
+        set. The source entities with errors in any of their translations
+        are skipped.
+
+        Source files are not validated, since they are what the
+        translations are checked against.
+        """
+        if not settings.I18N_VALIDATE_IMPORTS:
+            return
+        self._invalid_se_ids = set()
+        self.qa_report = self.check_translations(source_entities)
+        self._invalid_se_ids = set(
+            se.id for se in self.qa_report.items_with_errors()
+        )
+        if self._invalid_se_ids:
+            logger.warning(
+                "Skipped %s strings with errors when importing translations "
+                "for language %s and resource %s: %s." % (
+                    len(self._invalid_se_ids), self.language, self.resource,
+                    unicode(self.qa_report)
+                )
+            )
 
     def _save_source(self, user, overwrite_translations):
         """Save source language translations to the database.
@@ -684,6 +827,7 @@ class Handler(object):
         qs = SourceEntity.objects.filter(resource=self.resource).iterator()
         source_entities = self._init_source_entity_collection(qs)
         translations = self._init_translation_collection(source_entities.se_ids)
+        self._validate_imported_translations(source_entities)
 
         strings_added = 0
         strings_updated = 0
@@ -723,6 +867,214 @@ class Handler(object):
         sg_handler.add_from_strings(self.suggestions.strings)
         return strings_added, strings_updated, strings_deleted
 
+    def _bulk_save_source(self, user, overwrite_translations):
+        """Save source language translations to the database in bulk.
+
+        Behaves like `_save_source`, but the parsed strings are compared
+        with the existing rows in memory and the differences are written
+        with chunked bulk queries.
+
+        Args:
+            user: The user that made the commit.
+            overwrite_translations: A flag to indicate whether translations
+                should be overrided.
+
+        Returns:
+            A tuple of number of strings added, updted and deleted.
+        """
+        chunk_size = settings.BULK_IMPORT_CHUNK_SIZE
+        original_sources = list(
+            SourceEntity.objects.filter(resource=self.resource)
+        )
+        source_entities = self._init_source_entity_collection(original_sources)
+        translations = self._init_translation_collection(source_entities.se_ids)
+
+        deleted_sources = dict((se.id, se) for se in original_sources)
+        updated_sources = {}
+        new_entities = []
+        for j in self.stringset.strings:
+            if j in source_entities:
+                se = source_entities.get(j)
+                if se.id is None:
+                    continue
+                deleted_sources.pop(se.id, None)
+                values = (
+                    j.flags or "", j.pluralized, j.comment or "",
+                    j.occurrences
+                )
+                if values != (se.flags, se.pluralized, se.developer_comment,
+                              se.occurrences):
+                    (se.flags, se.pluralized, se.developer_comment,
+                     se.occurrences) = values
+                    updated_sources[se.id] = se
+            else:
+                se = SourceEntity(
+                    string = j.source_entity,
+                    context = self._context_value(j.context),
+                    resource = self.resource, pluralized = j.pluralized,
+                    position = 1,
+                    flags = j.flags or "",
+                    developer_comment = j.comment or "",
+                    occurrences = j.occurrences,
+                )
+                se._update_string_hash()
+                new_entities.append(se)
+                source_entities.add(se)
+
+        bulk_update(
+            SourceEntity, updated_sources.values(),
+            ['flags', 'pluralized', 'developer_comment', 'occurrences'],
+            chunk_size
+        )
+        bulk_insert(SourceEntity, new_entities, chunk_size)
+        self._fetch_source_entity_ids(new_entities)
+        current_deltas().add_source_entities(
+            self.resource.id, [se.id for se in new_entities]
+        )
+
+        strings_added, strings_updated = self._bulk_save_strings(
+            source_entities, translations, user, overwrite_translations
+        )
+
+        sg_handler = self.SuggestionFormat(self.resource, self.language, user)
+        sg_handler.add_from_strings(self.suggestions.strings)
+        sg_handler.create_suggestions(deleted_sources.values(), new_entities)
+        bulk_delete(SourceEntity, deleted_sources.keys(), chunk_size)
+        self._update_template(self.template)
+
+        strings_deleted = len(deleted_sources)
+        return strings_added, strings_updated, strings_deleted
+
+    def _bulk_save_translation(self, user, overwrite_translations):
+        """Save other language translations to the database in bulk.
+
+        Behaves like `_save_translation`, but writes the translations with
+        chunked bulk queries.
+
+        Args:
+            user: The user that made the commit.
+            overwrite_translations: A flag to indicate whether translations
+                should be overrided.
+
+        Returns:
+            A tuple of number of strings added, updted and deleted.
+        """
+        qs = SourceEntity.objects.filter(resource=self.resource).iterator()
+        source_entities = self._init_source_entity_collection(qs)
+        translations = self._init_translation_collection(source_entities.se_ids)
+        self._validate_imported_translations(source_entities)
+        strings_added, strings_updated = self._bulk_save_strings(
+            source_entities, translations, user, overwrite_translations
+        )
+        sg_handler = self.SuggestionFormat(self.resource, self.language, user)
+        sg_handler.add_from_strings(self.suggestions.strings)
+        return strings_added, strings_updated, 0
+
+    def _bulk_save_strings(self, source_entities, translations, user,
+                           overwrite_translations):
+        """Save the translations of the stringset with bulk queries.
+
+        Strings without a source entity in `source_entities` are skipped.
+        The changes of the stats are recorded in the active stats batch.
+
+        Args:
+            source_entities: A SourceEntityCollection of saved objects.
+            translations: A TranslationCollection with the existing
+                translations of the language.
+            user: The user that made the commit.
+            overwrite_translations: A flag to indicate whether translations
+                should be overrided.
+
+        Returns:
+            A tuple of number of strings added and updated.
+        """
+        chunk_size = settings.BULK_IMPORT_CHUNK_SIZE
+        new_translations = []
+        updated_translations = {}
+        strings_added = 0
+        strings_updated = 0
+        deltas = current_deltas()
+        is_source = self.language == self.resource.source_language
+        source_wordcounts = {}
+        for j in self.stringset.strings:
+            se = source_entities.get(j)
+            if se is None or self._should_skip_translation(se, j):
+                continue
+            if (se, j) in translations:
+                tr = translations.get((se, j))
+                if overwrite_translations and tr.string != j.translation:
+                    old_wordcount = tr.wordcount
+                    tr.string = j.translation
+                    tr.user = user
+                    if tr.reviewed and tr.rule == 5:
+                        deltas.add(
+                            self.resource.id, self.language.id, reviewed=-1
+                        )
+                    # Same as the pre_save handler of translations.
+                    tr.reviewed = False
+                    tr._update_string_hash()
+                    tr._update_wordcount()
+                    if is_source and tr.rule == 5:
+                        source_wordcounts[se.id] = tr.wordcount - old_wordcount
+                    if tr.id is not None:
+                        updated_translations[tr.id] = tr
+                    strings_updated += 1
+            else:
+                tr = Translation(
+                    source_entity=se, language=self.language, rule=j.rule,
+                    string=j.translation, user=user, resource=self.resource
+                )
+                tr._update_string_hash()
+                tr._update_wordcount()
+                new_translations.append(tr)
+                translations.add(tr)
+                if j.rule==5:
+                    strings_added += 1
+                    if is_source:
+                        wordcount = tr.wordcount
+                        source_wordcounts[se.id] = wordcount
+                    else:
+                        wordcount = deltas.source_wordcount(
+                            se.id, self.resource.source_language_id
+                        )
+                    deltas.add(
+                        self.resource.id, self.language.id, translated=1,
+                        untranslated=-1, translated_wordcount=wordcount
+                    )
+
+        if source_wordcounts:
+            deltas.add_source_wordcounts(
+                self.resource.id, self.language.id, source_wordcounts
+            )
+        bulk_update(
+            Translation, updated_translations.values(),
+            ['string', 'string_hash', 'wordcount', 'user', 'reviewed'],
+            chunk_size
+        )
+        bulk_insert(Translation, new_translations, chunk_size)
+        return strings_added, strings_updated
+
+    def _fetch_source_entity_ids(self, source_entities):
+        """Set the ids of source entities inserted with bulk queries.
+
+        Args:
+            source_entities: A list of SourceEntity objects of the resource.
+        """
+        context_field = SourceEntity._meta.get_field('context')
+        keys = dict(
+            ((se.string_hash, context_field.get_db_prep_value(se.context)), se)
+            for se in source_entities
+        )
+        if not keys:
+            return
+        qs = SourceEntity.objects.filter(resource=self.resource).values_list(
+            'id', 'string_hash', 'context'
+        ).iterator()
+        for se_id, string_hash, context in qs:
+            se = keys.get((string_hash, context))
+            if se is not None:
+                se.id = se_id
+
     def _update_stats_of_resource(self, resource, language, user):
         """Update the statistics for the resource.
 
@@ -749,15 +1101,25 @@ class Handler(object):
         Saves parsed file contents to the database. duh
         """
         self._pre_save2db(is_source, user, overwrite_translations)
+        if settings.BULK_IMPORT:
+            save_source = self._bulk_save_source
+            save_translation = self._bulk_save_translation
+        else:
+            save_source = self._save_source
+            save_translation = self._save_translation
         try:
-            if is_source:
-                (added, updated, deleted) = self._save_source(
-                    user, overwrite_translations
-                )
-            else:
-                (added, updated, deleted) = self._save_translation(
-                    user, overwrite_translations
-                )
+            # The stats must be up to date before the resource update is
+            # handled.
+            with batch_stats() as deltas:
+                deltas.load_source_wordcounts(self.resource)
+                if is_source:
+                    (added, updated, deleted) = save_source(
+                        user, overwrite_translations
+                    )
+                else:
+                    (added, updated, deleted) = save_translation(
+                        user, overwrite_translations
+                    )
         except Exception, e:
             logger.warning(
                 "Failed to save translations for language %s and resource %s."
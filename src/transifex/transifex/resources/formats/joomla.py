@@ -38,6 +38,8 @@ class JoomlaINIHandler(Handler):
 
     HandlerParseError = JoomlaParseError
     HandlerCompileError = JoomlaCompileError
+    # Translations of keys missing from the source are dropped
+    parse_uses_database = True
 
     def _escape(self, s):
         return  s.replace('\\', '\\\\').replace('\n', r'\\n').replace('\r', r'\\r')
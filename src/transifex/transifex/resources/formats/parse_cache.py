@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of parsed files.
+
+The result of parsing a file is cached under the md5 hash of its content,
+together with the handler, the language and whether it was parsed as a
+source file. The same file uploaded again, or imported after it was parsed
+to count its strings, is not parsed (nor checked) again::
+
+    parse_file_cached(handler, content_hash, is_source=True)
+
+What is cached are the attributes of the handler listed in its
+``parsed_attributes``, pickled and compressed with zlib. Handlers whose
+parsing reads the database (``parse_uses_database``) are never cached, so
+a cached result does not depend on the resource the handler is bound to.
+"""
+
+import cPickle
+import zlib
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.hashcompat import md5_constructor
+from transifex.txcommon.log import logger
+
+
+def _is_cacheable(handler, content_hash):
+    return bool(settings.PARSED_FILE_CACHE_TIMEOUT and content_hash and
+                handler.language is not None and
+                not handler.parse_uses_database)
+
+
+def _parse_key(handler, content_hash, is_source):
+    parts = [
+        handler.__class__.__name__, handler.language.code,
+        is_source and 'source' or 'translation', content_hash,
+    ]
+    return 'parsed_files:%s' % md5_constructor(
+        u':'.join(parts).encode('UTF-8')
+    ).hexdigest()
+
+
+def load_parsed(handler, content_hash, is_source=False):
+    """Load the cached result of parsing the content into the handler.
+
+    Returns:
+        True, if the result was cached.
+    """
+    if not _is_cacheable(handler, content_hash):
+        return False
+    data = cache.get(_parse_key(handler, content_hash, is_source))
+    if data is None:
+        return False
+    try:
+        values = cPickle.loads(zlib.decompress(data))
+    except Exception, e:
+        logger.warning("Invalid parsed file in the cache: %s" % e)
+        return False
+    for name, value in zip(handler.parsed_attributes, values):
+        setattr(handler, name, value)
+    return True
+
+
+def store_parsed(handler, content_hash, is_source=False):
+    """Cache the result of parsing the content of the handler."""
+    if not _is_cacheable(handler, content_hash):
+        return
+    values = [getattr(handler, name) for name in handler.parsed_attributes]
+    data = zlib.compress(cPickle.dumps(values, cPickle.HIGHEST_PROTOCOL))
+    if len(data) > settings.PARSED_FILE_CACHE_MAX_SIZE:
+        logger.debug("Parsed file %s is too big to be cached." % content_hash)
+        return
+    cache.set(
+        _parse_key(handler, content_hash, is_source), data,
+        settings.PARSED_FILE_CACHE_TIMEOUT
+    )
+
+
+def is_parsed(handler, content_hash, is_source=False):
+    """Return whether the result of parsing the content is cached."""
+    if not _is_cacheable(handler, content_hash):
+        return False
+    return cache.has_key(_parse_key(handler, content_hash, is_source))
+
+
+def parse_file_cached(handler, content_hash, is_source=False, check=False):
+    """Parse the content of the handler, unless the result of parsing the
+    same content is cached.
+
+    Args:
+        handler: The handler, with its content and language bound.
+        content_hash: The hash of the content or None, if it is unknown.
+        is_source: Whether the content is a source file.
+        check: Check the content with ``is_content_valid`` before parsing
+            it. A cached content has been checked already.
+    Returns:
+        True, if the result was found in the cache.
+    """
+    if load_parsed(handler, content_hash, is_source):
+        return True
+    if check:
+        handler.is_content_valid()
+    handler.parse_file(is_source)
+    store_parsed(handler, content_hash, is_source)
+    return False
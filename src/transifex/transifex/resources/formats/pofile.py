@@ -3,8 +3,11 @@
 """
 GNU Gettext .PO/.POT file handler/compiler
 """
+from __future__ import with_statement
 import os, re, time
+import itertools
 from collections import defaultdict
+from contextlib import contextmanager
 import polib
 from django.conf import settings
 from django.db import transaction
@@ -15,6 +18,7 @@ from django.contrib.sites.models import Site
 
 from transifex.txcommon.commands import run_command, CommandError
 from transifex.txcommon.log import logger
+from transifex.txcommon.timers import Timer
 from transifex.teams.models import Team
 from transifex.resources.formats.utils.decorators import *
 from transifex.resources.formats.utils.hash_tag import hash_tag, escape_context
@@ -39,6 +43,14 @@ SourceEntity = get_model('resources', 'SourceEntity')
 Template = get_model('resources', 'Template')
 
 
+def _msgfmt_error(errors):
+    """Return the error raised, when a file fails the msgfmt checks."""
+    return PoParseError(ugettext("Your file failed a correctness check "
+        "(msgfmt -c). It returned the following error:\n\n%s\n\n"
+        "Please run this command on "
+        "your system to see the errors for yourself." % errors))
+
+
 def msgfmt_check(po_contents, ispot=False, with_exceptions=True):
     """Run a `msgfmt -c` on the file contents.
 
@@ -61,10 +73,178 @@ def msgfmt_check(po_contents, ispot=False, with_exceptions=True):
             raise CommandError(command, status, stderr)
     except CommandError, e:
         logger.warning("pofile: The 'msgfmt -c' check failed.")
-        raise PoParseError, ugettext("Your file failed a correctness check "
-            "(msgfmt -c). It returned the following error:\n\n%s\n\n"
-            "Please run this command on "
-            "your system to see the errors for yourself." % e.stderr.lstrip('<stdin>:'))
+        raise _msgfmt_error(e.stderr.lstrip('<stdin>:'))
+
+
+def _iter_text_lines(text):
+    """Iterate over the lines of a text without splitting all of it."""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+# Format directives of c-format and python-format strings. The groups are
+# the argument (position or name), the length modifier and the conversion.
+_c_format = re.compile(
+    r"%(?:(\d+)\$)?[-+ #0']*(?:\*(?:\d+\$)?|\d+)?"
+    r"(?:\.(?:\*(?:\d+\$)?|\d+))?(hh|h|ll|l|L|q|j|z|t)?"
+    r"([diouxXeEfFgGaAcspn%])"
+)
+_python_format = re.compile(
+    r"%(?:\((\w+)\))?[-+ #0]*(?:\*|\d+)?(?:\.(?:\*|\d+))?()[hlL]?"
+    r"([diouxXeEfFgGcrs%])"
+)
+_conversion_types = {
+    'd': 'int', 'i': 'int', 'o': 'unsigned', 'u': 'unsigned',
+    'x': 'unsigned', 'X': 'unsigned', 'e': 'float', 'E': 'float',
+    'f': 'float', 'F': 'float', 'g': 'float', 'G': 'float', 'a': 'float',
+    'A': 'float', 'c': 'char', 's': 'string', 'r': 'string', 'p': 'pointer',
+    'n': 'count',
+}
+_plural_forms = re.compile(r'nplurals\s*=\s*(\d+)')
+
+
+def _format_arguments(string, directive):
+    """Return a dictionary of the arguments of the format directives in
+    ``string`` to their types.
+
+    Python strings only differ between integer, float, char and string
+    arguments.
+    """
+    arguments = {}
+    position = 0
+    for m in directive.finditer(string):
+        argument, size, conversion = m.groups()
+        if conversion == '%':
+            continue
+        kind = _conversion_types[conversion]
+        if directive is _python_format:
+            if kind in ('unsigned', 'count'):
+                kind = 'int'
+        else:
+            kind = (size or '') + kind
+        if argument is None:
+            position += 1
+            argument = position
+        elif argument.isdigit():
+            argument = int(argument)
+        arguments[argument] = kind
+    return arguments
+
+
+def _compare_formats(msgid, msgstr, directive, exact, names):
+    """Compare the format directives of a source and a translation string.
+
+    If ``exact`` is False, the translation may leave some arguments out;
+    this is allowed in plural forms.
+
+    Returns a description of the first difference or None.
+    """
+    expected = _format_arguments(msgid, directive)
+    found = _format_arguments(msgstr, directive)
+    for argument, kind in sorted(found.iteritems()):
+        if argument not in expected:
+            return "a format specification for argument %s, as in '%s', " \
+                    "doesn't exist in '%s'" % (argument, names[1], names[0])
+        if expected[argument] != kind:
+            return "format specifications in '%s' and '%s' for argument " \
+                    "%s are not the same" % (names[0], names[1], argument)
+    if exact and len(found) != len(expected):
+        return "number of format specifications in '%s' and '%s' does " \
+                "not match" % names
+    return None
+
+
+def check_catalog(po, ispot=False):
+    """Check a parsed po file the way ``msgfmt -c`` does.
+
+    This covers the checks uploaded files usually fail: duplicate
+    messages, the format directives of c-format and python-format strings,
+    leading and trailing newlines and, for po files, the number of plural
+    forms.
+
+    Args:
+        po: A polib.POFile object.
+        ispot: Whether the file is a template; then only the format
+            directives are checked.
+    Returns:
+        A list with a description of each error found.
+    """
+    errors = []
+    nplurals = None
+    plural_forms = po.metadata.get('Plural-Forms')
+    if plural_forms:
+        m = _plural_forms.search(plural_forms)
+        if m is not None:
+            nplurals = int(m.group(1))
+    seen = set()
+    for entry in po:
+        if entry.obsolete:
+            continue
+        msgid = entry.msgid
+        key = (entry.msgctxt, msgid)
+        if key in seen:
+            errors.append("duplicate message definition: '%s'" % msgid)
+            continue
+        seen.add(key)
+        if 'fuzzy' in entry.flags:
+            continue
+        if entry.msgid_plural:
+            forms = sorted(
+                (int(n), s) for n, s in entry.msgstr_plural.iteritems()
+            )
+            translations = []
+            for n, msgstr in forms:
+                if n == 0:
+                    translations.append(('msgstr[0]', msgstr, 'msgid'))
+                else:
+                    translations.append(
+                        ('msgstr[%s]' % n, msgstr, 'msgid_plural')
+                    )
+        else:
+            translations = [('msgstr', entry.msgstr, 'msgid')]
+        translations = [t for t in translations if t[1]]
+        if not translations:
+            continue
+
+        if entry.msgid_plural and not ispot:
+            if nplurals is None:
+                errors.append("message catalog has plural form "
+                    "translations, but lacks a header entry with "
+                    "\"Plural-Forms: nplurals=INTEGER; plural=EXPRESSION;\"")
+                nplurals = len(forms)
+            elif len(forms) != nplurals:
+                errors.append("'%s': nplurals = %s, but the message has %s "
+                    "plural forms" % (msgid, nplurals, len(forms)))
+
+        for name, msgstr, source_name in translations:
+            source = getattr(entry, source_name)
+            if not ispot:
+                for position, check in (('begin', 'startswith'),
+                                        ('end', 'endswith')):
+                    if getattr(source, check)('\n') != \
+                            getattr(msgstr, check)('\n'):
+                        errors.append("'%s': '%s' and '%s' entries do not "
+                            "both %s with '\\n'" % (
+                                msgid, source_name, name, position
+                        ))
+            for flag, directive in (('c-format', _c_format),
+                                    ('python-format', _python_format)):
+                if flag not in entry.flags:
+                    continue
+                error = _compare_formats(
+                    source, msgstr, directive,
+                    exact=name in ('msgstr', 'msgstr[0]'),
+                    names=(source_name, name)
+                )
+                if error is not None:
+                    errors.append("'%s': %s" % (msgid, error))
+    return errors
 
 
 class GettextHandler(Handler):
@@ -76,39 +256,83 @@ class GettextHandler(Handler):
     method_name = 'PO'
     format = "GNU Gettext Catalog (*.po, *.pot)"
     copyright_line = re.compile('^# (.*?), ((\d{4}(, ?)?)+)\.?$')
+    copyright_lines = re.compile('(?m)' + copyright_line.pattern + '\n?')
+    entry_separator = re.compile(r'\n\n+')
+    parsed_attributes = Handler.parsed_attributes + ('copyrights', )
+
+    # Number of entries (or lines) processed at a time by compile_iter
+    compile_chunk_size = 500
 
     HandlerParseError = PoParseError
     handlerCompileError = PoCompileError
 
     def _check_content(self, content):
-        try:
-            po = polib.pofile(content)
-        except IOError, e:
-            logger.warning("Parse error: %s" % e, exc_info=True)
-            raise PoParseError(unicode(e))
+        """Parse the content and check it.
+
+        The parsed file is kept, so that ``_parse`` does not need to parse
+        the content again.
+        """
+        if content and content is self._po_content:
+            # Already checked and parsed
+            return
 
         # If file is empty, the method hangs so we should bail out.
         if not content:
             logger.warning("Pofile: File '%s' is empty." % self.filename)
             raise PoParseError("Uploaded file is empty.")
 
+        with self._timed('parse'):
+            try:
+                po = polib.pofile(content)
+            except IOError, e:
+                logger.warning("Parse error: %s" % e, exc_info=True)
+                raise PoParseError(unicode(e))
+
         # Msgfmt check
         if settings.FILECHECKS['POFILE_MSGFMT']:
-            msgfmt_check(content, self.is_pot)
+            with self._timed('msgfmt'):
+                if settings.FILECHECKS['POFILE_MSGFMT_IN_PROCESS']:
+                    errors = check_catalog(po, self.is_pot)
+                    if errors:
+                        logger.warning(
+                            "pofile: The msgfmt checks failed: %s" % errors
+                        )
+                        raise _msgfmt_error('\n'.join(errors))
+                else:
+                    msgfmt_check(content, self.is_pot)
 
         # Check required header fields
-        required_metadata = ['Content-Type', 'Content-Transfer-Encoding']
-        for metadata in required_metadata:
-            if not metadata in po.metadata:
-                logger.warning(
-                    "pofile: Required metadata '%s' not found." % metadata
-                )
-                raise PoParseError(_(
-                    "Uploaded file header doesn't have '%s' metadata!" % metadata
-                ))
+        with self._timed('headers'):
+            required_metadata = ['Content-Type', 'Content-Transfer-Encoding']
+            for metadata in required_metadata:
+                if not metadata in po.metadata:
+                    logger.warning(
+                        "pofile: Required metadata '%s' not found." % metadata
+                    )
+                    raise PoParseError(_(
+                        "Uploaded file header doesn't have '%s' metadata!" % metadata
+                    ))
 
         # Save to avoid parsing it again
         self._po = po
+        self._po_content = content
+
+    @contextmanager
+    def _timed(self, stage):
+        """Measure the time spent in a stage of the processing of a file.
+
+        The durations are kept in ``self.timings``.
+        """
+        timer = Timer(stage, "%s of %s" % (stage, self.filename or 'content'))
+        timer.start()
+        try:
+            yield
+        finally:
+            timer.stop()
+            self.timings[stage] = self.timings.get(stage, 0) + timer.duration
+            logger.debug("pofile: %s took %.3fsec" % (
+                timer.description, timer.duration
+            ))
 
     def __init__(self, filename=None, resource=None, language=None,
                  content=None):
@@ -117,6 +341,8 @@ class GettextHandler(Handler):
             content=content
         )
         self.copyrights = []
+        self.timings = {}
+        self._po_content = None
 
     def get_po_contents(self, pofile):
         """
@@ -138,11 +364,8 @@ class GettextHandler(Handler):
             pofile.encoding = polib.default_encoding
 
         content = pofile.__str__()
-        stripped_content = ""
-        for line in content.split('\n'):
-            if not self._is_copyright_line(line):
-                stripped_content += line + "\n"
-        return stripped_content
+        # Every line ends with a newline, including the last one.
+        return self.copyright_lines.sub('', content) + "\n"
 
     def _escape(self, s):
         """
@@ -226,14 +449,18 @@ class GettextHandler(Handler):
             plurals[se].append(t)
         return plurals
 
-    def _update_plurals(self, po, language):
-        """Update the plurals in the po file."""
-        plurals = self._get_plurals(language)
+    def _update_plurals(self, po, language, plurals=None):
+        """Update the plurals in the po file.
+
+        The plural translations are fetched, unless they are given in
+        ``plurals``.
+        """
+        if plurals is None:
+            plurals = self._get_plurals(language)
+        lang_rules = language.get_pluralrules_numbers()
         for entry in po:
             if entry.msgid_plural:
                 plural_keys = {}
-                # last rule excluding other(5)
-                lang_rules = language.get_pluralrules_numbers()
                 # Initialize all plural rules up to the last
                 for p, n in enumerate(lang_rules):
                     plural_keys[p] = ""
@@ -242,6 +469,113 @@ class GettextHandler(Handler):
                 entry.msgstr_plural = plural_keys
         return po
 
+    def _iter_lines(self, chunks):
+        """Split a stream of text chunks into lines.
+
+        Behaves like ``str.split('\\n')`` on the concatenated chunks, so the
+        last line is yielded even if it is empty.
+        """
+        rest = u""
+        for chunk in chunks:
+            lines = (rest + chunk).split(u'\n')
+            rest = lines.pop()
+            for line in lines:
+                yield line
+        yield rest
+
+    def _iter_po_entries(self, content):
+        """Split the content of a po file in chunks of entries.
+
+        Each chunk has at most ``compile_chunk_size`` entries and ends at
+        an entry boundary.
+        """
+        start = 0
+        count = 0
+        for m in self.entry_separator.finditer(content):
+            count += 1
+            if count == self.compile_chunk_size:
+                yield content[start:m.end()]
+                start = m.end()
+                count = 0
+        if start < len(content):
+            yield content[start:]
+
+    def _iter_compiled_po(self, content, language):
+        """Compile the template chunk by chunk and yield the content of the
+        po file, as polib would serialize it after updating the headers and
+        the plurals.
+        """
+        placeholders = self._get_placeholders(language)
+        plurals = self._get_plurals(language)
+        obsolete = []
+        header_done = False
+        for chunk in self._iter_po_entries(content):
+            chunk = self._apply_translations(placeholders, chunk)
+            if header_done:
+                # Keep the comments of the first entry out of the header.
+                chunk = u'msgid ""\nmsgstr ""\n\n' + chunk
+            po = polib.pofile(chunk)
+            if not header_done:
+                header_done = True
+                header = polib.POFile(wrapwidth=po.wrapwidth)
+                header.header = po.header
+                header.metadata = po.metadata
+                header.metadata_is_fuzzy = po.metadata_is_fuzzy
+                header = self._update_headers(po=header, language=language)
+                yield unicode(header)
+            self._update_plurals(po=po, language=language, plurals=plurals)
+            for entry in po:
+                if entry.obsolete:
+                    obsolete.append(entry)
+                else:
+                    yield u'\n' + entry.__unicode__(po.wrapwidth)
+        for entry in obsolete:
+            yield u'\n' + entry.__unicode__(po.wrapwidth)
+
+    def _iter_post_compile(self, lines, language):
+        """Post-process the lines of the compiled file.
+
+        This is the streaming counterpart of ``_post_compile``. It gets
+        an iterator over the lines of the po file and returns an iterator
+        over the lines of the translation file.
+        """
+        for line in lines:
+            if not self._is_copyright_line(line):
+                yield line
+
+    @need_resource
+    def compile_iter(self, language=None):
+        """
+        Compile the template and yield the content of the po file in
+        chunks, encoded in ``format_encoding``.
+
+        The template is processed ``compile_chunk_size`` entries at a time
+        and the headers, plurals and copyrights are updated on the way, so
+        the whole file is never kept in memory.
+
+        Args:
+          language: The language of the file
+        """
+        if language is None:
+            language = self.language
+        self._pre_compile(language)
+        content = Template.objects.get(
+            resource=self.resource
+        ).content.decode(self.default_encoding)
+        content = self._examine_content(content)
+        lines = self._iter_post_compile(
+            self._iter_lines(self._iter_compiled_po(content, language)),
+            language
+        )
+        chunk = []
+        for line in lines:
+            chunk.append(line)
+            if len(chunk) == self.compile_chunk_size:
+                yield (u'\n'.join(chunk) + u'\n').encode(self.format_encoding)
+                chunk = []
+        if chunk:
+            yield (u'\n'.join(chunk) + u'\n').encode(self.format_encoding)
+
     def _post_save2db(self, *args, **kwargs):
         """Emit a signal for others to catch."""
         kwargs.update({'copyrights': self.copyrights})
@@ -257,15 +591,21 @@ class GettextHandler(Handler):
         else:
             nplural = self.language.get_pluralrules_numbers()
 
-        if not hasattr(self, '_po'):
+        # Use the file parsed by _check_content, unless it was parsed for
+        # some other content.
+        if self._po_content is not self.content:
             self.is_content_valid()
+        # The entries are modified below, so the file is only used once.
+        self._po_content = None
 
-        self._parse_copyrights(self.content)
-        try:
-            self._po = polib.pofile(self.content)
-        except IOError, e:
-            raise PoParseError(unicode(e))
+        with self._timed('copyrights'):
+            self._parse_copyrights(self.content)
+        with self._timed('stringset'):
+            self._parse_entries(is_source, nplural)
+        return self._po
 
+    def _parse_entries(self, is_source, nplural):
+        """Add the entries of the parsed file to the stringset."""
         for entry in self._po:
             pluralized = False
             same_nplural = True
@@ -363,10 +703,10 @@ class GettextHandler(Handler):
                                 'key':n
                             }
                         )
-        return self._po
 
     def _generate_template(self, po):
-        return self.get_po_contents(po)
+        with self._timed('template'):
+            return self.get_po_contents(po)
 
     def _parse_copyrights(self, content):
         """Read the copyrights (if any) from a gettext file."""
@@ -408,32 +748,42 @@ class POHandler(GettextHandler):
     def _post_compile(self, language):
         # Add copyright headers if any
         po = super(POHandler, self)._post_compile(language)
+        content = self.compiled_template.decode(self.format_encoding)
+        # The content ends with a newline and _iter_post_compile adds the
+        # empty line that follows it.
+        lines = content.split(u'\n')[:-1]
+        self.compiled_template = u''.join(
+            line + u'\n' for line in self._iter_post_compile(lines, language)
+        ).encode(self.format_encoding)
+        return po
+
+    def _iter_post_compile(self, lines, language):
+        """Add the copyright headers after the leading comments."""
+        lines = super(POHandler, self)._iter_post_compile(lines, language)
         from transifex.addons.copyright.models import Copyright
-        c = Copyright.objects.filter(
-            resource=self.resource, language=self.language
-        ).order_by('owner')
-        content_with_copyright = ""
         copyrights_inserted = False
-        for line in self.compiled_template.split('\n'):
+        # Splitting content that ends with a newline results in an extra
+        # empty line.
+        for line in itertools.chain(lines, [u""]):
             if line.startswith('#'):
                 if not line.startswith('# FIRST AUTHOR'):
-                    content_with_copyright += line + "\n"
+                    yield line
             elif not copyrights_inserted:
                 copyrights_inserted = True
-                content_with_copyright += "# Translators:\n"
+                yield u"# Translators:"
+                c = Copyright.objects.filter(
+                    resource=self.resource, language=self.language
+                ).order_by('owner')
                 for entry in c:
-                    content_with_copyright += '# ' + entry.owner.encode('UTF-8') + \
-                            ', ' + entry.years_text.encode('UTF-8') + ".\n"
-                content_with_copyright += line + "\n"
+                    yield u'# %s, %s.' % (entry.owner, entry.years_text)
+                yield line
             else:
-                content_with_copyright += line + "\n"
-        self.compiled_template = content_with_copyright
-        return po
+                yield line
 
     def _parse_copyrights(self, content):
         """Read the copyrights (if any) from a po file."""
         # TODO remove FIRST AUTHOR line
-        for line in content.split('\n'):
+        for line in _iter_text_lines(content):
             if not line.startswith('#'):
                 break
             c = self._get_copyright_from_line(line)
@@ -452,8 +802,9 @@ class POTHandler(GettextHandler):
     def is_pot(self):
         return True
 
-    def _apply_translation(self, source_hash, trans, content):
-        return self._replace_translation("%s_tr" % source_hash, "", content)
+    def _get_translation_strings(self, source_entities, language):
+        # Override to avoid a db query. All translations are left empty.
+        return {}
 
     def _get_plurals(self, language):
         # Override to avoid a db query
@@ -30,6 +30,8 @@ class PropertiesHandler(Handler):
 
     HandlerParseError = PropertiesParseError
     HandlerCompileError = PropertiesCompileError
+    # Translations of keys missing from the source are dropped
+    parse_uses_database = True
 
     SEPARATORS = [' ', '\t', '\f', '=', ':', ]
     comment_chars = ('#', '!', )
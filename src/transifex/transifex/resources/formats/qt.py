@@ -7,6 +7,7 @@ import re
 import time
 import xml.dom.minidom
 import xml.parsers.expat
+from collections import defaultdict
 from xml.sax.saxutils import escape as xml_escape
 from django.db import transaction
 from django.db.models import get_model
@@ -62,6 +63,127 @@ def _getText(nodelist):
             rc.append(node.toxml())
     return ''.join(rc)
 
+def _context_key(context):
+    """Return the context of a source entity as it is stored in the db."""
+    if isinstance(context, list):
+        context = u':'.join(context)
+    return context or u"None"
+
+def _set_attribute(tag, name, value):
+    """Set an attribute in the text of a start tag."""
+    attribute = '%s="%s"' % (name, xml_escape(value, {'"': '&quot;'}))
+    pattern = re.compile(r'(\s)%s\s*=\s*("[^"]*"|\'[^\']*\')' % name)
+    if pattern.search(tag):
+        return pattern.sub(lambda m: m.group(1) + attribute, tag, 1)
+    if tag.endswith('/>'):
+        return '%s %s/>' % (tag[:-2].rstrip(), attribute)
+    return '%s %s>' % (tag[:-1].rstrip(), attribute)
+
+def _scan_messages(content):
+    """Find the parts of a compiled TS file that need to be updated.
+
+    Parses ``content`` with expat, without building a DOM.
+
+    Returns:
+        A tuple of the (start, end) byte offsets of the <TS> start tag and
+        a list of the messages to update: the numerus ones and the ones
+        with an empty translation. Each message is a dictionary with the
+        ``numerus`` flag, the source ``string``, the ``context`` and the
+        byte offsets of the ``translation`` element (start and end of the
+        start tag, start and end of the end tag).
+    """
+    parser = xml.parsers.expat.ParserCreate()
+    state = {
+        'root': None, 'path': [], 'text': None, 'context_name': u'',
+        'message': None,
+    }
+    messages = []
+
+    def tag_end(start):
+        return content.index('>', start) + 1
+
+    def start_element(name, attrs):
+        start = parser.CurrentByteIndex
+        path = state['path']
+        path.append(name)
+        message = state['message']
+        if name == 'TS' and len(path) == 1:
+            state['root'] = (start, tag_end(start))
+        elif name == 'context':
+            state['context_name'] = u''
+        elif name == 'message':
+            state['message'] = message = {
+                'numerus': attrs.get('numerus') == 'yes',
+                'id': attrs.get('id'), 'source': [], 'comment': [],
+                'translation': None, 'empty': True,
+            }
+        elif message is not None and path[-2] == 'message':
+            if name == 'translation':
+                end = tag_end(start)
+                if content[end - 2:end] == '/>':
+                    message['translation'] = (start, end, end, end)
+                else:
+                    message['translation'] = (start, end)
+            elif name in ('source', 'comment'):
+                state['text'] = message[name]
+        elif name == 'name' and path[-2:-1] == ['context']:
+            state['text'] = []
+            state['context_name'] = state['text']
+        if message is not None and 'translation' in path[:-1]:
+            message['empty'] = False
+
+    def end_element(name):
+        path = state['path']
+        message = state['message']
+        if name == 'translation' and message is not None and \
+                path[-2] == 'message' and len(message['translation']) == 2:
+            start = parser.CurrentByteIndex
+            message['translation'] += (start, tag_end(start))
+        elif name == 'message' and message is not None:
+            if message['translation'] is not None and \
+                    (message['numerus'] or message['empty']):
+                messages.append(_message_info(
+                    message, state['context_name']
+                ))
+            state['message'] = None
+        path.pop()
+        state['text'] = None
+
+    def char_data(data):
+        if state['text'] is not None:
+            state['text'].append(data)
+        message = state['message']
+        if message is not None and state['path'][-1] == 'translation':
+            message['empty'] = False
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = char_data
+    try:
+        parser.Parse(content, True)
+    except xml.parsers.expat.ExpatError, e:
+        raise LinguistCompileError(
+            "Error parsing the compiled file: %s" % e
+        )
+    if state['root'] is None:
+        raise LinguistCompileError("Root element is not 'TS'")
+    return state['root'], messages
+
+def _message_info(message, context_name):
+    """Keep the info needed to update a message found by _scan_messages."""
+    context_name = u''.join(context_name)
+    context_name = context_name and escape_context([context_name]) or []
+    comment = u''.join(message['comment'])
+    comment = comment and escape_context([comment]) or []
+    # If we have an id for the message use this as the source
+    # string, otherwise use the actual source string
+    return {
+        'numerus': message['numerus'],
+        'string': message['id'] or u''.join(message['source']),
+        'context': (context_name + comment) or "None",
+        'translation': message['translation'],
+    }
+
 
 class LinguistHandler(Handler):
     name = "Qt4 TS parser"
@@ -74,69 +196,83 @@ class LinguistHandler(Handler):
     def _escape(self, s):
         return xml_escape(s, {"'": "&apos;", '"': '&quot;'})
 
-    def _post_compile(self, *args, **kwargs):
+    def _get_plurals(self, language):
+        """Get the plural forms of all pluralized source strings.
+
+        Returns a dictionary from the (string, context) of each source
+        entity to its translations, ordered by rule.
         """
+        translations = Translation.objects.filter(
+            resource=self.resource, language=language,
+            source_entity__pluralized=True
+        ).order_by('source_entity__id', 'rule').values_list(
+            'source_entity__string', 'source_entity__context', 'string'
+        )
+        plurals = defaultdict(list)
+        for string, context, translation in translations.iterator():
+            plurals[(string, _context_key(context))].append(translation)
+        return plurals
+
+    def _numerusforms(self, forms, nplurals):
+        """Return the <numerusform> elements of a translation."""
+        # Initialize all plural rules up to the last
+        forms = forms + [u""] * (nplurals - len(forms))
+        return u''.join(
+            u'<numerusform>%s</numerusform>' % self._escape(
+                self._pseudo_decorate(form)
+            ) for form in forms
+        ), not all(forms)
+
+    def _post_compile(self, language=None):
         """
-        if hasattr(kwargs,'language'):
-            language = kwargs['language']
-        else:
-            language = self.language
-
-        doc = xml.dom.minidom.parseString(self.compiled_template)
-        root = doc.documentElement
-        root.attributes["language"] = language.code
+        Set the language of the file, add the plural forms and mark the
+        untranslated messages as unfinished.
 
-        for message in doc.getElementsByTagName("message"):
-            translation = _getElementByTagName(message, "translation")
-            if message.attributes.has_key("numerus") and \
-                message.attributes['numerus'].value=='yes':
-                source = _getElementByTagName(message, "source")
-                numerusforms = message.getElementsByTagName('numerusform')
-                translation.childNodes  = []
-
-                # If we have an id for the message use this as the source
-                # string, otherwise use the actual source string
-                if message.attributes.has_key("id"):
-                    sourceString = message.attributes['id'].value
-                else:
-                    sourceString = _getText(source.childNodes)
-
-                plurals = Translation.objects.filter(
-                    resource=self.resource,
-                    language=language,
-                    source_entity__string=sourceString,
-                    source_entity__context=self._context_of_message(message)
-                ).order_by('rule')
-
-                plural_keys = {}
-                # last rule excluding other(5)
-                lang_rules = language.get_pluralrules_numbers()
-                # Initialize all plural rules up to the last
-                for p,n in enumerate(lang_rules):
-                    plural_keys[p] = ""
-                for p,n in enumerate(plurals):
-                    plural_keys[p] = n.string
-                message.setAttribute('numerus', 'yes')
-                for key in plural_keys.iterkeys():
-                    e = doc.createElement("numerusform")
-                    e.appendChild(
-                        doc.createTextNode(
-                            self._pseudo_decorate(plural_keys[key])
-                        )
-                    )
-                    translation.appendChild(e)
-                    if not plural_keys[key]:
-                        translation.attributes['type'] = 'unfinished'
+        The compiled file is scanned with expat and only the parts that
+        change are rewritten, instead of building a DOM of the whole file.
+        """
+        if language is None:
+            language = self.language
+        content = self.compiled_template
+        if isinstance(content, unicode):
+            content = content.encode(self.format_encoding)
+        plurals = self._get_plurals(language)
+        nplurals = len(language.get_pluralrules_numbers())
+        root, messages = _scan_messages(content)
+        edits = [(root[0], root[1], _set_attribute(
+            content[root[0]:root[1]], 'language', language.code
+        ))]
+        for message in messages:
+            start, start_end, end_start, end = message['translation']
+            tag = content[start:start_end]
+            if message['numerus']:
+                forms, unfinished = self._numerusforms(
+                    plurals.get(
+                        (message['string'], _context_key(message['context'])),
+                        []
+                    ), nplurals
+                )
+                if unfinished:
+                    tag = _set_attribute(tag, 'type', 'unfinished')
+                if tag.endswith('/>'):
+                    tag = tag[:-2].rstrip() + '>'
+                edits.append((
+                    start, end,
+                    tag + forms.encode(self.format_encoding) + '</translation>'
+                ))
             else:
-                if not translation.childNodes:
-                    translation.attributes['type'] = 'unfinished'
-
-        template_text = doc.toxml()
-        esc_template_text = re.sub("'(?=(?:(?!>).)*<\/source>)",
-            r"&apos;", template_text)
-        esc_template_text = re.sub("'(?=(?:(?!>).)*<\/translation>)",
-            r"&apos;", esc_template_text)
-        self.compiled_template = esc_template_text
+                edits.append(
+                    (start, start_end, _set_attribute(tag, 'type', 'unfinished'))
+                )
+
+        chunks = []
+        position = 0
+        for start, end, replacement in edits:
+            chunks.append(content[position:start])
+            chunks.append(replacement)
+            position = end
+        chunks.append(content[position:])
+        self.compiled_template = ''.join(chunks)
 
     def _context_of_message(self, message):
         """Get the context value of a message node."""
@@ -80,8 +80,8 @@ class _FormatsRegistry(object):
         """
         Return an appropriate Handler class for given file.
 
-        The handler is selected based on libmagic and the file extension
-        or the mime type.
+        The handler is selected based on the file extension and the mime
+        type. If no mime type is given, it is detected with libmagic.
 
         Args:
             filename: The path to the file.
@@ -92,23 +92,10 @@ class _FormatsRegistry(object):
         """
         i18n_type = None
         if filename is not None:
-            try:
-                m = magic.Magic(mime=True)
-                # guess mimetype and remove charset
-                mime_type = m.from_file(filename)
-            except AttributeError, e:
-                m = magic.open(magic.MAGIC_NONE)
-                m.load()
-                mime_type = m.file(filename)
-                m.close()
-            except IOError, e:
-                # file does not exist in the storage
-                mime_type = None
-            except Exception, e:
-                logger.error("Uncaught exception: %s" % e.message, exc_info=True)
-                # We don't have the actual file. Depend on the filename only
-                mime_type = None
-
+            if mimetype is not None:
+                mime_type = mimetype
+            else:
+                mime_type = self._detect_mime_type(filename)
             for method, info in self.methods.items():
                 if filter(filename.endswith, info['file-extensions'].split(', ')) or\
                   mime_type in info['mimetype'].split(', '):
@@ -122,6 +109,26 @@ class _FormatsRegistry(object):
 
         return i18n_type
 
+    def _detect_mime_type(self, filename):
+        """Return the mime type of a file, as libmagic detects it."""
+        try:
+            m = magic.Magic(mime=True)
+            # guess mimetype and remove charset
+            mime_type = m.from_file(filename)
+        except AttributeError, e:
+            m = magic.open(magic.MAGIC_NONE)
+            m.load()
+            mime_type = m.file(filename)
+            m.close()
+        except IOError, e:
+            # file does not exist in the storage
+            mime_type = None
+        except Exception, e:
+            logger.error("Uncaught exception: %s" % e.message, exc_info=True)
+            # We don't have the actual file. Depend on the filename only
+            mime_type = None
+        return mime_type
+
     def is_supported(self, m):
         """Check whether the method is supported.
 
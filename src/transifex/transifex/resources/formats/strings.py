@@ -36,6 +36,8 @@ class AppleStringsHandler(Handler):
 
     HandlerParseError = StringsParseError
     HandlerCompileError = StringsCompileError
+    # Translations of keys missing from the source are dropped
+    parse_uses_database = True
 
     def _post_compile(self, *args, **kwargs):
         self.compiled_template = self.compiled_template.decode(
@@ -29,3 +29,206 @@ def percent_diff(a, b):
     except ZeroDivisionError:
         if len(a)==len(b): return 0
         else: return 100
+
+def bounded_levenshtein_distance(first, second, limit):
+    """Find the Levenshtein distance between two strings, if it is at most
+    ``limit``.
+
+    Only the cells of the distance matrix within ``limit`` of the diagonal
+    are computed and the computation stops as soon as the distance is
+    certain to exceed the limit.
+
+    Returns:
+        The distance or ``limit + 1``, if the distance is larger than
+        ``limit``.
+    """
+    if len(first) > len(second):
+        first, second = second, first
+    first_length = len(first)
+    second_length = len(second)
+    if second_length - first_length > limit:
+        return limit + 1
+    if first_length == 0:
+        return second_length
+    over = limit + 1
+    previous = range(min(second_length, limit) + 1) + \
+            [over] * (second_length - min(second_length, limit))
+    for i in xrange(1, first_length + 1):
+        start = max(1, i - limit)
+        end = min(second_length, i + limit)
+        current = [over] * (second_length + 1)
+        if start == 1:
+            current[0] = i
+        char = first[i-1]
+        row_min = current[0]
+        for j in xrange(start, end + 1):
+            cost = previous[j-1]
+            if char != second[j-1]:
+                cost += 1
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j-1] + 1 < cost:
+                cost = current[j-1] + 1
+            if cost > over:
+                cost = over
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+    return min(previous[second_length], over)
+
+def max_distance(percent, length):
+    """Return the largest Levenshtein distance for which the percent
+    difference (see ``percent_diff``) of two strings, the longest of which
+    has ``length`` characters, is lower than ``percent``.
+    """
+    if length == 0:
+        # Two empty strings have no difference.
+        if percent > 0:
+            return 0
+        return -1
+    limit = int(percent * length / 100.0)
+    if 100 * limit >= percent * length:
+        limit -= 1
+    return limit
+
+
+class SimilarStringIndex(object):
+    """Index of strings for finding the strings similar to a given one.
+
+    Strings are similar, if their percent difference (see ``percent_diff``)
+    is lower than ``max_percent``.
+
+    Candidates are found with a q-gram count filter: strings with an edit
+    distance of ``d`` share at least ``max(len) - q + 1 - d * q`` q-grams.
+    Only the strings that share one of the rarest q-grams of the string
+    looked up can reach that count, so the other strings are never looked
+    at. The filters discard only strings that cannot be similar, so the
+    result is the same as comparing the string with every string of the
+    index.
+    """
+
+    def __init__(self, strings, max_percent, q=3):
+        """Index the strings.
+
+        Args:
+            strings: An iterable of (key, string) tuples.
+            max_percent: The maximum percent difference (exclusive).
+            q: The length of the q-grams.
+        """
+        self.max_percent = max_percent
+        self.q = q
+        self.strings = {}
+        self._qgram_counts = {}
+        self._postings = {}
+        self._lengths = {}
+        for key, string in strings:
+            self.strings[key] = string
+            self._lengths.setdefault(len(string), []).append(key)
+            grams = self._qgrams(string)
+            self._qgram_counts[key] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key)
+
+    def _qgrams(self, string):
+        """Return a dictionary of the q-grams of the string to the number of
+        their occurrences.
+        """
+        grams = {}
+        q = self.q
+        for i in xrange(len(string) - q + 1):
+            gram = string[i:i + q]
+            grams[gram] = grams.get(gram, 0) + 1
+        return grams
+
+    def _bounds(self, length):
+        """Return a dictionary of the lengths of the indexed strings that
+        may be similar to a string of ``length`` characters to a tuple of
+        the maximum distance and the minimum number of shared q-grams.
+        """
+        bounds = {}
+        for other_length in self._lengths:
+            longest = max(length, other_length)
+            limit = max_distance(self.max_percent, longest)
+            if limit >= 0 and abs(length - other_length) <= limit:
+                bounds[other_length] = (
+                    limit, longest - self.q + 1 - limit * self.q
+                )
+        return bounds
+
+    def candidates(self, string):
+        """Return the keys of the strings that may be similar to ``string``.
+
+        Returns:
+            A dictionary of the candidate keys to the maximum distance the
+            respective string may have from ``string``.
+        """
+        bounds = self._bounds(len(string))
+        if not bounds:
+            return {}
+        result = {}
+        # Strings may be similar without sharing any q-grams.
+        for other_length, (limit, threshold) in bounds.iteritems():
+            if threshold <= 0:
+                for key in self._lengths[other_length]:
+                    result[key] = limit
+        min_threshold = min(threshold for limit, threshold in bounds.values())
+
+        grams = self._qgrams(string)
+        keys = set()
+        if min_threshold <= 0:
+            for gram in grams:
+                keys.update(self._postings.get(gram, ()))
+        else:
+            # A string that shares none of the first ``total - threshold + 1``
+            # occurrences of q-grams shares less than ``threshold``.
+            remaining = sum(grams.itervalues()) - min_threshold + 1
+            rarest = sorted(
+                grams, key=lambda g: len(self._postings.get(g, ()))
+            )
+            for gram in rarest:
+                if remaining <= 0:
+                    break
+                keys.update(self._postings.get(gram, ()))
+                remaining -= grams[gram]
+
+        for key in keys:
+            if key in result:
+                continue
+            bound = bounds.get(len(self.strings[key]))
+            if bound is None:
+                continue
+            other = self._qgram_counts[key]
+            shared = 0
+            for gram, count in grams.iteritems():
+                other_count = other.get(gram)
+                if other_count:
+                    shared += min(count, other_count)
+            if shared >= bound[1]:
+                result[key] = bound[0]
+        return result
+
+    def _is_similar(self, string, key, limit):
+        return bounded_levenshtein_distance(
+            string, self.strings[key], limit
+        ) <= limit
+
+    def find(self, string):
+        """Return the sorted keys of the strings similar to ``string``."""
+        candidates = self.candidates(string)
+        return [
+            key for key in sorted(candidates)
+            if self._is_similar(string, key, candidates[key])
+        ]
+
+    def find_first(self, string):
+        """Return the smallest key of the strings similar to ``string`` or
+        None.
+        """
+        candidates = self.candidates(string)
+        for key in sorted(candidates):
+            if self._is_similar(string, key, candidates[key]):
+                return key
+        return None
@@ -1,6 +1,13 @@
 # -*- coding: utf-8 -*-
 """
 Validator classes for individual strings.
+
+The validators of an i18n type are combined in a ``ValidatorPipeline``,
+which is created once per i18n type by ``get_pipeline``. The pipeline
+wraps the strings in ``TokenizedString`` objects, so that the tokens the
+validators look for (printf specifiers, urls, numbers etc) are found once
+per string and shared by all validators. ``validate_translations`` checks
+many translations at once and returns a ``QAReport``.
 """
 
 import re
@@ -14,6 +21,64 @@ class ValidationError(Exception):
     pass
 
 
+PRINTF_RE = re.compile(
+    '%((?:(?P<ord>\d+)\$|\((?P<key>\w+)\))?(?P<fullvar>[+#-]*(?:\d+)?'\
+        '(?:\.\d+)?(hh\|h\|l\|ll)?(?P<type>[\w%])))'
+)
+
+
+class TokenizedString(unicode):
+    """A string, which keeps the results of the regular expressions run on
+    it, so that each expression is run once, no matter how many validators
+    use it.
+    """
+
+    @property
+    def unescaped(self):
+        """The unescaped string."""
+        try:
+            return self._unescaped
+        except AttributeError:
+            self._unescaped = unescape(self)
+            return self._unescaped
+
+    def _tokens(self, method, pattern, unescaped):
+        key = (method, pattern, unescaped)
+        try:
+            return self._cache[key]
+        except AttributeError:
+            self._cache = {}
+        except KeyError:
+            pass
+        if unescaped:
+            string = self.unescaped
+        else:
+            string = unicode(self)
+        if method == 'findall':
+            tokens = pattern.findall(string)
+        else:
+            tokens = list(pattern.finditer(string))
+        self._cache[key] = tokens
+        return tokens
+
+    def findall(self, pattern, unescaped=True):
+        """Return the matches of the compiled ``pattern`` as strings."""
+        return self._tokens('findall', pattern, unescaped)
+
+    def matches(self, pattern, unescaped=True):
+        """Return the match objects of the compiled ``pattern``."""
+        return self._tokens('finditer', pattern, unescaped)
+
+
+def tokenize(string):
+    """Return the string as a TokenizedString."""
+    if isinstance(string, TokenizedString):
+        return string
+    if isinstance(string, str):
+        string = string.decode('utf-8')
+    return TokenizedString(string)
+
+
 class BaseValidator(object):
     """Base class for validators.
 
@@ -73,7 +138,7 @@ class SpaceValidator(BaseValidator):
     """Validator that checks if the translation is just spaces."""
 
     def validate(self, old, new):
-        new = unescape(new)
+        new = tokenize(new).unescaped
         if len(new.strip()) == 0:
             raise ValidationError(
                 _("Translation string only contains whitespaces.")
@@ -87,8 +152,8 @@ class MatchingBracketsValidator(BaseValidator):
     bracket_chars = '[{()}]'
 
     def validate(self, old, new):
-        old = unescape(old)
-        new = unescape(new)
+        old = tokenize(old).unescaped
+        new = tokenize(new).unescaped
         for c in self.bracket_chars:
             if new.count(c) != old.count(c):
                 raise ValidationError(
@@ -107,10 +172,9 @@ class UrlsValidator(BaseValidator):
     )
 
     def validate(self, old, new):
-        old = unescape(old)
-        new = unescape(new)
-        for url in self.urls.findall(old):
-            if url not in new:
+        old, new = tokenize(old), tokenize(new)
+        for url in old.findall(self.urls):
+            if url not in new.unescaped:
                 raise ValidationError(
                     _("The following url is either missing from the"
                       " translation or has been translated: '%s'." % url)
@@ -125,10 +189,9 @@ class EmailAddressesValidator(BaseValidator):
     emails = re.compile("([\w\-\.+]+@[\w\w\-]+\.+[\w\-]+)")
 
     def validate(self, old, new):
-        old = unescape(old)
-        new = unescape(new)
-        for email in self.emails.findall(old):
-            if email not in new:
+        old, new = tokenize(old), tokenize(new)
+        for email in old.findall(self.emails):
+            if email not in new.unescaped:
                 raise ValidationError(
                     _("The following email is either missing from the"
                       " translation or has been translated: '%s'." % email)
@@ -141,9 +204,9 @@ class NewLineAtBeginningValidator(BaseValidator):
     """
 
     def validate(self, old, new):
-        old = unescape(old)
-        old_has_newline = old[0] == '\n'
-        new_has_newline = new[0] == '\n'
+        old = tokenize(old).unescaped
+        old_has_newline = old[:1] == '\n'
+        new_has_newline = new[:1] == '\n'
         if old_has_newline != new_has_newline:
             if old_has_newline:
                 msg = _("Translation must start with a newline (\\n)")
@@ -158,9 +221,9 @@ class NewLineAtEndValidator(BaseValidator):
     """
 
     def validate(self, old, new):
-        old = unescape(old)
-        old_has_newline = old[-1] == '\n'
-        new_has_newline = new[-1] == '\n'
+        old = tokenize(old).unescaped
+        old_has_newline = old[-1:] == '\n'
+        new_has_newline = new[-1:] == '\n'
         if old_has_newline != new_has_newline:
             if old_has_newline:
                 msg = _("Translation must end with a newline (\\n)")
@@ -177,12 +240,11 @@ class NumbersValidator(BaseValidator):
     numbers = re.compile("[-+]?[0-9]*\.?[0-9]+")
 
     def validate(self, old, new):
-        old = unescape(old)
-        new = unescape(new)
-        for num in self.numbers.findall(old):
-            if num not in new:
+        old, new = tokenize(old), tokenize(new)
+        for num in old.findall(self.numbers):
+            if num not in new.unescaped:
                 num = num.replace('.', ',', 1)
-                if num not in new:
+                if num not in new.unescaped:
                     raise ValidationError(
                         _("Number %s is in the source string but not "
                           "in the translation." % num)
@@ -196,10 +258,7 @@ class PrintfFormatNumberValidator(BaseValidator):
     This is valid only if the plurals in the two languages are the same.
     """
 
-    printf_re = re.compile(
-        '%((?:(?P<ord>\d+)\$|\((?P<key>\w+)\))?(?P<fullvar>[+#-]*(?:\d+)?'\
-            '(?:\.\d+)?(hh\|h\|l\|ll)?(?P<type>[\w%])))'
-    )
+    printf_re = PRINTF_RE
 
     def precondition(self):
         """Check if the number of plurals in the two languages is the same."""
@@ -207,10 +266,8 @@ class PrintfFormatNumberValidator(BaseValidator):
                 super(PrintfFormatNumberValidator, self).precondition()
 
     def validate(self, old, new):
-        old = unescape(old)
-        new = unescape(new)
-        old_matches = list(self.printf_re.finditer(old))
-        new_matches = list(self.printf_re.finditer(new))
+        old_matches = tokenize(old).matches(self.printf_re)
+        new_matches = tokenize(new).matches(self.printf_re)
         if len(old_matches) != len(new_matches):
             raise ValidationError(
                 _('The number of arguments seems to differ '
@@ -233,10 +290,7 @@ class PrintfFormatSourceValidator(BaseValidator):
     are preserved in the translation.
     """
 
-    printf_re = re.compile(
-        '%((?:(?P<ord>\d+)\$|\((?P<key>\w+)\))?(?P<fullvar>[+#-]*(?:\d+)?'\
-            '(?:\.\d+)?(hh\|h\|l\|ll)?(?P<type>[\w%])))'
-    )
+    printf_re = PRINTF_RE
 
     def validate(self, source_trans, target_trans):
         """Check, if all printf-format expressions in the source translation
@@ -260,10 +314,8 @@ class PrintfFormatSourceValidator(BaseValidator):
         Raises:
             ValidationError, in case the translation is not valid.
         """
-        source_trans = unescape(source_trans)
-        target_trans = unescape(target_trans)
-        source_matches = list(self.printf_re.finditer(source_trans))
-        target_matches = list(self.printf_re.finditer(target_trans))
+        source_matches = tokenize(source_trans).matches(self.printf_re)
+        target_matches = tokenize(target_trans).matches(self.printf_re)
 
         # We could use just one list comprehension:
         #
@@ -310,10 +362,7 @@ class PrintfFormatTranslationValidator(BaseValidator):
     string show up in the source string.
     """
 
-    printf_re = re.compile(
-        '%((?:(?P<ord>\d+)\$|\((?P<key>\w+)\))?(?P<fullvar>[+#-]*(?:\d+)?'\
-            '(?:\.\d+)?(hh\|h\|l\|ll)?(?P<type>[\w%])))'
-    )
+    printf_re = PRINTF_RE
 
     def validate(self, source_trans, target_trans):
         """Check, if all printf-format expressions in the target translation
@@ -337,8 +386,12 @@ class PrintfFormatTranslationValidator(BaseValidator):
         Raises:
             ValidationError, in case the translation is not valid.
         """
-        source_matches = list(self.printf_re.finditer(source_trans))
-        target_trans_matches = list(self.printf_re.finditer(target_trans))
+        source_matches = tokenize(source_trans).matches(
+            self.printf_re, unescaped=False
+        )
+        target_trans_matches = tokenize(target_trans).matches(
+            self.printf_re, unescaped=False
+        )
 
 
         # Look at PrintfFormatSourceValidator for a comment on optimizing this
@@ -369,6 +422,30 @@ def create_warning_validators(i18n_type):
     return _create_validators(i18n_type, 'I18N_WARNING_VALIDATORS')
 
 
+_validator_classes = {}
+
+
+def _validator_paths(i18n_type, type_):
+    """Return the paths of the validators of the i18n type in the
+    ``type_`` setting.
+    """
+    type_validators = getattr(settings, type_)
+    if i18n_type in type_validators:
+        key = i18n_type
+    else:
+        key = 'DEFAULT'
+    return tuple(type_validators[key])
+
+
+def _import_validator(path):
+    """Import a validator class once."""
+    try:
+        return _validator_classes[path]
+    except KeyError:
+        klass = _validator_classes[path] = import_to_python(path)
+        return klass
+
+
 def _create_validators(i18n_type, type_):
     """Create a generator of validators for the specific i18n_type and
     errors/warning check we need.
@@ -380,9 +457,140 @@ def _create_validators(i18n_type, type_):
     Returns:
         A generator with validator objects.
     """
-    type_validators = getattr(settings, type_)
-    if i18n_type in type_validators:
-        key = i18n_type
-    else:
-        key = 'DEFAULT'
-    return (import_to_python(klass) for klass in type_validators[key])
+    return (
+        _import_validator(path) for path in _validator_paths(i18n_type, type_)
+    )
+
+
+class ValidatorPipeline(object):
+    """The error and warning validators of an i18n type.
+
+    The validators are created once for each pair of languages and plural
+    rule and reused for all strings.
+
+    Args:
+        error_classes: The classes of the validators of errors.
+        warning_classes: The classes of the validators of warnings.
+    """
+
+    def __init__(self, error_classes, warning_classes):
+        self.error_classes = list(error_classes)
+        self.warning_classes = list(warning_classes)
+        self._validators = {}
+
+    def _get_validators(self, source_language, target_language, rule):
+        key = (source_language, target_language, rule)
+        try:
+            return self._validators[key]
+        except KeyError:
+            args = (source_language, target_language, rule)
+            validators = self._validators[key] = (
+                [klass(*args) for klass in self.error_classes],
+                [klass(*args) for klass in self.warning_classes],
+            )
+            return validators
+
+    def check(self, source, translation, source_language=None,
+              target_language=None, rule=5):
+        """Validate a translation.
+
+        Args:
+            source: The source string.
+            translation: The translation.
+            source_language: The source language.
+            target_language: The language of the translation.
+            rule: The plural rule of the translation.
+        Returns:
+            A tuple with the list of errors and the list of warnings.
+        """
+        source, translation = tokenize(source), tokenize(translation)
+        error_validators, warning_validators = self._get_validators(
+            source_language, target_language, rule
+        )
+        errors, warnings = [], []
+        for v in error_validators:
+            try:
+                v(source, translation)
+            except ValidationError, e:
+                errors.append(e.message)
+        for v in warning_validators:
+            try:
+                v(source, translation)
+            except ValidationError, e:
+                warnings.append(e.message)
+        return errors, warnings
+
+
+_pipelines = {}
+
+
+def get_pipeline(i18n_type):
+    """Return the ValidatorPipeline of the i18n type.
+
+    The pipeline is created once for the configured validators.
+    """
+    key = (
+        i18n_type, _validator_paths(i18n_type, 'I18N_ERROR_VALIDATORS'),
+        _validator_paths(i18n_type, 'I18N_WARNING_VALIDATORS'),
+    )
+    try:
+        return _pipelines[key]
+    except KeyError:
+        pipeline = _pipelines[key] = ValidatorPipeline(
+            create_error_validators(i18n_type),
+            create_warning_validators(i18n_type)
+        )
+        return pipeline
+
+
+class QAReport(object):
+    """The results of the validation of many translations.
+
+    The errors and the warnings are lists of ``(item, rule, message)``
+    tuples, where item identifies the translated string.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.errors = []
+        self.warnings = []
+
+    def add(self, item, rule, errors, warnings):
+        """Add the results of the validation of a translation."""
+        self.checked += 1
+        for message in errors:
+            self.errors.append((item, rule, message))
+        for message in warnings:
+            self.warnings.append((item, rule, message))
+
+    def items_with_errors(self):
+        """Return the set of the items with errors."""
+        return set(item for item, rule, message in self.errors)
+
+    def __unicode__(self):
+        return u"%s strings checked: %s errors, %s warnings" % (
+            self.checked, len(self.errors), len(self.warnings)
+        )
+
+
+def validate_translations(i18n_type, source_language, target_language,
+                          strings):
+    """Validate many translations of an i18n type.
+
+    Args:
+        i18n_type: The i18n type of the strings.
+        source_language: The source language.
+        target_language: The language of the translations.
+        strings: An iterable of ``(item, rule, source, translation)``
+            tuples. The item identifies the translation in the report.
+    Returns:
+        A QAReport.
+    """
+    pipeline = get_pipeline(i18n_type)
+    report = QAReport()
+    for item, rule, source, translation in strings:
+        errors, warnings = pipeline.check(
+            source, translation, source_language, target_language, rule
+        )
+        report.add(item, rule, errors, warnings)
+    return report
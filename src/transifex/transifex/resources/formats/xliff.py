@@ -28,6 +28,111 @@ SourceEntity = get_model('resources', 'SourceEntity')
 Template = get_model('resources', 'Template')
 Storage = get_model('storage', 'StorageFile')
 
+def _tag_end(content, start):
+    """Return the end of the tag that starts at ``start``."""
+    return content.index('>', start) + 1
+
+def _whitespace_start(content, position):
+    """Return the start of the whitespace that ends at ``position``."""
+    while position > 0 and content[position - 1] in ' \t\r\n':
+        position -= 1
+    return position
+
+def _set_attribute(tag, name, value):
+    """Set an attribute in the text of a start tag."""
+    attribute = '%s="%s"' % (
+        name, xml_escape(value, {'"': '&quot;'}).encode('UTF-8')
+    )
+    pattern = re.compile(r'(\s)%s\s*=\s*("[^"]*"|\'[^\']*\')' % name)
+    if pattern.search(tag):
+        return pattern.sub(lambda m: m.group(1) + attribute, tag, 1)
+    return '%s %s>' % (tag[:-1].rstrip(), attribute)
+
+def _scan_template(content):
+    """Find the parts of an XLIFF template that need to be compiled.
+
+    Parses ``content`` with expat, without building a DOM.
+
+    Returns:
+        A list of the targets and the plural groups of the template, in
+        the order they appear. A target is a dictionary with the byte
+        offsets of the whitespace before the element (``start``), of the
+        end of its start tag (``tag_end``), of its end tag (``end_tag``)
+        and of its end (``end``), and the ``placeholder`` in it. A plural
+        group is a dictionary with the ``id`` of the group and the
+        ``start`` and ``end`` of its two trans-units. Each unit in
+        ``units`` has the offsets of the whitespace before it (``start``),
+        of its start tag (``tag``) and of its end (``end``) and its
+        ``targets``.
+    """
+    parser = xml.parsers.expat.ParserCreate()
+    state = {'group': None, 'unit': None, 'target': None}
+    parts = []
+
+    def start_element(name, attrs):
+        start = parser.CurrentByteIndex
+        if state['target'] is not None:
+            # Not a plain placeholder
+            state['target']['text'] = None
+        elif name == 'group' and \
+                attrs.get('restype') == 'x-gettext-plurals':
+            state['group'] = {'id': attrs.get('id', u''), 'units': []}
+        elif name == 'trans-unit' and state['group'] is not None:
+            state['unit'] = {
+                'start': _whitespace_start(content, start), 'tag': start,
+                'targets': [],
+            }
+        elif name == 'target':
+            state['target'] = {
+                'start': _whitespace_start(content, start),
+                'tag_end': _tag_end(content, start), 'text': [],
+            }
+
+    def end_element(name):
+        start = parser.CurrentByteIndex
+        target = state['target']
+        group = state['group']
+        if name == 'target' and target is not None:
+            state['target'] = None
+            if not target['text']:
+                return
+            target['end_tag'] = start
+            target['end'] = _tag_end(content, start)
+            target['placeholder'] = u''.join(target.pop('text'))
+            if state['unit'] is not None:
+                state['unit']['targets'].append(target)
+            else:
+                parts.append(target)
+        elif name == 'trans-unit' and state['unit'] is not None:
+            state['unit']['end'] = _tag_end(content, start)
+            group['units'].append(state['unit'])
+            state['unit'] = None
+        elif name == 'group' and group is not None:
+            state['group'] = None
+            units = group['units']
+            if len(units) == 2:
+                group['start'] = units[0]['start']
+                group['end'] = units[1]['end']
+                parts.append(group)
+            else:
+                for unit in units:
+                    parts.extend(unit['targets'])
+
+    def char_data(data):
+        target = state['target']
+        if target is not None and target['text'] is not None:
+            target['text'].append(data)
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = char_data
+    try:
+        parser.Parse(content, True)
+    except xml.parsers.expat.ExpatError, e:
+        raise XliffCompileError("Error parsing the template: %s" % e)
+    return parts
+
+
 class XliffParseError(ParseError):
     pass
 
@@ -43,112 +148,169 @@ class XliffHandler(Handler):
     HandlerParseError = XliffParseError
     HandlerCompileError = XliffCompileError
 
-    def _examine_content(self, content):
-        """Modify template content to handle plural data in target language"""
-        if isinstance(content, unicode):
-            content = content.encode('utf-8')
-        doc = xml.dom.minidom.parseString(content)
-        root = doc.documentElement
-        rules = self.language.get_pluralrules_numbers()
-        plurals = SourceEntity.objects.filter(resource = self.resource, pluralized=True)
-        if self.language != self.resource.source_language and plurals:
-            for entity in plurals:
-                match = False
-                for group_node in root.getElementsByTagName("group"):
-                    if group_node.attributes['restype'].value == "x-gettext-plurals":
-                        trans_unit_nodes = group_node.getElementsByTagName("trans-unit")
-                        if self.getElementByTagName(trans_unit_nodes[0], "source").firstChild.data == entity.string_hash:
-                            match = True
-                            break
-                if not match:
-                    continue
-            for count,rule in enumerate(rules):
-                if rule == 0:
-                    clone = trans_unit_nodes[1].cloneNode(deep=True)
-                    target = self.getElementByTagName(clone, "target")
-                    target.firstChild.data = target.firstChild.data[:-1] + '0'
-                    clone.setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
-                    indent_node = trans_unit_nodes[0].previousSibling.cloneNode(deep=True)
-                    group_node.insertBefore(indent_node, trans_unit_nodes[0].previousSibling)
-                    group_node.insertBefore(clone, trans_unit_nodes[0].previousSibling)
-                if rule == 1:
-                    trans_unit_nodes[0].setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
-                if rule in range(2, 5):
-                    clone = trans_unit_nodes[1].cloneNode(deep=True)
-                    target = self.getElementByTagName(clone, "target")
-                    target.firstChild.data = target.firstChild.data[:-1] + '%d'%rule
-                    clone.setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
-                    indent_node = trans_unit_nodes[1].previousSibling.cloneNode(deep=True)
-                    group_node.insertBefore(indent_node, trans_unit_nodes[1].previousSibling)
-                    group_node.insertBefore(clone, trans_unit_nodes[1].previousSibling)
-                if rule == 5:
-                    trans_unit_nodes[1].setAttribute("id", group_node.attributes["id"].value+'[%d]'%count)
-        content = doc.toxml()
-        return content
-
-    def _get_translation_strings(self, source_entities, language):
-        """Modified to include a new field for translation rule"""
-        res = {}
-        translations = Translation.objects.filter(
-            source_entity__in=source_entities, language=language
-        ).values_list('source_entity_id', 'string', 'rule') .iterator()
-        for t in translations:
-            if res.has_key(t[0]):
-                if type(res[t[0]]) == type([]):
-                    res[t[0]].append(t[1:])
-                else:
-                    res[t[0]] = [res[t[0]]]
-                    res[t[0]].append(t[1:])
-            else:
-                res[t[0]] = t[1:]
-        return res
-
-    def _post_compile(self, *args, **kwargs):
-        doc = xml.dom.minidom.parseString(self.compiled_template)
-        root = doc.documentElement
-        for node in root.getElementsByTagName("target"):
-            value = ""
-            for child in node.childNodes:
-                value += child.toxml()
-            if not value.strip() or self.language == self.resource.source_language:
-                parent = node.parentNode
-                parent.removeChild(node.previousSibling)
-                parent.removeChild(node)
-        self.compiled_template = doc.toxml()
-
-    def _compile(self, content, language):
-        stringset = self._get_source_strings(self.resource)
-        translations = self._get_translation_strings(
-            (s[0] for s in stringset), language
-        )
-
-        for string in stringset:
-            trans = translations.get(string[0], u"")
-            if SourceEntity.objects.get(id__exact=string[0]).pluralized:
-                if type(trans) == type([]):
-                    plural_trans = trans
-                else:
-                    plural_trans = []
-                    for i in self.language.get_pluralrules_numbers():
-                        plural_trans.append((u"", i))
-                for i in plural_trans:
-                    rule = str(i[1])
-                    trans = i[0]
-                    if SourceEntity.objects.get(id__exact=string[0]).pluralized:
-                        content = self._replace_translation(
-                            "%s_pl_%s"%(string[1].encode('utf-8'), rule),
-                            trans or "",
-                            content)
+    # Number of targets and plural groups processed at a time by
+    # compile_iter
+    compile_chunk_size = 500
+
+    def _get_placeholders(self, language):
+        """Return a dictionary of the placeholders of the template to the
+        translations of the strings in the language.
+
+        Pluralized strings have a placeholder for each plural rule of the
+        language; the ones without a translation map to an empty string.
+        """
+        translations = {}
+        for se_id, rule, string in Translation.objects.filter(
+                resource=self.resource, language=language
+            ).values_list('source_entity_id', 'rule', 'string').iterator():
+            translations[(se_id, rule)] = string
+        rules = language.get_pluralrules_numbers()
+        placeholders = {}
+        for se_id, string_hash, pluralized in SourceEntity.objects.filter(
+                resource=self.resource
+            ).values_list('id', 'string_hash', 'pluralized').iterator():
+            if pluralized:
+                for rule in rules:
+                    placeholders["%s_pl_%s" % (string_hash, rule)] = \
+                            translations.get((se_id, rule), u"")
             else:
-                if trans:
-                    trans = trans[0]
-                content = self._replace_translation(
-                    "%s_tr" % string[1].encode('utf-8'),
-                    trans or "",
-                    content
+                placeholders["%s_tr" % string_hash] = \
+                        translations.get((se_id, 5), u"")
+        return placeholders
+
+    def _compile_target(self, content, target, placeholder, translations,
+                        remove):
+        """Return the compiled text of a <target> element of the template.
+
+        Targets without a translation are removed, along with the
+        whitespace before them.
+        """
+        if remove:
+            return ''
+        if placeholder in translations:
+            text = self._get_replacement(placeholder, translations[placeholder])
+            if not text.strip():
+                return ''
+            text = text.encode(self.format_encoding)
+        else:
+            text = placeholder.encode(self.format_encoding)
+        return ''.join([
+            content[target['start']:target['tag_end']], text,
+            content[target['end_tag']:target['end']]
+        ])
+
+    def _compile_span(self, content, start, end, targets, translations,
+                      remove, rule=None):
+        """Return the compiled text of a part of the template with the
+        given targets.
+
+        If ``rule`` is given, the plural placeholders are replaced by the
+        ones of the rule.
+        """
+        chunks = []
+        position = start
+        for target in targets:
+            placeholder = target['placeholder']
+            if rule is not None and '_pl_' in placeholder:
+                placeholder = "%s_pl_%s" % (
+                    placeholder[:placeholder.rindex('_pl_')], rule
                 )
+            chunks.append(content[position:target['start']])
+            chunks.append(self._compile_target(
+                content, target, placeholder, translations, remove
+            ))
+            position = target['end']
+        chunks.append(content[position:end])
+        return ''.join(chunks)
+
+    def _compile_plurals(self, content, group, rules, translations):
+        """Return the compiled text of the trans-units of a plural group.
 
-        return content
+        The template has a unit for the singular and one for the plural.
+        The compiled file has a unit for each plural rule of the language:
+        the one of rule 1 is the singular unit, the rest are copies of the
+        plural unit.
+        """
+        singular, plural = group['units']
+        chunks = []
+        for count, rule in enumerate(rules):
+            unit = rule == 1 and singular or plural
+            tag_end = _tag_end(content, unit['tag'])
+            chunks.append(content[unit['start']:unit['tag']])
+            chunks.append(_set_attribute(
+                content[unit['tag']:tag_end], 'id',
+                u"%s[%d]" % (group['id'], count)
+            ))
+            chunks.append(self._compile_span(
+                content, tag_end, unit['end'], unit['targets'],
+                translations, False, rule
+            ))
+        return ''.join(chunks)
+
+    def _iter_compiled(self, content, language):
+        """Compile the template in a single pass and yield the content of
+        the XLIFF file in chunks.
+
+        The template is scanned with expat: the plural groups are expanded
+        to the plural rules of the language and the targets get the
+        translations. Targets without a translation are removed and so are
+        all targets in the file of the source language.
+        """
+        translations = self._get_placeholders(language)
+        rules = language.get_pluralrules_numbers()
+        remove = language == self.resource.source_language
+        chunks = []
+        position = 0
+        for part in _scan_template(content):
+            chunks.append(content[position:part['start']])
+            if 'units' not in part:
+                chunks.append(self._compile_target(
+                    content, part, part['placeholder'], translations, remove
+                ))
+            elif remove:
+                chunks.append(self._compile_span(
+                    content, part['start'], part['end'],
+                    [t for unit in part['units'] for t in unit['targets']],
+                    translations, remove
+                ))
+            else:
+                chunks.append(self._compile_plurals(
+                    content, part, rules, translations
+                ))
+            position = part['end']
+            if len(chunks) >= 2 * self.compile_chunk_size:
+                yield ''.join(chunks)
+                chunks = []
+        chunks.append(content[position:])
+        yield ''.join(chunks)
+
+    @need_resource
+    def compile(self, language=None):
+        """
+        Compile the template using the database strings. The result is the
+        content of the translation file.
+
+        Args:
+          language: The language of the file
+        """
+        self.compiled_template = ''.join(self.compile_iter(language))
+
+    @need_resource
+    def compile_iter(self, language=None):
+        """
+        Compile the template and return an iterator over chunks of the
+        content of the XLIFF file, encoded in ``format_encoding``.
+
+        Args:
+          language: The language of the file
+        """
+        if language is None:
+            language = self.language
+        self._pre_compile(language)
+        content = Template.objects.get(resource=self.resource).content
+        if isinstance(content, unicode):
+            content = content.encode(self.format_encoding)
+        return self._iter_compiled(content, language)
 
     def _getText(self, nodelist):
         rc = []
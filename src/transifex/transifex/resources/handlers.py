@@ -1,14 +1,25 @@
 # -*- coding: utf-8 -*-
+import datetime
 from django.conf import settings
-from django.db.models import get_model
-from django.db.models.signals import pre_save
+from django.db import IntegrityError, transaction
+from django.db.models import get_model, F
+from django.db.models.signals import pre_save, post_save, pre_delete, \
+        post_delete
 from transifex.actionlog.models import action_logging
+from transifex.languages.models import Language
+from transifex.projects.models import Project
 from transifex.projects.signals import post_resource_save, post_resource_delete
+from transifex.teams.models import Team
 from transifex.txcommon import notifications as txnotification
+from transifex.txcommon.log import logger
 from transifex.resources.utils import invalidate_template_cache
-from transifex.teams.models import Team
+from transifex.resources import stats
+from transifex.resources.compiled import invalidate_compiled_files, \
+        invalidate_project_files, invalidate_language_files
 
 RLStats = get_model('resources', 'RLStats')
+SourceEntity = get_model('resources', 'SourceEntity')
+StatsUpdate = get_model('resources', 'StatsUpdate')
 Translation = get_model('resources', 'Translation')
 
 def get_project_teams(project):
@@ -17,11 +28,30 @@ def get_project_teams(project):
     else:
         return project.team_set.all()
 
-def invalidate_stats_cache(resource, language, **kwargs):
+def invalidate_stats_cache(resource, language, defer=None, **kwargs):
     """
     Invalidate template caches and handle the updating of the persistent
     stats.
+
+    The counters of the stats are kept current as translations change (see
+    ``transifex.resources.stats``), so existing stats are only marked as
+    updated here.
+
+    If ``defer`` is True, the update is queued and processed later by
+    ``process_stats_updates``. It defaults to the DEFERRED_STATS_UPDATES
+    setting.
+
+    The cached compiled files are invalidated right away, even if the
+    update is deferred, and once more after the stats are updated, since
+    the headers of some formats show the last update and committer.
     """
+    _invalidate_compiled_files(resource, language)
+
+    if defer is None:
+        defer = settings.DEFERRED_STATS_UPDATES
+    if defer:
+        queue_stats_update(resource, language, kwargs.get('user'))
+        return
 
     is_source = False
     if not language or language == resource.source_language:
@@ -35,7 +65,7 @@ def invalidate_stats_cache(resource, language, **kwargs):
         # Get or create new RLStat object
         rl, created = RLStats.objects.get_or_create(resource=resource,
             language=language)
-        rl.update( kwargs['user'] if kwargs.has_key('user') else None)
+        rl.touch(kwargs['user'] if kwargs.has_key('user') else None)
         # Check to see if the lang has zero translations and is not a team
         # lang. If yes, delete RLStats object
         if rl.translated == 0 and rl.language.id not in\
@@ -47,7 +77,7 @@ def invalidate_stats_cache(resource, language, **kwargs):
         # Source file was updated. Update all language statistics
         stats = RLStats.objects.filter(resource=resource)
         for s in stats:
-            s.update(kwargs['user'] if kwargs.has_key('user') else None)
+            s.touch(kwargs['user'] if kwargs.has_key('user') else None)
             if s.translated == 0 and s.language.id not in\
               team_languages:
                 s.delete()
@@ -56,8 +86,92 @@ def invalidate_stats_cache(resource, language, **kwargs):
         resource.update_total_entities(save=False)
         resource.update_wordcount(save=True)
 
+    _invalidate_compiled_files(resource, language)
     invalidate_object_templates(resource, language, **kwargs)
 
+def _invalidate_compiled_files(resource, language):
+    if not language or language == resource.source_language:
+        invalidate_compiled_files(resource.id)
+    else:
+        invalidate_compiled_files(resource.id, language.id)
+
+def queue_stats_update(resource, language, user=None):
+    """
+    Queue an update of the stats of the resource in the language.
+
+    An update that is already queued for the same resource and language is
+    reused.
+    """
+    if not language:
+        language = resource.source_language
+    queued = StatsUpdate.objects.filter(resource=resource, language=language)
+    # Increasing the version lets a worker that is processing the update
+    # know it must be processed again.
+    values = {'version': F('version') + 1, 'user': user}
+    if queued.update(**values):
+        return
+    sid = transaction.savepoint()
+    try:
+        StatsUpdate.objects.create(
+            resource=resource, language=language, user=user
+        )
+        transaction.savepoint_commit(sid)
+    except IntegrityError:
+        # Another process queued the update in the meantime.
+        transaction.savepoint_rollback(sid)
+        queued.update(**values)
+
+def process_stats_updates(batch_size=None, exclude=None):
+    """
+    Process a batch of queued stats updates, oldest first.
+
+    Updates that fail are logged and left in the queue.
+
+    Args:
+        batch_size: The maximum number of updates to process. Defaults to
+            the STATS_QUEUE_BATCH_SIZE setting.
+        exclude: A set of ids of updates to skip. The ids of the updates
+            that failed are added to it.
+    Returns:
+        The number of updates in the batch, including the failed ones.
+    """
+    if batch_size is None:
+        batch_size = settings.STATS_QUEUE_BATCH_SIZE
+    if exclude is None:
+        exclude = set()
+    updates = StatsUpdate.objects.select_related(
+        'resource', 'language', 'user'
+    ).order_by('created')
+    if exclude:
+        updates = updates.exclude(pk__in=exclude)
+    updates = list(updates[:batch_size])
+    for update in updates:
+        try:
+            invalidate_stats_cache(update.resource, update.language,
+                defer=False, user=update.user)
+        except Exception, e:
+            logger.error("Error updating the stats of %s for %s: %s" % (
+                update.resource, update.language, e), exc_info=True)
+            exclude.add(update.pk)
+            continue
+        # The update stays queued, if it was queued again in the meantime.
+        StatsUpdate.objects.filter(
+            pk=update.pk, version=update.version
+        ).delete()
+    return len(updates)
+
+def stats_queue_lag():
+    """
+    Return the number of seconds the oldest queued stats update has been
+    waiting for.
+    """
+    oldest = StatsUpdate.objects.order_by('created').values_list(
+        'created', flat=True)[:1]
+    if not oldest:
+        return 0
+    lag = datetime.datetime.now() - oldest[0]
+    return max(lag.days * 86400 + lag.seconds, 0)
+
 def invalidate_object_templates(resource, language, **kwargs):
     """
     Invalidate all template level caches related to a specific object
@@ -75,18 +189,22 @@ def invalidate_object_templates(resource, language, **kwargs):
     invalidate_template_cache("project_resource_details",
         resource.project.slug, resource.slug)
 
+    teams = dict(get_project_teams(resource.project).values_list(
+        'language', 'id'))
+    release_ids = list(resource.project.releases.values_list('id', flat=True))
+
     # Number of source strings in resource
     for lang in langs:
-        team = Team.objects.get_or_none(resource.project, lang.code)
-        if team:
+        team_id = teams.get(lang.id)
+        if team_id:
             # Template lvl cache for team details
             invalidate_template_cache("team_details",
-                team.id, resource.id)
+                team_id, resource.id)
 
-        for rel in resource.project.releases.all():
+        for rel_id in release_ids:
             # Template lvl cache for release details
             invalidate_template_cache("release_details",
-                rel.id, lang.id)
+                rel_id, lang.id)
 
         # Template lvl cache for resource details
         invalidate_template_cache("resource_details_lang",
@@ -98,6 +216,8 @@ def on_resource_save(sender, instance, created, user, **kwargs):
     Called on resource post save and passes a user object in addition to the
     saved instance. Used for logging the create/update of a resource.
     """
+    if not created:
+        invalidate_compiled_files(instance.id)
     # ActionLog
     context = {'resource': instance}
     object_list = [instance.project, instance]
@@ -133,10 +253,58 @@ def on_translation_presave(sender, instance, **kwargs):
             old_instance = Translation.objects.get(pk=instance.id)
             if instance.string != old_instance.string:
                 instance.reviewed = False
+            instance._stats_old = (old_instance.reviewed,
+                old_instance.wordcount)
         except Translation.DoesNotExist, e:
             pass
 
+def on_translation_save(sender, instance, created, **kwargs):
+    """Record the changes of the stats caused by the saved translation."""
+    old_reviewed, old_wordcount = getattr(instance, '_stats_old', (False, 0))
+    stats.translation_saved(instance, created, old_reviewed, old_wordcount)
+    invalidate_compiled_files(instance.resource_id, instance.language_id)
+
+def on_translation_predelete(sender, instance, **kwargs):
+    stats.translation_deleting(instance)
+
+def on_translation_delete(sender, instance, **kwargs):
+    """Record the changes of the stats caused by the deleted translation."""
+    stats.translation_deleted(instance)
+    invalidate_compiled_files(instance.resource_id, instance.language_id)
+
+def on_source_entity_save(sender, instance, created, **kwargs):
+    stats.source_entity_saved(instance, created)
+
+def on_source_entity_delete(sender, instance, **kwargs):
+    stats.source_entity_deleted(instance)
+
+def on_project_change(sender, instance, **kwargs):
+    """The compiled files show the name and the bug tracker of the project."""
+    invalidate_project_files(instance.id)
+
+def on_team_change(sender, instance, **kwargs):
+    """The compiled files show the contact of the team."""
+    invalidate_project_files(instance.project_id)
+
+def on_language_change(sender, instance, **kwargs):
+    """The compiled files show the plural forms of the language."""
+    invalidate_language_files(instance.id)
+
 # Resource signal handlers for logging
 post_resource_save.connect(on_resource_save)
 post_resource_delete.connect(on_resource_delete)
 pre_save.connect(on_translation_presave, sender=Translation)
+
+# Incremental stats
+post_save.connect(on_translation_save, sender=Translation)
+pre_delete.connect(on_translation_predelete, sender=Translation)
+post_delete.connect(on_translation_delete, sender=Translation)
+post_save.connect(on_source_entity_save, sender=SourceEntity)
+post_delete.connect(on_source_entity_delete, sender=SourceEntity)
+
+# Cached compiled files
+post_save.connect(on_project_change, sender=Project)
+post_delete.connect(on_project_change, sender=Project)
+post_save.connect(on_team_change, sender=Team)
+post_delete.connect(on_team_change, sender=Team)
+post_save.connect(on_language_change, sender=Language)
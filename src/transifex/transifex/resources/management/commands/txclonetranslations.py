@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+The txclonetranslations management command, which copies the translations
+of resources from one language to another.
+"""
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import get_model
+
+
+def get_resources(label):
+    """Return the resources of a ``project_slug[.resource_slug]`` label."""
+    Resource = get_model('resources', 'Resource')
+    try:
+        project_slug, resource_slug = label.split('.')
+    except ValueError:
+        project_slug, resource_slug = label, None
+    resources = Resource.objects.select_related('source_language').filter(
+        project__slug=project_slug
+    )
+    if resource_slug is not None:
+        resources = resources.filter(slug=resource_slug)
+    if not resources:
+        raise CommandError("Unknown resource %s" % label)
+    return resources
+
+
+def get_language(code):
+    Language = get_model('languages', 'Language')
+    try:
+        return Language.objects.by_code_or_alias(code)
+    except Language.DoesNotExist:
+        raise CommandError("Unknown language %s" % code)
+
+
+class Command(BaseCommand):
+    """
+    Management Command Class about cloning translations
+    """
+    help = "Copy the translations of the resources from the source language\n"\
+        "to the target language. Existing translations are kept."
+    args = "<project_slug[.resource_slug]> <source_lang> <target_lang>"
+
+    requires_model_validation = True
+    can_import_settings = True
+
+    def handle(self, *args, **options):
+        from transifex.resources.translations import clone_translations
+
+        if len(args) != 3:
+            raise CommandError("Wrong number of arguments.")
+        resources = get_resources(args[0])
+        source_language = get_language(args[1])
+        target_language = get_language(args[2])
+        verbosity = int(options.get('verbosity', 1))
+        for resource in resources:
+            if target_language == resource.source_language:
+                sys.stderr.write((u"Skipping %s: %s is its source language.\n"
+                    % (resource, target_language.code)).encode('UTF-8'))
+                continue
+            added = clone_translations(
+                resource, source_language, target_language
+            )
+            if verbosity > 0:
+                sys.stdout.write((u"%s: %s translations added\n" % (
+                    resource, added
+                )).encode('UTF-8'))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+The txdeletetranslations management command, which deletes the translations
+of resources in a language.
+"""
+import sys
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from transifex.resources.management.commands.txclonetranslations import \
+        get_resources, get_language
+
+
+class Command(BaseCommand):
+    """
+    Management Command Class about deleting translations
+    """
+    help = "Delete the translations of the resources in the language."
+    args = "<project_slug[.resource_slug]> <lang>"
+    option_list = BaseCommand.option_list + (
+        make_option('--source', action='store_true',
+            dest='source', default=False,
+            help='Allow deleting the strings of the source language.'),
+    )
+
+    requires_model_validation = True
+    can_import_settings = True
+
+    def handle(self, *args, **options):
+        from transifex.resources.translations import delete_translations
+
+        if len(args) != 2:
+            raise CommandError("Wrong number of arguments.")
+        resources = get_resources(args[0])
+        language = get_language(args[1])
+        verbosity = int(options.get('verbosity', 1))
+        for resource in resources:
+            if language == resource.source_language and \
+                    not options.get('source'):
+                sys.stderr.write((u"Skipping %s: %s is its source language.\n"
+                    % (resource, language.code)).encode('UTF-8'))
+                continue
+            deleted = delete_translations(resource, language)
+            if verbosity > 0:
+                sys.stdout.write((u"%s: %s translations deleted\n" % (
+                    resource, deleted
+                )).encode('UTF-8'))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import time
+from optparse import make_option
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+from transifex.txcommon.log import logger
+
+
+class Command(NoArgsCommand):
+    """
+    Management command that processes the queued statistics updates.
+    """
+    help = ("Process the statistics updates queued when "
+            "DEFERRED_STATS_UPDATES is enabled, in batches.")
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size', action='store', type='int',
+            dest='batch_size', default=None, help='Number of updates '
+            'processed in each batch. Defaults to STATS_QUEUE_BATCH_SIZE.'),
+        make_option('--forever', action='store_true', dest='forever',
+            default=False, help='Keep waiting for new updates, when the '
+            'queue is empty.'),
+        make_option('--interval', action='store', type='int',
+            dest='interval', default=5, help='Seconds to wait before '
+            'checking an empty queue again, with --forever.'),
+        make_option('--lag', action='store_true', dest='lag',
+            default=False, help='Print the number of queued updates and '
+            'the seconds the oldest one has been waiting for and exit.'),
+    )
+
+    can_import_settings = True
+
+    def handle_noargs(self, **options):
+        from transifex.resources.models import StatsUpdate
+        from transifex.resources.handlers import process_stats_updates, \
+                stats_queue_lag
+
+        verbosity = int(options.get('verbosity', 1))
+        batch_size = options.get('batch_size') or \
+                settings.STATS_QUEUE_BATCH_SIZE
+
+        if options.get('lag'):
+            self.stdout.write("queued: %s\nlag: %s\n" % (
+                StatsUpdate.objects.count(), stats_queue_lag()))
+            return
+
+        failed = set()
+        while True:
+            lag = stats_queue_lag()
+            processed = process_stats_updates(batch_size, exclude=failed)
+            if processed:
+                logger.info("Processed %s stats updates (lag %ss)." % (
+                    processed, lag))
+                if verbosity > 1:
+                    self.stdout.write("Processed %s updates, lag was %ss.\n"
+                        % (processed, lag))
+                continue
+            if not options.get('forever'):
+                break
+            # Retry the failed updates, once the queue is drained.
+            failed.clear()
+            time.sleep(options.get('interval'))
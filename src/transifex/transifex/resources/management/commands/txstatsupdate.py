@@ -1,18 +1,52 @@
 # -*- coding: utf-8 -*-
+from __future__ import with_statement
+import datetime
+import Queue
+import threading
+import time
 from optparse import make_option, OptionParser
 import os.path
 import sys
 from django.core.management.base import (BaseCommand, LabelCommand, CommandError)
-from django.db.models import get_model
+from django.db import connection
+from django.db.models import get_model, Q
 from django.conf import settings
 
+
+def _parse_since(value):
+    for format in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, format)
+        except ValueError:
+            continue
+    raise CommandError("Invalid date for --since: %s" % value)
+
+
 class Command(LabelCommand):
     """
     Management Command Class about resource source file updating
     """
     help = "This command creates the necessary objects for every resource"\
-           " and forces statistics to be recalculated."
+           " and forces statistics to be recalculated. Use it to repair"\
+           " statistics that have drifted from the translations."
     args = "<project_slug1.resource_slug1 project_slug1.resource_slug2>"
+    option_list = LabelCommand.option_list + (
+        make_option('--bulk', action='store_true', dest='bulk',
+            default=False, help='Recount the statistics of many resources '
+            'at once, with a few aggregate queries.'),
+        make_option('--project', action='append', dest='projects',
+            default=[], help='Update the resources of the project with this '
+            'slug. Can be given many times.'),
+        make_option('--since', action='store', dest='since', default=None,
+            help='Update only the resources changed since this date '
+            '(YYYY-MM-DD [HH:MM[:SS]]).'),
+        make_option('--workers', action='store', type='int', dest='workers',
+            default=1, help='Number of threads recounting disjoint sets of '
+            'resources at the same time, with --bulk.'),
+        make_option('--batch-size', action='store', type='int',
+            dest='batch_size', default=100, help='Number of resources '
+            'recounted together, with --bulk.'),
+    )
 
     can_import_settings = True
 
@@ -26,6 +60,10 @@ class Command(LabelCommand):
 
         verbosity = int(options.get('verbosity',1))
 
+        if options.get('workers') < 1 or options.get('batch_size') < 1:
+            raise CommandError("The workers and the batch size must be "
+                "positive numbers.")
+
         if not args:
             resources = Resource.objects.all()
         else:
@@ -40,6 +78,34 @@ class Command(LabelCommand):
                 except ValueError, e:
                     raise Exception("Argument %s is not in the correct format"
                         % arg)
+            resources = Resource.objects.filter(
+                id__in=[r.id for r in resources]
+            )
+
+        if options.get('projects'):
+            resources = resources.filter(
+                project__slug__in=options.get('projects')
+            )
+        if options.get('since'):
+            since = _parse_since(options.get('since'))
+            resources = resources.filter(
+                Q(last_update__gte=since) |
+                Q(id__in=Translation.objects.filter(
+                    last_update__gte=since).values('resource')) |
+                Q(id__in=RLStats.objects.filter(
+                    last_update__gte=since).values('resource'))
+            )
+
+        if options.get('bulk'):
+            resource_ids = list(resources.order_by('id').values_list(
+                'id', flat=True
+            ))
+            if not resource_ids:
+                sys.stderr.write("No resources suitable for updating found. Exiting...\n")
+                sys.exit()
+            self.recount(resource_ids, verbosity, options.get('workers'),
+                         options.get('batch_size'))
+            return
 
         num = len(resources)
 
@@ -99,3 +165,64 @@ class Command(LabelCommand):
             for stat in rlstats:
                 if not stat.language.id in langs:
                     stat.delete()
+
+    def recount(self, resource_ids, verbosity, workers, batch_size):
+        """Recount the stats of the resources in batches, with the given
+        number of threads.
+        """
+        from transifex.resources.stats import RecountResult, recount_stats
+
+        if verbosity:
+            sys.stdout.write("A total of %s resources are listed for "
+                "updating.\n" % len(resource_ids))
+        batches = Queue.Queue()
+        for i in xrange(0, len(resource_ids), batch_size):
+            batches.put(resource_ids[i:i + batch_size])
+        total = RecountResult()
+        errors = []
+        lock = threading.Lock()
+
+        def worker(close_connection=False):
+            try:
+                while True:
+                    try:
+                        batch = batches.get_nowait()
+                    except Queue.Empty:
+                        return
+                    start = time.time()
+                    try:
+                        result = recount_stats(batch)
+                    except Exception, e:
+                        with lock:
+                            errors.append(e)
+                            sys.stderr.write("Error recounting resources "
+                                "%s-%s: %s\n" % (batch[0], batch[-1], e))
+                        continue
+                    with lock:
+                        total.add(result)
+                        if verbosity > 1:
+                            sys.stdout.write((u"%s in %.2fs\n" % (
+                                unicode(result), time.time() - start
+                            )).encode('UTF-8'))
+            finally:
+                # Each thread has its own database connection
+                if close_connection:
+                    connection.close()
+
+        start = time.time()
+        if workers == 1:
+            worker()
+        else:
+            threads = [threading.Thread(target=worker, args=(True, ))
+                       for i in xrange(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        if verbosity:
+            sys.stdout.write((u"Recounted %s in %.2fs\n" % (
+                unicode(total), time.time() - start
+            )).encode('UTF-8'))
+        if errors:
+            raise CommandError("Failed to recount %s batches of resources."
+                % len(errors))
@@ -3,6 +3,7 @@
 String Level models.
 """
 
+from __future__ import with_statement
 import datetime, sys, re, operator
 from itertools import groupby
 
@@ -18,6 +19,7 @@ from django.contrib.auth.models import User, AnonymousUser
 from django.forms import ValidationError
 
 from transifex.languages.models import Language
+from transifex.languages.registry import registry as language_registry
 from transifex.projects.models import Project
 from transifex.txcommon.db.models import CompressedTextField, \
     ChainerManager, ListCharField
@@ -230,10 +232,13 @@ class Resource(models.Model):
         """
         # Import is here to avoid circular imports
         from transifex.resources.handlers import invalidate_stats_cache
+        from transifex.resources.stats import batch_stats
 
-        invalidate_stats_cache(self, self.source_language)
+        invalidate_stats_cache(self, self.source_language, defer=False)
         RLStats.objects.filter(resource=self).delete()
-        super(Resource, self).delete(*args, **kwargs)
+        # The stats are gone, there is nothing to keep up to date.
+        with batch_stats(discard=True):
+            super(Resource, self).delete(*args, **kwargs)
 
     def update_total_entities(self, total_entities=None, save=True):
         """
@@ -381,6 +386,13 @@ class SourceEntity(models.Model):
         """
         Do some exra processing before the actual save to db.
         """
+        self._update_string_hash()
+        super(SourceEntity, self).save(*args, **kwargs)
+
+    def _update_string_hash(self):
+        """
+        Calculate the hash of the (string, context) of the source entity.
+        """
         context = self.context_string
         # This is for sqlite support since None objects are treated as strings
         # containing 'None'
@@ -391,8 +403,6 @@ class SourceEntity(models.Model):
         self.string_hash = md5_constructor(':'.join([self.string,
             context]).encode('utf-8')).hexdigest()
 
-        super(SourceEntity, self).save(*args, **kwargs)
-
     @property
     def context_string(self):
         """Return context field as a colon concatenated string"""
@@ -667,11 +677,17 @@ class Translation(models.Model):
         """
         Do some exra processing before the actual save to db.
         """
-        # encoding happens to support unicode characters
-        self.string_hash = md5(self.string.encode('utf-8')).hexdigest()
+        self._update_string_hash()
         self._update_wordcount()
         super(Translation, self).save(*args, **kwargs)
 
+    def _update_string_hash(self):
+        """
+        Calculate the hash of the translation string.
+        """
+        # encoding happens to support unicode characters
+        self.string_hash = md5(self.string.encode('utf-8')).hexdigest()
+
     def _update_wordcount(self):
         """
         Return the number of words for this translation string.
@@ -691,18 +707,18 @@ class Translation(models.Model):
         """
         # Tweaking the translation rule, because the source translation might
         # not have the same number of plural rules.
-        source_language = self.resource.source_language
+        source_language_id = self.resource.source_language_id
         if not self.source_entity.pluralized or \
-            (self.source_entity.pluralized and
-            self.rule in source_language.get_pluralrules_numbers()):
+            (self.source_entity.pluralized and self.rule in
+            language_registry.by_id(source_language_id).rule_numbers):
             rule = self.rule
         else:
             rule = 5
 
         try:
-            if source_language != self.language:
-                return Translation.objects.get(language=source_language,
-                    rule=rule, source_entity=self.source_entity)
+            if source_language_id != self.language_id:
+                return Translation.objects.get(language=source_language_id,
+                    rule=rule, source_entity=self.source_entity_id)
         except Translation.DoesNotExist:
             pass
 
@@ -935,6 +951,16 @@ class RLStats(models.Model):
             self.save(update=False)
         post_update_rlstats.send_robust(sender=self)
 
+    def touch(self, user=None):
+        """
+        Mark the RLStat object as updated without recounting it.
+
+        The counters are kept current by ``transifex.resources.stats``.
+        """
+        self._update_now(user)
+        self.save(update=False)
+        post_update_rlstats.send_robust(sender=self)
+
     def _update_now(self, user=None):
         """
         Update the last update and last committer.
@@ -943,6 +969,33 @@ class RLStats(models.Model):
         if user:
             self.last_committer = user
 
+class StatsUpdate(models.Model):
+    """
+    A queued update of the statistics of a resource in a language.
+
+    Updates are queued instead of processed during the request, when the
+    DEFERRED_STATS_UPDATES setting is enabled. There is at most one queued
+    update for each resource and language.
+    """
+
+    resource = models.ForeignKey(Resource, verbose_name=_("Resource"),
+        help_text=_("The resource whose statistics need to be updated."))
+    language = models.ForeignKey(Language, verbose_name=_("Language"),
+        help_text=_("The language whose statistics need to be updated."))
+    user = models.ForeignKey(User, null=True, verbose_name=_("User"),
+        help_text=_("The user that caused the last queued update."))
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+    version = models.PositiveIntegerField(default=0, editable=False,
+        help_text=_("Increased every time the update is queued again."))
+
+    def __unicode__(self):
+        return "Stats update of %s for %s" % (
+            self.resource_id, self.language_id)
+
+    class Meta:
+        unique_together = ('resource', 'language',)
+        ordering = ['created',]
+
 class Template(models.Model):
     """
     Source file template for a specific resource.
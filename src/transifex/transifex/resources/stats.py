@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental maintenance of the RLStats objects.
+
+Instead of recounting all translations of a resource every time one of them
+changes, the changes to the counters of the RLStats objects (translated,
+untranslated, reviewed and translated wordcount) are recorded here as deltas
+and added to the existing objects.
+
+Deltas are applied as soon as they are recorded, unless a ``batch_stats``
+block is active. In that case they are accumulated and applied together at
+the end of the block::
+
+    with batch_stats():
+        for t in translations:
+            t.save()
+
+``RLStats.update()`` and the ``txstatsupdate`` management command still do a
+full recount, which repairs any drift. ``recount_stats`` does the same for
+many resources at once, with a few aggregate queries.
+"""
+
+from __future__ import with_statement
+import datetime
+import threading
+from django.db import connection
+from django.db.models import get_model, Count, Sum, F
+from transifex.txcommon.db.bulk import chunks, bulk_update, bulk_delete
+
+Resource = get_model('resources', 'Resource')
+SourceEntity = get_model('resources', 'SourceEntity')
+Translation = get_model('resources', 'Translation')
+RLStats = get_model('resources', 'RLStats')
+
+COUNTERS = ('translated', 'untranslated', 'reviewed', 'translated_wordcount')
+PERCENTAGES = ('translated_perc', 'untranslated_perc', 'reviewed_perc')
+
+_local = threading.local()
+
+_resource_cache_name = Translation._meta.get_field('resource').get_cache_name()
+
+
+class StatsDeltas(object):
+    """Accumulate changes to the counters of RLStats objects."""
+
+    def __init__(self, discard=False):
+        self.discard = discard
+        self._deltas = {}
+        self._source_languages = {}
+        self._source_wordcounts = {}
+        self._new_source_entities = set()
+
+    def add(self, resource_id, language_id=None, **counters):
+        """Add changes to the counters of the stats of a resource.
+
+        Args:
+            resource_id: The id of the resource.
+            language_id: The id of the language of the stats. If None,
+                the changes apply to the stats of all languages.
+            counters: The change of each counter.
+        """
+        if self.discard:
+            return
+        delta = self._deltas.setdefault(
+            (resource_id, language_id), dict.fromkeys(COUNTERS, 0)
+        )
+        for name, value in counters.iteritems():
+            delta[name] += value
+
+    def source_language_id(self, translation):
+        """Return the id of the source language of the resource of a
+        translation or None, if the resource does not exist.
+        """
+        resource = getattr(translation, _resource_cache_name, None)
+        if resource is not None:
+            return resource.source_language_id
+        resource_id = translation.resource_id
+        if resource_id not in self._source_languages:
+            ids = Resource.objects.filter(pk=resource_id).values_list(
+                'source_language', flat=True
+            )
+            self._source_languages[resource_id] = ids and ids[0] or None
+        return self._source_languages[resource_id]
+
+    def source_wordcount(self, source_entity_id, source_language_id):
+        """Return the wordcount of the source string of a source entity."""
+        if source_entity_id not in self._source_wordcounts:
+            wordcount = Translation.objects.filter(
+                source_entity=source_entity_id, language=source_language_id,
+                rule=5
+            ).values_list('wordcount', flat=True)
+            self._source_wordcounts[source_entity_id] = \
+                    wordcount and wordcount[0] or 0
+        return self._source_wordcounts[source_entity_id]
+
+    def set_source_wordcount(self, source_entity_id, wordcount):
+        """Update the known wordcount of the source string of a source
+        entity.
+        """
+        self._source_wordcounts[source_entity_id] = wordcount
+
+    def load_source_wordcounts(self, resource):
+        """Fetch the wordcounts of all source strings of a resource with
+        one query.
+
+        Useful before saving many translations of the resource.
+        """
+        qs = Translation.objects.filter(
+            resource=resource, language=resource.source_language, rule=5
+        ).values_list('source_entity', 'wordcount').iterator()
+        for source_entity_id, wordcount in qs:
+            self._source_wordcounts[source_entity_id] = wordcount
+        self._source_languages[resource.id] = resource.source_language_id
+
+    def add_source_entities(self, resource_id, source_entity_ids):
+        """Record the creation of source entities."""
+        self._new_source_entities.update(source_entity_ids)
+        self.add(resource_id, untranslated=len(source_entity_ids))
+
+    def add_source_wordcounts(self, resource_id, source_language_id,
+                              changes):
+        """Record changes of the wordcount of source strings.
+
+        A change affects the stats of all languages the source string is
+        translated to.
+
+        Args:
+            resource_id: The id of the resource.
+            source_language_id: The id of the source language.
+            changes: A dictionary of the change of the wordcount for each
+                source entity id.
+        """
+        se_ids = [
+            se_id for se_id, wordcount in changes.iteritems()
+            if wordcount and se_id not in self._new_source_entities
+        ]
+        for chunk in chunks(se_ids, 500):
+            qs = Translation.objects.filter(
+                source_entity__in=chunk, rule=5
+            ).exclude(language=source_language_id).values_list(
+                'source_entity', 'language'
+            )
+            for se_id, language_id in qs:
+                self.add(
+                    resource_id, language_id,
+                    translated_wordcount=changes[se_id]
+                )
+
+    def flush(self):
+        """Apply the accumulated changes to the RLStats objects.
+
+        The counters are changed with UPDATE statements, so that concurrent
+        flushes do not overwrite each other, and the percentages are then
+        computed from the stored counters.
+        """
+        deltas, self._deltas = self._deltas, {}
+        now = datetime.datetime.now()
+        changed = {}
+        for (resource_id, language_id), delta in deltas.iteritems():
+            if not any(delta.itervalues()):
+                continue
+            stats = RLStats.objects.filter(resource=resource_id)
+            if language_id is not None:
+                stats = stats.filter(language=language_id)
+            fields = {'last_update': now}
+            for name, value in delta.iteritems():
+                if value < 0:
+                    # The counters never drop below zero.
+                    stats.filter(**{name + '__lt': -value}).update(
+                        **{name: -value}
+                    )
+                fields[name] = F(name) + value
+            stats.update(**fields)
+            changed.setdefault(resource_id, set()).add(language_id)
+
+        for resource_id, language_ids in changed.iteritems():
+            stats = RLStats.objects.filter(resource=resource_id)
+            if None not in language_ids:
+                stats = stats.filter(language__in=language_ids)
+            rows = stats.order_by().values_list(
+                'id', 'translated', 'untranslated', 'reviewed', *PERCENTAGES
+            )
+            for row in rows:
+                percentages = _percentages(*row[1:4])
+                if percentages != tuple(row[4:]):
+                    RLStats.objects.filter(id=row[0]).update(
+                        **dict(zip(PERCENTAGES, percentages))
+                    )
+
+
+class batch_stats(object):
+    """Context manager that applies the recorded deltas at its end.
+
+    Nested blocks are merged into the outermost one. The deltas are thrown
+    away, if an exception is raised or ``discard`` is True; the latter is
+    useful when the stats themselves are about to be deleted.
+    """
+
+    def __init__(self, discard=False):
+        self.discard = discard
+
+    def __enter__(self):
+        self.outer = getattr(_local, 'deltas', None)
+        if self.outer is None:
+            _local.deltas = StatsDeltas(discard=self.discard)
+        return _local.deltas
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.outer is None:
+            deltas = _local.deltas
+            _local.deltas = None
+            if exc_type is None and not deltas.discard:
+                deltas.flush()
+        return False
+
+
+def current_deltas():
+    """Return the deltas of the active batch or None."""
+    return getattr(_local, 'deltas', None)
+
+
+def record(resource_id, language_id=None, **counters):
+    """Record changes to the counters of the stats of a resource.
+
+    See ``StatsDeltas.add`` for the arguments.
+    """
+    with batch_stats() as deltas:
+        deltas.add(resource_id, language_id, **counters)
+
+
+def _record_source_wordcount(deltas, translation, wordcount):
+    """Record a change of the wordcount of a source string."""
+    deltas.add_source_wordcounts(
+        translation.resource_id, translation.language_id,
+        {translation.source_entity_id: wordcount}
+    )
+
+
+def translation_saved(translation, created, old_reviewed=False,
+                      old_wordcount=0):
+    """Record the changes caused by saving a translation.
+
+    Args:
+        translation: The saved Translation object.
+        created: Whether the translation was created.
+        old_reviewed: The reviewed flag before the save.
+        old_wordcount: The wordcount before the save.
+    """
+    if translation.rule != 5 or translation.language_id is None:
+        return
+    with batch_stats() as deltas:
+        if deltas.discard:
+            return
+        source_language_id = deltas.source_language_id(translation)
+        is_source = translation.language_id == source_language_id
+        reviewed = int(bool(translation.reviewed)) - int(bool(old_reviewed))
+        if is_source:
+            deltas.set_source_wordcount(
+                translation.source_entity_id, translation.wordcount
+            )
+        if created:
+            if is_source:
+                wordcount = translation.wordcount
+                _record_source_wordcount(deltas, translation, wordcount)
+            else:
+                wordcount = deltas.source_wordcount(
+                    translation.source_entity_id, source_language_id
+                )
+            deltas.add(
+                translation.resource_id, translation.language_id,
+                translated=1, untranslated=-1, reviewed=reviewed,
+                translated_wordcount=wordcount
+            )
+        else:
+            wordcount = 0
+            if is_source:
+                wordcount = translation.wordcount - old_wordcount
+                if wordcount:
+                    _record_source_wordcount(deltas, translation, wordcount)
+            deltas.add(
+                translation.resource_id, translation.language_id,
+                reviewed=reviewed, translated_wordcount=wordcount
+            )
+
+
+def translation_deleting(translation):
+    """Keep the values needed to record the deletion of a translation.
+
+    This must be called before the translation is deleted, since the
+    source string may be deleted along with it.
+    """
+    if translation.rule != 5 or translation.language_id is None:
+        return
+    deltas = current_deltas() or StatsDeltas()
+    if deltas.discard:
+        return
+    source_language_id = deltas.source_language_id(translation)
+    translation._stats_is_source = \
+            translation.language_id == source_language_id
+    if translation._stats_is_source:
+        translation._stats_wordcount = translation.wordcount
+    else:
+        translation._stats_wordcount = deltas.source_wordcount(
+            translation.source_entity_id, source_language_id
+        )
+
+
+def translation_deleted(translation):
+    """Record the changes caused by deleting a translation."""
+    if not hasattr(translation, '_stats_wordcount'):
+        return
+    with batch_stats() as deltas:
+        if deltas.discard:
+            return
+        wordcount = translation._stats_wordcount
+        if translation._stats_is_source:
+            deltas.set_source_wordcount(translation.source_entity_id, 0)
+            # When the source entity is deleted, its translations are
+            # already gone at this point and nothing is recorded.
+            _record_source_wordcount(deltas, translation, -wordcount)
+        deltas.add(
+            translation.resource_id, translation.language_id,
+            translated=-1, untranslated=1,
+            reviewed=-int(bool(translation.reviewed)),
+            translated_wordcount=-wordcount
+        )
+
+
+def source_entity_saved(source_entity, created):
+    """Record the changes caused by saving a source entity."""
+    if created:
+        with batch_stats() as deltas:
+            deltas.add_source_entities(
+                source_entity.resource_id, [source_entity.id]
+            )
+
+
+def source_entity_deleted(source_entity):
+    """Record the changes caused by deleting a source entity."""
+    record(source_entity.resource_id, untranslated=-1)
+
+
+
+class RecountResult(object):
+    """The number of RLStats objects changed by ``recount_stats``."""
+
+    def __init__(self, resources=0, created=0, updated=0, deleted=0,
+                 unchanged=0):
+        self.resources = resources
+        self.created = created
+        self.updated = updated
+        self.deleted = deleted
+        self.unchanged = unchanged
+
+    def add(self, other):
+        """Add the numbers of another result to this one."""
+        for name in ('resources', 'created', 'updated', 'deleted',
+                     'unchanged'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def __unicode__(self):
+        return u"%s resources: %s stats created, %s updated, %s deleted, " \
+                u"%s unchanged" % (self.resources, self.created, self.updated,
+                                   self.deleted, self.unchanged)
+
+
+def _translated_wordcounts(resource_ids):
+    """Return the translated wordcount of each resource and language.
+
+    The wordcount of a translated source entity is the sum of the
+    wordcounts of its strings in the source language, as in
+    ``RLStats._calculate_translated_wordcount``.
+    """
+    qn = connection.ops.quote_name
+    t_opts, r_opts = Translation._meta, Resource._meta
+    column = lambda opts, name: qn(opts.get_field(name).column)
+    sql = (
+        "SELECT t.%(resource)s, t.%(language)s, SUM(s.%(wordcount)s) "
+        "FROM %(translation)s t "
+        "INNER JOIN %(resource_table)s r ON r.%(resource_pk)s = t.%(resource)s "
+        "INNER JOIN %(translation)s s "
+        "ON s.%(source_entity)s = t.%(source_entity)s "
+        "AND s.%(language)s = r.%(source_language)s "
+        "WHERE t.%(rule)s = 5 AND t.%(resource)s IN (%(ids)s) "
+        "GROUP BY t.%(resource)s, t.%(language)s" % {
+            'translation': qn(t_opts.db_table),
+            'resource_table': qn(r_opts.db_table),
+            'resource_pk': qn(r_opts.pk.column),
+            'resource': column(t_opts, 'resource'),
+            'language': column(t_opts, 'language'),
+            'source_entity': column(t_opts, 'source_entity'),
+            'wordcount': column(t_opts, 'wordcount'),
+            'rule': column(t_opts, 'rule'),
+            'source_language': column(r_opts, 'source_language'),
+            'ids': ', '.join(['%s'] * len(resource_ids)),
+        }
+    )
+    cursor = connection.cursor()
+    cursor.execute(sql, list(resource_ids))
+    return dict(
+        ((resource_id, language_id), int(wordcount or 0))
+        for resource_id, language_id, wordcount in cursor.fetchall()
+    )
+
+
+def _percentages(translated, untranslated, reviewed):
+    """Return the percentages, as in ``RLStats._calculate_perc``."""
+    total = translated + untranslated
+    if not total:
+        return 0, 0, 0
+    translated_perc = translated * 100 / total
+    return translated_perc, 100 - translated_perc, reviewed * 100 / total
+
+
+def recount_stats(resource_ids, send_signals=True):
+    """Recount the stats of the resources with a few aggregate queries.
+
+    The result is the same as running ``txstatsupdate`` for the resources
+    one at a time: the totals of the resources are updated, the stats of
+    the languages with translations and of the teams are recounted or
+    created and the stats of any other language, except for the source
+    language, are deleted. Only the stats that changed are written.
+
+    Args:
+        resource_ids: The ids of the resources.
+        send_signals: Whether to send ``post_update_rlstats`` for the stats
+            that changed.
+    Returns:
+        A RecountResult.
+    """
+    from transifex.resources.signals import post_update_rlstats
+    from transifex.resources.utils import invalidate_template_cache
+    Team = get_model('teams', 'Team')
+
+    resource_ids = list(resource_ids)
+    result = RecountResult()
+    if not resource_ids:
+        return result
+
+    resources = dict(
+        (row[0], row[1:]) for row in Resource.objects.filter(
+            id__in=resource_ids
+        ).order_by().values_list(
+            'id', 'project__slug', 'slug', 'source_language', 'project',
+            'project__outsource', 'total_entities', 'wordcount'
+        )
+    )
+    resource_ids = resources.keys()
+    result.resources = len(resource_ids)
+    totals = dict(SourceEntity.objects.filter(
+        resource__in=resource_ids
+    ).values_list('resource').order_by().annotate(Count('id')))
+    wordcounts = dict(Translation.objects.filter(
+        resource__in=resource_ids, language=F('resource__source_language')
+    ).values_list('resource').order_by().annotate(Sum('wordcount')))
+
+    # The languages with translations of any rule are kept
+    languages = dict((resource_id, set()) for resource_id in resource_ids)
+    translated = {}
+    for resource_id, language_id, rule, count in Translation.objects.filter(
+            resource__in=resource_ids).values_list(
+            'resource', 'language', 'rule').order_by().annotate(Count('id')):
+        languages[resource_id].add(language_id)
+        if rule == 5:
+            translated[(resource_id, language_id)] = count
+    reviewed = dict(
+        ((resource_id, language_id), count)
+        for resource_id, language_id, count in Translation.objects.filter(
+            resource__in=resource_ids, rule=5, reviewed=True
+        ).values_list('resource', 'language').order_by().annotate(Count('id'))
+    )
+    translated_wordcounts = _translated_wordcounts(resource_ids)
+
+    # Add the languages of the teams
+    team_projects = dict(
+        (resource_id, values[4] or values[3])
+        for resource_id, values in resources.iteritems()
+    )
+    team_languages = {}
+    for project_id, language_id in Team.objects.filter(
+            project__in=set(team_projects.values())).order_by().values_list(
+            'project', 'language'):
+        team_languages.setdefault(project_id, set()).add(language_id)
+    for resource_id, project_id in team_projects.iteritems():
+        languages[resource_id].update(team_languages.get(project_id, ()))
+
+    # Update the totals of the resources
+    changed_resources = set()
+    for resource_id, values in resources.iteritems():
+        total, wordcount = totals.get(resource_id, 0), \
+                wordcounts.get(resource_id) or 0
+        if (total, wordcount) != tuple(values[5:7]):
+            Resource.objects.filter(id=resource_id).update(
+                total_entities=total, wordcount=wordcount
+            )
+            changed_resources.add(resource_id)
+
+    existing = {}
+    stale = []
+    for row in RLStats.objects.filter(resource__in=resource_ids).order_by(
+            ).values_list('id', 'resource', 'language', *(COUNTERS + PERCENTAGES)):
+        stats_id, resource_id, language_id = row[:3]
+        if language_id in languages[resource_id] or \
+                language_id == resources[resource_id][2]:
+            existing[(resource_id, language_id)] = (stats_id, row[3:])
+        else:
+            stale.append(stats_id)
+
+    updated, created = [], []
+    for resource_id, language_ids in languages.iteritems():
+        total = totals.get(resource_id, 0)
+        for language_id in language_ids:
+            key = (resource_id, language_id)
+            counters = (
+                translated.get(key, 0), total - translated.get(key, 0),
+                reviewed.get(key, 0), translated_wordcounts.get(key, 0),
+            )
+            values = counters + _percentages(*counters[:3])
+            fields = dict(zip(COUNTERS + PERCENTAGES, values))
+            if key not in existing:
+                created.append(RLStats(
+                    resource_id=resource_id, language_id=language_id, **fields
+                ))
+            elif existing[key][1] != values:
+                updated.append(RLStats(
+                    id=existing[key][0], resource_id=resource_id,
+                    language_id=language_id, **fields
+                ))
+            else:
+                result.unchanged += 1
+
+    bulk_update(RLStats, updated, COUNTERS + PERCENTAGES)
+    for rl in created:
+        # The order of the stats of a resource is set on save.
+        rl.save(update=False)
+    bulk_delete(RLStats, stale)
+    result.created, result.updated, result.deleted = \
+            len(created), len(updated), len(stale)
+
+    if send_signals:
+        for rl in updated + created:
+            post_update_rlstats.send_robust(sender=rl)
+
+    changed_resources.update(rl.resource_id for rl in updated + created)
+    for resource_id in changed_resources:
+        project_slug, slug = resources[resource_id][:2]
+        invalidate_template_cache("project_resource_details",
+            project_slug, slug)
+        invalidate_template_cache("resource_details", project_slug, slug)
+    return result
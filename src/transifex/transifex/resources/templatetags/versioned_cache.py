@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+A drop-in replacement of the ``{% cache %}`` tag of Django, whose fragments
+are invalidated with ``invalidate_template_cache``::
+
+    {% load versioned_cache %}
+    {% cache 604800 resource_details project.slug resource.slug LANGUAGE_CODE %}
+        ...
+    {% endcache %}
+
+The key of a fragment includes the generation of the cache for its
+variables. If the last variable is the ``LANGUAGE_CODE`` of the context,
+it is left out of the generation, so that invalidating the cache for the
+rest of the variables invalidates the fragments of all languages.
+"""
+
+from django import template
+from django.core.cache import cache
+from django.templatetags.cache import CacheNode
+from transifex.resources.utils import template_cache_generation, \
+        template_cache_key
+
+register = template.Library()
+
+
+class VersionedCacheNode(CacheNode):
+
+    def render(self, context):
+        try:
+            expire_time = self.expire_time_var.resolve(context)
+        except template.VariableDoesNotExist:
+            raise template.TemplateSyntaxError(
+                '"cache" tag got an unknown variable: %r' %
+                self.expire_time_var.var
+            )
+        try:
+            expire_time = int(expire_time)
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"cache" tag got a non-integer timeout value: %r' %
+                expire_time
+            )
+        vary_on = [
+            template.resolve_variable(var, context) for var in self.vary_on
+        ]
+        variables = vary_on
+        if vary_on and vary_on[-1] == context.get('LANGUAGE_CODE'):
+            variables = vary_on[:-1]
+        generation = template_cache_generation(self.fragment_name, *variables)
+        cache_key = template_cache_key(self.fragment_name, generation, vary_on)
+        value = cache.get(cache_key)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(cache_key, value, expire_time)
+        return value
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    """
+    Cache the contents of a template fragment, like the ``{% cache %}`` tag
+    of Django, in the current generation of its cache.
+    """
+    nodelist = parser.parse(('endcache',))
+    parser.delete_first_token()
+    tokens = token.contents.split()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            u"'%r' tag requires at least 2 arguments." % tokens[0]
+        )
+    return VersionedCacheNode(
+        nodelist, template.Variable(tokens[1]), tokens[2], tokens[3:]
+    )
@@ -7,3 +7,6 @@ from lib import *
 from views import *
 from templates import *
 from backends import *
+from stats import *
+from compiled import *
+from translations import *
@@ -6,9 +6,10 @@ from django.test import TransactionTestCase
 from django.conf import settings
 from django.contrib.auth.models import User, Permission
 from transifex.txcommon.tests.base import Users, TransactionNoticeTypes
-from transifex.resources.models import Resource, RLStats
+from transifex.resources.models import Resource, RLStats, Translation
 from transifex.resources.api import ResourceHandler
 from transifex.resources.formats.registry import registry
+from transifex.resources.formats.pofile import POHandler
 from transifex.resources.tests.api.base import APIBaseTests
 from transifex.projects.models import Project
 from transifex.languages.models import Language
@@ -948,6 +949,149 @@ class TestStatsAPI(APIBaseTests):
             content_type='application/json'
         )
 
+class TestQAAPI(APIBaseTests):
+
+    def setUp(self):
+        super(TestQAAPI, self).setUp()
+        self.url_qa = reverse('apiv2_translation_qa', kwargs={
+            'project_slug': self.project.slug,
+            'resource_slug': self.resource.slug,
+            'lang_code': self.language.code,
+        })
+
+    def test_get_qa_report(self):
+        res = self.client['registered'].get(self.url_qa)
+        self.assertEquals(res.status_code, 200)
+        data = simplejson.loads(res.content)
+        self.assertTrue(data['checked'] > 0)
+
+        translation = Translation.objects.filter(
+            resource=self.resource, language=self.language, rule=5,
+            source_entity__pluralized=False
+        )[0]
+        Translation.objects.filter(
+            source_entity=translation.source_entity,
+            language=self.resource.source_language, rule=5
+        ).update(string="Source %s")
+        Translation.objects.filter(id=translation.id).update(
+            string="Translation"
+        )
+        res = self.client['registered'].get(self.url_qa)
+        self.assertEquals(res.status_code, 200)
+        data = simplejson.loads(res.content)
+        errors = [
+            e for e in data['errors']
+            if e['source_entity'] == translation.source_entity.string
+        ]
+        self.assertTrue(errors)
+        self.assertTrue('%s' in errors[0]['message'])
+
+        url = reverse('apiv2_translation_qa', kwargs={
+            'project_slug': self.project.slug,
+            'resource_slug': self.resource.slug,
+            'lang_code': 'no_such_language',
+        })
+        res = self.client['registered'].get(url)
+        self.assertEquals(res.status_code, 404)
+
+    def test_validate_imports(self):
+        """Test that strings with errors are skipped on imports."""
+        old_validate = settings.I18N_VALIDATE_IMPORTS
+        settings.I18N_VALIDATE_IMPORTS = True
+        try:
+            Translation.objects.filter(
+                resource=self.resource, language=self.language
+            ).delete()
+            handler = POHandler('%s/pt_BR.po' % self.pofile_path)
+            handler.bind_resource(self.resource)
+            handler.set_language(self.language)
+            handler.parse_file()
+            invalid = [
+                j for j in handler.stringset.strings
+                if not j.pluralized and j.translation
+            ][0]
+            invalid.translation += u' %d'
+            handler.save2db()
+            self.assertTrue(handler.qa_report.checked > 1)
+            entities = handler.qa_report.items_with_errors()
+            self.assertTrue(
+                invalid.source_entity in [se.string for se in entities]
+            )
+            saved = Translation.objects.filter(
+                resource=self.resource, language=self.language
+            )
+            self.assertFalse(saved.filter(
+                source_entity__in=[se.id for se in entities]
+            ).exists())
+            self.assertTrue(saved.exists())
+        finally:
+            settings.I18N_VALIDATE_IMPORTS = old_validate
+
+    def test_validate_source_imports(self):
+        """Test that changed source strings are saved, even if they do not
+        match the previous source strings.
+        """
+        old_validate = settings.I18N_VALIDATE_IMPORTS
+        settings.I18N_VALIDATE_IMPORTS = True
+        try:
+            handler = POHandler('%s/tests.pot' % self.pofile_path)
+            handler.bind_resource(self.resource)
+            handler.set_language(self.resource.source_language)
+            handler.parse_file(is_source=True)
+            changed = [
+                j for j in handler.stringset.strings if not j.pluralized
+            ][0]
+            changed.translation += u' %d'
+            handler.save2db(is_source=True)
+            self.assertTrue(handler.qa_report is None)
+            self.assertTrue(Translation.objects.filter(
+                resource=self.resource,
+                language=self.resource.source_language,
+                source_entity__string=changed.source_entity,
+                string=changed.translation
+            ).exists())
+        finally:
+            settings.I18N_VALIDATE_IMPORTS = old_validate
+
+
+class TestCloneAPI(APIBaseTests):
+
+    def _url(self, source_language, target_language):
+        return reverse('apiv2_translation_clone', kwargs={
+            'project_slug': self.project.slug,
+            'resource_slug': self.resource.slug,
+            'source_lang_code': source_language.code,
+            'target_lang_code': target_language.code,
+        })
+
+    def test_clone_translations(self):
+        url = self._url(self.language, self.language_ar)
+        res = self.client['anonymous'].post(url)
+        self.assertEquals(res.status_code, 401)
+
+        expected = Translation.objects.filter(
+            resource=self.resource, language=self.language,
+            source_entity__pluralized=False
+        ).exclude(source_entity__translations__language=self.language_ar)
+        count = expected.count()
+        res = self.client['maintainer'].post(url)
+        self.assertEquals(res.status_code, 200)
+        self.assertEquals(simplejson.loads(res.content)['strings_added'], count)
+        for t in expected:
+            self.assertEquals(Translation.objects.get(
+                source_entity=t.source_entity_id, rule=t.rule,
+                language=self.language_ar
+            ).string, t.string)
+
+        res = self.client['maintainer'].post(url)
+        self.assertEquals(simplejson.loads(res.content)['strings_added'], 0)
+
+        res = self.client['maintainer'].post(
+            self._url(self.language, self.resource.source_language)
+        )
+        self.assertEquals(res.status_code, 400)
+
+
 class TestFormatsAPI(APIBaseTests):
     def test_formats_api(self):
         res = self.client['registered'].get(
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import os
+from django.conf import settings
+from django.core.cache import get_cache
+from django.core.urlresolvers import reverse
+from transifex.languages.models import Language
+from transifex.resources.models import Resource, Translation
+from transifex.resources.formats.pofile import POHandler
+from transifex.resources import compiled
+from transifex.resources.compiled import get_compiled_file, \
+        compiled_cache_stats
+from transifex.txcommon.tests.base import BaseTestCase
+
+
+class CompiledFilesCacheTests(BaseTestCase):
+    """Test the cache of the compiled translation files."""
+
+    def setUp(self):
+        super(CompiledFilesCacheTests, self).setUp()
+        self.old_cache = compiled.cache
+        compiled.cache = get_cache(
+            'django.core.cache.backends.locmem.LocMemCache',
+            LOCATION='compiled-files-tests'
+        )
+        compiled.cache.clear()
+        self.old_max_size = settings.COMPILED_FILE_CACHE_MAX_SIZE
+        self.old_timeout = settings.COMPILED_FILE_CACHE_TIMEOUT
+        settings.COMPILED_FILE_CACHE_TIMEOUT = 60
+        path = os.path.join(
+            os.path.split(__file__)[0], 'lib', 'pofile'
+        )
+        handler = POHandler(os.path.join(path, 'tests.pot'))
+        handler.bind_resource(self.resource)
+        handler.set_language(self.resource.source_language)
+        handler.parse_file(is_source=True)
+        handler.save2db(is_source=True)
+        self.language_ar = Language.objects.by_code_or_alias('ar')
+        handler.bind_file(os.path.join(path, 'ar.po'))
+        handler.set_language(self.language_ar)
+        handler.parse_file()
+        handler.save2db()
+
+    def tearDown(self):
+        compiled.cache = self.old_cache
+        settings.COMPILED_FILE_CACHE_MAX_SIZE = self.old_max_size
+        settings.COMPILED_FILE_CACHE_TIMEOUT = self.old_timeout
+        super(CompiledFilesCacheTests, self).tearDown()
+
+    def _get(self, language, etags=()):
+        etag, content = get_compiled_file(
+            self.resource, language, etags=etags
+        )
+        if content is not None:
+            content = ''.join(content)
+        return etag, content
+
+    def test_hits(self):
+        etag, content = self._get(self.language_ar)
+        self.assertTrue(etag)
+        self.assertTrue('msgstr' in content)
+        self.assertEqual(compiled_cache_stats(), {'hits': 0, 'misses': 1})
+        self.assertEqual(self._get(self.language_ar), (etag, content))
+        self.assertEqual(compiled_cache_stats(), {'hits': 1, 'misses': 1})
+        # The template is cached separately.
+        pot_etag, pot = self._get(None)
+        self.assertNotEqual(pot_etag, etag)
+        self.assertEqual(compiled_cache_stats(), {'hits': 1, 'misses': 2})
+
+    def test_not_modified(self):
+        etag, content = self._get(self.language_ar)
+        self.assertEqual(self._get(self.language_ar, [etag]), (etag, None))
+        self.assertEqual(
+            self._get(self.language_ar, ['other']), (etag, content)
+        )
+
+    def test_disabled(self):
+        settings.COMPILED_FILE_CACHE_TIMEOUT = 0
+        etag, content = self._get(self.language_ar)
+        self.assertEqual(etag, None)
+        self.assertTrue('msgstr' in content)
+        self.assertEqual(compiled_cache_stats(), {'hits': 0, 'misses': 0})
+
+    def test_invalidation(self):
+        etag, content = self._get(self.language_ar)
+        pot_etag, pot = self._get(None)
+        translation = Translation.objects.filter(
+            resource=self.resource, language=self.language_ar
+        )[0]
+        translation.string = u'Changed translation'
+        translation.save()
+        new_etag, new_content = self._get(self.language_ar)
+        self.assertNotEqual(new_etag, etag)
+        self.assertTrue('Changed translation' in new_content)
+        # The template did not change.
+        self.assertEqual(self._get(None), (pot_etag, pot))
+
+        # Changes of the source strings invalidate every file.
+        source = Translation.objects.filter(
+            resource=self.resource, language=self.resource.source_language,
+            source_entity=translation.source_entity
+        )[0]
+        source.string = u'Changed source'
+        source.save()
+        self.assertNotEqual(self._get(None)[0], pot_etag)
+        self.assertNotEqual(self._get(self.language_ar)[0], new_etag)
+
+    def test_header_invalidation(self):
+        """Test that changes of the data in the headers of the files
+        invalidate them.
+        """
+        etag, content = self._get(self.language_ar)
+        self.project.name = u'Renamed project'
+        self.project.save()
+        self.resource = Resource.objects.get(pk=self.resource.pk)
+        new_etag, new_content = self._get(self.language_ar)
+        self.assertNotEqual(new_etag, etag)
+        self.assertTrue('Renamed project' in new_content)
+
+        self.language_ar.pluralequation = u'(n != 1)'
+        self.language_ar.save()
+        self.assertNotEqual(self._get(self.language_ar)[0], new_etag)
+
+    def test_too_big(self):
+        etag, content = self._get(self.language_ar)
+        settings.COMPILED_FILE_CACHE_MAX_SIZE = 10
+        compiled.invalidate_compiled_files(self.resource.id)
+        self.assertEqual(self._get(self.language_ar), (None, content))
+
+    def test_views(self):
+        url = reverse('download_translation', args=[
+            self.project.slug, self.resource.slug, self.language_ar.code
+        ])
+        resp = self.client['maintainer'].get(url)
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+        resp = self.client['maintainer'].get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp.content, '')
+
+        url = reverse('apiv2_translation', kwargs={
+            'project_slug': self.project.slug,
+            'resource_slug': self.resource.slug,
+            'lang_code': self.language_ar.code,
+        })
+        resp = self.client['maintainer'].get(url, {'file': ''})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['ETag'], etag)
+        resp = self.client['maintainer'].get(
+            url, {'file': ''}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(resp.status_code, 304)
@@ -12,5 +12,6 @@ from mozilla_properties import *
 from pseudo import *
 from validators import *
 from info import *
+from string_utils import *
 from registry import *
 from collections import *
@@ -1,22 +1,23 @@
 # -*- coding: utf-8 -*-
 
-from django.test import TransactionTestCase
+from django.test import TestCase, TransactionTestCase
 from django.conf import settings
 from transifex.txcommon.tests.base import Users, Languages
 from transifex.projects.models import Project
-from transifex.resources.models import Resource, SourceEntity
+from transifex.resources.models import Resource, SourceEntity, Translation
 from transifex.languages.models import Language
 from transifex.resources.formats.joomla import JoomlaINIHandler
+from transifex.resources.formats.javaproperties import JavaPropertiesHandler
+from transifex.resources.formats.mozillaproperties import \
+        MozillaPropertiesHandler
+from transifex.resources.formats.pofile import POHandler
+from transifex.resources.formats.utils.hash_tag import hash_tag
 
 
 class TestCoreFunctions(Users, Languages, TransactionTestCase):
 
     def test_delete_old(self):
-        """Test that old source entities get deleted, even when the iterations
-        block doesn't get executed.
-        """
-        old_max_iters = settings.MAX_STRING_ITERATIONS
-        settings.MAX_STRING_ITERATIONS = 1
+        """Test that old source entities get deleted."""
         content = ';1.6\nKEY1="value1"\nKEY2="value2"\nKEY3="value3"\n'
         parser = JoomlaINIHandler()
         parser.bind_content(content)
@@ -36,5 +37,89 @@ class TestCoreFunctions(Users, Languages, TransactionTestCase):
         parser.parse_file(is_source=True)
         parser.save2db(is_source=True)
         self.assertEquals(SourceEntity.objects.filter(resource=r).count(), 2)
-        settings.MAX_STRING_ITERATIONS = old_max_iters
 
+    def _import(self, resource, content, language, is_source):
+        parser = JoomlaINIHandler()
+        parser.bind_content(content)
+        parser.bind_resource(resource)
+        parser.set_language(language)
+        parser.parse_file(is_source=is_source)
+        return parser.save2db(is_source=is_source)
+
+    def _strings(self, resource):
+        return sorted(Translation.objects.filter(resource=resource).values_list(
+            'source_entity__string', 'language__code', 'rule', 'string',
+            'string_hash', 'wordcount'
+        ))
+
+    def test_bulk_import(self):
+        """Test that the bulk import mode gives the same results as saving
+        each string separately."""
+        old_bulk_import = settings.BULK_IMPORT
+        p = Project.objects.create(slug="pr", name="Pr", source_language=self.language_en)
+        contents = [
+            (';1.6\nKEY1="value1"\nKEY2="value2"\nKEY3="value3"\n',
+             self.language_en, True),
+            (';1.6\nKEY1="valeur1"\nKEY2="valeur2"\n', self.language, False),
+            (';1.6\nKEY1="valeur1"\nKEY2="autre valeur"\n', self.language, False),
+            (';1.6\nKEY1="value one"\nKEY4="value4"\n', self.language_en, True),
+        ]
+        results = {}
+        for bulk in (False, True):
+            settings.BULK_IMPORT = bulk
+            r = Resource.objects.create(
+                slug="core%s" % bulk, name="Core", project=p,
+                source_language=self.language_en
+            )
+            results[bulk] = [
+                self._import(r, content, language, is_source)
+                for content, language, is_source in contents
+            ]
+            results[bulk].append(self._strings(r))
+        settings.BULK_IMPORT = old_bulk_import
+        self.assertEquals(results[True], results[False])
+        self.assertEquals(results[True][1], (2, 0))
+        self.assertEquals(results[True][2], (0, 1))
+        self.assertEquals(results[True][3], (1, 1))
+
+
+class TestCompileTranslations(TestCase):
+    """Test the single pass application of translations to a template."""
+
+    def setUp(self):
+        self.hashes = [hash_tag(u"key%s" % n, "") for n in range(3)]
+        self.content = u'\n'.join(
+            u'key%s=%s_tr' % (n, h) for n, h in enumerate(self.hashes)
+        )
+        self.translations = {
+            "%s_tr" % self.hashes[0]: u'Value with \\ and "quotes"',
+            "%s_tr" % self.hashes[1]: u'Value with\nnewline and α',
+        }
+
+    def _compile_per_string(self, handler):
+        content = self.content
+        for placeholder, trans in self.translations.iteritems():
+            content = handler._replace_translation(placeholder, trans, content)
+        return content
+
+    def test_same_as_per_string_replacement(self):
+        """Test that formats overriding _replace_translation give the same
+        output as replacing each string separately."""
+        joomla = JoomlaINIHandler()
+        joomla._examine_content(';1.6\n')
+        handlers = [
+            joomla, JavaPropertiesHandler(), MozillaPropertiesHandler(),
+            POHandler(),
+        ]
+        for handler in handlers:
+            self.assertEquals(
+                handler._apply_translations(self.translations, self.content),
+                self._compile_per_string(handler)
+            )
+
+    def test_unknown_placeholders_untouched(self):
+        """Test that placeholders without a translation are left as is."""
+        handler = JoomlaINIHandler()
+        handler._examine_content(';1.6\n')
+        compiled = handler._apply_translations(self.translations, self.content)
+        self.assertTrue(compiled.endswith(u'key2=%s_tr' % self.hashes[2]))
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
 
 from main import TestPoFile, TestPoFileHeaders, TestPoFileCopyright, \
-        TestPolibEmptyComments
+        TestPolibEmptyComments, TestCatalogChecks, TestPoFileChecks
 from po_pot import TestApiInvocations, TestViewsInvocations
@@ -9,7 +9,7 @@ from transifex.languages.models import Language
 from transifex.resources.models import *
 from transifex.resources.backends import ResourceBackend, FormatsBackend
 from transifex.resources.formats.pofile import POHandler, POTHandler, \
-        PoParseError
+        PoParseError, check_catalog
 from transifex.resources.tests.lib.base import FormatsBaseTestCase
 from transifex.addons.copyright.models import Copyright
 
@@ -182,8 +182,6 @@ class TestPoFile(FormatsBaseTestCase):
         self.assertEqual(pt_trans.string, "Holas, Amigos!")
         self.assertEqual(source.string, "source_1")
 
-    @unittest.skipIf(settings.MAX_STRING_ITERATIONS == 0,
-            "Skipping because MAX_STRING_ITERATIONS = 0")
     def test_convert_to_suggestions(self):
         """Test convert to suggestions when importing new source files"""
 
@@ -282,6 +280,32 @@ class TestPoFile(FormatsBaseTestCase):
                     " differs from translation %s" % (entry.msgstr,
                     trans.string.encode('utf-8')))
 
+    def test_compile_iter(self):
+        """Test that the streamed file is the same as the compiled one."""
+        SourceEntity.objects.filter(resource=self.resource).delete()
+        handler = POHandler('%s/general/test.pot' %
+            os.path.split(__file__)[0])
+        handler.bind_resource(self.resource)
+        handler.set_language(self.resource.source_language)
+        handler.parse_file(is_source=True)
+        handler.save2db(is_source=True)
+        Copyright.objects.assign(
+            language=self.resource.source_language, resource=self.resource,
+            owner='John Doe', year='2011'
+        )
+        for klass in (POHandler, POTHandler):
+            handler = klass()
+            handler.bind_resource(self.resource)
+            handler.set_language(self.resource.source_language)
+            handler.compile()
+            compiled = handler.compiled_template
+            for chunk_size in (1, 3, 500):
+                handler = klass()
+                handler.compile_chunk_size = chunk_size
+                handler.bind_resource(self.resource)
+                handler.set_language(self.resource.source_language)
+                self.assertEqual(''.join(handler.compile_iter()), compiled)
+
     def test_wrong_po(self):
         handler = POHandler(os.path.join(
                 os.path.dirname(__file__), 'wrong.pot')
@@ -430,3 +454,123 @@ class TestPolibEmptyComments(unittest.TestCase):
             settings.TX_ROOT, 'resources/tests/lib/pofile/empty_comment.po'
         )
         polib.pofile(filename)
+
+
+class TestCatalogChecks(unittest.TestCase):
+    """Test the in-process msgfmt checks."""
+
+    header = (
+        'msgid ""\n'
+        'msgstr ""\n'
+        '"Content-Type: text/plain; charset=UTF-8\\n"\n'
+        '"Content-Transfer-Encoding: 8bit\\n"\n'
+        '%s\n'
+    )
+    plural_forms = '"Plural-Forms: nplurals=2; plural=(n != 1);\\n"\n'
+
+    def _errors(self, entries, plural_forms=True, ispot=False):
+        content = self.header % (plural_forms and self.plural_forms or '')
+        return check_catalog(polib.pofile(content + entries), ispot)
+
+    def test_valid_file(self):
+        self.assertEqual(self._errors(
+            '#, c-format\n'
+            'msgid "%d files in %s"\n'
+            'msgstr "%2$s: %1$d files"\n\n'
+            '#, python-format\n'
+            'msgid "%(count)s of %(total)s"\n'
+            'msgstr "%(total)s: %(count)s"\n\n'
+            '#, c-format\n'
+            'msgid "One file"\n'
+            'msgid_plural "%d files"\n'
+            'msgstr[0] "A file"\n'
+            'msgstr[1] "%d files"\n\n'
+            'msgid "Untranslated\\n"\n'
+            'msgstr ""\n'
+        ), [])
+
+    def test_format_errors(self):
+        errors = self._errors(
+            '#, c-format\n'
+            'msgid "%d files"\n'
+            'msgstr "%s files"\n\n'
+            '#, c-format\n'
+            'msgid "%d files in %s"\n'
+            'msgstr "%d files"\n\n'
+            '#, python-format\n'
+            'msgid "%(count)s files"\n'
+            'msgstr "%(total)s files"\n\n'
+            '#, fuzzy, c-format\n'
+            'msgid "%d fuzzy files"\n'
+            'msgstr "%s fuzzy files"\n'
+        )
+        self.assertEqual(len(errors), 3)
+
+    def test_newlines(self):
+        errors = self._errors(
+            'msgid "Line\\n"\n'
+            'msgstr "Line"\n\n'
+            'msgid "\\nLine"\n'
+            'msgstr "Line"\n'
+        )
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(self._errors(
+            'msgid "Line\\n"\n'
+            'msgstr "Line"\n', ispot=True
+        ), [])
+
+    def test_plural_forms(self):
+        entries = (
+            'msgid "One file"\n'
+            'msgid_plural "Many files"\n'
+            'msgstr[0] "A file"\n'
+            'msgstr[1] "Files"\n'
+            'msgstr[2] "More files"\n'
+        )
+        self.assertEqual(len(self._errors(entries)), 1)
+        self.assertEqual(len(self._errors(entries, plural_forms=False)), 1)
+
+    def test_duplicates(self):
+        entries = (
+            'msgid "File"\n'
+            'msgstr "A file"\n\n'
+        )
+        self.assertEqual(len(self._errors(entries * 2)), 1)
+
+
+class TestPoFileChecks(FormatsBaseTestCase):
+    """Test the checks of the uploaded po files."""
+
+    def setUp(self):
+        super(TestPoFileChecks, self).setUp()
+        self.old_in_process = settings.FILECHECKS['POFILE_MSGFMT_IN_PROCESS']
+        settings.FILECHECKS['POFILE_MSGFMT_IN_PROCESS'] = True
+
+    def tearDown(self):
+        settings.FILECHECKS['POFILE_MSGFMT_IN_PROCESS'] = self.old_in_process
+        super(TestPoFileChecks, self).tearDown()
+
+    def test_parsed_once(self):
+        """Test that the file parsed by the checks is used by the parser."""
+        handler = POHandler(os.path.join(
+                os.path.dirname(__file__), 'pt_BR.po')
+        )
+        handler.bind_resource(self.resource)
+        handler.set_language(self.language)
+        handler.is_content_valid()
+        po = handler._po
+        handler.parse_file()
+        self.assertTrue(handler._po is po)
+        self.assertTrue(handler.stringset.strings)
+        for stage in ('parse', 'msgfmt', 'headers', 'stringset'):
+            self.assertTrue(stage in handler.timings)
+
+    def test_failed_check(self):
+        handler = POHandler()
+        handler.bind_content(
+            TestCatalogChecks.header % '' +
+            '#, c-format\nmsgid "%d files"\nmsgstr "%s files"\n'
+        )
+        handler.bind_resource(self.resource)
+        handler.set_language(self.language)
+        self.assertRaises(PoParseError, handler.parse_file)
@@ -1,3 +1,4 @@
+# -*- coding: utf-8 -*-
 import os
 import unittest
 import xml.dom.minidom
@@ -10,6 +11,87 @@ from transifex.addons.suggestions.models import Suggestion
 from transifex.resources.tests.lib.base import FormatsBaseTestCase
 
 
+# A compiled file, before the post-processing of the handler.
+COMPILED_TEMPLATE = u"""<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE TS>
+<TS version="2.0"%(language)s>
+<context>
+    <name>Numerus</name>
+    <message>
+        <source>Nice file</source>
+        <translation>Ωραίο αρχείο</translation>
+    </message>
+    <message>
+        <source>Empty file</source>
+        <translation></translation>
+    </message>
+    <message numerus="yes">
+        <source>%%n files</source>
+        %(translation)s
+    </message>
+    <message numerus="yes">
+        <source>%%n folders</source>
+        %(translation)s
+    </message>
+</context>
+</TS>
+"""
+
+
+def _dom_post_compile(handler, content, language):
+    """The post-processing of a compiled file, as it was done with a DOM."""
+    doc = xml.dom.minidom.parseString(content)
+    root = doc.documentElement
+    root.attributes["language"] = language.code
+
+    for message in doc.getElementsByTagName("message"):
+        translation = _getElementByTagName(message, "translation")
+        if message.attributes.has_key("numerus") and \
+            message.attributes['numerus'].value=='yes':
+            source = _getElementByTagName(message, "source")
+            translation.childNodes  = []
+            if message.attributes.has_key("id"):
+                sourceString = message.attributes['id'].value
+            else:
+                sourceString = _getText(source.childNodes)
+            plurals = Translation.objects.filter(
+                resource=handler.resource,
+                language=language,
+                source_entity__string=sourceString,
+                source_entity__context=handler._context_of_message(message)
+            ).order_by('rule')
+            plural_keys = {}
+            for p,n in enumerate(language.get_pluralrules_numbers()):
+                plural_keys[p] = ""
+            for p,n in enumerate(plurals):
+                plural_keys[p] = n.string
+            for key in plural_keys.iterkeys():
+                e = doc.createElement("numerusform")
+                e.appendChild(doc.createTextNode(plural_keys[key]))
+                translation.appendChild(e)
+                if not plural_keys[key]:
+                    translation.attributes['type'] = 'unfinished'
+        else:
+            if not translation.childNodes:
+                translation.attributes['type'] = 'unfinished'
+    return doc.toxml().encode('utf-8')
+
+
+def _xml_tree(content):
+    """Return the elements, attributes and text of an XML document,
+    ignoring the formatting.
+    """
+    def walk(node):
+        children = []
+        for child in node.childNodes:
+            if child.nodeType == child.ELEMENT_NODE:
+                children.append(walk(child))
+            elif child.nodeType == child.TEXT_NODE and child.data.strip():
+                children.append(child.data.strip())
+        return node.tagName, sorted(node.attributes.items()), children
+    return walk(xml.dom.minidom.parseString(content).documentElement)
+
+
 class TestQtFile(FormatsBaseTestCase):
     """Suite of tests for the qt lib."""
 
@@ -439,3 +521,83 @@ class TestQtFile(FormatsBaseTestCase):
                 self.assertEquals(s.translation, 'asadfzasdf')
             else:
                 self.assertTrue(False, "Not supposed to happen")
+
+    def test_numerus_compile(self):
+        """Test the plural forms and the unfinished messages of compiled
+        files against the DOM based implementation.
+        """
+        SourceEntity.objects.filter(resource=self.resource).delete()
+        handler = LinguistHandler(os.path.join(
+            os.path.dirname(__file__), 'numerus/source.ts'
+        ))
+        handler.bind_resource(self.resource)
+        handler.set_language(self.resource.source_language)
+        handler.parse_file(is_source=True)
+        handler.save2db(is_source=True)
+        source = SourceEntity.objects.get(
+            resource=self.resource, string='%n files'
+        )
+        self.assertTrue(source.pluralized)
+
+        language_ja = Language.objects.create(
+            code='ja', name='Japanese', nplurals=1, pluralequation='0',
+            rule_other='everything'
+        )
+        language_el = Language.objects.by_code_or_alias('el')
+        # Only '%n files' is translated.
+        for language in (language_ja, language_el, self.language_ar):
+            for rule in language.get_pluralrules_numbers():
+                Translation.objects.create(
+                    string=u'%%n αρχεία %s' % rule, rule=rule,
+                    source_entity=source, language=language,
+                    resource=self.resource, user=self.user['registered']
+                )
+
+        translations = [
+            '<translation/>',
+            '<translation />',
+            '<translation type="unfinished"/>',
+            '<translation type="unfinished"></translation>',
+            '<translation>\n<numerusform>%n file</numerusform>\n'
+            '<numerusform>%n files</numerusform>\n</translation>',
+        ]
+        for language, nplurals in ((language_ja, 1), (language_el, 2),
+                                   (self.language_ar, 6)):
+            for root_language in ('', ' language="en"'):
+                for translation in translations:
+                    template = (COMPILED_TEMPLATE % {
+                        'language': root_language, 'translation': translation,
+                    }).encode('utf-8')
+                    handler.compiled_template = template
+                    handler._post_compile(language)
+                    compiled = handler.compiled_template
+                    self.assertEqual(
+                        _xml_tree(compiled),
+                        _xml_tree(_dom_post_compile(handler, template, language))
+                    )
+                    self.assertEqual(compiled.count('<TS '), 1)
+                    self.assertTrue(
+                        '<TS version="2.0" language="%s">' % language.code
+                        in compiled
+                    )
+                    # The content before the rewritten tags is kept.
+                    start = template.index('<context>')
+                    end = template.index('<source>Empty file')
+                    self.assertEqual(
+                        compiled[compiled.index('<context>'):][:end - start],
+                        template[start:end]
+                    )
+                    self.assertTrue(
+                        u'Ωραίο αρχείο'.encode('utf-8') in compiled
+                    )
+                    self.assertEqual(
+                        compiled.count('<numerusform>'), 2 * nplurals
+                    )
+                    # The untranslated messages are unfinished and the
+                    # translated ones keep their type.
+                    unfinished = 2
+                    if 'unfinished' in translation:
+                        unfinished += 1
+                    self.assertEqual(
+                        compiled.count('type="unfinished"'), unfinished
+                    )
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+from transifex.resources.formats.utils.string_utils import \
+        levenshtein_distance, bounded_levenshtein_distance, percent_diff, \
+        SimilarStringIndex
+
+
+class TestStringUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(1)
+
+    def _string(self, max_length, chars='abcd '):
+        return u''.join(
+            self.random.choice(chars)
+            for i in xrange(self.random.randint(0, max_length))
+        )
+
+    def test_bounded_levenshtein_distance(self):
+        for n in xrange(200):
+            first, second = self._string(12), self._string(12)
+            distance = levenshtein_distance(first, second)
+            for limit in xrange(14):
+                self.assertEqual(
+                    bounded_levenshtein_distance(first, second, limit),
+                    min(distance, limit + 1)
+                )
+
+    def test_similar_string_index(self):
+        """Test that the index finds the same strings as a full scan."""
+        strings = [self._string(40) for i in xrange(100)]
+        for max_percent in (1, 10, 30, 100):
+            index = SimilarStringIndex(enumerate(strings), max_percent)
+            for string in strings[:30] + [u'', u'abc']:
+                expected = [
+                    i for i, s in enumerate(strings)
+                    if percent_diff(string, s) < max_percent
+                ]
+                self.assertEqual(index.find(string), expected)
+                first = None
+                if expected:
+                    first = expected[0]
+                self.assertEqual(index.find_first(string), first)
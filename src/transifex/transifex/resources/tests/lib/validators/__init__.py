@@ -220,3 +220,53 @@ class TestValidators(TestCase):
         v.rule = 1
         new = "apple"
         v(old, new)
+
+    def test_tokenized_string(self):
+        s = tokenize('%s http://transifex.net\\n')
+        self.assertTrue(isinstance(s, unicode))
+        self.assertTrue(tokenize(s) is s)
+        self.assertEqual(s.unescaped, u'%s http://transifex.net\n')
+        urls = s.findall(UrlsValidator.urls)
+        self.assertEqual(urls, [u'http://transifex.net'])
+        self.assertTrue(s.findall(UrlsValidator.urls) is urls)
+        self.assertEqual(len(s.matches(PRINTF_RE)), 1)
+        self.assertEqual(s.matches(PRINTF_RE, unescaped=False)[0].group(0),
+                         u'%s')
+
+    def test_pipeline(self):
+
+        class Language(object):
+            nplurals = 2
+
+        sl, tl = Language(), Language()
+        pipeline = ValidatorPipeline(
+            [PrintfFormatNumberValidator, PrintfFormatSourceValidator],
+            [UrlsValidator, NumbersValidator]
+        )
+        self.assertEqual(
+            pipeline.check("%s 1 http://a.org", "%s 1 http://a.org", sl, tl),
+            ([], [])
+        )
+        errors, warnings = pipeline.check("%s 1 http://a.org", "2", sl, tl)
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(len(warnings), 2)
+        # The validators are created once for each pair of languages
+        # and rule.
+        validators = pipeline._get_validators(sl, tl, 5)
+        pipeline.check("%s", "%s", sl, tl)
+        self.assertTrue(pipeline._get_validators(sl, tl, 5) is validators)
+        self.assertTrue(get_pipeline('PO') is get_pipeline('PO'))
+
+    def test_validate_translations(self):
+
+        class Language(object):
+            nplurals = 2
+
+        report = validate_translations('PO', Language(), Language(), [
+            ('a', 5, "%s apples", "%s apples"),
+            ('b', 5, "%s apples", "apples"),
+            ('c', 5, "apples (red)", "apples"),
+        ])
+        self.assertEqual(report.checked, 3)
+        self.assertEqual(report.items_with_errors(), set(['b']))
+        self.assertTrue(('c', 5) in [w[:2] for w in report.warnings])
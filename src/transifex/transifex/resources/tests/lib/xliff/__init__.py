@@ -1,6 +1,8 @@
 import os
 import re
 import unittest
+import xml.dom.minidom
+from django.db import connection
 from transifex.txcommon.tests.base import BaseTestCase
 from transifex.languages.models import Language
 from transifex.resources.models import *
@@ -180,4 +182,65 @@ class TestXliffParser(BaseTestCase):
         self.resource.delete()
         self.resource_new.delete()
 
+    def _compile(self, handler, language):
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            handler.compile(language)
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        doc = xml.dom.minidom.parseString(handler.compiled_template)
+        return doc, connection.queries[start:]
+
+    def test_xliff_compile_plurals(self):
+        """Test that the plural groups get a unit per plural rule."""
+        self.test_xliff_save2db(delete=False)
+        handler = XliffHandler()
+        handler.bind_resource(self.resource)
+
+        doc, queries = self._compile(handler, self.language_ar)
+        # The template, the translations and the source entities
+        self.assertEqual(len(queries), 3)
+        groups = [
+            g for g in doc.getElementsByTagName("group")
+            if g.getAttribute("restype") == "x-gettext-plurals"
+        ]
+        self.assertEqual(len(groups), 1)
+        units = groups[0].getElementsByTagName("trans-unit")
+        rules = self.language_ar.get_pluralrules_numbers()
+        self.assertEqual(len(units), len(rules))
+        self.assertEqual(
+            [u.getAttribute("id") for u in units],
+            ["messages:2[%d]" % n for n in range(len(rules))]
+        )
+        for unit in units:
+            self.assertEqual(len(unit.getElementsByTagName("target")), 1)
+        self.assertEqual(
+            len(doc.getElementsByTagName("target")),
+            Translation.objects.filter(
+                resource=self.resource, language=self.language_ar
+            ).count()
+        )
+        self.assertFalse(re.search(r'[0-9a-f]{32}_(tr|pl_\d)',
+            handler.compiled_template))
 
+        # The compiled file can be imported again
+        handler.bind_content(handler.compiled_template)
+        handler.set_language(self.language_ar)
+        handler.parse_file()
+        self.assertEqual(len(handler.stringset.strings), 9)
+
+        # No targets and no extra units in the file of the source language
+        doc, queries = self._compile(handler, self.resource.source_language)
+        self.assertEqual(doc.getElementsByTagName("target"), [])
+        self.assertEqual(len(doc.getElementsByTagName("trans-unit")), 7)
+
+        # The file is compiled in chunks
+        handler.compile_chunk_size = 1
+        chunks = list(handler.compile_iter(self.language_ar))
+        self.assertTrue(len(chunks) > 1)
+        handler.compile(self.language_ar)
+        self.assertEqual(''.join(chunks), handler.compiled_template)
+        self.resource.delete()
+        self.resource_new.delete()
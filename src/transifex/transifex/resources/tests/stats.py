@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+from __future__ import with_statement
+import random
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from transifex.languages.models import Language
+from transifex.resources.models import SourceEntity, Translation, RLStats, \
+        StatsUpdate
+from transifex.resources.stats import StatsDeltas, batch_stats, record, \
+        recount_stats
+from transifex.resources.handlers import invalidate_stats_cache, \
+        process_stats_updates, stats_queue_lag
+from transifex.resources.signals import post_update_rlstats
+from transifex.txcommon.tests.base import BaseTestCase
+
+COUNTERS = ('translated', 'untranslated', 'reviewed', 'translated_wordcount',
+            'translated_perc', 'untranslated_perc', 'reviewed_perc')
+
+
+class IncrementalStatsTests(BaseTestCase):
+    """Test that the stats kept current with deltas match a full recount."""
+
+    def setUp(self):
+        super(IncrementalStatsTests, self).setUp()
+        self.languages = [self.language_en, self.language_ar, self.language]
+        for language in self.languages:
+            rl, created = RLStats.objects.get_or_create(
+                resource=self.resource, language=language
+            )
+            rl.update()
+        self.random = random.Random(1234)
+        self.counter = 0
+
+    def _words(self):
+        self.counter += 1
+        return u' '.join(
+            [u'word%s' % self.counter] * self.random.randint(1, 6)
+        )
+
+    def _translations(self, **kwargs):
+        return list(Translation.objects.filter(
+            resource=self.resource, rule=5, **kwargs
+        ))
+
+    def _create_source_entity(self):
+        se = SourceEntity.objects.create(
+            string=self._words(), context='', resource=self.resource
+        )
+        Translation.objects.create(
+            source_entity=se, language=self.language_en, rule=5,
+            string=se.string, resource=self.resource
+        )
+
+    def _delete_source_entity(self):
+        entities = list(SourceEntity.objects.filter(resource=self.resource))
+        if entities:
+            self.random.choice(entities).delete()
+
+    def _edit_source(self):
+        translations = self._translations(language=self.language_en)
+        if translations:
+            t = self.random.choice(translations)
+            t.string = self._words()
+            t.save()
+
+    def _translate(self):
+        language = self.random.choice(self.languages[1:])
+        entities = list(SourceEntity.objects.filter(resource=self.resource))
+        if not entities:
+            return
+        se = self.random.choice(entities)
+        try:
+            t = Translation.objects.get(
+                source_entity=se, language=language, rule=5
+            )
+        except Translation.DoesNotExist:
+            t = Translation(
+                source_entity=se, language=language, rule=5,
+                resource=self.resource
+            )
+        t.string = self._words()
+        t.reviewed = self.random.choice([True, False])
+        t.save()
+
+    def _delete_translation(self):
+        translations = self._translations()
+        if translations:
+            self.random.choice(translations).delete()
+
+    def _toggle_reviewed(self):
+        translations = self._translations()
+        if translations:
+            t = self.random.choice(translations)
+            t.reviewed = not t.reviewed
+            t.save()
+
+    def _assertStats(self):
+        for rl in RLStats.objects.filter(resource=self.resource):
+            expected = RLStats.objects.get(pk=rl.pk)
+            expected.update(save=False)
+            for name in COUNTERS:
+                self.assertEqual(
+                    getattr(rl, name), getattr(expected, name),
+                    "%s of %s: %s != %s" % (
+                        name, rl.language, getattr(rl, name),
+                        getattr(expected, name)
+                    )
+                )
+
+    def test_random_edits(self):
+        """Test random sequences of edits, one at a time and in batches."""
+        operations = [
+            self._create_source_entity, self._create_source_entity,
+            self._delete_source_entity, self._edit_source, self._translate,
+            self._translate, self._translate, self._delete_translation,
+            self._toggle_reviewed,
+        ]
+        for n in xrange(150):
+            self.random.choice(operations)()
+            self._assertStats()
+        for n in xrange(10):
+            with batch_stats():
+                for m in xrange(15):
+                    self.random.choice(operations)()
+            self._assertStats()
+
+    def test_discarded_batch(self):
+        """Test that discarded and failed batches do not change the stats."""
+        rl = RLStats.objects.get(resource=self.resource, language=self.language)
+        translated = rl.translated
+        with batch_stats(discard=True):
+            record(self.resource.id, self.language.id, translated=1)
+        try:
+            with batch_stats():
+                record(self.resource.id, self.language.id, translated=1)
+                raise ValueError
+        except ValueError:
+            pass
+        rl = RLStats.objects.get(resource=self.resource, language=self.language)
+        self.assertEqual(rl.translated, translated)
+
+    def test_concurrent_flushes(self):
+        """Test that flushes add to the stored counters, instead of
+        overwriting the changes made since the stats were read.
+        """
+        rl = RLStats.objects.get(resource=self.resource, language=self.language)
+        first, second = StatsDeltas(), StatsDeltas()
+        first.add(self.resource.id, self.language.id, translated=1,
+                  untranslated=-1)
+        second.add(self.resource.id, self.language.id, translated=1,
+                   untranslated=-1, reviewed=1)
+        second.flush()
+        first.flush()
+        new_rl = RLStats.objects.get(pk=rl.pk)
+        self.assertEqual(new_rl.translated, rl.translated + 2)
+        self.assertEqual(new_rl.untranslated, rl.untranslated - 2)
+        self.assertEqual(new_rl.reviewed, rl.reviewed + 1)
+        expected = RLStats.objects.get(pk=rl.pk)
+        expected._calculate_perc()
+        for name in ('translated_perc', 'untranslated_perc', 'reviewed_perc'):
+            self.assertEqual(getattr(new_rl, name), getattr(expected, name))
+
+        record(self.resource.id, self.language.id,
+               reviewed=-(new_rl.reviewed + 5))
+        new_rl = RLStats.objects.get(pk=rl.pk)
+        self.assertEqual(new_rl.reviewed, 0)
+        self.assertEqual(new_rl.reviewed_perc, 0)
+
+
+class StatsQueueTests(BaseTestCase):
+    """Test the deferred updates of the stats."""
+
+    def setUp(self):
+        super(StatsQueueTests, self).setUp()
+        self.old_deferred = settings.DEFERRED_STATS_UPDATES
+        settings.DEFERRED_STATS_UPDATES = True
+
+    def tearDown(self):
+        settings.DEFERRED_STATS_UPDATES = self.old_deferred
+        super(StatsQueueTests, self).tearDown()
+
+    def test_updates_are_merged(self):
+        user = self.user['maintainer']
+        self.assertEqual(stats_queue_lag(), 0)
+        invalidate_stats_cache(self.resource, self.language_ar)
+        invalidate_stats_cache(self.resource, self.language_ar, user=user)
+        invalidate_stats_cache(self.resource, self.language_en)
+        self.assertEqual(StatsUpdate.objects.count(), 2)
+        update = StatsUpdate.objects.get(language=self.language_ar)
+        self.assertEqual(update.version, 1)
+        self.assertEqual(update.user, user)
+        self.assertTrue(stats_queue_lag() >= 0)
+
+        self.assertEqual(process_stats_updates(), 2)
+        self.assertFalse(StatsUpdate.objects.exists())
+        rl = RLStats.objects.get(
+            resource=self.resource, language=self.language_ar
+        )
+        self.assertEqual(rl.last_committer, user)
+
+    def test_update_queued_during_processing(self):
+        """Test that an update queued again while being processed is kept."""
+        invalidate_stats_cache(self.resource, self.language_ar)
+        queued = []
+
+        def queue_again(sender, **kwargs):
+            if not queued:
+                queued.append(sender)
+                invalidate_stats_cache(self.resource, self.language_ar)
+
+        post_update_rlstats.connect(queue_again)
+        try:
+            self.assertEqual(process_stats_updates(), 1)
+        finally:
+            post_update_rlstats.disconnect(queue_again)
+        self.assertTrue(queued)
+        update = StatsUpdate.objects.get()
+        self.assertEqual(update.language, self.language_ar)
+        self.assertEqual(update.version, 1)
+
+        self.assertEqual(process_stats_updates(), 1)
+        self.assertFalse(StatsUpdate.objects.exists())
+
+    def test_synchronous_update(self):
+        invalidate_stats_cache(self.resource, self.language_ar, defer=False)
+        self.assertFalse(StatsUpdate.objects.exists())
+
+
+class BulkRecountTests(BaseTestCase):
+    """Test that the bulk recount matches the recount of each RLStats."""
+
+    def setUp(self):
+        super(BulkRecountTests, self).setUp()
+        self.resources = [self.resource, self.resource_private]
+        for resource in self.resources:
+            for language in (self.language_en, self.language_ar,
+                             self.language):
+                rl, created = RLStats.objects.get_or_create(
+                    resource=resource, language=language
+                )
+                rl.update()
+
+    def _stats(self):
+        return dict(
+            ((rl.resource_id, rl.language_id),
+             tuple(getattr(rl, name) for name in COUNTERS))
+            for rl in RLStats.objects.filter(resource__in=self.resources)
+        )
+
+    def _expected(self):
+        expected = {}
+        for rl in RLStats.objects.filter(resource__in=self.resources):
+            rl.update(save=False)
+            expected[(rl.resource_id, rl.language_id)] = tuple(
+                getattr(rl, name) for name in COUNTERS
+            )
+        return expected
+
+    def test_repair(self):
+        expected = self._expected()
+        RLStats.objects.filter(resource__in=self.resources).update(
+            translated=99, reviewed=99, translated_wordcount=0
+        )
+        stale_language = Language.objects.exclude(id__in=[
+            self.language_en.id, self.language_ar.id, self.language.id
+        ])[0]
+        RLStats.objects.create(
+            resource=self.resource, language=stale_language
+        )
+        result = recount_stats([r.id for r in self.resources])
+        self.assertEqual(result.resources, 2)
+        self.assertEqual(result.deleted, 1)
+        self.assertEqual(result.created, 0)
+        self.assertEqual(self._stats(), expected)
+
+        result = recount_stats([r.id for r in self.resources])
+        self.assertEqual(result.updated + result.created + result.deleted, 0)
+        self.assertEqual(result.unchanged, len(expected))
+
+    def test_missing_stats(self):
+        expected = self._expected()
+        RLStats.objects.filter(
+            resource=self.resource, language=self.language_ar
+        ).delete()
+        result = recount_stats([self.resource.id])
+        self.assertEqual(result.created, 1)
+        self.assertEqual(self._stats(), expected)
+
+    def test_queries(self):
+        """The number of queries does not depend on the resources."""
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start = len(connection.queries)
+        try:
+            recount_stats([r.id for r in self.resources])
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        self.assertTrue(len(connection.queries) - start <= 8)
+
+    def test_command(self):
+        expected = self._expected()
+        RLStats.objects.filter(resource__in=self.resources).update(
+            translated=99
+        )
+        call_command(
+            'txstatsupdate', bulk=True, projects=[self.project.slug],
+            verbosity=0
+        )
+        stats = self._stats()
+        for key, value in stats.iteritems():
+            if key[0] == self.resource.id:
+                self.assertEqual(value, expected[key])
+            else:
+                self.assertEqual(value[0], 99)
+        call_command(
+            'txstatsupdate', bulk=True, since='2000-01-01', batch_size=1,
+            verbosity=0
+        )
+        self.assertEqual(self._stats(), expected)
@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 from django.conf import settings
+from django.core.cache import get_cache
 from django.core.urlresolvers import reverse
+from django.template import Context, Template
+from django.test import TestCase
 from transifex.languages.models import Language
 from transifex.resources.models import SourceEntity
+from transifex.resources import utils
+from transifex.resources.templatetags import versioned_cache
+from transifex.resources.utils import invalidate_template_cache
 from transifex.teams.models import Team
 from transifex.txcommon.tests.base import BaseTestCase
 
@@ -144,3 +150,44 @@ class ResourcesTemplateTests(BaseTestCase):
             msg_prefix="Show a 0% language if there is a respective team.")
         self.assertContains(resp, '<div class="stats_string_resource">\n'
             '    0%\n  </div>')
+
+
+class VersionedCacheTests(TestCase):
+    """Test the template fragment cache with generations."""
+
+    def setUp(self):
+        self.old_cache = utils.cache
+        utils.cache = versioned_cache.cache = get_cache(
+            'django.core.cache.backends.locmem.LocMemCache',
+            LOCATION='versioned-cache-tests'
+        )
+        utils.cache.clear()
+        self.template = Template(
+            "{% load versioned_cache %}"
+            "{% cache 60 fragment id LANGUAGE_CODE %}{{ value }}{% endcache %}"
+        )
+
+    def tearDown(self):
+        utils.cache = versioned_cache.cache = self.old_cache
+
+    def _render(self, id, value, language='en'):
+        return self.template.render(Context({
+            'id': id, 'value': value, 'LANGUAGE_CODE': language
+        }))
+
+    def test_invalidation(self):
+        self.assertEqual(self._render(1, 'a'), 'a')
+        self.assertEqual(self._render(1, 'b'), 'a')
+        self.assertEqual(self._render(1, 'b', 'el'), 'b')
+        self.assertEqual(self._render(2, 'c'), 'c')
+        invalidate_template_cache('fragment', 1)
+        # All languages are invalidated, other objects are not.
+        self.assertEqual(self._render(1, 'd'), 'd')
+        self.assertEqual(self._render(1, 'd', 'el'), 'd')
+        self.assertEqual(self._render(2, 'd'), 'c')
+
+    def test_no_generation(self):
+        # Invalidating a cache that was never used does nothing.
+        invalidate_template_cache('fragment', 3)
+        self.assertEqual(self._render(3, 'a'), 'a')
+        self.assertEqual(self._render(3, 'b'), 'a')
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+from django.db import connection
+from transifex.resources.models import SourceEntity, Translation, RLStats
+from transifex.resources.stats import COUNTERS
+from transifex.resources.translations import clone_translations, \
+        delete_translations
+from transifex.txcommon.tests.base import BaseTestCase
+
+
+class TranslationOperationsTests(BaseTestCase):
+    """Test cloning and deleting the translations of a language."""
+
+    def setUp(self):
+        super(TranslationOperationsTests, self).setUp()
+        for n in xrange(20):
+            se = SourceEntity.objects.create(
+                string='String %s' % n, context='', resource=self.resource
+            )
+            Translation.objects.create(
+                source_entity=se, language=self.language_en, rule=5,
+                string=' '.join(['word'] * (n % 4 + 1)),
+                resource=self.resource
+            )
+            if n % 2:
+                Translation.objects.create(
+                    source_entity=se, language=self.language_ar, rule=5,
+                    string=u'Arabic %s' % n, reviewed=bool(n % 3),
+                    resource=self.resource
+                )
+        for rule in (1, 5):
+            Translation.objects.create(
+                source_entity=self.source_entity_plural, rule=rule,
+                language=self.language_ar, string=u'Plural %s' % rule,
+                resource=self.resource
+            )
+        for language in (self.language_en, self.language_ar, self.language):
+            rl, created = RLStats.objects.get_or_create(
+                resource=self.resource, language=language
+            )
+            rl.update()
+
+    def _translations(self, language):
+        return Translation.objects.filter(
+            resource=self.resource, language=language
+        )
+
+    def _assertStats(self):
+        for rl in RLStats.objects.filter(resource=self.resource):
+            expected = RLStats.objects.get(pk=rl.pk)
+            expected.update(save=False)
+            for name in COUNTERS:
+                self.assertEqual(
+                    getattr(rl, name), getattr(expected, name),
+                    "%s of %s: %s != %s" % (
+                        name, rl.language, getattr(rl, name),
+                        getattr(expected, name)
+                    )
+                )
+
+    def test_clone(self):
+        existing = Translation.objects.create(
+            source_entity=self.translation_ar.source_entity, rule=5,
+            language=self.language, string=u'Existing',
+            resource=self.resource
+        )
+        source = self._translations(self.language_ar)
+        added = clone_translations(
+            self.resource, self.language_ar, self.language,
+            user=self.user['maintainer']
+        )
+        # The plural forms are skipped, since the plural rules differ.
+        expected = source.exclude(
+            source_entity__pluralized=True
+        ).exclude(source_entity=existing.source_entity)
+        self.assertEqual(added, expected.count())
+        self.assertEqual(
+            Translation.objects.get(id=existing.id).string, u'Existing'
+        )
+        for t in expected:
+            clone = Translation.objects.get(
+                source_entity=t.source_entity, rule=t.rule,
+                language=self.language
+            )
+            self.assertEqual(clone.string, t.string)
+            self.assertEqual(clone.string_hash, t.string_hash)
+            self.assertFalse(clone.reviewed)
+            self.assertEqual(clone.user, self.user['maintainer'])
+        self._assertStats()
+
+        # Nothing is added the second time.
+        self.assertEqual(clone_translations(
+            self.resource, self.language_ar, self.language
+        ), 0)
+        self._assertStats()
+        self.assertRaises(
+            ValueError, clone_translations, self.resource,
+            self.language_ar, self.language_en
+        )
+
+    def test_clone_query_count(self):
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            added = clone_translations(
+                self.resource, self.language_en, self.language
+            )
+            queries = len(connection.queries) - start
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        self.assertTrue(added > 20)
+        self.assertTrue(queries < 10, "%s queries" % queries)
+        self._assertStats()
+
+    def test_delete(self):
+        translations = list(self._translations(self.language_ar).filter(
+            source_entity__pluralized=False
+        ))
+        ids = [t.source_entity_id for t in translations[:3]]
+        self.assertEqual(
+            delete_translations(self.resource, self.language_ar, ids), 3
+        )
+        self.assertFalse(self._translations(self.language_ar).filter(
+            source_entity__in=ids
+        ).exists())
+        self._assertStats()
+
+        remaining = self._translations(self.language_ar).count()
+        self.assertEqual(
+            delete_translations(self.resource, self.language_ar), remaining
+        )
+        self.assertFalse(self._translations(self.language_ar).exists())
+        self.assertTrue(self._translations(self.language_en).exists())
+        self._assertStats()
+
+    def test_delete_source(self):
+        se_id = self.translation_en.source_entity_id
+        delete_translations(self.resource, self.language_en, [se_id])
+        self.assertFalse(self._translations(self.language_en).filter(
+            source_entity=se_id
+        ).exists())
+        self._assertStats()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Operations on all the translations of a resource in a language.
+
+The translations are copied and deleted with a few SQL statements, instead
+of one query per translation, so the signals of the Translation model are
+not sent. The changes to the counters of the RLStats objects are computed
+with an aggregate query beforehand and recorded as deltas (see
+``transifex.resources.stats``), so the stats are not recounted.
+"""
+
+from __future__ import with_statement
+import datetime
+from django.db import connection, transaction
+from django.db.models import get_model
+from transifex.txcommon.db.bulk import chunks
+from transifex.resources.handlers import invalidate_stats_cache
+from transifex.resources.stats import batch_stats
+
+SourceEntity = get_model('resources', 'SourceEntity')
+Translation = get_model('resources', 'Translation')
+
+# The columns copied from the source translations by clone_translations.
+_CLONED_FIELDS = ('string', 'string_hash', 'rule', 'wordcount',
+                  'source_entity', 'resource')
+
+
+def _sql_names():
+    qn = connection.ops.quote_name
+    names = {
+        'translation': qn(Translation._meta.db_table),
+        'source_entity': qn(SourceEntity._meta.db_table),
+        'se_pk': qn(SourceEntity._meta.pk.column),
+        'pluralized': qn(SourceEntity._meta.get_field('pluralized').column),
+    }
+    for name in ('source_entity', 'resource', 'language', 'rule',
+                 'wordcount', 'reviewed'):
+        names['t_' + name] = qn(Translation._meta.get_field(name).column)
+    return names
+
+
+def _fetch_counts(sql, params):
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return [int(value or 0) for value in cursor.fetchone()]
+
+
+@transaction.commit_on_success
+def clone_translations(resource, source_language, target_language,
+                       user=None):
+    """Copy the translations of a resource from one language to another.
+
+    The translations that already exist in the target language are kept.
+    The plural forms are copied only if the two languages have the same
+    plural rules.
+
+    Args:
+        resource: The Resource object.
+        source_language: The language to copy the translations from.
+        target_language: The language to copy the translations to.
+        user: The user set as the committer of the new translations.
+    Returns:
+        The number of translations added.
+    Raises:
+        ValueError: If the target language is the source language of
+            the resource.
+    """
+    if target_language == resource.source_language:
+        raise ValueError("Cannot clone translations to the source language.")
+    if target_language == source_language:
+        return 0
+    names = _sql_names()
+    # The source translations (s) that have no counterpart (e) in the
+    # target language.
+    where = (
+        "WHERE s.%(t_resource)s = %%s AND s.%(t_language)s = %%s AND "
+        "NOT EXISTS (SELECT 1 FROM %(translation)s e WHERE "
+        "e.%(t_source_entity)s = s.%(t_source_entity)s AND "
+        "e.%(t_language)s = %%s AND e.%(t_rule)s = s.%(t_rule)s)"
+    )
+    where_params = [resource.id, source_language.id, target_language.id]
+    if source_language.get_pluralrules() != target_language.get_pluralrules():
+        where += " AND se.%(pluralized)s = %%s"
+        where_params.append(False)
+    joins = (
+        "FROM %(translation)s s INNER JOIN %(source_entity)s se ON "
+        "se.%(se_pk)s = s.%(t_source_entity)s "
+    )
+
+    # The translated wordcount comes from the strings in the source
+    # language of the resource, which may differ from the cloned ones.
+    added, wordcount = _fetch_counts((
+        "SELECT COUNT(*), SUM(w.%(t_wordcount)s) " + joins +
+        "LEFT OUTER JOIN %(translation)s w ON "
+        "w.%(t_source_entity)s = s.%(t_source_entity)s AND "
+        "w.%(t_language)s = %%s AND w.%(t_rule)s = 5 " + where +
+        " AND s.%(t_rule)s = 5"
+    ) % names, [resource.source_language_id] + where_params)
+
+    now = datetime.datetime.now()
+    values = {
+        'language': target_language.id,
+        'user': getattr(user, 'id', None),
+        'origin': None,
+        'reviewed': False,
+        'created': now,
+        'last_update': now,
+    }
+    columns, selected, params = [], [], []
+    for field in Translation._meta.local_fields:
+        if field.primary_key:
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+        if field.name in _CLONED_FIELDS:
+            selected.append("s.%s" % connection.ops.quote_name(field.column))
+            continue
+        value = values.get(field.name, field.get_default())
+        selected.append("%s")
+        params.append(field.get_db_prep_save(value, connection=connection))
+    cursor = connection.cursor()
+    cursor.execute((
+        "INSERT INTO %(translation)s (" + ", ".join(columns) + ") "
+        "SELECT " + ", ".join(selected).replace('%', '%%') + " " +
+        joins + where
+    ) % names, params + where_params)
+
+    with batch_stats() as deltas:
+        deltas.add(
+            resource.id, target_language.id, translated=added,
+            untranslated=-added, translated_wordcount=wordcount
+        )
+    invalidate_stats_cache(resource, target_language, user=user)
+    return cursor.rowcount
+
+
+def _delete_where(prefix, source_entity_ids):
+    """Return the WHERE clause, which selects the translations to delete."""
+    where = ("WHERE %(p)s%%(t_resource)s = %%%%s AND "
+             "%(p)s%%(t_language)s = %%%%s" % {'p': prefix})
+    if source_entity_ids is not None:
+        where += " AND %s%%(t_source_entity)s IN (%s)" % (
+            prefix, ", ".join(["%%s"] * len(source_entity_ids))
+        )
+    return where
+
+
+@transaction.commit_on_success
+def delete_translations(resource, language, source_entity_ids=None,
+                        user=None):
+    """Delete the translations of a resource in a language.
+
+    Args:
+        resource: The Resource object.
+        language: The language of the translations.
+        source_entity_ids: Delete only the translations of these source
+            entities. Defaults to all of them.
+        user: The user who deleted the translations.
+    Returns:
+        The number of translations deleted.
+    """
+    if language == resource.source_language:
+        # The source strings count towards the stats of every language,
+        # which the signal handlers take care of.
+        qs = Translation.objects.filter(resource=resource, language=language)
+        if source_entity_ids is not None:
+            qs = qs.filter(source_entity__in=source_entity_ids)
+        deleted = qs.count()
+        with batch_stats():
+            qs.delete()
+        invalidate_stats_cache(resource, language, user=user)
+        return deleted
+
+    names = _sql_names()
+    if source_entity_ids is None:
+        batches = [None]
+    else:
+        batches = chunks(list(source_entity_ids), 500)
+    deleted = 0
+    with batch_stats() as deltas:
+        for batch in batches:
+            params = [resource.id, language.id]
+            if batch is not None:
+                params.extend(batch)
+            translated, reviewed, wordcount = _fetch_counts((
+                "SELECT COUNT(*), "
+                "SUM(CASE WHEN t.%(t_reviewed)s = %%s THEN 1 ELSE 0 END), "
+                "SUM(w.%(t_wordcount)s) FROM %(translation)s t "
+                "LEFT OUTER JOIN %(translation)s w ON "
+                "w.%(t_source_entity)s = t.%(t_source_entity)s AND "
+                "w.%(t_language)s = %%s AND w.%(t_rule)s = 5 " +
+                _delete_where('t.', batch) + " AND t.%(t_rule)s = 5"
+            ) % names, [True, resource.source_language_id] + params)
+            cursor = connection.cursor()
+            cursor.execute((
+                "DELETE FROM %(translation)s " + _delete_where('', batch)
+            ) % names, params)
+            deleted += cursor.rowcount
+            deltas.add(
+                resource.id, language.id, translated=-translated,
+                untranslated=translated, reviewed=-reviewed,
+                translated_wordcount=-wordcount
+            )
+    invalidate_stats_cache(resource, language, user=user)
+    return deleted
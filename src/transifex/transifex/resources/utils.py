@@ -1,25 +1,65 @@
 # -*- coding: utf-8 -*-
+import random
 from django.conf import settings
 from django.core.cache import cache
 from django.utils.hashcompat import md5_constructor
 from django.utils.http import urlquote
 
 
+def _variables_hash(variables):
+    return md5_constructor(
+        u':'.join([urlquote(var) for var in variables])
+    ).hexdigest()
+
+
+def _generation_key(fragment_name, variables):
+    return 'template.generation.%s.%s' % (
+        fragment_name, _variables_hash(variables)
+    )
+
+
+def template_cache_generation(fragment_name, *variables):
+    """
+    Return the current generation of the template cache named
+    `fragment_name` for the given variables.
+
+    A new generation starts at a random number, so that the fragments of an
+    evicted generation are not used again.
+    """
+    key = _generation_key(fragment_name, variables)
+    generation = cache.get(key)
+    if generation is None:
+        generation = random.getrandbits(48)
+        cache.add(key, generation, settings.TEMPLATE_CACHE_GENERATION_TIMEOUT)
+        generation = cache.get(key) or generation
+    return generation
+
+
+def template_cache_key(fragment_name, generation, vary_on):
+    """Return the cache key of a template fragment."""
+    return 'template.cache.%s.%s.%s' % (
+        fragment_name, generation, _variables_hash(vary_on)
+    )
+
+
 def invalidate_template_cache(fragment_name, *variables):
     """
     This function invalidates a template cache named `fragment_name` and with
     variables which are included in *variables. For example:
 
-    {% cache 500 project_details project.slug %}
+    {% load versioned_cache %}
+    {% cache 500 project_details project.slug LANGUAGE_CODE %}
         ...
     {% endcache %}
 
     We invalidate this by calling:
      -  invalidate_template_cache("project_details", project.slug)
+
+    The fragments of all languages are invalidated at once, by incrementing
+    the generation of the cache (see the ``versioned_cache`` tags).
     """
-    for lang,code in settings.LANGUAGES:
-        cur_vars = list(variables)
-        cur_vars.append(unicode(lang))
-        args = md5_constructor(u':'.join([urlquote(var) for var in cur_vars]))
-        cache_key = 'template.cache.%s.%s' % (fragment_name, args.hexdigest())
-        cache.delete(cache_key)
+    try:
+        cache.incr(_generation_key(fragment_name, variables))
+    except ValueError:
+        # There is no generation, so nothing is cached for the variables.
+        pass
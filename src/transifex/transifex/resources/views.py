@@ -30,9 +30,11 @@ from transifex.txcommon.log import logger
 
 from transifex.resources.forms import ResourceForm, ResourcePseudoTranslationForm
 from transifex.resources.models import Translation, Resource, RLStats
-from transifex.resources.handlers import (invalidate_object_templates,
-    invalidate_stats_cache)
+from transifex.resources.handlers import invalidate_object_templates
 from transifex.resources.formats.registry import registry
+from transifex.resources.translations import clone_translations, \
+        delete_translations
+from transifex.resources.compiled import compiled_file_response
 from transifex.resources.backends import FormatsBackend, FormatsBackendError, \
         content_from_uploaded_file
 
@@ -401,25 +403,11 @@ def clone_language(request, project_slug=None, resource_slug=None,
     source_lang = get_object_or_404(Language, code=source_lang_code)
     target_lang = get_object_or_404(Language, code=target_lang_code)
 
-    # get the strings which will be cloned
-    strings = Translation.objects.filter(
-                resource = resource,
-                language = source_lang)
-
-    # If the language we want to create, has the same plural rules with the
-    # source, we also copy the pluralized translations!
-    if not source_lang.get_pluralrules() == target_lang.get_pluralrules():
-        strings = strings.exclude(source_entity__pluralized = True)
-
-    # clone them in new translation
-    for s in strings:
-        Translation.objects.get_or_create(
-            language=target_lang, string=s.string,
-            source_entity=s.source_entity, rule=s.rule,
-            resource=s.resource
+    # The source strings are never overwritten by a clone
+    if target_lang != resource.source_language:
+        clone_translations(
+            resource, source_lang, target_lang, user=request.user
         )
-
-    invalidate_stats_cache(resource, target_lang, user=request.user)
     return HttpResponseRedirect(reverse('translate_resource', args=[project_slug,
                                 resource_slug, target_lang_code]),)
 
@@ -442,15 +430,13 @@ def resource_translations_delete(request, project_slug, resource_slug, lang_code
         is_source_language = True
 
     if request.method == 'POST':
-        Translation.objects.filter(resource=resource,
-            language=language).delete()
+        delete_translations(resource, language, user=request.user)
 
         messages.success(request,
                         _("Deleted %(lang)s translation for resource "
                         "%(resource)s.") % {
                           'lang': language.name,
                           'resource': resource.name})
-        invalidate_stats_cache(resource, language, user=request.user)
         return HttpResponseRedirect(reverse('resource_detail',
                                     args=[resource.project.slug, resource.slug]),)
     else:
@@ -479,8 +465,10 @@ def get_translation_file(request, project_slug, resource_slug, lang_code):
     language = get_object_or_404(Language, code=lang_code)
 
     try:
-        fb = FormatsBackend(resource, language)
-        template = fb.compile_translation()
+        response = compiled_file_response(
+            request, resource, language,
+            mimetype=registry.mimetypes_for(resource.i18n_method)[0]
+        )
     except Exception, e:
         messages.error(request,
                        _("Error compiling translation file."))
@@ -489,9 +477,6 @@ def get_translation_file(request, project_slug, resource_slug, lang_code):
         return HttpResponseRedirect(reverse('resource_detail',
             args=[resource.project.slug, resource.slug]),)
 
-    response = HttpResponse(
-        template, mimetype=registry.mimetypes_for(resource.i18n_method)[0]
-    )
     _filename = "%(proj)s_%(res)s_%(lang)s%(type)s" % {
         'proj': smart_unicode(resource.project.slug),
         'res': smart_unicode(resource.slug),
@@ -515,8 +500,10 @@ def get_pot_file(request, project_slug, resource_slug):
         Resource, project__slug=project_slug, slug=resource_slug
     )
     try:
-        fb = FormatsBackend(resource, None)
-        template = fb.compile_translation()
+        response = compiled_file_response(
+            request, resource, None,
+            mimetype=registry.mimetypes_for(resource.i18n_method)[0]
+        )
     except Exception, e:
         messages.error(request, _("Error compiling the pot file."))
         logger.error(
@@ -525,9 +512,6 @@ def get_pot_file(request, project_slug, resource_slug):
         return HttpResponseRedirect(reverse(
                 'resource_detail', args=[resource.project.slug, resource.slug]
         ))
-    response = HttpResponse(
-        template, mimetype=registry.mimetypes_for(resource.i18n_method)[0]
-    )
     _filename = "%(proj)s_%(res)s.pot" % {
         'proj': smart_unicode(resource.project.slug),
         'res': smart_unicode(resource.slug),
@@ -18,7 +18,6 @@ from transifex.txcommon.log import logger
 from django.db import transaction
 from transifex.api.utils import BAD_REQUEST
 from uuid import uuid4
-import os
 
 
 class StorageHandler(BaseHandler):
@@ -96,11 +95,7 @@ class StorageHandler(BaseHandler):
                 sf = StorageFile()
                 sf.name = str(submitted_file.name.encode('UTF-8'))
                 sf.uuid = str(uuid4())
-                fh = open(sf.get_storage_path(), 'wb')
-                for chunk in submitted_file.chunks():
-                    fh.write(chunk)
-                fh.close()
-                sf.size = os.path.getsize(sf.get_storage_path())
+                original = sf.save_content(submitted_file.chunks())
                 sf.user = request.user
                 if 'language' in request.data.keys():
                     lang_code = request.data['language']
@@ -118,10 +113,14 @@ class StorageHandler(BaseHandler):
                     )
 
                 try:
-                    sf.update_props()
+                    sf.update_props(original)
                     sf.save()
 
-                    logger.debug("Uploaded file %s (%s)" % (sf.uuid, sf.name))
+                    if original is not None:
+                        logger.debug("Uploaded file %s (%s), same as %s" % (
+                            sf.uuid, sf.name, original.uuid))
+                    else:
+                        logger.debug("Uploaded file %s (%s)" % (sf.uuid, sf.name))
                     files.append({'uuid':sf.uuid, 'id':str(sf.id),
                         'name':sf.name})
                 except UnicodeDecodeError, e:
@@ -1,12 +1,13 @@
 # -*- coding: utf-8 -*-
 import os
-import datetime, hashlib, sys
+import datetime, hashlib, sys, tempfile
 from django.conf import settings
 from django.db.models import permalink
 from django.contrib.auth.models import User
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import ugettext
+from django.utils.hashcompat import md5_constructor
 
 from transifex.languages.models import Language
 from transifex.txcommon.exceptions import FileCheckError
@@ -46,6 +47,9 @@ class StorageFile(models.Model):
 
     created = models.DateTimeField(auto_now_add=True, editable=False)
     total_strings = models.IntegerField(_('Total number of strings'), blank=True, null=True)
+    # md5 hash of the content, which identifies files with the same content
+    content_hash = models.CharField(_('Hash of the content'), max_length=32,
+        blank=True, default='', db_index=True, editable=False)
 
     def __unicode__(self):
         return "%s (%s)" % (self.name, self.uuid)
@@ -66,6 +70,63 @@ class StorageFile(models.Model):
         filename = "%s-%s" % (self.uuid, self.name)
         return os.path.join(settings.STORAGE_DIR, filename)
 
+    def save_content(self, chunks):
+        """
+        Write the content of the file, given as an iterable of chunks, to the
+        storage and hash it on the way.
+
+        If a file with the same content is already stored, the file becomes
+        a hard link to it. Returns that file or None.
+        """
+        md5 = md5_constructor()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=settings.STORAGE_DIR,
+            prefix='.upload-')
+        try:
+            fh = os.fdopen(fd, 'wb')
+            try:
+                for chunk in chunks:
+                    md5.update(chunk)
+                    size += len(chunk)
+                    fh.write(chunk)
+            finally:
+                fh.close()
+            self.size = size
+            self.content_hash = md5.hexdigest()
+            original = self.find_duplicate()
+            if original is not None:
+                try:
+                    os.link(original.get_storage_path(),
+                        self.get_storage_path())
+                except (OSError, AttributeError), e:
+                    # Not supported by the filesystem, keep the copy
+                    logger.debug("Could not link %s to %s: %s" % (
+                        self, original, e))
+                    original = None
+            if original is None:
+                os.rename(tmp_path, self.get_storage_path())
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return original
+
+    def find_duplicate(self):
+        """
+        Return a stored file with the same content, which has been checked
+        already, or None.
+        """
+        if not self.content_hash:
+            return None
+        duplicates = StorageFile.objects.filter(
+            content_hash=self.content_hash, size=self.size
+        ).exclude(mime_type='').order_by('-id')
+        if self.id:
+            duplicates = duplicates.exclude(id=self.id)
+        for duplicate in duplicates[:10]:
+            if os.path.isfile(duplicate.get_storage_path()):
+                return duplicate
+        return None
+
     def translatable(self):
         """
         Whether we could extract any strings -> whether we can translate file
@@ -86,10 +147,7 @@ class StorageFile(models.Model):
             i18n_type = 'POT'
         return registry.handler_for(i18n_type)
 
-    def update_props(self):
-        """
-        Try to parse the file and fill in information fields in current model
-        """
+    def _detect_mime_type(self):
         # this try to guess the API of the magic module, between
         # the one from file and the other one from python-magic
         try:
@@ -104,20 +162,47 @@ class StorageFile(models.Model):
         except Exception, e:
             pass
 
-        self.save()
+    def get_parser(self, resource=None, is_source=False):
+        """
+        Return the handler of the file with its content parsed or None, if
+        there is no handler for the format.
 
+        The result of parsing is cached under the hash of the content, so
+        that the same content is parsed (and checked) only once. The parse
+        of ``update_props`` is reused by the import of the file as a
+        translation of any resource.
+        """
+        from transifex.resources.formats.parse_cache import parse_file_cached
         try:
             parser = self.find_parser()
         except IndexError, e:
             raise FileCheckError("Invalid format")
-
         if not parser:
-            return
-
+            return None
         parser.bind_file(filename=self.get_storage_path())
+        if resource is not None:
+            parser.bind_resource(resource)
         parser.set_language(self.language)
-        parser.is_content_valid()
-        parser.parse_file()
+        parse_file_cached(parser, self.content_hash, is_source, check=True)
+        return parser
+
+    def update_props(self, original=None):
+        """
+        Try to parse the file and fill in information fields in current model
+
+        The mime type is copied from ``original``, a stored file with the
+        same content, if given.
+        """
+        if original is not None and original.mime_type:
+            self.mime_type = original.mime_type
+        else:
+            self._detect_mime_type()
+
+        self.save()
+
+        parser = self.get_parser()
+        if not parser:
+            return
 
         stringset = parser.stringset
         if not stringset:
@@ -1 +1,2 @@
-from api import *
\ No newline at end of file
+from api import *
+from content import *
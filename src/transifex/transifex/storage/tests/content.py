@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import os
+from django.conf import settings
+from django.core.cache import get_cache
+from transifex.resources.formats import parse_cache
+from transifex.resources.formats.pofile import POHandler
+from transifex.storage.models import StorageFile
+from transifex.storage.tests.api import BaseStorageTests
+
+
+class StorageContentTests(BaseStorageTests):
+    """Test the storage of files with the same content."""
+
+    def setUp(self):
+        super(StorageContentTests, self).setUp()
+        self.old_cache = parse_cache.cache
+        parse_cache.cache = get_cache(
+            'django.core.cache.backends.locmem.LocMemCache',
+            LOCATION='parsed-files-tests'
+        )
+        parse_cache.cache.clear()
+        self.old_timeout = settings.PARSED_FILE_CACHE_TIMEOUT
+        settings.PARSED_FILE_CACHE_TIMEOUT = 60
+        self.old_parse_file = POHandler.parse_file
+        self.parsed = []
+        def parse_file(handler, *args, **kwargs):
+            self.parsed.append(handler)
+            return self.old_parse_file(handler, *args, **kwargs)
+        POHandler.parse_file = parse_file
+
+    def tearDown(self):
+        POHandler.parse_file = self.old_parse_file
+        parse_cache.cache = self.old_cache
+        settings.PARSED_FILE_CACHE_TIMEOUT = self.old_timeout
+        super(StorageContentTests, self).tearDown()
+
+    def test_same_content_is_stored_once(self):
+        """Test that files with the same content share their blob."""
+        self.create_storage()
+        first = StorageFile.objects.get(uuid=self.uuid)
+        self.create_storage()
+        second = StorageFile.objects.get(uuid=self.uuid)
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(len(first.content_hash), 32)
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertEqual(first.size, second.size)
+        self.assertEqual(first.mime_type, second.mime_type)
+        self.assertEqual(first.total_strings, second.total_strings)
+        self.assertEqual(
+            os.stat(first.get_storage_path()).st_ino,
+            os.stat(second.get_storage_path()).st_ino
+        )
+        self.assertEqual(first.find_duplicate(), second)
+
+        # Deleting a file leaves the other one in place
+        second.delete()
+        self.assertTrue(os.path.isfile(first.get_storage_path()))
+        self.assertEqual(first.find_duplicate(), None)
+        first.delete()
+
+    def test_parsed_once(self):
+        """Test that the content of a file is parsed only once."""
+        self.create_storage()
+        sf = StorageFile.objects.get(uuid=self.uuid)
+        # The file was parsed when it was uploaded
+        parsed = len(self.parsed)
+        self.assertTrue(parsed > 0)
+        parser = sf.get_parser()
+        self.assertEqual(len(self.parsed), parsed)
+        self.assertEqual(
+            len([s for s in parser.stringset.strings if s.rule == 5]),
+            sf.total_strings
+        )
+
+        # Importing the file as a translation reuses the same parse, for
+        # any resource.
+        other = sf.get_parser(self.resource)
+        self.assertEqual(len(self.parsed), parsed)
+        self.assertEqual(other.resource, self.resource)
+        self.assertEqual(
+            len(other.stringset.strings), len(parser.stringset.strings)
+        )
+        sf.get_parser(self.resource_private)
+        self.assertEqual(len(self.parsed), parsed)
+
+        # Parsing as a source file is cached separately
+        sf.get_parser(self.resource, is_source=True)
+        self.assertEqual(len(self.parsed), parsed + 1)
+        source = sf.get_parser(self.resource, is_source=True)
+        self.assertEqual(len(self.parsed), parsed + 1)
+        self.assertTrue(source.template)
+
+    def test_cache_disabled(self):
+        """Test that files are parsed every time without the cache."""
+        settings.PARSED_FILE_CACHE_TIMEOUT = 0
+        self.create_storage()
+        sf = StorageFile.objects.get(uuid=self.uuid)
+        parsed = len(self.parsed)
+        sf.get_parser()
+        sf.get_parser()
+        self.assertEqual(len(self.parsed), parsed + 2)
+
+    def test_checked_unless_cached(self):
+        """Test that the content is checked when it is not cached."""
+        checked = []
+        old_is_content_valid = POHandler.is_content_valid
+        def is_content_valid(handler, *args, **kwargs):
+            checked.append(handler)
+            return old_is_content_valid(handler, *args, **kwargs)
+        POHandler.is_content_valid = is_content_valid
+        try:
+            self.create_storage()
+            sf = StorageFile.objects.get(uuid=self.uuid)
+            count = len(checked)
+            sf.get_parser()
+            self.assertEqual(len(checked), count)
+            settings.PARSED_FILE_CACHE_TIMEOUT = 0
+            sf.get_parser()
+            self.assertEqual(len(checked), count + 1)
+        finally:
+            POHandler.is_content_valid = old_is_content_valid
+
+    def test_database_dependent_parses_not_cached(self):
+        handler = POHandler()
+        handler.set_language(self.language)
+        self.assertTrue(parse_cache._is_cacheable(handler, 'a' * 32))
+        handler.parse_uses_database = True
+        self.assertFalse(parse_cache._is_cacheable(handler, 'a' * 32))
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Support for benchmarks.
+
+Applications can define benchmarks in a ``benchmarks`` module. Each benchmark
+is a callable decorated with ``register``, which gets a ``BenchmarkRun``
+object and uses it to time the tasks it wants to compare::
+
+    from transifex.txcommon.benchmarks import register
+
+    @register('compile', "Compile a template with 20k strings")
+    def compile_template(run):
+        run.time("old", old_compile, content)
+        run.time("new", new_compile, content)
+
+Benchmarks are run with ``./manage.py txbenchmark [name ...]``.
+"""
+
+from django.conf import settings
+from django.utils.datastructures import SortedDict
+from django.utils.importlib import import_module
+from transifex.txcommon.timers import Timer
+
+_registry = SortedDict()
+
+
+def register(name, description):
+    """Register the decorated callable as the benchmark ``name``."""
+    def decorator(func):
+        _registry[name] = (func, description)
+        return func
+    return decorator
+
+
+def autodiscover():
+    """Import the ``benchmarks`` module of every installed application."""
+    for app in settings.INSTALLED_APPS:
+        try:
+            import_module('%s.benchmarks' % app)
+        except ImportError, e:
+            # Skip applications without benchmarks, but do not hide the
+            # errors of the benchmark modules themselves.
+            if not str(e).endswith('benchmarks'):
+                raise
+
+
+def get_benchmarks():
+    """Return a dictionary of the registered benchmarks."""
+    return _registry
+
+
+class BenchmarkRun(object):
+    """Collect the timers of a single benchmark."""
+
+    def __init__(self, name):
+        self.name = name
+        self.timers = []
+        self.notes = []
+
+    def time(self, task, func, *args, **kwargs):
+        """Time the call ``func(*args, **kwargs)`` and return its result."""
+        timer = Timer(name="%s: %s" % (self.name, task), description=task)
+        timer.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timer.stop()
+            timer.log()
+            self.timers.append(timer)
+
+    def note(self, task, text):
+        """Report a measurement other than time, like the memory used."""
+        self.notes.append((task, text))
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers for writing many rows of a model with a few queries.
+
+The helpers bypass ``Model.save()`` and ``Model.delete()`` on purpose, so
+neither the custom save methods nor the ``pre_save``/``post_save`` signals
+are called. Callers must do the extra processing themselves.
+"""
+
+from django.db import connection, transaction
+from django.db.models import AutoField
+
+
+def chunks(items, size):
+    """Yield successive lists of ``size`` items from the sequence."""
+    for i in xrange(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _column_values(obj, fields, add):
+    """Return the database values of ``fields`` for ``obj``."""
+    return [
+        f.get_db_prep_save(f.pre_save(obj, add), connection=connection)
+        for f in fields
+    ]
+
+
+def bulk_insert(model, objs, chunk_size=500):
+    """Insert the unsaved ``objs`` with one query per chunk.
+
+    The primary keys of the objects are not set.
+    """
+    if not objs:
+        return
+    qn = connection.ops.quote_name
+    opts = model._meta
+    fields = [f for f in opts.local_fields if not isinstance(f, AutoField)]
+    sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+        qn(opts.db_table),
+        ', '.join(qn(f.column) for f in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    cursor = connection.cursor()
+    for chunk in chunks(objs, chunk_size):
+        cursor.executemany(
+            sql, [_column_values(obj, fields, True) for obj in chunk]
+        )
+    transaction.commit_unless_managed()
+
+
+def bulk_update(model, objs, field_names, chunk_size=500):
+    """Update the ``field_names`` columns of the saved ``objs`` with one
+    query per chunk.
+
+    Fields with ``auto_now`` set are updated as well.
+    """
+    if not objs:
+        return
+    qn = connection.ops.quote_name
+    opts = model._meta
+    fields = [
+        f for f in opts.local_fields
+        if f.name in field_names or getattr(f, 'auto_now', False)
+    ]
+    sql = "UPDATE %s SET %s WHERE %s = %%s" % (
+        qn(opts.db_table),
+        ', '.join('%s = %%s' % qn(f.column) for f in fields),
+        qn(opts.pk.column),
+    )
+    cursor = connection.cursor()
+    for chunk in chunks(objs, chunk_size):
+        cursor.executemany(sql, [
+            _column_values(obj, fields, False) + [obj.pk] for obj in chunk
+        ])
+    transaction.commit_unless_managed()
+
+
+def bulk_delete(model, pks, chunk_size=500):
+    """Delete the rows of ``model`` with the primary keys ``pks``.
+
+    Related objects are deleted by the ORM, one chunk at a time.
+    """
+    pks = list(pks)
+    for chunk in chunks(pks, chunk_size):
+        model.objects.filter(pk__in=chunk).delete()
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-import base64, datetime, re
+import base64, datetime, re, zlib
 from django import forms
 from django.conf import settings
 from django.db.models.signals import post_save
@@ -155,37 +155,137 @@ class ListCharField(models.CharField):
         return u':'.join(unicode(x) for x in value)
 
 
+ZLIB_PREFIX = 'zlib:'
+ZLIB_UNICODE_PREFIX = 'zlibu:'
+
+
+def compress_value(value, format=None):
+    """Return the value of a CompressedTextField as stored in the db.
+
+    Strings are stored zlib compressed, after a prefix that tells whether
+    the value was unicode. The legacy ``pickle`` format pickles and gzips
+    the value instead; it is also used for values that are not strings.
+
+    Both formats are base64 encoded, since the column is a text one in
+    PostgreSQL.
+    """
+    if format is None:
+        format = settings.COMPRESSED_TEXT_FIELD_FORMAT
+    if format == 'zlib':
+        if isinstance(value, unicode):
+            return ZLIB_UNICODE_PREFIX + base64.b64encode(
+                zlib.compress(value.encode('UTF-8'))
+            )
+        if isinstance(value, str):
+            return ZLIB_PREFIX + base64.b64encode(zlib.compress(value))
+    return base64.encodestring(compress_string(pickle.dumps(value)))
+
+
+def decompress_value(value):
+    """Return the python value of a CompressedTextField db value.
+
+    Values that are not compressed are returned as they are.
+    """
+    if value is None:
+        return
+    if isinstance(value, buffer):
+        value = str(value)
+    if value.startswith(ZLIB_UNICODE_PREFIX):
+        return zlib.decompress(
+            base64.b64decode(value[len(ZLIB_UNICODE_PREFIX):])
+        ).decode('UTF-8')
+    if value.startswith(ZLIB_PREFIX):
+        return zlib.decompress(base64.b64decode(value[len(ZLIB_PREFIX):]))
+    try:
+        value = pickle.loads(uncompress_string(base64.decodestring(value)))
+    except:
+        # if we can't unpickle it it's not pickled. probably we got a
+        # normal string. pass
+        pass
+    return value
+
+
+def is_legacy_compressed(value):
+    """Return whether a db value is not in the zlib format."""
+    if value is None:
+        return False
+    if isinstance(value, buffer):
+        value = str(value)
+    return not value.startswith(ZLIB_PREFIX) and \
+            not value.startswith(ZLIB_UNICODE_PREFIX)
+
+
+class _Compressed(object):
+    """A db value of a CompressedTextField to be saved as it is."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class CompressedValueDescriptor(object):
+    """
+    Keep the db value of a CompressedTextField and decompress it the first
+    time the attribute is read.
+
+    Loading an object does not pay for the decompression of a field that is
+    never used, and only the compressed data is kept in memory until then.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            raise AttributeError("Can only be accessed via an instance.")
+        data = instance.__dict__
+        attname = self.field.attname
+        try:
+            return data[attname]
+        except KeyError:
+            value = data[attname] = decompress_value(
+                data.pop(self.field.raw_attname, None)
+            )
+            return value
+
+    def __set__(self, instance, value):
+        data = instance.__dict__
+        data.pop(self.field.attname, None)
+        data[self.field.raw_attname] = value
+
+
 class CompressedTextField(models.TextField):
     """
     Transparently compress data before hitting the db and uncompress after
     fetching.
+
+    The data is decompressed lazily, when the attribute is first read. See
+    ``compress_value`` for the formats of the stored data.
     """
-    __metaclass__ = models.SubfieldBase
+
+    def contribute_to_class(self, cls, name):
+        super(CompressedTextField, self).contribute_to_class(cls, name)
+        self.raw_attname = '_%s_raw' % self.attname
+        setattr(cls, self.name, CompressedValueDescriptor(self))
+
+    def pre_save(self, model_instance, add):
+        # Save the data that was never read as it is, unless it has to be
+        # converted from the legacy format.
+        data = model_instance.__dict__
+        if self.attname not in data:
+            raw = data.get(self.raw_attname)
+            if raw is not None and not is_legacy_compressed(raw):
+                return _Compressed(raw)
+        return getattr(model_instance, self.attname)
 
     def get_db_prep_value(self, value, connection=None, prepared=False):
+        if isinstance(value, _Compressed):
+            return value.data
         if value is not None:
-            value = base64.encodestring(compress_string(pickle.dumps(value)))
+            value = compress_value(value)
         return value
 
     def to_python(self, value):
-        if value is None: return
-        try:
-            value = pickle.loads(uncompress_string(base64.decodestring(value)))
-        except:
-            # if we can't unpickle it it's not pickled. probably we got a
-            # normal string. pass
-            pass
-        return value
-
-    def post_init(self, instance=None, **kwargs):
-        value = self._get_val_from_obj(instance)
-        if value:
-            setattr(instance, self.attname, value)
-
-    def contribute_to_class(self, cls, name):
-        super(CompressedTextField, self).contribute_to_class(cls, name)
-        models.signals.post_init.connect(self.post_init, sender=cls)
-
+        return decompress_value(value)
 
     def value_to_string(self, obj):
         value = self._get_val_from_obj(obj)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from transifex.txcommon.benchmarks import autodiscover, get_benchmarks, \
+        BenchmarkRun
+
+
+class Command(BaseCommand):
+    help = ("Run the benchmarks of the installed applications. Benchmarks "
+            "run against a freshly created test database.")
+    args = "<benchmark1 benchmark2 ...>"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--list', action='store_true', dest='list',
+            default=False, help='List the available benchmarks and exit.'),
+        make_option('--noinput', action='store_false', dest='interactive',
+            default=True, help='Do not prompt before destroying an '
+            'existing test database.'),
+    )
+
+    requires_model_validation = True
+    can_import_settings = True
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        autodiscover()
+        benchmarks = get_benchmarks()
+
+        if options.get('list'):
+            for name, (func, description) in benchmarks.iteritems():
+                self.stdout.write("%s: %s\n" % (name, description))
+            return
+
+        names = args or benchmarks.keys()
+        for name in names:
+            if name not in benchmarks:
+                raise CommandError("Unknown benchmark %s" % name)
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=verbosity, autoclobber=not options.get('interactive')
+        )
+        try:
+            for name in names:
+                func, description = benchmarks[name]
+                self.stdout.write("%s: %s\n" % (name, description))
+                run = BenchmarkRun(name)
+                func(run)
+                for timer in run.timers:
+                    self.stdout.write("  %-40s %8.3fs (CPU %.3fs)\n" % (
+                        timer.description, timer.duration, timer.cpu_duration
+                    ))
+                for task, text in run.notes:
+                    self.stdout.write("  %-40s %s\n" % (task, text))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity)
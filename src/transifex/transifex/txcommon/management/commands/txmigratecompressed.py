@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import get_models
+from transifex.txcommon.db.bulk import chunks
+from transifex.txcommon.db.models import CompressedTextField, \
+        compress_value, decompress_value, is_legacy_compressed, _Compressed
+
+
+class Command(BaseCommand):
+    help = ("Convert the values of the compressed text fields, like the "
+            "templates of the resources, from the legacy pickle format to "
+            "the zlib one.")
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', action='store', type='int',
+            dest='batch_size', default=100,
+            help='Number of rows loaded at a time.'),
+        make_option('--dry-run', action='store_true', dest='dry_run',
+            default=False, help='Only count the rows to convert.'),
+    )
+
+    requires_model_validation = True
+    can_import_settings = True
+
+    def handle(self, *args, **options):
+        verbosity = int(options.get('verbosity', 1))
+        for model in get_models():
+            for field in model._meta.local_fields:
+                if isinstance(field, CompressedTextField):
+                    converted = self._migrate_field(
+                        model, field, options['batch_size'],
+                        options['dry_run']
+                    )
+                    if verbosity > 0:
+                        self.stdout.write("%s.%s: %s rows %s\n" % (
+                            model._meta.object_name, field.name, converted,
+                            options['dry_run'] and 'to convert' or 'converted'
+                        ))
+
+    def _migrate_field(self, model, field, batch_size, dry_run):
+        """Convert the legacy values of a field, one batch at a time.
+
+        Returns the number of converted rows.
+        """
+        manager = model._default_manager
+        pks = list(manager.values_list('pk', flat=True).order_by('pk'))
+        converted = 0
+        for batch in chunks(pks, batch_size):
+            # values_list returns the db values without decompressing them.
+            rows = manager.filter(pk__in=batch).values_list(
+                'pk', field.attname
+            )
+            for pk, raw in rows:
+                if not is_legacy_compressed(raw):
+                    continue
+                converted += 1
+                if not dry_run:
+                    value = compress_value(decompress_value(raw), 'zlib')
+                    manager.filter(pk=pk).update(
+                        **{field.attname: _Compressed(value)}
+                    )
+            if not dry_run:
+                transaction.commit_unless_managed()
+        return converted
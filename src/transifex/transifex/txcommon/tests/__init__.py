@@ -1,2 +1,3 @@
 from base import *
-from testmaker import *
\ No newline at end of file
+from testmaker import *
+from db import *
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.core.management import call_command
+from transifex.resources.models import Template
+from transifex.txcommon.db.models import is_legacy_compressed
+from transifex.txcommon.tests.base import BaseTestCase
+
+
+class CompressedTextFieldTests(BaseTestCase):
+    """Test the storage formats of the compressed text fields."""
+
+    def setUp(self):
+        super(CompressedTextFieldTests, self).setUp()
+        self.content = u'msgid "%s"\nmsgstr ""\nαβγ' % (
+            'x' * 1000
+        )
+
+    def _raw(self, template):
+        return Template.objects.filter(pk=template.pk).values_list(
+            'content', flat=True
+        )[0]
+
+    def test_lazy(self):
+        template = Template.objects.create(
+            resource=self.resource, content=self.content
+        )
+        self.assertFalse(is_legacy_compressed(self._raw(template)))
+        template = Template.objects.get(pk=template.pk)
+        self.assertFalse('content' in template.__dict__)
+        self.assertEqual(template.content, self.content)
+        self.assertTrue(isinstance(template.content, unicode))
+        self.assertTrue('content' in template.__dict__)
+        self.assertFalse('_content_raw' in template.__dict__)
+
+    def _create_legacy(self, content):
+        old_format = settings.COMPRESSED_TEXT_FIELD_FORMAT
+        settings.COMPRESSED_TEXT_FIELD_FORMAT = 'pickle'
+        try:
+            template = Template.objects.create(
+                resource=self.resource, content=content
+            )
+        finally:
+            settings.COMPRESSED_TEXT_FIELD_FORMAT = old_format
+        self.assertTrue(is_legacy_compressed(self._raw(template)))
+        return template
+
+    def test_formats(self):
+        content = self.content.encode('UTF-8')
+        template = self._create_legacy(content)
+        template = Template.objects.get(pk=template.pk)
+        self.assertEqual(template.content, content)
+        self.assertTrue(isinstance(template.content, str))
+
+        # Saving converts legacy values
+        template.save()
+        self.assertFalse(is_legacy_compressed(self._raw(template)))
+
+        # Values that were never read are saved as they are.
+        raw = self._raw(template)
+        template = Template.objects.get(pk=template.pk)
+        template.save()
+        self.assertEqual(self._raw(template), raw)
+        self.assertFalse('content' in template.__dict__)
+
+    def test_migration_command(self):
+        template = self._create_legacy(self.content)
+        call_command('txmigratecompressed', dry_run=True, verbosity=0)
+        self.assertTrue(is_legacy_compressed(self._raw(template)))
+        call_command('txmigratecompressed', verbosity=0)
+        self.assertFalse(is_legacy_compressed(self._raw(template)))
+        self.assertEqual(
+            Template.objects.get(pk=template.pk).content, self.content
+        )